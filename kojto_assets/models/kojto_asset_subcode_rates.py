@@ -23,14 +23,11 @@ class KojtoAssetSubcodeRates(models.Model):
 
     @api.depends("rate", "currency_id", "datetime_start")
     def _compute_rate_in_BGN(self):
+        # Get BGN currency
+        bgn_currency = self.env['res.currency'].search([('name', '=', 'BGN')], limit=1)
+        to_convert = []
         for record in self:
-            if not record.rate or not record.currency_id:
-                record.rate_in_BGN = 0.0
-                continue
-
-            # Get BGN currency
-            bgn_currency = self.env['res.currency'].search([('name', '=', 'BGN')], limit=1)
-            if not bgn_currency:
+            if not record.rate or not record.currency_id or not bgn_currency:
                 record.rate_in_BGN = 0.0
                 continue
 
@@ -44,59 +41,26 @@ class KojtoAssetSubcodeRates(models.Model):
                 record.rate_in_BGN = record.rate * 1.95583
                 continue
 
-            # For other currencies, try to get exchange rate from kojto.base.currency.exchange
-            exchange_rate = 0.0
-            if record.datetime_start:
-                # Try direct rate first
-                exchange_record = self.env['kojto.base.currency.exchange'].search([
-                    ('base_currency_id', '=', record.currency_id.id),
-                    ('target_currency_id', '=', bgn_currency.id),
-                    ('datetime', '<=', record.datetime_start),
-                ], order='datetime desc', limit=1)
-
-                if exchange_record:
-                    exchange_rate = exchange_record.exchange_rate
-                else:
-                    # Try reverse rate
-                    exchange_record = self.env['kojto.base.currency.exchange'].search([
-                        ('base_currency_id', '=', bgn_currency.id),
-                        ('target_currency_id', '=', record.currency_id.id),
-                        ('datetime', '<=', record.datetime_start),
-                    ], order='datetime desc', limit=1)
-
-                    if exchange_record and exchange_record.exchange_rate > 0:
-                        exchange_rate = 1.0 / exchange_record.exchange_rate
-                    else:
-                        # If no rate found for the specific date, try most recent rate
-                        exchange_record = self.env['kojto.base.currency.exchange'].search([
-                            ('base_currency_id', '=', record.currency_id.id),
-                            ('target_currency_id', '=', bgn_currency.id),
-                        ], order='datetime desc', limit=1)
-
-                        if exchange_record:
-                            exchange_rate = exchange_record.exchange_rate
-                        else:
-                            # Try most recent reverse rate
-                            exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                ('base_currency_id', '=', bgn_currency.id),
-                                ('target_currency_id', '=', record.currency_id.id),
-                            ], order='datetime desc', limit=1)
-
-                            if exchange_record and exchange_record.exchange_rate > 0:
-                                exchange_rate = 1.0 / exchange_record.exchange_rate
-
+            # For other currencies, the exchange rates are looked up below in one batch
+            record.rate_in_BGN = 0.0
+            reference_dt = record.datetime_start
+            if reference_dt:
+                to_convert.append((record, reference_dt))
+
+        exchange_rates = self.env['kojto.base.currency.exchange'].get_rates([
+            (record.currency_id.id, bgn_currency.id, reference_dt) for record, reference_dt in to_convert
+        ])
+        for (record, _reference_dt), exchange_rate in zip(to_convert, exchange_rates):
+            exchange_rate = exchange_rate or 0.0
             record.rate_in_BGN = record.rate * exchange_rate if exchange_rate > 0 else 0.0
 
     @api.depends("rate", "currency_id", "datetime_start")
     def _compute_rate_in_EUR(self):
+        # Get EUR currency
+        eur_currency = self.env['res.currency'].search([('name', '=', 'EUR')], limit=1)
+        to_convert = []
         for record in self:
-            if not record.rate or not record.currency_id:
-                record.rate_in_EUR = 0.0
-                continue
-
-            # Get EUR currency
-            eur_currency = self.env['res.currency'].search([('name', '=', 'EUR')], limit=1)
-            if not eur_currency:
+            if not record.rate or not record.currency_id or not eur_currency:
                 record.rate_in_EUR = 0.0
                 continue
 
@@ -110,47 +74,17 @@ class KojtoAssetSubcodeRates(models.Model):
                 record.rate_in_EUR = record.rate * (1.0 / 1.95583)
                 continue
 
-            # For other currencies, try to get exchange rate from kojto.base.currency.exchange
-            exchange_rate = 0.0
-            if record.datetime_start:
-                # Try direct rate first
-                exchange_record = self.env['kojto.base.currency.exchange'].search([
-                    ('base_currency_id', '=', record.currency_id.id),
-                    ('target_currency_id', '=', eur_currency.id),
-                    ('datetime', '<=', record.datetime_start),
-                ], order='datetime desc', limit=1)
-
-                if exchange_record:
-                    exchange_rate = exchange_record.exchange_rate
-                else:
-                    # Try reverse rate
-                    exchange_record = self.env['kojto.base.currency.exchange'].search([
-                        ('base_currency_id', '=', eur_currency.id),
-                        ('target_currency_id', '=', record.currency_id.id),
-                        ('datetime', '<=', record.datetime_start),
-                    ], order='datetime desc', limit=1)
-
-                    if exchange_record and exchange_record.exchange_rate > 0:
-                        exchange_rate = 1.0 / exchange_record.exchange_rate
-                    else:
-                        # If no rate found for the specific date, try most recent rate
-                        exchange_record = self.env['kojto.base.currency.exchange'].search([
-                            ('base_currency_id', '=', record.currency_id.id),
-                            ('target_currency_id', '=', eur_currency.id),
-                        ], order='datetime desc', limit=1)
-
-                        if exchange_record:
-                            exchange_rate = exchange_record.exchange_rate
-                        else:
-                            # Try most recent reverse rate
-                            exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                ('base_currency_id', '=', eur_currency.id),
-                                ('target_currency_id', '=', record.currency_id.id),
-                            ], order='datetime desc', limit=1)
-
-                            if exchange_record and exchange_record.exchange_rate > 0:
-                                exchange_rate = 1.0 / exchange_record.exchange_rate
-
+            # For other currencies, the exchange rates are looked up below in one batch
+            record.rate_in_EUR = 0.0
+            reference_dt = record.datetime_start
+            if reference_dt:
+                to_convert.append((record, reference_dt))
+
+        exchange_rates = self.env['kojto.base.currency.exchange'].get_rates([
+            (record.currency_id.id, eur_currency.id, reference_dt) for record, reference_dt in to_convert
+        ])
+        for (record, _reference_dt), exchange_rate in zip(to_convert, exchange_rates):
+            exchange_rate = exchange_rate or 0.0
             record.rate_in_EUR = record.rate * exchange_rate if exchange_rate > 0 else 0.0
 
     def get_utc_from_local(self, hour):
@@ -192,39 +126,7 @@ class KojtoAssetSubcodeRates(models.Model):
                     # Get exchange rate
                     exchange_rate = 0.0
                     if record.datetime_start:
-                        # Try direct rate
-                        exchange_record = self.env['kojto.base.currency.exchange'].search([
-                            ('base_currency_id', '=', record.currency_id.id),
-                            ('target_currency_id', '=', bgn_id),
-                            ('datetime', '<=', record.datetime_start),
-                        ], order='datetime desc', limit=1)
-                        if exchange_record:
-                            exchange_rate = exchange_record.exchange_rate
-                        else:
-                            # Try reverse rate
-                            exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                ('base_currency_id', '=', bgn_id),
-                                ('target_currency_id', '=', record.currency_id.id),
-                                ('datetime', '<=', record.datetime_start),
-                            ], order='datetime desc', limit=1)
-                            if exchange_record and exchange_record.exchange_rate > 0:
-                                exchange_rate = 1.0 / exchange_record.exchange_rate
-                            else:
-                                # Try most recent direct
-                                exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                    ('base_currency_id', '=', record.currency_id.id),
-                                    ('target_currency_id', '=', bgn_id),
-                                ], order='datetime desc', limit=1)
-                                if exchange_record:
-                                    exchange_rate = exchange_record.exchange_rate
-                                else:
-                                    # Try most recent reverse
-                                    exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                        ('base_currency_id', '=', bgn_id),
-                                        ('target_currency_id', '=', record.currency_id.id),
-                                    ], order='datetime desc', limit=1)
-                                    if exchange_record and exchange_record.exchange_rate > 0:
-                                        exchange_rate = 1.0 / exchange_record.exchange_rate
+                        exchange_rate = self.env['kojto.base.currency.exchange'].get_rate(record.currency_id.id, bgn_id, record.datetime_start) or 0.0
                     rate_in_BGN = record.rate * exchange_rate if exchange_rate > 0 else 0.0
 
             # Compute EUR rate
@@ -239,39 +141,7 @@ class KojtoAssetSubcodeRates(models.Model):
                     # Get exchange rate
                     exchange_rate = 0.0
                     if record.datetime_start:
-                        # Try direct rate
-                        exchange_record = self.env['kojto.base.currency.exchange'].search([
-                            ('base_currency_id', '=', record.currency_id.id),
-                            ('target_currency_id', '=', eur_id),
-                            ('datetime', '<=', record.datetime_start),
-                        ], order='datetime desc', limit=1)
-                        if exchange_record:
-                            exchange_rate = exchange_record.exchange_rate
-                        else:
-                            # Try reverse rate
-                            exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                ('base_currency_id', '=', eur_id),
-                                ('target_currency_id', '=', record.currency_id.id),
-                                ('datetime', '<=', record.datetime_start),
-                            ], order='datetime desc', limit=1)
-                            if exchange_record and exchange_record.exchange_rate > 0:
-                                exchange_rate = 1.0 / exchange_record.exchange_rate
-                            else:
-                                # Try most recent direct
-                                exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                    ('base_currency_id', '=', record.currency_id.id),
-                                    ('target_currency_id', '=', eur_id),
-                                ], order='datetime desc', limit=1)
-                                if exchange_record:
-                                    exchange_rate = exchange_record.exchange_rate
-                                else:
-                                    # Try most recent reverse
-                                    exchange_record = self.env['kojto.base.currency.exchange'].search([
-                                        ('base_currency_id', '=', eur_id),
-                                        ('target_currency_id', '=', record.currency_id.id),
-                                    ], order='datetime desc', limit=1)
-                                    if exchange_record and exchange_record.exchange_rate > 0:
-                                        exchange_rate = 1.0 / exchange_record.exchange_rate
+                        exchange_rate = self.env['kojto.base.currency.exchange'].get_rate(record.currency_id.id, eur_id, record.datetime_start) or 0.0
                     rate_in_EUR = record.rate * exchange_rate if exchange_rate > 0 else 0.0
 
             # Update directly in database using SQL (bypasses validation)
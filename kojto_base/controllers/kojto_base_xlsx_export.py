@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import os
+
+from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import request, content_disposition
+
+from ..utils.kojto_base_xlsx_export import KojtoXlsxExport, XLSX_MIMETYPE
+
+
+class KojtoBaseXlsxExportController(http.Controller):
+
+    @http.route('/kojto_base/xlsx_export', type='http', auth="user")
+    def xlsx_export(self, model, res_id, export, **params):
+        if model not in request.env or not export.isidentifier():
+            raise NotFound()
+        record = request.env[model].browse(int(res_id)).exists()
+        writer = getattr(record, f"_xlsx_export_{export}", None)
+        if not record or not writer:
+            raise NotFound()
+        record.check_access('read')
+
+        xlsx = KojtoXlsxExport()
+        filename = writer(xlsx, **params)
+        output = xlsx.close()
+
+        # The file is sent from disk in blocks, never read into memory as a whole
+        response = request.make_response(
+            wrap_file(request.httprequest.environ, output),
+            headers=[
+                ('Content-Type', XLSX_MIMETYPE),
+                ('Content-Length', os.fstat(output.fileno()).st_size),
+                ('Content-Disposition', content_disposition(filename)),
+            ],
+        )
+        response.direct_passthrough = True
+        return response
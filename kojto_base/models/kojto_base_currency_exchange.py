@@ -1,8 +1,9 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 import xml.etree.ElementTree as ET
 import requests
-from datetime import datetime
+from bisect import bisect_right
+from datetime import date as date_type, datetime, time
 
 class KojtoBaseCurrencyExchange(models.Model):
     _name = "kojto.base.currency.exchange"
@@ -15,6 +16,138 @@ class KojtoBaseCurrencyExchange(models.Model):
     datetime = fields.Datetime(string="Date and Time")
     url = fields.Char("Originates from URL")
 
+    def init(self):
+        # Version of the rate series cache, raised in the transaction that changes the rates.
+        # Versions come from a sequence, so a rolled back change never reuses a cached version.
+        self.env.cr.execute("""
+            CREATE SEQUENCE IF NOT EXISTS kojto_base_currency_exchange_version_seq;
+            CREATE TABLE IF NOT EXISTS kojto_base_currency_exchange_version (
+                id integer PRIMARY KEY,
+                version bigint NOT NULL
+            );
+            INSERT INTO kojto_base_currency_exchange_version (id, version) VALUES (1, 0)
+            ON CONFLICT (id) DO NOTHING;
+        """)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._invalidate_rate_series()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        self._invalidate_rate_series()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self._invalidate_rate_series()
+        return result
+
+    @api.model
+    def _invalidate_rate_series(self):
+        """Raise the cache version so every worker reloads the rate series once this commits."""
+        self.env.cr.execute("""
+            UPDATE kojto_base_currency_exchange_version
+            SET version = nextval('kojto_base_currency_exchange_version_seq')
+            WHERE id = 1
+        """)
+
+    @api.model
+    def _get_rate_series(self, base_currency_id, target_currency_id):
+        """Return (datetimes, rates) of one currency pair as tuples sorted by datetime.
+
+        Cached per cache version, which is raised by any change to the exchange rates.
+        """
+        self.env.cr.execute("SELECT version FROM kojto_base_currency_exchange_version WHERE id = 1")
+        row = self.env.cr.fetchone()
+        return self._load_rate_series(base_currency_id, target_currency_id, row[0] if row else 0)
+
+    @api.model
+    @tools.ormcache("base_currency_id", "target_currency_id", "version")
+    def _load_rate_series(self, base_currency_id, target_currency_id, version):
+        self.flush_model(["base_currency_id", "target_currency_id", "exchange_rate", "datetime"])
+        self.env.cr.execute("""
+            SELECT datetime, exchange_rate
+            FROM kojto_base_currency_exchange
+            WHERE base_currency_id = %s AND target_currency_id = %s AND datetime IS NOT NULL
+            ORDER BY datetime, id
+        """, (base_currency_id, target_currency_id))
+        rows = self.env.cr.fetchall()
+        return tuple(row[0] for row in rows), tuple(row[1] or 0.0 for row in rows)
+
+    @api.model
+    def _lookup_rate(self, base_currency_id, target_currency_id, date=None, day_start=None, positive=False):
+        """Latest rate of the pair on or before date (any date if None), or None.
+
+        day_start bounds the search from below; positive skips rates that are not > 0.
+        """
+        datetimes, rates = self._get_rate_series(base_currency_id, target_currency_id)
+        index = bisect_right(datetimes, date) if date is not None else len(datetimes)
+        for k in range(index - 1, -1, -1):
+            if day_start is not None and datetimes[k] < day_start:
+                return None
+            if not positive or rates[k] > 0:
+                return rates[k]
+        return None
+
+    @api.model
+    def get_rate(self, from_currency_id, to_currency_id, date=None, inverse=True, latest=True, same_day=False, positive=False):
+        """Rate converting from_currency_id into to_currency_id on or before date, or None.
+
+        Looks up the direct pair, then 1 / the opposite pair (inverse), then the most recent
+        direct and opposite rate of any date (latest). same_day only accepts rates from the
+        day of date; positive ignores rates that are not > 0. Currencies may be ids or records.
+        """
+        from_currency_id = getattr(from_currency_id, "id", from_currency_id)
+        to_currency_id = getattr(to_currency_id, "id", to_currency_id)
+        if not from_currency_id or not to_currency_id:
+            return None
+        if from_currency_id == to_currency_id:
+            return 1.0
+
+        date = self._to_rate_datetime(date)
+        day_start = datetime.combine(date.date(), time.min) if same_day and date else None
+        if same_day and date:
+            date = datetime.combine(date.date(), time.max)
+        lookups = [(date, day_start)]
+        if latest and date is not None:
+            lookups.append((None, None))
+        for lookup_date, lookup_start in lookups:
+            rate = self._lookup_rate(from_currency_id, to_currency_id, lookup_date, lookup_start, positive)
+            if rate is not None:
+                return rate
+            if inverse:
+                rate = self._lookup_rate(to_currency_id, from_currency_id, lookup_date, lookup_start, positive)
+                if rate:
+                    return 1.0 / rate
+        return None
+
+    @api.model
+    def get_rates(self, lookups, **options):
+        """Batch get_rate over (from_currency_id, to_currency_id, date) triples, in order.
+
+        Identical lookups are answered once; options are passed on to get_rate.
+        """
+        results = {}
+        for key in lookups:
+            if key not in results:
+                results[key] = self.get_rate(*key, **options)
+        return [results[key] for key in lookups]
+
+    @api.model
+    def _to_rate_datetime(self, value):
+        if not value:
+            return None
+        if isinstance(value, str):
+            return fields.Datetime.to_datetime(value)
+        if isinstance(value, datetime):
+            return value
+        if isinstance(value, date_type):
+            return datetime.combine(value, time.min)
+        return None
+
     @api.model
     def process_ecb_data(self, url, base_currency):
         """Process ECB exchange rate data."""
@@ -28,17 +161,22 @@ class KojtoBaseCurrencyExchange(models.Model):
             root = ET.fromstring(response.content)
             namespace = {"gesmes": "http://www.gesmes.org/xml/2002-08-01", "": "http://www.ecb.int/vocabulary/2002-08-01/eurofxref"}
 
+            # Active currencies by code, BGN is never imported
+            currencies = {
+                currency.name: currency
+                for currency in self.env["res.currency"].search([("active", "=", True), ("name", "!=", "BGN")])
+            }
+
+            vals_list = []
             for cube_date in root.findall(".//Cube[@time]", namespace):
                 date_str = cube_date.attrib["time"]
                 # Convert date string to datetime (ECB uses YYYY-MM-DD)
-                date = datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y-%m-%d 00:00:00")
+                date = datetime.strptime(date_str, "%Y-%m-%d")
 
                 for cube_rate in cube_date.findall("Cube[@currency]", namespace):
-                    currency_code = cube_rate.attrib["currency"]
-
-                    # Skip BGN currency
-                    if currency_code == "BGN":
-                        continue
+                    target_currency = currencies.get(cube_rate.attrib["currency"])
+                    if not target_currency:
+                        continue  # Skip BGN, inactive or missing currencies
 
                     try:
                         raw_rate = cube_rate.attrib["rate"]
@@ -48,31 +186,31 @@ class KojtoBaseCurrencyExchange(models.Model):
                     except ValueError:
                         continue  # Skip invalid rates
 
-                    target_currency = self.env["res.currency"].search([("name", "=", currency_code), ("active", "=", True)], limit=1)
-                    if not target_currency:
-                        continue  # Skip inactive or missing currencies
-
-                    # Additional check to ensure BGN is never processed
-                    if target_currency.name == "BGN":
-                        continue
-
-                    # Check for existing record to avoid duplicates
-                    existing = self.search([
-                        ("base_currency_id", "=", base_currency.id),
-                        ("target_currency_id", "=", target_currency.id),
-                        ("datetime", "=", date)
-                    ], limit=1)
-                    if existing:
-                        continue  # Skip duplicates
-
-                    # Ensure rate is stored with 5 decimal places
-                    self.create({
+                    vals_list.append({
                         "base_currency_id": base_currency.id,
                         "target_currency_id": target_currency.id,
                         "exchange_rate": rate,
                         "datetime": date,
                         "url": url
                     })
+
+            # Skip rates already stored for the pair and date, and repeats within the file
+            existing = set()
+            if vals_list:
+                self.flush_model(["base_currency_id", "target_currency_id", "datetime"])
+                self.env.cr.execute("""
+                    SELECT target_currency_id, datetime
+                    FROM kojto_base_currency_exchange
+                    WHERE base_currency_id = %s AND datetime = ANY(%s)
+                """, (base_currency.id, list({vals["datetime"] for vals in vals_list})))
+                existing = set(self.env.cr.fetchall())
+            new_vals_list = []
+            for vals in vals_list:
+                key = (vals["target_currency_id"], vals["datetime"])
+                if key not in existing:
+                    existing.add(key)
+                    new_vals_list.append(vals)
+            self.create(new_vals_list)
         except ET.ParseError:
             raise ValidationError(f"Failed to parse XML from {url}.")
 
@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+
+from . import kojto_base_xlsx_export
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Kojto Base - Streaming Excel Export
+
+Shared engine for large Excel exports. Workbooks are written in xlsxwriter's
+constant_memory mode into a temporary file, rows are pulled from the database
+in chunks, and the finished file is streamed to the browser by the
+/kojto_base/xlsx_export controller.
+
+A model takes part by defining ``_xlsx_export_<name>(self, xlsx, **params)``,
+which fills the given KojtoXlsxExport and returns the download filename, and
+by returning ``xlsx_export_action(record, '<name>', **params)`` from its button.
+"""
+
+import re
+import tempfile
+import uuid
+from urllib.parse import urlencode
+
+import xlsxwriter
+
+from odoo.tools import split_every
+
+CHUNK_SIZE = 2000
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def xlsx_export_action(record, export, **params):
+    """Return the client action that downloads the export of the given record."""
+    record.ensure_one()
+    query = dict(params, model=record._name, res_id=record.id, export=export)
+    return {
+        'type': 'ir.actions.act_url',
+        'url': f"/kojto_base/xlsx_export?{urlencode(query)}",
+        'target': 'self',
+    }
+
+
+def iter_query(cr, query, params=None, chunk_size=CHUNK_SIZE):
+    """Yield the rows of a query as dicts, fetched from a server-side cursor in chunks."""
+    name = f"kojto_xlsx_{uuid.uuid4().hex}"
+    cr.execute(f"DECLARE {name} NO SCROLL CURSOR FOR {query}", params)
+    try:
+        while True:
+            cr.execute(f"FETCH FORWARD {int(chunk_size)} FROM {name}")
+            rows = cr.dictfetchall()
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cr.execute(f"CLOSE {name}")
+
+
+def iter_records(records, chunk_size=CHUNK_SIZE):
+    """Yield the records in chunks, dropping the cache of each chunk once written.
+
+    Only the exported records are invalidated (after flushing them), so pending
+    writes and the cache of other models in the transaction are left alone.
+    """
+    for ids in split_every(chunk_size, records.ids):
+        chunk = records.browse(ids)
+        yield from chunk
+        chunk.invalidate_recordset()
+
+
+class KojtoXlsxExport:
+    """Write-only workbook: sheets and rows are appended in order."""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.workbook = xlsxwriter.Workbook(self.file, {'constant_memory': True})
+        self.formats = {
+            'header': self.workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'}),
+            'bold': self.workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'}),
+            'currency': self.workbook.add_format({'num_format': '#,##0.00'}),
+            'date': self.workbook.add_format({'num_format': 'yyyy-mm-dd'}),
+            'text': self.workbook.add_format({'text_wrap': True}),
+        }
+        self.worksheet = None
+        self.column_formats = []
+        self.row = 0
+        self._sheet_names = set()
+
+    def add_sheet(self, name, columns):
+        """Start a new sheet.
+
+        Args:
+            name: Sheet name, shortened and made unique as Excel requires
+            columns: List of (header, width, format) tuples, format being a key
+                of self.formats or None
+        """
+        self.worksheet = self.workbook.add_worksheet(self._sheet_name(name))
+        self.column_formats = [self.formats.get(fmt) for _header, _width, fmt in columns]
+        for col, (header, width, _fmt) in enumerate(columns):
+            self.worksheet.set_column(col, col, width)
+            self.worksheet.write(0, col, header, self.formats['header'])
+        self.row = 1 if columns else 0
+        return self.worksheet
+
+    def write_row(self, values, bold=False):
+        """Append a row. With bold, text cells get the bold format (totals rows)."""
+        for col, value in enumerate(values):
+            if value is None or value is False:
+                value = ''
+            cell_format = self.column_formats[col] if col < len(self.column_formats) else None
+            if bold and value and isinstance(value, str):
+                cell_format = self.formats['bold']
+            self.worksheet.write(self.row, col, value, cell_format)
+        self.row += 1
+
+    def write_message(self, message):
+        """Append a single text cell, e.g. for an empty sheet."""
+        self.worksheet.write(self.row, 0, message)
+        self.row += 1
+
+    def close(self):
+        """Finish the workbook and return the file, rewound and ready to stream."""
+        if not self.workbook.worksheets():
+            self.add_sheet('Export', [])
+            self.write_message('No data available')
+        self.workbook.close()
+        self.file.seek(0)
+        return self.file
+
+    def _sheet_name(self, name):
+        name = re.sub(r'[\[\]:*?/\\]', '_', name or 'Sheet')[:31]
+        unique_name, counter = name, 1
+        while unique_name.lower() in self._sheet_names:
+            counter += 1
+            suffix = f" ({counter})"
+            unique_name = name[:31 - len(suffix)] + suffix
+        self._sheet_names.add(unique_name.lower())
+        return unique_name
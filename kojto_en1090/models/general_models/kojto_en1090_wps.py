@@ -212,6 +212,11 @@ class KojtoEn1090WPS(models.Model):
         self.ensure_one()
         return self.print_document_as_pdf()
 
+    def _get_pdf_cache_dependencies(self):
+        return super()._get_pdf_cache_dependencies() + [
+            self.weld_deposition_ids, self.weld_deposition_ids.parameter_content_ids, self.issued_by,
+        ]
+
     @api.model
     def default_get(self, fields_list):
         res = super().default_get(fields_list)
@@ -135,6 +135,12 @@ class KojtoEn1090DocControl(models.Model):
         self.ensure_one()
         return self.print_document_as_pdf()
 
+    def _get_pdf_cache_dependencies(self):
+        bundle = self.document_bundle_id
+        return super()._get_pdf_cache_dependencies() + [
+            self.welding_seam_ids, bundle, bundle.company_name_id, bundle.company_address_id,
+        ]
+
 
 
     @api.depends('control_type')
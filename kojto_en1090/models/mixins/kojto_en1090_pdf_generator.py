@@ -9,6 +9,7 @@ class KojtoEn1090PDFGenerator(models.AbstractModel):
     _name = "kojto.en1090.pdf.generator"
     _description = "EN1090 PDF Generator Mixin"
     _inherit = ["kojto.library.printable"]
+    _pdf_cache = True
 
     # Fields
     pdf_attachment_id = fields.Many2one(
@@ -25,16 +26,18 @@ class KojtoEn1090PDFGenerator(models.AbstractModel):
         help="Additional attachments for this document"
     )
 
+    def _get_pdf_cache_dependencies(self):
+        # Every EN1090 document prints the logo of the company contact
+        company_contact = self.env["kojto.contacts"].search([("res_company_id", "=", self.env.company.id)], limit=1)
+        return super()._get_pdf_cache_dependencies() + [company_contact]
+
     def generate_pdf_attachment_id(self):
         """Generate a PDF attachment for this document.
 
         Returns:
             int: The ID of the generated attachment
         """
-        html = self.generate_report_html()
-        html = self.inject_report_css(html)
-        attachment = self.create_pdf_attachment(html)
-        return attachment.id
+        return self.get_pdf_attachment().id
 
     def delete_pdf_attachment_id(self):
         """Delete the PDF attachment for this document.
@@ -0,0 +1,76 @@
+from io import BytesIO
+import logging
+
+from reportlab.pdfgen import canvas
+
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+
+_logger = logging.getLogger(__name__)
+
+
+class PdfBundleBuilder:
+    """
+    Collects the parts of a document bundle and writes them as one PDF in a
+    single pass. Pages are copied from the parts as they are (no re-rendering),
+    each part gets a bookmark, and parts with a stamp get it as a small header
+    on every page.
+    """
+
+    def __init__(self):
+        self.parts = []
+
+    def add(self, data, title, stamp=None):
+        """Queue a PDF part.
+
+        Args:
+            data: bytes - The PDF data
+            title: str - Bookmark title of the part
+            stamp: str - Optional header drawn on each page of the part
+        """
+        if not isinstance(data, bytes) or not data:
+            return
+        self.parts.append({'data': data, 'title': title, 'stamp': stamp})
+
+    def build(self):
+        """Merge all queued parts and return the PDF data."""
+        writer = PdfFileWriter()
+        add_page = getattr(writer, 'add_page', None) or writer.addPage
+        add_bookmark = getattr(writer, 'add_outline_item', None) or writer.addBookmark
+        overlays = {}
+        page_count = 0
+
+        for part in self.parts:
+            try:
+                pages = list(PdfFileReader(BytesIO(part['data']), strict=False).pages)
+            except Exception as e:
+                _logger.error(f"Skipping unreadable PDF '{part['title']}': {str(e)}")
+                continue
+            if not pages:
+                continue
+            for page in pages:
+                if part['stamp']:
+                    _stamp_page(page, part['stamp'], overlays)
+                add_page(page)
+            add_bookmark(part['title'], page_count)
+            page_count += len(pages)
+
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+
+def _stamp_page(page, text, overlays):
+    """Draw the text at the top of the page, reusing one overlay per text and page size."""
+    box = getattr(page, 'mediabox', None) or page.mediaBox
+    left, top, right = float(box[0]), float(box[3]), float(box[2])
+    key = (text, left, top, right)
+    if key not in overlays:
+        overlay = BytesIO()
+        title_canvas = canvas.Canvas(overlay, pagesize=(right, top))
+        title_canvas.setFont("Helvetica-Bold", 9)
+        title_canvas.setFillColorRGB(0.4, 0.4, 0.4)
+        title_canvas.drawString(left + 30, top - 20, text)
+        title_canvas.save()
+        overlays[key] = PdfFileReader(BytesIO(overlay.getvalue())).pages[0]
+    merge_page = getattr(page, 'merge_page', None) or page.mergePage
+    merge_page(overlays[key])
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError, UserError
 
 
@@ -216,13 +216,160 @@ class KojtoEnergyManagementPowerMeterReadings(models.Model):
             }
         }
 
+    def init(self):
+        """Indexes used by the set-based recompute: readings in meter order and prices by exchange and period end"""
+        tools.create_index(self.env.cr, 'kojto_em_readings_meter_datetime_idx', self._table, ['power_meter_id', 'datetime_utc', 'id'])
+        tools.create_index(self.env.cr, 'kojto_em_prices_exchange_period_end_idx', 'kojto_energy_management_prices', ['exchange', 'period_end_utc'])
+
+    @api.model
+    def _recompute_readings_sql(self, power_meter_ids=None, date_from=None, date_to=None, reading_ids=None):
+        """Recompute consumption, prices and values of many readings with one UPDATE per power meter.
+
+        Same results as _compute_energy_consumption and _compute_energy_value: deltas come from
+        LAG over each meter's readings with rollover at max_*_kwh_counter_value, the market price
+        is the latest period ending at or before the reading and base prices the latest starting
+        at or before it. Only readings whose stored values change are written. Returns the number
+        of updated readings.
+        """
+        self.flush_model()
+        self.env['kojto.energy.management.devices'].flush_model(['exchange', 'max_imported_kwh_counter_value', 'max_exported_kwh_counter_value'])
+        self.env['kojto.energy.management.prices'].flush_model(['exchange', 'period_end_utc', 'price_eur_per_mwh'])
+        self.env['kojto.energy.management.base.prices'].flush_model(['device_id', 'price_type', 'start_date', 'base_price_eur_per_mwh'])
+
+        if power_meter_ids is None:
+            self.env.cr.execute(f"SELECT DISTINCT power_meter_id FROM {self._table}")
+            power_meter_ids = [row[0] for row in self.env.cr.fetchall()]
+
+        updated = 0
+        for power_meter_id in power_meter_ids:
+            self.env.cr.execute(f"""
+                WITH ordered AS (
+                    SELECT r.id, r.power_meter_id, r.datetime_utc,
+                           COALESCE(r.imported_kwh_counter, 0) AS imp_counter,
+                           COALESCE(r.exported_kwh_counter, 0) AS exp_counter,
+                           LAG(COALESCE(r.imported_kwh_counter, 0)) OVER w AS prev_imp_counter,
+                           LAG(COALESCE(r.exported_kwh_counter, 0)) OVER w AS prev_exp_counter
+                    FROM {self._table} r
+                    WHERE r.power_meter_id = %(meter)s
+                      AND (%(date_to)s::timestamp IS NULL OR r.datetime_utc <= %(date_to)s)
+                    WINDOW w AS (ORDER BY r.datetime_utc, r.id)
+                ),
+                deltas AS (
+                    SELECT o.id, o.datetime_utc, d.exchange,
+                           ROUND((CASE
+                               WHEN o.prev_imp_counter IS NULL THEN 0
+                               WHEN o.imp_counter < o.prev_imp_counter AND COALESCE(d.max_imported_kwh_counter_value, 0) > 0
+                                   THEN d.max_imported_kwh_counter_value - o.prev_imp_counter + o.imp_counter
+                               ELSE o.imp_counter - o.prev_imp_counter
+                           END)::numeric, 3) AS imported_kwh,
+                           ROUND((CASE
+                               WHEN o.prev_exp_counter IS NULL THEN 0
+                               WHEN o.exp_counter < o.prev_exp_counter AND COALESCE(d.max_exported_kwh_counter_value, 0) > 0
+                                   THEN d.max_exported_kwh_counter_value - o.prev_exp_counter + o.exp_counter
+                               ELSE o.exp_counter - o.prev_exp_counter
+                           END)::numeric, 3) AS exported_kwh
+                    FROM ordered o
+                    JOIN kojto_energy_management_devices d ON d.id = o.power_meter_id
+                    WHERE (%(date_from)s::timestamp IS NULL OR o.datetime_utc >= %(date_from)s)
+                      AND (%(reading_ids)s::int[] IS NULL OR o.id = ANY(%(reading_ids)s))
+                ),
+                priced AS (
+                    SELECT x.id, x.imported_kwh, x.exported_kwh,
+                           price.price_eur_per_mwh AS market_price,
+                           CASE WHEN price.price_eur_per_mwh IS NULL THEN 0 ELSE COALESCE(base_imp.base_price_eur_per_mwh, 0) END AS base_imp,
+                           CASE WHEN price.price_eur_per_mwh IS NULL THEN 0 ELSE COALESCE(base_exp.base_price_eur_per_mwh, 0) END AS base_exp
+                    FROM deltas x
+                    LEFT JOIN LATERAL (
+                        SELECT COALESCE(p.price_eur_per_mwh, 0) AS price_eur_per_mwh
+                        FROM kojto_energy_management_prices p
+                        WHERE x.exchange IS NOT NULL AND x.exchange != ''
+                          AND p.exchange = x.exchange AND p.period_end_utc <= x.datetime_utc
+                        ORDER BY p.period_end_utc DESC
+                        LIMIT 1
+                    ) price ON TRUE
+                    LEFT JOIN LATERAL (
+                        SELECT b.base_price_eur_per_mwh
+                        FROM kojto_energy_management_base_prices b
+                        WHERE b.device_id = %(meter)s AND b.price_type = 'import' AND b.start_date <= x.datetime_utc
+                        ORDER BY b.start_date DESC
+                        LIMIT 1
+                    ) base_imp ON TRUE
+                    LEFT JOIN LATERAL (
+                        SELECT b.base_price_eur_per_mwh
+                        FROM kojto_energy_management_base_prices b
+                        WHERE b.device_id = %(meter)s AND b.price_type = 'export' AND b.start_date <= x.datetime_utc
+                        ORDER BY b.start_date DESC
+                        LIMIT 1
+                    ) base_exp ON TRUE
+                ),
+                computed AS (
+                    SELECT id, imported_kwh, exported_kwh,
+                           ROUND(COALESCE(market_price, 0)::numeric, 2) AS price_per_mwh_eur,
+                           ROUND(base_imp::numeric, 2) AS base_price_per_mwh_import_eur,
+                           ROUND(base_exp::numeric, 2) AS base_price_per_mwh_export_eur,
+                           CASE WHEN market_price IS NULL THEN 0
+                                ELSE ROUND((imported_kwh * (market_price + base_imp) / 1000.0)::numeric, 2) END AS imported_kwh_value,
+                           CASE WHEN market_price IS NULL THEN 0
+                                ELSE ROUND((exported_kwh * (market_price + base_exp) / 1000.0)::numeric, 2) END AS exported_kwh_value
+                    FROM priced
+                )
+                UPDATE {self._table} r
+                SET imported_kwh = c.imported_kwh,
+                    exported_kwh = c.exported_kwh,
+                    price_per_mwh_eur = c.price_per_mwh_eur,
+                    base_price_per_mwh_import_eur = c.base_price_per_mwh_import_eur,
+                    base_price_per_mwh_export_eur = c.base_price_per_mwh_export_eur,
+                    imported_kwh_value = c.imported_kwh_value,
+                    exported_kwh_value = c.exported_kwh_value,
+                    write_uid = %(uid)s,
+                    write_date = NOW() AT TIME ZONE 'UTC'
+                FROM computed c
+                WHERE r.id = c.id
+                  AND (r.imported_kwh, r.exported_kwh, r.price_per_mwh_eur, r.base_price_per_mwh_import_eur,
+                       r.base_price_per_mwh_export_eur, r.imported_kwh_value, r.exported_kwh_value)
+                      IS DISTINCT FROM
+                      (c.imported_kwh, c.exported_kwh, c.price_per_mwh_eur, c.base_price_per_mwh_import_eur,
+                       c.base_price_per_mwh_export_eur, c.imported_kwh_value, c.exported_kwh_value)
+            """, {
+                'meter': power_meter_id,
+                'date_from': date_from,
+                'date_to': date_to,
+                'reading_ids': list(reading_ids) if reading_ids is not None else None,
+                'uid': self.env.uid,
+            })
+            updated += self.env.cr.rowcount
+
+        self.invalidate_model([
+            'imported_kwh', 'exported_kwh', 'price_per_mwh_eur', 'base_price_per_mwh_import_eur',
+            'base_price_per_mwh_export_eur', 'imported_kwh_value', 'exported_kwh_value',
+        ])
+        return updated
+
+    @api.model
+    def recompute_readings_bulk(self, device_id=None, start_date=None, end_date=None):
+        """Set-based recompute of all readings in a period, callable via XML-RPC.
+
+        Returns the number of readings whose consumption, prices or values changed.
+        The readings are updated in SQL, so the caller needs write access to them.
+        """
+        self.check_access('write')
+        return self._recompute_readings_sql(
+            power_meter_ids=[device_id] if device_id else None,
+            date_from=fields.Datetime.to_datetime(start_date) if start_date else None,
+            date_to=fields.Datetime.to_datetime(end_date) if end_date else None,
+        )
+
     def action_recalculate_all(self):
         """Recalculate both energy consumption (with rollover) and energy values for selected readings"""
-        for record in self:
-            # Force recalculation of energy consumption (imported_kwh, exported_kwh) - includes rollover logic
-            record._compute_energy_consumption()
-            # Force recalculation of energy values (imported_kwh_value, exported_kwh_value) - includes prices
-            record._compute_energy_value()
+        self.flush_recordset(['power_meter_id', 'datetime_utc'])
+        self.env.cr.execute(f"""
+            SELECT power_meter_id, MIN(datetime_utc), MAX(datetime_utc)
+            FROM {self._table}
+            WHERE id IN %s
+            GROUP BY power_meter_id
+        """, (tuple(self.ids) or (None,),))
+        for power_meter_id, date_from, date_to in self.env.cr.fetchall():
+            self._recompute_readings_sql([power_meter_id], date_from, date_to, reading_ids=self.ids)
 
         return {
             'type': 'ir.actions.client',
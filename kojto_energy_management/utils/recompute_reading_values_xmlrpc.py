@@ -119,8 +119,8 @@ class ReadingValuesRecomputer:
             start_date: Start date filter (datetime string or None for all)
             end_date: End date filter (datetime string or None for all)
             device_id: Specific device ID to recompute (None for all devices)
-            batch_size: Number of records to process in each batch
-            price_type: 'import' or 'export' - only recompute readings with non-zero consumption of this type
+            batch_size: Unused, readings are recomputed set-based per device on the server
+            price_type: 'import' or 'export' - informational only, every reading of the period is checked
         """
         print("\n" + "="*80)
         print("POWER METER READINGS FULL RECOMPUTATION")
@@ -143,13 +143,10 @@ class ReadingValuesRecomputer:
                 domain.append(('power_meter_id', '=', device_id))
                 print(f"Device ID: {device_id}")
 
-            # Filter by price type - only recompute readings with non-zero consumption
-            if price_type == 'import':
-                domain.append(('imported_kwh', '!=', 0))
-                print(f"Price Type: Import (only non-zero imported_kwh)")
-            elif price_type == 'export':
-                domain.append(('exported_kwh', '!=', 0))
-                print(f"Price Type: Export (only non-zero exported_kwh)")
+            if price_type:
+                # The bulk recompute only writes readings whose values change, so every
+                # reading of the period is checked regardless of its consumption
+                print(f"Price Type: {price_type} (all readings of the period are checked)")
 
             # Count total records
             total_count = self.models.execute_kw(
@@ -165,71 +162,45 @@ class ReadingValuesRecomputer:
                 print("No readings found matching the criteria.")
                 return
 
-            # Get all reading IDs
-            reading_ids = self.models.execute_kw(
-                self.db, self.uid, self.auth,
-                'kojto.energy.management.power.meter.readings',
-                'search',
-                [domain],
-                {'order': 'datetime_utc asc'}
-            )
-
-            print(f"Found {len(reading_ids)} reading IDs")
-            print(f"Processing in batches of {batch_size}...")
+            if device_id:
+                device_ids = [device_id]
+            else:
+                device_ids = [device['id'] for device in self.models.execute_kw(
+                    self.db, self.uid, self.auth,
+                    'kojto.energy.management.devices',
+                    'search_read',
+                    [[]],
+                    {'fields': ['id'], 'context': {'active_test': False}}
+                )]
+
+            print(f"Recomputing {len(device_ids)} power meter(s) set-based on the server...")
             print("-"*80)
 
-            # Process in batches
+            # One set-based call per power meter; readings are compared and updated in SQL
             total_processed = 0
             total_failed = 0
-            batch_num = 0
-
-            for i in range(0, len(reading_ids), batch_size):
-                batch_num += 1
-                batch_ids = reading_ids[i:i+batch_size]
-
-                print(f"\nBatch {batch_num}: Processing {len(batch_ids)} readings (IDs {batch_ids[0]} to {batch_ids[-1]})...")
 
+            for current_device_id in device_ids:
+                started = datetime.now()
                 try:
-                    # Read the records to trigger recomputation
-                    # When we read computed fields, Odoo automatically recalculates them
-                    # But we need to explicitly write to trigger stored computed fields
-
-                    # Get the records
-                    records = self.models.execute_kw(
-                        self.db, self.uid, self.auth,
-                        'kojto.energy.management.power.meter.readings',
-                        'read',
-                        [batch_ids],
-                        {'fields': ['id', 'datetime_utc', 'power_meter_id', 'imported_kwh', 'exported_kwh']}
-                    )
-
-                    # Trigger FULL recomputation by calling the action method
-                    # This will recalculate:
-                    # 1. Energy consumption (imported_kwh, exported_kwh) with rollover logic
-                    # 2. Energy values (imported_kwh_value, exported_kwh_value) with time-based prices
-                    # 3. Price components (price_per_mwh_eur, base_price_per_mwh_import_eur, base_price_per_mwh_export_eur)
-                    result = self.models.execute_kw(
+                    updated = self.models.execute_kw(
                         self.db, self.uid, self.auth,
                         'kojto.energy.management.power.meter.readings',
-                        'action_recalculate_all',
-                        [batch_ids]
+                        'recompute_readings_bulk',
+                        [current_device_id, start_date or False, end_date or False]
                     )
-
-                    total_processed += len(batch_ids)
-                    print(f"  ✓ Batch {batch_num} completed: {len(batch_ids)} readings recomputed")
-                    print(f"  Progress: {total_processed}/{total_count} ({100*total_processed/total_count:.1f}%)")
-
+                    total_processed += updated
+                    print(f"  ✓ Device {current_device_id}: {updated} readings changed ({(datetime.now() - started).total_seconds():.1f}s)")
                 except Exception as e:
-                    total_failed += len(batch_ids)
-                    print(f"  ✗ Batch {batch_num} failed: {e}")
+                    total_failed += 1
+                    print(f"  ✗ Device {current_device_id} failed: {e}")
 
             # Summary
             print("\n" + "="*80)
             print("RECOMPUTATION SUMMARY")
             print("="*80)
-            print(f"Total readings processed: {total_processed}")
-            print(f"Total failures: {total_failed}")
-            print(f"Success rate: {100*(total_processed-total_failed)/total_processed:.1f}%")
+            print(f"Total readings changed: {total_processed}")
+            print(f"Devices failed: {total_failed}")
             print("="*80)
 
             return True
@@ -315,7 +286,7 @@ def main():
     parser.add_argument('--start-date', help='Start date (YYYY-MM-DD HH:MM:SS)')
     parser.add_argument('--end-date', help='End date (YYYY-MM-DD HH:MM:SS)')
     parser.add_argument('--device-id', type=int, help='Specific device ID to recompute')
-    parser.add_argument('--batch-size', type=int, default=500, help='Batch size for processing (default: 500)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Unused, kept for compatibility: readings are recomputed set-based per device')
     parser.add_argument('--price-type', choices=['import', 'export'], help='Only recompute readings with non-zero consumption of this type (import or export)')
 
     parser.add_argument('--auto', action='store_true', help='Auto mode: recompute all readings from the last 30 days')
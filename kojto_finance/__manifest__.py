@@ -10,6 +10,7 @@
     "depends": ["kojto_hr", "kojto_assets"],
     "data": [
         "security/ir.model.access.csv",
+        "data/kojto_finance_cron.xml",
         "views/kojto_finance_invoices_views.xml",
         "views/kojto_finance_invoices_accounting_views.xml",
         "views/kojto_finance_cashflow_views.xml",
@@ -17,6 +18,7 @@
         "views/kojto_finance_invoice_contents_views.xml",
         "views/kojto_finance_bank_statements_views.xml",
         "views/kojto_finance_bank_statements_import_view.xml",
+        "views/kojto_finance_ai_batch_runs_views.xml",
         "views/kojto_finance_accounting_templates_views.xml",
         "views/kojto_finance_accounting_identifiers_views.xml",
         "views/kojto_finance_accounting_types_views.xml",
@@ -2,6 +2,8 @@
 
 from . import kojto_finance_bank_statements
 from . import kojto_finance_bank_statements_import
+from . import kojto_finance_ai_batch_runs
+from . import kojto_finance_ai_decision_cache
 from . import kojto_finance_cashflow
 from . import kojto_finance_cashflow_allocation
 from . import kojto_finance_invoice
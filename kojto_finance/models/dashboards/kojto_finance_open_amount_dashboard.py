@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import logging
+
 from odoo import models, fields, tools, api
+from odoo.tools import split_every
+
+_logger = logging.getLogger(__name__)
+
+# Invoices recomputed (and locked) at a time by reconcile_financial_summary
+RECONCILE_CHUNK_SIZE = 1000
 
 class KojtoFinanceOpenAmountDashboard(models.Model):
     _name = 'kojto.finance.open.amount.dashboard'
@@ -25,82 +33,348 @@ class KojtoFinanceOpenAmountDashboard(models.Model):
     has_child_documents = fields.Boolean(string='Has Child Documents', readonly=True)
 
     def init(self):
-        tools.drop_view_if_exists(self.env.cr, self._table)
-        self.env.cr.execute(f'''
-            CREATE OR REPLACE VIEW {self._table} AS (
-                WITH relevant_invoices AS (
-                    -- Get all parent invoices (type 'invoice', active)
-                    SELECT
-                        inv.id AS parent_id,
-                        inv.id AS invoice_id,
-                        inv.date_issue,
-                        inv.date_due,
-                        inv.document_in_out_type,
-                        inv.invoice_type,
-                        inv.consecutive_number,
-                        cur.name AS currency,
-                        inv.counterparty_id,
-                        inv.exchange_rate_to_eur
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS kojto_finance_invoices_open_idx
+            ON kojto_finance_invoices (open_amount_in_eur DESC)
+            WHERE invoice_type = 'invoice' AND active = true AND paid = false;
+        """)
+
+        # Financial summary of the given invoices and, through the parents of the
+        # given credit/debit notes, of their parents. Same arithmetic as the
+        # former Python computes: document total from its non-redistribution
+        # contents (custom VAT replacing the content VAT), child note totals,
+        # allocations signed by direction, all at the documents' own rates.
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_invoice_summary(p_invoice_ids INTEGER[])
+            RETURNS TABLE (
+                invoice_id INTEGER,
+                child_total_in_eur NUMERIC, child_total_in_bgn NUMERIC,
+                payable_amount_in_eur NUMERIC, payable_amount_in_bgn NUMERIC,
+                paid_amount_in_eur NUMERIC, paid_amount_in_bgn NUMERIC,
+                open_amount_in_eur NUMERIC, open_amount_in_bgn NUMERIC,
+                allocated_amount_in_eur_incoming NUMERIC, allocated_amount_in_eur_outgoing NUMERIC,
+                force_paid_status BOOLEAN
+            ) AS $$
+                WITH documents AS (
+                    SELECT inv.id
                     FROM kojto_finance_invoices inv
-                    LEFT JOIN res_currency cur ON cur.id = inv.currency_id
-                    WHERE inv.invoice_type = 'invoice'
-                      AND inv.active = true
-                      AND inv.paid = false
-                    UNION ALL
-                    -- Get all child credit/debit notes for those parents
-                    SELECT
-                        child.parent_invoice_id AS parent_id,
-                        child.id AS invoice_id,
-                        child.date_issue,
-                        child.date_due,
-                        child.document_in_out_type,
-                        child.invoice_type,
-                        child.consecutive_number,
-                        cur.name AS currency,
-                        child.counterparty_id,
-                        child.exchange_rate_to_eur
+                    WHERE inv.id = ANY(p_invoice_ids)
+                    UNION
+                    SELECT child.id
                     FROM kojto_finance_invoices child
-                    LEFT JOIN res_currency cur ON cur.id = child.currency_id
-                    WHERE child.invoice_type IN ('credit_note', 'debit_note')
+                    WHERE child.parent_invoice_id = ANY(p_invoice_ids)
+                      AND child.invoice_type IN ('credit_note', 'debit_note')
                       AND child.active = true
-                      AND child.parent_invoice_id IS NOT NULL
                 ),
-                invoice_totals AS (
-                    -- Aggregate all contents for each parent invoice (including its children)
+                document_totals AS (
                     SELECT
-                        r.parent_id AS invoice_id,
-                        ROUND(
-                            COALESCE(
-                                CASE
-                                    WHEN i.custom_vat IS NOT NULL AND i.custom_vat != 0 THEN
-                                        SUM(CASE WHEN ic.is_redistribution IS NOT TRUE THEN ic.pre_vat_total ELSE 0 END) + i.custom_vat
-                                    ELSE
-                                        SUM(CASE WHEN ic.is_redistribution IS NOT TRUE THEN ic.pre_vat_total * (1 + COALESCE(ic.vat_rate, 0)/100) ELSE 0 END)
-                                END,
-                                0
-                            ) * COALESCE(r.exchange_rate_to_eur, 1),
-                        2) AS invoice_total_in_eur
-                    FROM relevant_invoices r
-                    LEFT JOIN kojto_finance_invoice_contents ic ON ic.invoice_id = r.invoice_id
-                    LEFT JOIN kojto_finance_invoices i ON i.id = r.parent_id
-                    GROUP BY r.parent_id, i.custom_vat, r.exchange_rate_to_eur
+                        inv.id,
+                        COALESCE(SUM(ic.pre_vat_total) FILTER (WHERE ic.is_redistribution IS NOT TRUE), 0)
+                        + CASE
+                            WHEN COALESCE(inv.custom_vat, 0) != 0 THEN inv.custom_vat
+                            ELSE COALESCE(SUM(ic.pre_vat_total * COALESCE(ic.vat_rate, 0) / 100) FILTER (WHERE ic.is_redistribution IS NOT TRUE), 0)
+                        END AS total_price,
+                        COALESCE(NULLIF(inv.exchange_rate_to_eur, 0), 1) AS rate_to_eur,
+                        COALESCE(NULLIF(inv.exchange_rate_to_bgn, 0), 1) AS rate_to_bgn
+                    FROM documents d
+                    JOIN kojto_finance_invoices inv ON inv.id = d.id
+                    LEFT JOIN kojto_finance_invoice_contents ic ON ic.invoice_id = inv.id
+                    GROUP BY inv.id
+                ),
+                child_totals AS (
+                    SELECT
+                        child.parent_invoice_id AS invoice_id,
+                        SUM(dt.total_price * dt.rate_to_eur) AS total_in_eur,
+                        SUM(dt.total_price * dt.rate_to_bgn) AS total_in_bgn
+                    FROM kojto_finance_invoices child
+                    JOIN document_totals dt ON dt.id = child.id
+                    WHERE child.parent_invoice_id = ANY(p_invoice_ids)
+                      AND child.invoice_type IN ('credit_note', 'debit_note')
+                      AND child.active = true
+                    GROUP BY child.parent_invoice_id
                 ),
                 allocations AS (
-                    -- Pre-aggregate allocations by invoice and direction
                     SELECT
                         alloc.invoice_id,
-                        ROUND(COALESCE(SUM(CASE WHEN cf.transaction_direction = 'incoming' THEN alloc.amount * cf.exchange_rate_to_eur ELSE 0 END), 0), 2) AS allocated_amount_in_eur_incoming,
-                        ROUND(COALESCE(SUM(CASE WHEN cf.transaction_direction = 'outgoing' THEN alloc.amount * cf.exchange_rate_to_eur ELSE 0 END), 0), 2) AS allocated_amount_in_eur_outgoing
+                        COALESCE(SUM(alloc.amount * COALESCE(NULLIF(cf.exchange_rate_to_eur, 0), 1)) FILTER (WHERE cf.transaction_direction = 'incoming'), 0) AS incoming_eur,
+                        COALESCE(SUM(alloc.amount * COALESCE(NULLIF(cf.exchange_rate_to_eur, 0), 1)) FILTER (WHERE cf.transaction_direction = 'outgoing'), 0) AS outgoing_eur,
+                        COALESCE(SUM(alloc.amount * COALESCE(NULLIF(cf.exchange_rate_to_bgn, 0), 1)) FILTER (WHERE cf.transaction_direction = 'incoming'), 0) AS incoming_bgn,
+                        COALESCE(SUM(alloc.amount * COALESCE(NULLIF(cf.exchange_rate_to_bgn, 0), 1)) FILTER (WHERE cf.transaction_direction = 'outgoing'), 0) AS outgoing_bgn
                     FROM kojto_finance_cashflow_allocation alloc
                     JOIN kojto_finance_cashflow cf ON cf.id = alloc.transaction_id
-                    WHERE EXISTS (
-                        SELECT 1 FROM invoice_totals it WHERE it.invoice_id = alloc.invoice_id
-                    )
+                    WHERE alloc.invoice_id = ANY(p_invoice_ids)
                     GROUP BY alloc.invoice_id
+                ),
+                amounts AS (
+                    SELECT
+                        inv.id AS invoice_id,
+                        inv.invoice_type,
+                        COALESCE(inv.force_paid_status, false) AS force_paid_status,
+                        COALESCE(ct.total_in_eur, 0) AS child_eur,
+                        COALESCE(ct.total_in_bgn, 0) AS child_bgn,
+                        dt.total_price * dt.rate_to_eur + COALESCE(ct.total_in_eur, 0) AS payable_eur,
+                        dt.total_price * dt.rate_to_bgn + COALESCE(ct.total_in_bgn, 0) AS payable_bgn,
+                        CASE WHEN inv.document_in_out_type = 'outgoing' THEN 1 ELSE -1 END
+                            * (COALESCE(al.incoming_eur, 0) - COALESCE(al.outgoing_eur, 0)) AS paid_eur,
+                        CASE WHEN inv.document_in_out_type = 'outgoing' THEN 1 ELSE -1 END
+                            * (COALESCE(al.incoming_bgn, 0) - COALESCE(al.outgoing_bgn, 0)) AS paid_bgn,
+                        COALESCE(al.incoming_eur, 0) AS incoming_eur,
+                        COALESCE(al.outgoing_eur, 0) AS outgoing_eur
+                    FROM kojto_finance_invoices inv
+                    JOIN document_totals dt ON dt.id = inv.id
+                    LEFT JOIN child_totals ct ON ct.invoice_id = inv.id
+                    LEFT JOIN allocations al ON al.invoice_id = inv.id
+                    WHERE inv.id = ANY(p_invoice_ids)
                 )
                 SELECT
-                    ROW_NUMBER() OVER (ORDER BY it.invoice_id) AS id,
-                    it.invoice_id,
+                    a.invoice_id,
+                    ROUND(a.child_eur, 2), ROUND(a.child_bgn, 2),
+                    ROUND(a.payable_eur, 2), ROUND(a.payable_bgn, 2),
+                    ROUND(a.paid_eur, 2), ROUND(a.paid_bgn, 2),
+                    CASE WHEN a.force_paid_status OR a.invoice_type IN ('credit_note', 'debit_note') THEN 0 ELSE ROUND(a.payable_eur - a.paid_eur, 2) END,
+                    CASE WHEN a.force_paid_status OR a.invoice_type IN ('credit_note', 'debit_note') THEN 0 ELSE ROUND(a.payable_bgn - a.paid_bgn, 2) END,
+                    ROUND(a.incoming_eur, 2), ROUND(a.outgoing_eur, 2),
+                    a.force_paid_status
+                FROM amounts a
+            $$ LANGUAGE sql STABLE;
+        """)
+
+        # Writes the summary columns of the given invoices and their parents,
+        # in the company currency (the currency of contact 1, as base_currency_id)
+        # and in EUR and BGN. Only rows that changed are written.
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_refresh_invoice_summaries(p_invoice_ids INTEGER[])
+            RETURNS INTEGER AS $$
+            DECLARE
+                v_ids INTEGER[];
+                v_in_bgn BOOLEAN;
+                v_count INTEGER;
+            BEGIN
+                SELECT ARRAY(
+                    SELECT id FROM kojto_finance_invoices WHERE id = ANY(p_invoice_ids)
+                    UNION
+                    SELECT parent_invoice_id FROM kojto_finance_invoices
+                    WHERE id = ANY(p_invoice_ids) AND parent_invoice_id IS NOT NULL
+                ) INTO v_ids;
+                IF cardinality(v_ids) = 0 THEN
+                    RETURN 0;
+                END IF;
+
+                SELECT COALESCE(cur.name = 'BGN', false) INTO v_in_bgn
+                FROM kojto_contacts c
+                JOIN res_currency cur ON cur.id = c.currency_id
+                WHERE c.id = 1;
+                v_in_bgn := COALESCE(v_in_bgn, false);
+
+                UPDATE kojto_finance_invoices inv
+                SET child_document_sum_all_totals = CASE WHEN v_in_bgn THEN s.child_total_in_bgn ELSE s.child_total_in_eur END,
+                    payable_amount = CASE WHEN v_in_bgn THEN s.payable_amount_in_bgn ELSE s.payable_amount_in_eur END,
+                    paid_amount = CASE WHEN v_in_bgn THEN s.paid_amount_in_bgn ELSE s.paid_amount_in_eur END,
+                    open_amount = CASE WHEN v_in_bgn THEN s.open_amount_in_bgn ELSE s.open_amount_in_eur END,
+                    payable_amount_in_eur = s.payable_amount_in_eur,
+                    payable_amount_in_bgn = s.payable_amount_in_bgn,
+                    paid_amount_in_eur = s.paid_amount_in_eur,
+                    paid_amount_in_bgn = s.paid_amount_in_bgn,
+                    open_amount_in_eur = s.open_amount_in_eur,
+                    open_amount_in_bgn = s.open_amount_in_bgn,
+                    allocated_amount_in_eur_incoming = s.allocated_amount_in_eur_incoming,
+                    allocated_amount_in_eur_outgoing = s.allocated_amount_in_eur_outgoing,
+                    paid = s.force_paid_status OR (CASE WHEN v_in_bgn THEN s.open_amount_in_bgn ELSE s.open_amount_in_eur END) = 0
+                FROM kojto_finance_invoice_summary(v_ids) s
+                WHERE inv.id = s.invoice_id
+                  AND ROW(
+                        inv.child_document_sum_all_totals, inv.payable_amount, inv.paid_amount, inv.open_amount,
+                        inv.payable_amount_in_eur, inv.payable_amount_in_bgn, inv.paid_amount_in_eur, inv.paid_amount_in_bgn,
+                        inv.open_amount_in_eur, inv.open_amount_in_bgn,
+                        inv.allocated_amount_in_eur_incoming, inv.allocated_amount_in_eur_outgoing, inv.paid
+                  ) IS DISTINCT FROM ROW(
+                        CASE WHEN v_in_bgn THEN s.child_total_in_bgn ELSE s.child_total_in_eur END,
+                        CASE WHEN v_in_bgn THEN s.payable_amount_in_bgn ELSE s.payable_amount_in_eur END,
+                        CASE WHEN v_in_bgn THEN s.paid_amount_in_bgn ELSE s.paid_amount_in_eur END,
+                        CASE WHEN v_in_bgn THEN s.open_amount_in_bgn ELSE s.open_amount_in_eur END,
+                        s.payable_amount_in_eur, s.payable_amount_in_bgn, s.paid_amount_in_eur, s.paid_amount_in_bgn,
+                        s.open_amount_in_eur, s.open_amount_in_bgn,
+                        s.allocated_amount_in_eur_incoming, s.allocated_amount_in_eur_outgoing,
+                        s.force_paid_status OR (CASE WHEN v_in_bgn THEN s.open_amount_in_bgn ELSE s.open_amount_in_eur END) = 0
+                  );
+                GET DIAGNOSTICS v_count = ROW_COUNT;
+                RETURN v_count;
+            END;
+            $$ LANGUAGE plpgsql;
+        """)
+
+        # The triggers below run once per statement and refresh each affected
+        # invoice once, reading the changed rows from the transition tables.
+        # Transition tables rule out column lists, so update triggers only
+        # refresh rows whose watched columns (the trigger arguments) changed.
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_summary_columns_changed(p_old JSONB, p_new JSONB, p_columns TEXT[])
+            RETURNS BOOLEAN AS $$
+                SELECT EXISTS (
+                    SELECT 1 FROM unnest(p_columns) col
+                    WHERE p_old -> col IS DISTINCT FROM p_new -> col
+                );
+            $$ LANGUAGE sql IMMUTABLE;
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoice_contents_summary_trigger ON kojto_finance_invoice_contents;
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_allocation_summary_trigger ON kojto_finance_cashflow_allocation;
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_summary_trigger ON kojto_finance_cashflow;
+            DROP TRIGGER IF EXISTS kojto_finance_invoices_summary_trigger ON kojto_finance_invoices;
+        """)
+
+        # Contents and allocations refresh their old and new invoice
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_invoice_ref_summary_trigger()
+            RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                        SELECT DISTINCT invoice_id FROM new_rows WHERE invoice_id IS NOT NULL
+                    ));
+                ELSIF TG_OP = 'DELETE' THEN
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                        SELECT DISTINCT invoice_id FROM old_rows WHERE invoice_id IS NOT NULL
+                    ));
+                ELSE
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                        SELECT invoice_id FROM (
+                            SELECT o.invoice_id AS old_invoice_id, n.invoice_id AS new_invoice_id
+                            FROM old_rows o
+                            JOIN new_rows n ON n.id = o.id
+                            WHERE kojto_finance_summary_columns_changed(to_jsonb(o), to_jsonb(n), TG_ARGV)
+                        ) changed
+                        CROSS JOIN LATERAL (VALUES (old_invoice_id), (new_invoice_id)) ids (invoice_id)
+                        WHERE invoice_id IS NOT NULL
+                        GROUP BY invoice_id
+                    ));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoice_contents_summary_insert ON kojto_finance_invoice_contents;
+            CREATE TRIGGER kojto_finance_invoice_contents_summary_insert
+            AFTER INSERT ON kojto_finance_invoice_contents
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger();
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoice_contents_summary_update ON kojto_finance_invoice_contents;
+            CREATE TRIGGER kojto_finance_invoice_contents_summary_update
+            AFTER UPDATE ON kojto_finance_invoice_contents
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger(
+                'invoice_id', 'pre_vat_total', 'vat_rate', 'is_redistribution');
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoice_contents_summary_delete ON kojto_finance_invoice_contents;
+            CREATE TRIGGER kojto_finance_invoice_contents_summary_delete
+            AFTER DELETE ON kojto_finance_invoice_contents
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger();
+
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_allocation_summary_insert ON kojto_finance_cashflow_allocation;
+            CREATE TRIGGER kojto_finance_cashflow_allocation_summary_insert
+            AFTER INSERT ON kojto_finance_cashflow_allocation
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger();
+
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_allocation_summary_update ON kojto_finance_cashflow_allocation;
+            CREATE TRIGGER kojto_finance_cashflow_allocation_summary_update
+            AFTER UPDATE ON kojto_finance_cashflow_allocation
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger(
+                'invoice_id', 'amount', 'transaction_id');
+
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_allocation_summary_delete ON kojto_finance_cashflow_allocation;
+            CREATE TRIGGER kojto_finance_cashflow_allocation_summary_delete
+            AFTER DELETE ON kojto_finance_cashflow_allocation
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoice_ref_summary_trigger();
+        """)
+
+        # Transactions: new rates or direction revalue the allocated invoices;
+        # deleted transactions cascade to their allocations
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_cashflow_summary_trigger()
+            RETURNS trigger AS $$
+            BEGIN
+                PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                    SELECT DISTINCT a.invoice_id
+                    FROM old_rows o
+                    JOIN new_rows n ON n.id = o.id
+                    JOIN kojto_finance_cashflow_allocation a ON a.transaction_id = n.id
+                    WHERE a.invoice_id IS NOT NULL
+                      AND kojto_finance_summary_columns_changed(to_jsonb(o), to_jsonb(n), TG_ARGV)
+                ));
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS kojto_finance_cashflow_summary_update ON kojto_finance_cashflow;
+            CREATE TRIGGER kojto_finance_cashflow_summary_update
+            AFTER UPDATE ON kojto_finance_cashflow
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_cashflow_summary_trigger(
+                'exchange_rate_to_eur', 'exchange_rate_to_bgn', 'transaction_direction');
+        """)
+
+        # Invoices: the document itself and its old and new parent. The summary
+        # columns are not watched, so the update made by the refresh finds no
+        # changed rows when it fires the update trigger again.
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_finance_invoices_summary_trigger()
+            RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(SELECT id FROM new_rows));
+                ELSIF TG_OP = 'DELETE' THEN
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                        SELECT DISTINCT parent_invoice_id FROM old_rows WHERE parent_invoice_id IS NOT NULL
+                    ));
+                ELSE
+                    PERFORM kojto_finance_refresh_invoice_summaries(ARRAY(
+                        SELECT invoice_id FROM (
+                            SELECT n.id AS new_invoice_id, o.parent_invoice_id AS old_parent_id
+                            FROM old_rows o
+                            JOIN new_rows n ON n.id = o.id
+                            WHERE kojto_finance_summary_columns_changed(to_jsonb(o), to_jsonb(n), TG_ARGV)
+                        ) changed
+                        CROSS JOIN LATERAL (VALUES (new_invoice_id), (old_parent_id)) ids (invoice_id)
+                        WHERE invoice_id IS NOT NULL
+                        GROUP BY invoice_id
+                    ));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoices_summary_insert ON kojto_finance_invoices;
+            CREATE TRIGGER kojto_finance_invoices_summary_insert
+            AFTER INSERT ON kojto_finance_invoices
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoices_summary_trigger();
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoices_summary_update ON kojto_finance_invoices;
+            CREATE TRIGGER kojto_finance_invoices_summary_update
+            AFTER UPDATE ON kojto_finance_invoices
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoices_summary_trigger(
+                'custom_vat', 'exchange_rate_to_eur', 'exchange_rate_to_bgn', 'document_in_out_type',
+                'invoice_type', 'parent_invoice_id', 'force_paid_status', 'active');
+
+            DROP TRIGGER IF EXISTS kojto_finance_invoices_summary_delete ON kojto_finance_invoices;
+            CREATE TRIGGER kojto_finance_invoices_summary_delete
+            AFTER DELETE ON kojto_finance_invoices
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION kojto_finance_invoices_summary_trigger();
+        """)
+
+        # The dashboard reads the stored summary of the unpaid invoices only
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT
+                    inv.id,
+                    inv.id AS invoice_id,
                     inv.date_issue,
                     inv.date_due,
                     inv.document_in_out_type,
@@ -109,29 +383,59 @@ class KojtoFinanceOpenAmountDashboard(models.Model):
                     cur.name AS currency,
                     125 AS currency_id,
                     inv.counterparty_id,
-                    it.invoice_total_in_eur,
-                    COALESCE(a.allocated_amount_in_eur_incoming, 0) AS allocated_amount_in_eur_incoming,
-                    COALESCE(a.allocated_amount_in_eur_outgoing, 0) AS allocated_amount_in_eur_outgoing,
-                    CASE
-                        WHEN inv.document_in_out_type = 'incoming' THEN
-                            ROUND(it.invoice_total_in_eur - COALESCE(a.allocated_amount_in_eur_outgoing, 0) + COALESCE(a.allocated_amount_in_eur_incoming, 0), 2)
-                        WHEN inv.document_in_out_type = 'outgoing' THEN
-                            ROUND(it.invoice_total_in_eur + COALESCE(a.allocated_amount_in_eur_outgoing, 0) - COALESCE(a.allocated_amount_in_eur_incoming, 0), 2)
-                        ELSE NULL
-                    END AS open_amount_in_eur,
+                    inv.payable_amount_in_eur AS invoice_total_in_eur,
+                    inv.allocated_amount_in_eur_incoming,
+                    inv.allocated_amount_in_eur_outgoing,
+                    inv.open_amount_in_eur,
                     EXISTS (
                         SELECT 1 FROM kojto_finance_invoices child
-                        WHERE child.parent_invoice_id = it.invoice_id
+                        WHERE child.parent_invoice_id = inv.id
                           AND child.invoice_type IN ('credit_note', 'debit_note')
                           AND child.active = true
                     ) AS has_child_documents
-                FROM invoice_totals it
-                JOIN kojto_finance_invoices inv ON inv.id = it.invoice_id
+                FROM kojto_finance_invoices inv
                 JOIN res_currency cur ON cur.id = inv.currency_id
-                LEFT JOIN allocations a ON a.invoice_id = it.invoice_id
                 WHERE inv.invoice_type = 'invoice'
                   AND inv.active = true
                   AND inv.paid = false
-                ORDER BY open_amount_in_eur DESC
             )
-        ''')
+        """)
+
+        self.reconcile_financial_summary()
+
+    @api.model
+    def reconcile_financial_summary(self, commit=False):
+        """Recompute the stored financial summary of all invoices and fix any drift.
+
+        Also backfills it after install, and picks up a change of the company
+        currency, which the triggers do not watch. Only rows that differ are written.
+        Invoices are recomputed in chunks, each with its rows (and their parents)
+        locked first, so concurrent writes only wait on the chunk being fixed;
+        commit releases those locks after every chunk.
+        """
+        cr = self.env.cr
+        for model_name in ("kojto.finance.invoices", "kojto.finance.invoice.contents", "kojto.finance.cashflow.allocation", "kojto.finance.cashflow"):
+            self.env[model_name].flush_model()
+        cr.execute("SELECT id FROM kojto_finance_invoices ORDER BY id")
+        invoice_ids = [row[0] for row in cr.fetchall()]
+        fixes = 0
+        for chunk in split_every(RECONCILE_CHUNK_SIZE, invoice_ids, list):
+            cr.execute("""
+                SELECT id FROM kojto_finance_invoices
+                WHERE id = ANY(%(ids)s)
+                   OR id IN (SELECT parent_invoice_id FROM kojto_finance_invoices WHERE id = ANY(%(ids)s))
+                ORDER BY id
+                FOR UPDATE
+            """, {"ids": chunk})
+            cr.execute("SELECT kojto_finance_refresh_invoice_summaries(%s)", (chunk,))
+            fixes += cr.fetchone()[0]
+            if commit:
+                cr.commit()
+        if fixes:
+            _logger.info("Invoice financial summary reconciled: %s invoice rows corrected", fixes)
+        self.env["kojto.finance.invoices"]._refresh_financial_summary()
+        return True
+
+    @api.model
+    def _cron_reconcile_financial_summary(self):
+        self.reconcile_financial_summary(commit=True)
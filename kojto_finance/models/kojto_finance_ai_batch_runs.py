@@ -0,0 +1,319 @@
+"""
+Kojto Finance AI Batch Runs
+
+Purpose:
+--------
+Runs AI auto-allocation and auto-accounting over a selection or a whole bank
+statement in the background. A cron runner claims queued runs and processes
+their records on a bounded pool of worker threads, each with its own cursor,
+sharing one pooled HTTP connection to the AI. Decisions are cached by a
+normalized fingerprint. Every record's result, latency and cache hits are
+written to the run as soon as it finishes, so an interrupted run is resumed
+with the records it has not reached yet.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from psycopg2 import errors
+
+from odoo import SUPERUSER_ID, api, fields, models
+from ..utils.ai_client import reset_decision_stats, get_decision_stats
+from ..utils.cashflow_auto_allocate import auto_allocate_for_transaction
+from ..utils.allocation_auto_accounting import auto_accounting_for_allocation
+from ..utils.invoice_auto_accounting import auto_accounting_for_content
+
+_logger = logging.getLogger(__name__)
+
+BATCH_RUNNER_CRON = "kojto_finance.ir_cron_kojto_finance_ai_batch_runner"
+DEFAULT_CONCURRENCY = 4
+
+# operation: (model of the records, function run per record)
+OPERATIONS = {
+    "cashflow_allocation": ("kojto.finance.cashflow", auto_allocate_for_transaction),
+    "allocation_accounting": ("kojto.finance.cashflow.allocation", auto_accounting_for_allocation),
+    "content_accounting": ("kojto.finance.invoice.contents", auto_accounting_for_content),
+}
+
+CONCURRENCY_ERRORS = (errors.SerializationFailure, errors.DeadlockDetected, errors.LockNotAvailable)
+
+# A failed or interrupted run is queued again after RETRY_BACKOFF_SECONDS,
+# doubling on every attempt, until it has run MAX_ATTEMPTS times
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 60
+# Running runs without progress for longer were left behind by a killed worker
+STALE_RUNNING_MINUTES = 60
+
+
+class KojtoFinanceAiBatchRuns(models.Model):
+    _name = "kojto.finance.ai.batch.runs"
+    _description = "Kojto Finance AI Batch Runs"
+    _order = "id desc"
+
+    name = fields.Char(string="Name", required=True)
+    operation = fields.Selection([
+        ("cashflow_allocation", "Auto Allocation"),
+        ("allocation_accounting", "Allocation Auto Accounting"),
+        ("content_accounting", "Invoice Content Auto Accounting"),
+    ], string="Operation", required=True)
+    res_ids = fields.Text(string="Record IDs (JSON)", required=True, default="[]")
+    statement_id = fields.Many2one("kojto.finance.bank.statements", string="Statement", ondelete="set null")
+    state = fields.Selection([
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ], string="State", required=True, default="queued", index=True)
+    concurrency = fields.Integer(string="Concurrency")
+    record_count = fields.Integer(string="Records")
+    processed_count = fields.Integer(string="Processed")
+    failed_count = fields.Integer(string="Failed")
+    cache_hits = fields.Integer(string="Cache Hits")
+    cache_misses = fields.Integer(string="Cache Misses")
+    hit_rate = fields.Float(string="Hit Rate (%)", digits=(5, 1))
+    average_latency = fields.Float(string="Average Latency (s)", digits=(9, 2))
+    error_message = fields.Text(string="Error")
+    date_started = fields.Datetime(string="Started")
+    date_finished = fields.Datetime(string="Finished")
+    duration = fields.Float(string="Duration (s)", digits=(9, 2))
+    attempts = fields.Integer(string="Attempts", default=0)
+    next_attempt_at = fields.Datetime(string="Next Attempt", index=True)
+    line_ids = fields.One2many("kojto.finance.ai.batch.run.lines", "run_id", string="Records")
+
+    @api.model
+    def _enqueue(self, operation, records, statement=None):
+        """Queue a run of operation over records and wake the runner."""
+        model_name = OPERATIONS[operation][0]
+        label = dict(self._fields["operation"].selection)[operation]
+        run = self.create({
+            "name": f"{label}: {statement.name if statement else f'{len(records)} record(s)'}",
+            "operation": operation,
+            "res_ids": json.dumps(records.ids),
+            "statement_id": statement.id if statement else False,
+            "record_count": len(records),
+        })
+        _logger.info("Queued AI batch run %s over %d %s record(s)", run.id, len(records), model_name)
+        self._trigger_runner()
+        return run
+
+    @api.model
+    def _trigger_runner(self, at=None):
+        cron = self.env.ref(BATCH_RUNNER_CRON, raise_if_not_found=False)
+        if cron and cron.active:
+            cron.sudo()._trigger(at)
+
+    @api.model
+    def _enqueue_notification(self, run):
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": "AI Batch Run Queued",
+                "message": f"{run.name} is processed in the background. Progress is shown under Cash Flow > AI Batch Runs.",
+                "type": "info",
+                "sticky": False,
+            },
+        }
+
+    @api.model
+    def _claim_next_run(self):
+        """Lock the oldest due queued run, mark it running and commit so other runners skip it."""
+        self.env.cr.execute("""
+            SELECT id FROM kojto_finance_ai_batch_runs
+            WHERE state = 'queued'
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW() AT TIME ZONE 'UTC')
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        run = self.browse(row[0])
+        run.write({"state": "running", "attempts": run.attempts + 1, "date_started": fields.Datetime.now()})
+        self.env.cr.commit()
+        return run
+
+    def _retry_or_fail(self, error_message):
+        """Queue the runs again with backoff, or fail them once out of attempts."""
+        now = fields.Datetime.now()
+        retry_at = False
+        for run in self:
+            if run.attempts < MAX_ATTEMPTS:
+                next_attempt_at = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** max(run.attempts - 1, 0))
+                run.write({"state": "queued", "error_message": error_message, "next_attempt_at": next_attempt_at})
+                retry_at = min(retry_at, next_attempt_at) if retry_at else next_attempt_at
+            else:
+                run.write({"state": "failed", "error_message": error_message, "date_finished": now})
+        if retry_at:
+            self._trigger_runner(retry_at)
+
+    @api.model
+    def _reap_stale_runs(self):
+        """Retry or fail runs left running by a worker that was killed or timed out.
+
+        Every finished record touches the run, so write_date tells when it last made progress.
+        """
+        self.env.cr.execute("""
+            SELECT id FROM kojto_finance_ai_batch_runs
+            WHERE state = 'running'
+              AND write_date < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 minute'
+            FOR UPDATE SKIP LOCKED
+        """, (STALE_RUNNING_MINUTES,))
+        stale = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if stale:
+            _logger.warning("AI batch runs %s were left running, retrying them", stale.ids)
+            stale._retry_or_fail(f"Interrupted without progress for more than {STALE_RUNNING_MINUTES} minutes")
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_run_jobs(self, limit=None):
+        """Run queued batch runs until the queue is empty or the batch size is reached."""
+        if limit is None:
+            limit = int(self.env["ir.config_parameter"].sudo().get_param("kojto_finance.ai_batch_size", 5))
+        self._reap_stale_runs()
+        for _ in range(limit):
+            run = self._claim_next_run()
+            if not run:
+                break
+            run._run()
+            self.env.cr.commit()
+
+    def _run(self):
+        self.ensure_one()
+        concurrency = max(1, int(self.env["ir.config_parameter"].sudo().get_param(
+            "kojto_finance.ai_batch_concurrency", DEFAULT_CONCURRENCY)))
+        # A retried run resumes with the records that have no line yet
+        done_ids = set(self.line_ids.mapped("res_id"))
+        res_ids = [res_id for res_id in json.loads(self.res_ids or "[]") if res_id not in done_ids]
+        operation = self.operation
+        # The worker environment acts as the user who queued the run, in that user's company
+        user = self.create_uid or self.env.user
+        uid = user.id
+        context = dict(self.env.context, ai_decision_cache=True, allowed_company_ids=user.company_id.ids)
+        started = time.monotonic()
+        # Release the snapshot and the claim before the workers update the run
+        self.env.cr.commit()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kojto_ai_batch") as executor:
+                retries = [
+                    res_id for res_id in executor.map(
+                        lambda res_id: self._process_record(operation, res_id, uid, context, final=False), res_ids)
+                    if res_id
+                ]
+            # Records that hit a lock or serialization conflict with another worker are retried one by one
+            for res_id in retries:
+                self._process_record(operation, res_id, uid, context)
+        except Exception as e:
+            _logger.error(f"AI batch run {self.id} failed: {str(e)}", exc_info=True)
+            self.env.cr.commit()
+            self.invalidate_recordset()
+            self.write({"duration": time.monotonic() - started})
+            self._retry_or_fail(str(e))
+            return
+
+        # A new snapshot, which sees the progress the workers committed
+        self.env.cr.commit()
+        self.invalidate_recordset()
+        self.write({
+            "state": "done",
+            "concurrency": concurrency,
+            "error_message": False,
+            "date_finished": fields.Datetime.now(),
+            "duration": time.monotonic() - started,
+        })
+
+    def _process_record(self, operation, res_id, uid, context, final=True):
+        """Run the operation on one record in its own cursor and transaction.
+
+        Called from the worker threads, so it only touches the database through
+        the cursor it opens. The record's line and the run's counters are written
+        in a second transaction of the same cursor once the record is done.
+        Returns res_id when the record hit a concurrency conflict and, not being
+        the final attempt, should be retried; False otherwise.
+        """
+        model_name, function = OPERATIONS[operation]
+        reset_decision_stats()
+        started = time.monotonic()
+        result, error = False, False
+        with self.env.registry.cursor() as cr:
+            env = api.Environment(cr, uid, context)
+            try:
+                record = env[model_name].browse(res_id).exists()
+                if record:
+                    outcome = function(record)
+                    result = outcome if isinstance(outcome, str) else "Done"
+                else:
+                    result = "Record no longer exists"
+                cr.commit()
+            except CONCURRENCY_ERRORS as e:
+                cr.rollback()
+                if not final:
+                    return res_id
+                error = str(e)
+            except Exception as e:
+                cr.rollback()
+                _logger.error(f"AI batch run {self.id} failed on {model_name}({res_id}): {str(e)}", exc_info=True)
+                error = str(e)
+            latency = time.monotonic() - started
+            stats = get_decision_stats()
+            # Workers update the same run row, so wait for each other instead of failing on the snapshot
+            cr.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env["kojto.finance.ai.batch.run.lines"].create({
+                "run_id": self.id,
+                "res_id": res_id,
+                "result": result,
+                "error_message": error,
+                "latency": latency,
+                "cache_hits": stats["hits"],
+                "cache_misses": stats["misses"],
+            })
+            env.flush_all()
+            cr.execute("""
+                UPDATE kojto_finance_ai_batch_runs
+                SET average_latency = (COALESCE(average_latency, 0) * COALESCE(processed_count, 0) + %(latency)s)
+                        / (COALESCE(processed_count, 0) + 1),
+                    processed_count = COALESCE(processed_count, 0) + 1,
+                    failed_count = COALESCE(failed_count, 0) + %(failed)s,
+                    cache_hits = COALESCE(cache_hits, 0) + %(hits)s,
+                    cache_misses = COALESCE(cache_misses, 0) + %(misses)s,
+                    hit_rate = COALESCE(100.0 * (COALESCE(cache_hits, 0) + %(hits)s)
+                        / NULLIF(COALESCE(cache_hits, 0) + COALESCE(cache_misses, 0) + %(hits)s + %(misses)s, 0), 0),
+                    write_date = NOW() AT TIME ZONE 'UTC'
+                WHERE id = %(run_id)s
+            """, {
+                "run_id": self.id,
+                "latency": latency,
+                "failed": 1 if error else 0,
+                "hits": stats["hits"],
+                "misses": stats["misses"],
+            })
+            cr.commit()
+        return False
+
+    @api.autovacuum
+    def _gc_finished_runs(self):
+        """Drop finished runs older than 30 days."""
+        self.env.cr.execute("""
+            DELETE FROM kojto_finance_ai_batch_runs
+            WHERE state IN ('done', 'failed')
+              AND create_date < NOW() AT TIME ZONE 'UTC' - INTERVAL '30 days'
+        """)
+
+
+class KojtoFinanceAiBatchRunLines(models.Model):
+    _name = "kojto.finance.ai.batch.run.lines"
+    _description = "Kojto Finance AI Batch Run Lines"
+    _order = "run_id desc, id"
+
+    run_id = fields.Many2one("kojto.finance.ai.batch.runs", string="Run", required=True, ondelete="cascade", index=True)
+    res_id = fields.Integer(string="Record ID")
+    result = fields.Text(string="Result")
+    error_message = fields.Text(string="Error")
+    latency = fields.Float(string="Latency (s)", digits=(9, 2))
+    cache_hits = fields.Integer(string="Cache Hits")
+    cache_misses = fields.Integer(string="Cache Misses")
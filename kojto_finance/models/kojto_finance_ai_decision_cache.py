@@ -0,0 +1,43 @@
+import json
+
+from odoo import models, fields, api
+
+DECISION_CACHE_DAYS = 90
+
+
+class KojtoFinanceAiDecisionCache(models.Model):
+    _name = "kojto.finance.ai.decision.cache"
+    _description = "Kojto Finance AI Decision Cache"
+    _order = "id desc"
+    _sql_constraints = [("kind_fingerprint_unique", "UNIQUE(kind, fingerprint)", "A decision is cached once per kind and fingerprint.")]
+
+    kind = fields.Char(string="Kind", required=True, readonly=True)
+    fingerprint = fields.Char(string="Fingerprint", required=True, readonly=True)
+    value = fields.Text(string="Decision (JSON)", readonly=True)
+
+    @api.model
+    def _get_decision(self, kind, fingerprint):
+        self.env.cr.execute("""
+            SELECT value FROM kojto_finance_ai_decision_cache
+            WHERE kind = %s AND fingerprint = %s
+        """, (kind, fingerprint))
+        row = self.env.cr.fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    @api.model
+    def _set_decision(self, kind, fingerprint, value):
+        """Store a decision; written in SQL so concurrent batch workers do not conflict on the same fingerprint."""
+        self.env.cr.execute("""
+            INSERT INTO kojto_finance_ai_decision_cache (kind, fingerprint, value, create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, %s, %s, NOW() AT TIME ZONE 'UTC', NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (kind, fingerprint) DO UPDATE
+            SET value = EXCLUDED.value, write_uid = EXCLUDED.write_uid, write_date = EXCLUDED.write_date
+        """, (kind, fingerprint, json.dumps(value, ensure_ascii=False), self.env.uid, self.env.uid))
+
+    @api.autovacuum
+    def _gc_old_decisions(self):
+        """Drop decisions not refreshed for DECISION_CACHE_DAYS days, so they follow newer bookings."""
+        self.env.cr.execute("""
+            DELETE FROM kojto_finance_ai_decision_cache
+            WHERE write_date < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 day'
+        """, (DECISION_CACHE_DAYS,))
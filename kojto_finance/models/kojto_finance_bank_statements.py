@@ -6,6 +6,28 @@ from datetime import timedelta
 import importlib
 import os
 
+STATEMENT_ENCODINGS = ['utf-8', 'windows-1251', 'cp1251', 'iso-8859-5', 'cp1252']
+
+
+def decode_statement_file(decoded_bytes):
+    """Text of an MT940 file, trying the usual encodings, without NUL and carriage returns."""
+    statement_file_text = None
+    for encoding in STATEMENT_ENCODINGS:
+        try:
+            statement_file_text = decoded_bytes.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+
+    if statement_file_text is None:
+        statement_file_text = decoded_bytes.decode('utf-8', errors='replace')
+
+    statement_file_text = statement_file_text.replace('\x00', '')
+    statement_file_text = re.sub(r"[\r]+ ", "", statement_file_text)
+    statement_file_text = re.sub(r"[\r]+", "", statement_file_text)
+    return statement_file_text
+
+
 class KojtoFinanceBankStatements(models.Model):
     _name = "kojto.finance.bank.statements"
     _description = "Bank Statements"
@@ -65,30 +87,7 @@ class KojtoFinanceBankStatements(models.Model):
         records = []
         for vals in vals_list:
             if "statement_file" in vals:
-                decoded_bytes = base64.b64decode(vals["statement_file"])
-                statement_file_text = None
-
-                encodings_to_try = ['utf-8', 'windows-1251', 'cp1251', 'iso-8859-5', 'cp1252']
-
-                for encoding in encodings_to_try:
-                    try:
-                        statement_file_text = decoded_bytes.decode(encoding)
-                        print(f"Successfully decoded with {encoding}")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-
-                if statement_file_text is None:
-                    statement_file_text = decoded_bytes.decode('utf-8', errors='replace')
-                    print("Warning: Used UTF-8 with character replacement")
-
-                if statement_file_text is not None:
-                    statement_file_text = statement_file_text.replace('\x00', '')
-                    statement_file_text = re.sub(r"[\r]+ ", "", statement_file_text)
-                    statement_file_text = re.sub(r"[\r]+", "", statement_file_text)
-                    vals["statement_file_text"] = statement_file_text
-                else:
-                    vals["statement_file_text"] = None
+                vals["statement_file_text"] = decode_statement_file(base64.b64decode(vals["statement_file"]))
 
             if "statement_file_text" in vals and vals["statement_file_text"]:
                 existing_record = self.search([("statement_file_text", "=", vals["statement_file_text"])], limit=1)
@@ -99,7 +98,10 @@ class KojtoFinanceBankStatements(models.Model):
             record.extract_statement_from_file()
             records.append(record)
 
-        return records[0] if len(records) == 1 else self.browse([r.id for r in records])
+        # Transactions of all statements are created together
+        statements = self.browse([r.id for r in records])
+        statements.extract_and_create_transactions()
+        return records[0] if len(records) == 1 else statements
 
 
     def extract_statement_from_file(self):
@@ -166,7 +168,6 @@ class KojtoFinanceBankStatements(models.Model):
         self.select_account_iban()
         self.validate_balance_continuity()
         self.compute_number_of_transactions()
-        self.extract_and_create_transactions()
 
     def select_account_iban(self):
         if self.tag_25:
@@ -187,6 +188,17 @@ class KojtoFinanceBankStatements(models.Model):
             else:
                 raise UserError("No contact found for the current company. Please configure a contact with bank accounts.")
 
+    def action_ai_batch_auto_allocate(self):
+        """Queue AI auto-allocation of the unallocated transactions, one run per statement."""
+        runs = self.env["kojto.finance.ai.batch.runs"]
+        cashflow_model = self.env["kojto.finance.cashflow"]
+        run = runs.browse()
+        for statement in self:
+            transactions = cashflow_model.search([("statement_id", "=", statement.id), ("unallocated_amount", ">", 0)], order="date_value, id")
+            if transactions:
+                run = runs._enqueue("cashflow_allocation", transactions, statement=statement)
+        return runs._enqueue_notification(run) if run else True
+
     def validate_balance_continuity(self, return_error_details=False):
         if not self.bank_account_id or not self.date_start:
             return None
@@ -241,240 +253,197 @@ class KojtoFinanceBankStatements(models.Model):
                 record.number_of_transactions = 0
 
 
-    def _calculate_exchange_rates(self, transaction_date, source_currency_id):
-        rate_to_bgn = 1.0
-        rate_to_eur = 1.0
-
-        if not source_currency_id:
-            return rate_to_bgn, rate_to_eur
-
+    def _calculate_exchange_rates(self, lookups):
+        """(rate_to_bgn, rate_to_eur) for each (currency_id, date) lookup, in order."""
         bgn_currency = self.env['res.currency'].search([('name', '=', 'BGN')], limit=1)
         eur_currency = self.env['res.currency'].search([('name', '=', 'EUR')], limit=1)
-
-        if not bgn_currency or not eur_currency:
-            return rate_to_bgn, rate_to_eur
-
         exchange_model = self.env['kojto.base.currency.exchange']
 
-        if source_currency_id.id != bgn_currency.id:
-            exchange_rate = exchange_model.search([
-                ('base_currency_id', '=', source_currency_id.id),
-                ('target_currency_id', '=', bgn_currency.id),
-                ('datetime', '<=', transaction_date),
-                ('exchange_rate', '>', 0)
-            ], order='datetime desc', limit=1)
-
-            if exchange_rate and exchange_rate.exchange_rate > 0:
-                rate_to_bgn = exchange_rate.exchange_rate
-            else:
-                exchange_rate = exchange_model.search([
-                    ('base_currency_id', '=', bgn_currency.id),
-                    ('target_currency_id', '=', source_currency_id.id),
-                    ('datetime', '<=', transaction_date),
-                    ('exchange_rate', '>', 0)
-                ], order='datetime desc', limit=1)
-
-                if exchange_rate and exchange_rate.exchange_rate > 0:
-                    rate_to_bgn = 1.0 / exchange_rate.exchange_rate
-                else:
-                    exchange_rate = exchange_model.search([
-                        '|',
-                        ('base_currency_id', '=', source_currency_id.id),
-                        ('target_currency_id', '=', source_currency_id.id),
-                        '|',
-                        ('base_currency_id', '=', bgn_currency.id),
-                        ('target_currency_id', '=', bgn_currency.id),
-                        ('exchange_rate', '>', 0)
-                    ], order='datetime desc', limit=1)
-
-                    if exchange_rate and exchange_rate.exchange_rate > 0:
-                        if exchange_rate.base_currency_id.id == source_currency_id.id and exchange_rate.target_currency_id.id == bgn_currency.id:
-                            rate_to_bgn = exchange_rate.exchange_rate
-                        elif exchange_rate.base_currency_id.id == bgn_currency.id and exchange_rate.target_currency_id.id == source_currency_id.id:
-                            rate_to_bgn = 1.0 / exchange_rate.exchange_rate
-                        else:
-                            rate_to_bgn = 1.0
-
-        if source_currency_id.id != eur_currency.id:
-            exchange_rate = exchange_model.search([
-                ('base_currency_id', '=', source_currency_id.id),
-                ('target_currency_id', '=', eur_currency.id),
-                ('datetime', '<=', transaction_date),
-                ('exchange_rate', '>', 0)
-            ], order='datetime desc', limit=1)
-
-            if exchange_rate and exchange_rate.exchange_rate > 0:
-                rate_to_eur = exchange_rate.exchange_rate
-            else:
-                exchange_rate = exchange_model.search([
-                    ('base_currency_id', '=', eur_currency.id),
-                    ('target_currency_id', '=', source_currency_id.id),
-                    ('datetime', '<=', transaction_date),
-                    ('exchange_rate', '>', 0)
-                ], order='datetime desc', limit=1)
-
-                if exchange_rate and exchange_rate.exchange_rate > 0:
-                    rate_to_eur = 1.0 / exchange_rate.exchange_rate
-                else:
-                    exchange_rate = exchange_model.search([
-                        '|',
-                        ('base_currency_id', '=', source_currency_id.id),
-                        ('target_currency_id', '=', source_currency_id.id),
-                        '|',
-                        ('base_currency_id', '=', eur_currency.id),
-                        ('target_currency_id', '=', eur_currency.id),
-                        ('exchange_rate', '>', 0)
-                    ], order='datetime desc', limit=1)
-
-                    if exchange_rate and exchange_rate.exchange_rate > 0:
-                        if exchange_rate.base_currency_id.id == source_currency_id.id and exchange_rate.target_currency_id.id == eur_currency.id:
-                            rate_to_eur = exchange_rate.exchange_rate
-                        elif exchange_rate.base_currency_id.id == eur_currency.id and exchange_rate.target_currency_id.id == source_currency_id.id:
-                            rate_to_eur = 1.0 / exchange_rate.exchange_rate
-                        else:
-                            rate_to_eur = 1.0
-
-        rate_to_bgn = max(rate_to_bgn, 0.0001)
-        rate_to_eur = max(rate_to_eur, 0.0001)
-
-        return rate_to_bgn, rate_to_eur
-
-    def extract_and_create_transactions(self):
-        cashflow_model = self.env["kojto.finance.cashflow"]
-        bank_account_model = self.env["kojto.base.bank.accounts"]
-
-        parser_dir = os.path.join(os.path.dirname(__file__), "bank_statement_parsers")
-        available_parsers = []
-        for fname in os.listdir(parser_dir):
-            if fname.startswith("parser_for_") and fname.endswith(".py"):
-                bic = fname[len("parser_for_"):-3]
-                available_parsers.append(bic)
-
+        results = {}
+        for currency_id, transaction_date in lookups:
+            if (currency_id, transaction_date) in results:
+                continue
+            rate_to_bgn = rate_to_eur = 1.0
+            if currency_id and bgn_currency and eur_currency:
+                if currency_id != bgn_currency.id:
+                    rate_to_bgn = exchange_model.get_rate(currency_id, bgn_currency.id, transaction_date, positive=True) or 1.0
+                if currency_id != eur_currency.id:
+                    rate_to_eur = exchange_model.get_rate(currency_id, eur_currency.id, transaction_date, positive=True) or 1.0
+                rate_to_bgn = max(rate_to_bgn, 0.0001)
+                rate_to_eur = max(rate_to_eur, 0.0001)
+            results[currency_id, transaction_date] = (rate_to_bgn, rate_to_eur)
+        return [results[lookup] for lookup in lookups]
+
+    def _get_transaction_parser(self):
         parser_method_name = f"parser_for_{self.bank_bic_code}"
         try:
             parser_module = importlib.import_module(f".bank_statement_parsers.{parser_method_name}", package=__package__)
-            parser = getattr(parser_module, f"{self.bank_bic_code}_parse_transaction_data")
+            return getattr(parser_module, f"{self.bank_bic_code}_parse_transaction_data")
         except (ModuleNotFoundError, AttributeError):
+            parser_dir = os.path.join(os.path.dirname(__file__), "bank_statement_parsers")
+            available_parsers = []
+            for fname in os.listdir(parser_dir):
+                if fname.startswith("parser_for_") and fname.endswith(".py"):
+                    bic = fname[len("parser_for_"):-3]
+                    available_parsers.append(bic)
             print(f"Warning: No parser found for BIC {self.bank_bic_code} in statement ID {self.id}. Transactions will not be parsed. Available parsers: {available_parsers}")
-            parser = lambda x: {}
+            return lambda x: {}
+
+    def _parse_transactions(self, parser):
+        """Parse the :61/:86 blocks of the statement file.
 
+        Returns:
+            list: (cashflow vals, counterparty IBAN) per valid transaction, with the
+            counterparty and exchange rates still to be resolved
+        """
         if not self.statement_file_text:
-            return
+            return []
 
+        result = []
         transactions = self.statement_file_text.split(":61")[1:]
-        for idx, raw_part in enumerate(transactions):
+        for raw_part in transactions:
             try:
                 transaction_content = f":61{raw_part.split(':6', 1)[0].strip()}"
                 transaction_content = re.sub(r"\n\s*|\s*\n", "", transaction_content).replace(":61", "\n:61").replace(":86", "\n:86")
 
-                if cashflow_model.search([("transaction_data_raw", "=", transaction_content), ("statement_id", "=", self.id)], limit=1):
-                    continue
-
                 start_61 = transaction_content.find(":61:")
                 start_86 = transaction_content.find(":86:")
-                if start_61 == -1 and start_86 == -1:
+                if start_61 == -1:
                     continue
 
                 text_86 = transaction_content[start_86 + 4:] if start_86 != -1 else ""
                 parsed = parser(transaction_content)
 
-                counterparty_iban = parsed.get("counterparty_iban", "")
-                counterparty_bank_account_id = False
-                if counterparty_iban:
-                    counterparty_bank_account = bank_account_model.search([("IBAN", "=", counterparty_iban)], limit=1)
-                    if counterparty_bank_account:
-                        counterparty_bank_account_id = counterparty_bank_account.id
-                    else:
-                        bank_code = counterparty_iban[4:8] if len(counterparty_iban) >= 8 else ""
-                        matching_bank_account = False
-                        if bank_code:
-                            matching_bank_account = bank_account_model.search([
-                                ("IBAN", "!=", counterparty_iban),
-                                ("IBAN", "like", f"%{bank_code}%")
-                            ], limit=1)
-                        new_bank_account_vals = {
-                            "IBAN": counterparty_iban,
-                            "name": f"Account {counterparty_iban}",
-                        }
-                        if matching_bank_account and matching_bank_account.BIC:
-                            bank_model = self.env["kojto.base.banks"]
-                            existing_bank = bank_model.search([("BIC", "=", matching_bank_account.BIC)], limit=1)
-                            if existing_bank:
-                                new_bank_account_vals["bank_id"] = existing_bank.id
-                            else:
-                                new_bank = bank_model.create({
-                                    "name": f"Bank {bank_code}",
-                                    "BIC": matching_bank_account.BIC,
-                                })
-                                new_bank_account_vals["bank_id"] = new_bank.id
-                        new_bank_account = bank_account_model.create(new_bank_account_vals)
-                        counterparty_bank_account_id = new_bank_account.id
-
-                counterparty_id = False
-                if counterparty_bank_account_id:
-                    counterparty_bank_account = bank_account_model.browse(counterparty_bank_account_id)
-                    if counterparty_bank_account.contact_id:
-                        counterparty_id = counterparty_bank_account.contact_id.id
-
-                cashflow_vals = {
+                transaction_data = transaction_content[start_61 + 4:].split(":")[0].strip()
+                year, month, day = f"20{transaction_data[:2]}", transaction_data[2:4], transaction_data[4:6]
+                direction = "incoming" if transaction_data[10] == "C" else "outgoing"
+                amount_match = re.search(r"[A-Za-z](\d+[.,]?\d*)", transaction_data[10:])
+                amount_str = amount_match.group(1).replace(",", ".") if amount_match else "0"
+                try:
+                    amount = abs(float(amount_str))
+                except Exception:
+                    amount = 0.0
+                if amount <= 0.0:
+                    continue
+
+                result.append(({
                     "transaction_data_raw": transaction_content,
                     "statement_id": self.id,
-                    "bank_account_id": self.bank_account_id.id if self.bank_account_id else False,
+                    "bank_account_id": self.bank_account_id.id,
                     "related_reference": parsed.get("related_reference", "" if "+00" not in text_86 or "+10" not in text_86 else text_86[text_86.index("+00") + len("+00"):text_86.index("+10")].strip()),
                     "information": parsed.get("information") if parsed.get("information") else "No information provided",
                     "description": parsed.get("description") if parsed.get("description") else "No description provided",
-                    "counterparty_bank_account_id": counterparty_bank_account_id,
-                    "counterparty_id": counterparty_id,
-                }
-
-                if start_61 != -1:
-                    transaction_data = transaction_content[start_61 + 4:].split(":")[0].strip()
-                    year, month, day = f"20{transaction_data[:2]}", transaction_data[2:4], transaction_data[4:6]
-                    transaction_date = fields.Date.from_string(f"{year}-{month}-{day}")
-                    source_currency_id = self.bank_account_id.currency_id if self.bank_account_id else False
-                    rate_to_bgn, rate_to_eur = self._calculate_exchange_rates(transaction_date, source_currency_id)
-                    direction = "incoming" if transaction_data[10] == "C" else "outgoing"
-                    amount_match = re.search(r"[A-Za-z](\d+[.,]?\d*)", transaction_data[10:])
-                    amount_str = amount_match.group(1).replace(",", ".") if amount_match else "0"
-                    try:
-                        amount = abs(float(amount_str))
-                    except Exception:
-                        amount = 0.0
-                    cashflow_vals.update({
-                        "swift_transaction_code": parsed.get("transaction_code", transaction_data),
-                        "date_value": transaction_date,
-                        "date_entry": fields.Date.from_string(f"{year}-{transaction_data[6:8]}-{transaction_data[8:10]}"),
-                        "transaction_direction": direction,
-                        "amount": amount,
-                        "exchange_rate_to_bgn": rate_to_bgn,
-                        "exchange_rate_to_eur": rate_to_eur,
-                    })
-                    if amount <= 0.0:
-                        continue
-
-                search_domain = []
-                for field, value in [
-                    ("transaction_data_raw", cashflow_vals.get("transaction_data_raw")),
-                    ("bank_account_id", cashflow_vals.get("bank_account_id")),
-                    ("information", cashflow_vals.get("information")),
-                    ("description", cashflow_vals.get("description")),
-                    ("counterparty_bank_account_id", cashflow_vals.get("counterparty_bank_account_id")),
-                    ("counterparty_id", cashflow_vals.get("counterparty_id")),
-                ]:
-                    if value and value != "" and value is not False:
-                        search_domain.append((field, "=", value))
-
-                existing_cashflow = cashflow_model.search(search_domain, limit=1)
-
-                if not existing_cashflow:
-                    cashflow_model.create(cashflow_vals)
-                    continue
+                    "swift_transaction_code": parsed.get("transaction_code", transaction_data),
+                    "date_value": fields.Date.from_string(f"{year}-{month}-{day}"),
+                    "date_entry": fields.Date.from_string(f"{year}-{transaction_data[6:8]}-{transaction_data[8:10]}"),
+                    "transaction_direction": direction,
+                    "amount": amount,
+                }, parsed.get("counterparty_iban", "")))
+            except Exception:
+                continue
+        return result
 
-                if existing_cashflow:
-                    existing_cashflow.write(cashflow_vals)
-                    continue
+    def _resolve_counterparty_bank_accounts(self, ibans):
+        """Map counterparty IBANs to bank accounts in a few queries, creating the unknown ones.
+
+        A new account gets the bank of an existing account with the same bank code
+        (IBAN characters 5-8), like the single-transaction import did.
+        """
+        bank_account_model = self.env["kojto.base.bank.accounts"]
+        bank_model = self.env["kojto.base.banks"]
+        accounts = {}
+        for account in bank_account_model.search([("IBAN", "in", list(ibans))]):
+            accounts.setdefault(account.IBAN, account)
+
+        missing_ibans = sorted(iban for iban in ibans if iban not in accounts)
+        if not missing_ibans:
+            return accounts
+
+        bank_codes = {iban[4:8] for iban in missing_ibans if len(iban) >= 8}
+        bic_by_code = {}
+        if bank_codes:
+            bank_account_model.flush_model(["IBAN", "BIC"])
+            self.env.cr.execute("""
+                SELECT DISTINCT ON (SUBSTRING("IBAN" FROM 5 FOR 4)) SUBSTRING("IBAN" FROM 5 FOR 4), "BIC"
+                FROM kojto_base_bank_accounts
+                WHERE SUBSTRING("IBAN" FROM 5 FOR 4) = ANY(%s) AND COALESCE("BIC", '') != '' AND active
+                ORDER BY SUBSTRING("IBAN" FROM 5 FOR 4), "IBAN" DESC
+            """, [list(bank_codes)])
+            bic_by_code = dict(self.env.cr.fetchall())
+
+        banks = {}
+        for bank in bank_model.search([("BIC", "in", list(set(bic_by_code.values())))]):
+            banks.setdefault(bank.BIC, bank)
+        new_banks = {}
+        for code, bic in bic_by_code.items():
+            if bic not in banks and bic not in new_banks:
+                new_banks[bic] = {"name": f"Bank {code}", "BIC": bic}
+        for bank in bank_model.create(list(new_banks.values())):
+            banks[bank.BIC] = bank
+
+        new_account_vals = []
+        for iban in missing_ibans:
+            vals = {"IBAN": iban, "name": f"Account {iban}"}
+            bic = bic_by_code.get(iban[4:8]) if len(iban) >= 8 else None
+            if bic:
+                vals["bank_id"] = banks[bic].id
+            new_account_vals.append(vals)
+        for account in bank_account_model.create(new_account_vals):
+            accounts[account.IBAN] = account
+        return accounts
+
+    def extract_and_create_transactions(self):
+        """Create the cashflow transactions of the statements in one batch.
 
-            except Exception as e:
+        All files are parsed first; counterparty accounts, exchange rates and
+        already imported transactions (by transaction_hash) are then resolved for
+        the whole batch, and the new transactions are created with a single create.
+        """
+        cashflow_model = self.env["kojto.finance.cashflow"]
+
+        parsers = {}
+        transactions = []
+        for statement in self:
+            if not statement.statement_file_text or not statement.bank_account_id:
                 continue
+            if statement.bank_bic_code not in parsers:
+                parsers[statement.bank_bic_code] = statement._get_transaction_parser()
+            transactions += statement._parse_transactions(parsers[statement.bank_bic_code])
+        if not transactions:
+            return
+
+        # Skip transactions imported before, and repeated ones within the batch
+        for vals, _iban in transactions:
+            vals["transaction_hash"] = cashflow_model._get_transaction_hash(vals["bank_account_id"], vals["transaction_data_raw"])
+        cashflow_model.flush_model(["transaction_hash"])
+        self.env.cr.execute(
+            "SELECT transaction_hash FROM kojto_finance_cashflow WHERE transaction_hash = ANY(%s)",
+            [[vals["transaction_hash"] for vals, _iban in transactions]],
+        )
+        known_hashes = {row[0] for row in self.env.cr.fetchall()}
+        new_transactions = []
+        for vals, iban in transactions:
+            if vals["transaction_hash"] not in known_hashes:
+                known_hashes.add(vals["transaction_hash"])
+                new_transactions.append((vals, iban))
+        if not new_transactions:
+            return
 
-        return
+        accounts = self._resolve_counterparty_bank_accounts({iban for _vals, iban in new_transactions if iban})
+        bank_accounts = self.env["kojto.base.bank.accounts"].browse({vals["bank_account_id"] for vals, _iban in new_transactions})
+        currency_ids = {account.id: account.currency_id.id for account in bank_accounts}
+        rates = self._calculate_exchange_rates([
+            (currency_ids[vals["bank_account_id"]], vals["date_value"]) for vals, _iban in new_transactions
+        ])
+
+        vals_list = []
+        for (vals, iban), (rate_to_bgn, rate_to_eur) in zip(new_transactions, rates):
+            counterparty_bank_account = accounts.get(iban) if iban else False
+            vals.update({
+                "counterparty_bank_account_id": counterparty_bank_account.id if counterparty_bank_account else False,
+                "counterparty_id": counterparty_bank_account.contact_id.id if counterparty_bank_account and counterparty_bank_account.contact_id else False,
+                "exchange_rate_to_bgn": rate_to_bgn,
+                "exchange_rate_to_eur": rate_to_eur,
+            })
+            vals_list.append(vals)
+        cashflow_model.create(vals_list)
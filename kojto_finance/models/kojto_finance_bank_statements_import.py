@@ -1,7 +1,33 @@
 from odoo import models, fields
 from datetime import date
+from io import BytesIO
 import base64
+import logging
 import re
+import time
+import zipfile
+
+from .kojto_finance_bank_statements import decode_statement_file
+
+_logger = logging.getLogger(__name__)
+
+
+def _parse_statement_file(args):
+    """Decode one uploaded MT940 file and read what is needed to order the import.
+
+    Returns (filename, text, sort key, number of :61 blocks, seconds, error).
+    """
+    filename, data = args
+    started = time.monotonic()
+    try:
+        text = decode_statement_file(data)
+        tags = dict((tag, content.strip()) for tag, content in re.findall(r":(25|28C|60F):(.*?)(?=\n:|$)", text, re.DOTALL))
+        sequence = re.search(r"(\d+)(?:/\d+)?\s*$", tags.get("28C", ""))
+        opening = re.match(r"[CD](\d{6})", tags.get("60F", ""))
+        sort_key = (tags.get("25", ""), opening.group(1) if opening else "", int(sequence.group(1)) if sequence else 0)
+        return filename, text, sort_key, len(re.findall(r":61:", text)), time.monotonic() - started, None
+    except Exception as e:
+        return filename, None, None, 0, time.monotonic() - started, str(e)
 
 
 class KojtoFinanceBankStatementsImport(models.TransientModel):
@@ -9,73 +35,116 @@ class KojtoFinanceBankStatementsImport(models.TransientModel):
     _description = "Bank Statements Import"
 
     files = fields.Many2many("ir.attachment", string="Select files")
-
+    commit_per_statement = fields.Boolean(string="Commit Each Statement", default=True, help="Save every statement as soon as it is imported, so a failing file does not undo the others")
 
     result_message = fields.Text(string="Import Summary", readonly=True)
 
-    def import_files(self):
-
-        newly_imported = []
-        duplicates_ignored = []
-        imported_statements = []
+    def _get_uploaded_files(self):
+        """Return ((filename, bytes) of every selected file with ZIP archives unpacked, errors).
 
+        Files inside an archive are named by their path in it.
+        """
+        uploaded_files = []
+        file_errors = []
         for attachment in self.files:
             if not attachment.datas:
                 continue
-
-            # Decode file to check for duplicates
-            decoded_bytes = base64.b64decode(attachment.datas)
-            statement_file_text = None
-
-            encodings_to_try = ['utf-8', 'windows-1251', 'cp1251', 'iso-8859-5', 'cp1252']
-
-            for encoding in encodings_to_try:
+            data = base64.b64decode(attachment.datas)
+            if attachment.name and attachment.name.lower().endswith(".zip"):
                 try:
-                    statement_file_text = decoded_bytes.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
+                    with zipfile.ZipFile(BytesIO(data)) as archive:
+                        for member in archive.infolist():
+                            if not member.is_dir():
+                                uploaded_files.append((member.filename, archive.read(member)))
+                except zipfile.BadZipFile as e:
+                    file_errors.append(f"{attachment.name}: {e}")
+            else:
+                uploaded_files.append((attachment.name, data))
+        return uploaded_files, file_errors
 
-            if statement_file_text is None:
-                statement_file_text = decoded_bytes.decode('utf-8', errors='replace')
-
-            if statement_file_text is not None:
-                statement_file_text = statement_file_text.replace('\x00', '')
-                statement_file_text = re.sub(r"[\r]+ ", "", statement_file_text)
-                statement_file_text = re.sub(r"[\r]+", "", statement_file_text)
-
-            # Check if statement already exists
-            if statement_file_text:
-                existing_record = self.env["kojto.finance.bank.statements"].search([
-                    ("statement_file_text", "=", statement_file_text)
-                ], limit=1)
+    def import_files(self):
+        statement_model = self.env["kojto.finance.bank.statements"]
+        uploaded_files, file_errors = self._get_uploaded_files()
+        # Parsed in-process: decoding and regex matching hold the GIL, so threads do not
+        # help, and process pools are not used from Odoo workers (forked children copy
+        # the database connections, spawned ones cannot import addon modules)
+        parsed_files = [_parse_statement_file(args) for args in uploaded_files]
 
-                if existing_record:
-                    upload_date = existing_record.create_date.strftime("%Y-%m-%d %H:%M:%S") if existing_record.create_date else "Unknown"
-                    duplicates_ignored.append(f"{existing_record.name} (Uploaded: {upload_date})")
+        duplicates_ignored = []
+        to_import = []
+        existing_statements = {}
+        texts = [text for _name, text, _key, _count, _seconds, error in parsed_files if text]
+        if texts:
+            for statement in statement_model.search([("statement_file_text", "in", texts)]):
+                existing_statements.setdefault(statement.statement_file_text, statement)
+
+        seen_texts = set()
+        for filename, text, sort_key, count, seconds, error in parsed_files:
+            if error:
+                file_errors.append(f"{filename}: {error}")
+                continue
+            if not text:
+                continue
+            existing_record = existing_statements.get(text)
+            if existing_record:
+                upload_date = existing_record.create_date.strftime("%Y-%m-%d %H:%M:%S") if existing_record.create_date else "Unknown"
+                duplicates_ignored.append(f"{existing_record.name} (Uploaded: {upload_date})")
+                continue
+            if text in seen_texts:
+                duplicates_ignored.append(f"{filename} (Selected twice)")
+                continue
+            seen_texts.add(text)
+            to_import.append((sort_key, filename, text, {"parse": seconds, "blocks": count}))
+
+        # Statements of an account in sequence, so their balances follow on from each other
+        to_import.sort(key=lambda item: item[0])
+        vals_list = [{"statement_file_text": text, "statement_filename": filename} for _key, filename, text, _report in to_import]
+        file_reports = [report for _key, _filename, _text, report in to_import]
+
+        # (statement, report of its file) in import order
+        imported = []
+        if self.commit_per_statement:
+            for vals, report in zip(vals_list, file_reports):
+                started = time.monotonic()
+                try:
+                    statement = statement_model.create([vals])
+                    self.env.cr.commit()
+                except Exception as e:
+                    self.env.cr.rollback()
+                    _logger.exception("Bank statement import of %s failed", vals["statement_filename"])
+                    file_errors.append(f"{vals['statement_filename']}: {e}")
                     continue
-
-            # Create new statement
-            statement = self.env["kojto.finance.bank.statements"].create({
-                "statement_file": attachment.datas,
-                "statement_filename": attachment.name,
-            })
-            newly_imported.append(statement.name if statement.name else attachment.name)
-            imported_statements.append(statement)
-
-        # Validate balance continuity for all imported statements after all transactions are created
-        # Sort statements by date to validate in chronological order
+                report["import"] = time.monotonic() - started
+                imported.append((statement, report))
+        elif vals_list:
+            started = time.monotonic()
+            statements = statement_model.create(vals_list)
+            elapsed = time.monotonic() - started
+            for statement, report in zip(statements, file_reports):
+                report["import"] = elapsed / len(vals_list)
+                imported.append((statement, report))
+        imported_statements = [statement for statement, _report in imported]
+        newly_imported = [statement.name or statement.statement_filename for statement in imported_statements]
+
+        # Validate balance continuity for all imported statements after all transactions are created,
+        # per bank account in chronological order
         validation_errors = []
         sorted_statements = sorted(
             imported_statements,
-            key=lambda s: fields.Date.to_date(s.date_start) or date.min,
+            key=lambda s: (s.bank_account_id.id, fields.Date.to_date(s.date_start) or date.min, s.number or 0),
         )
         for statement in sorted_statements:
             error_details = statement.validate_balance_continuity(return_error_details=True)
             if error_details:
                 validation_errors.append(error_details)
 
-        total_transactions = sum(stmt.number_of_transactions for stmt in imported_statements)
+        created_counts = {}
+        if imported_statements:
+            created_counts = dict(self.env["kojto.finance.cashflow"]._read_group(
+                [("statement_id", "in", [statement.id for statement in imported_statements])],
+                ["statement_id"], ["__count"],
+            ))
+        total_transactions = sum(created_counts.values())
 
         message_lines = []
 
@@ -93,6 +162,24 @@ class KojtoFinanceBankStatementsImport(models.TransientModel):
         message_lines.append("TRANSACTIONS:")
         message_lines.append(f"Transactions created: {total_transactions}")
 
+        # FILES section
+        if imported_statements:
+            message_lines.append("")
+            message_lines.append("")
+            message_lines.append("FILES:")
+            for statement, report in imported:
+                message_lines.append(
+                    f"{statement.statement_filename}: {created_counts.get(statement, 0)} of {report.get('blocks', 0)} transaction(s) created | "
+                    f"Parsed in {report.get('parse', 0.0):.2f}s | Imported in {report.get('import', 0.0):.2f}s"
+                )
+
+        # FAILED FILES section
+        if file_errors:
+            message_lines.append("")
+            message_lines.append("")
+            message_lines.append("FAILED FILES:")
+            message_lines.extend(file_errors)
+
         # BALANCE CONTINUITY ERRORS section
         if validation_errors:
             message_lines.append("")
@@ -120,4 +207,3 @@ class KojtoFinanceBankStatementsImport(models.TransientModel):
             "target": "new",  # Opens as popup
             "view_id": self.env.ref("kojto_finance.view_kojto_finance_bank_statements_import_message_popup").id,
         }
-
@@ -1,6 +1,7 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 from collections import defaultdict
+import hashlib
 from ..utils.cashflow_auto_allocate import auto_allocate_for_transaction
 
 class KojtoFinanceCashflow(models.Model):
@@ -8,11 +9,15 @@ class KojtoFinanceCashflow(models.Model):
     _description = "Kojto Finance Cashflow"
     _rec_name = "name"
     _order = "id desc"
-    _sql_constraints = [('amount_positive', 'CHECK (amount > 0)', 'Amount must be greater than zero.')]
+    _sql_constraints = [
+        ('amount_positive', 'CHECK (amount > 0)', 'Amount must be greater than zero.'),
+        ('transaction_hash_unique', 'UNIQUE(transaction_hash)', 'This bank transaction has already been imported.'),
+    ]
 
     auto_allocated = fields.Boolean(string="Auto Allocated", default=False)
     name = fields.Char(string="Name", compute="_compute_name", store=False)
     transaction_data_raw = fields.Text(string="Base Data", readonly=True)
+    transaction_hash = fields.Char(string="Transaction Hash", readonly=True, copy=False, help="Hash of our bank account and the raw statement data, used to skip transactions imported before")
     statement_id = fields.Many2one("kojto.finance.bank.statements", string="Statement", readonly=True)
     bank_account_id = fields.Many2one("kojto.base.bank.accounts", string="Our Bank Account", required=True, domain=lambda self: self.domain_bank_account_id())
     transaction_allocation_ids = fields.One2many("kojto.finance.cashflow.allocation", "transaction_id", string="Transaction Allocation")
@@ -185,6 +190,29 @@ class KojtoFinanceCashflow(models.Model):
         return {}
 
 
+    def init(self):
+        """Hash transactions imported before transaction_hash existed, keeping duplicates of a transaction unhashed"""
+        self.env.cr.execute("""
+            UPDATE kojto_finance_cashflow c
+            SET transaction_hash = encode(sha256(convert_to(c.bank_account_id::text || '|' || c.transaction_data_raw, 'UTF8')), 'hex')
+            FROM (
+                SELECT DISTINCT ON (bank_account_id, transaction_data_raw) id
+                FROM kojto_finance_cashflow
+                WHERE transaction_hash IS NULL AND transaction_data_raw IS NOT NULL AND bank_account_id IS NOT NULL
+                ORDER BY bank_account_id, transaction_data_raw, id
+            ) first_rows
+            WHERE c.id = first_rows.id
+              AND NOT EXISTS (
+                  SELECT 1 FROM kojto_finance_cashflow h
+                  WHERE h.transaction_hash = encode(sha256(convert_to(c.bank_account_id::text || '|' || c.transaction_data_raw, 'UTF8')), 'hex')
+              )
+        """)
+
+    @api.model
+    def _get_transaction_hash(self, bank_account_id, transaction_data_raw):
+        """Same hash as computed in SQL by init"""
+        return hashlib.sha256(f"{bank_account_id}|{transaction_data_raw}".encode()).hexdigest()
+
     @api.model
     def create(self, vals):
         def _set_exchange_rates(val):
@@ -226,6 +254,8 @@ class KojtoFinanceCashflow(models.Model):
                 vals['exchange_rate_to_bgn'] = 1
                 vals['exchange_rate_to_eur'] = 0.51129
         result = super(KojtoFinanceCashflow, self).write(vals)
+        if {'exchange_rate_to_bgn', 'exchange_rate_to_eur', 'transaction_direction'}.intersection(vals):
+            self.env['kojto.finance.invoices']._refresh_financial_summary()
         return result
 
     def domain_bank_account_id(self):
@@ -331,18 +361,11 @@ class KojtoFinanceCashflow(models.Model):
         if not date or not from_currency or not to_currency:
             return 0.0
 
-        exchange_rate = self.env["kojto.base.currency.exchange"].search(
-            [
-                ("base_currency_id", "=", from_currency.id),
-                ("target_currency_id", "=", to_currency.id),
-                ("datetime", ">=", date),
-                ("datetime", "<=", date),
-            ],
-            order="datetime DESC",
-            limit=1,
+        exchange_rate = self.env["kojto.base.currency.exchange"].get_rate(
+            from_currency.id, to_currency.id, date, inverse=False, latest=False, same_day=True
         )
 
-        if not exchange_rate:
+        if exchange_rate is None:
             if from_currency.name == 'BGN' and to_currency.name == 'EUR':
                 return 0.51129
             elif from_currency.name == 'EUR' and to_currency.name == 'BGN':
@@ -353,7 +376,7 @@ class KojtoFinanceCashflow(models.Model):
                 return 1.0
             return 0.0
 
-        return exchange_rate.exchange_rate
+        return exchange_rate
 
     @api.onchange("counterparty_bank_account_id")
     def _onchange_counterparty_bank_account_id(self):
@@ -389,7 +412,7 @@ class KojtoFinanceCashflow(models.Model):
         result = super(KojtoFinanceCashflow, self).unlink()
 
         if invoice_ids:
-            pass
+            self.env['kojto.finance.invoices']._refresh_financial_summary()
 
         return result
 
@@ -398,6 +421,14 @@ class KojtoFinanceCashflow(models.Model):
             auto_allocate_for_transaction(record)
         return True
 
+    def action_ai_batch_auto_allocate(self):
+        """Queue AI auto-allocation of the selected transactions with something left to allocate."""
+        transactions = self.filtered(lambda r: r.unallocated_amount > 0)
+        if not transactions:
+            return True
+        runs = self.env['kojto.finance.ai.batch.runs']
+        return runs._enqueue_notification(runs._enqueue('cashflow_allocation', transactions))
+
     def auto_allocate_cashflow_transaction_to_invoice(self):
         import re
         Invoice = self.env['kojto.finance.invoices']
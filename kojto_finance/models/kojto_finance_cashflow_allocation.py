@@ -194,16 +194,24 @@ class KojtoFinanceCashflowAllocation(models.Model):
         # Return True to refresh the current view without navigation
         return True
 
+    def action_ai_batch_auto_accounting(self):
+        """Queue AI auto-accounting of the selected allocations in the background."""
+        runs = self.env['kojto.finance.ai.batch.runs']
+        return runs._enqueue_notification(runs._enqueue('allocation_accounting', self))
+
     @api.model
     def create(self, vals):
         allocation = super().create(vals)
         allocation._update_invoice_payment_status()
+        self.env['kojto.finance.invoices']._refresh_financial_summary()
         return allocation
 
     def write(self, vals):
         result = super().write(vals)
         for allocation in self:
             allocation._update_invoice_payment_status()
+        if {'invoice_id', 'amount', 'transaction_id'}.intersection(vals):
+            self.env['kojto.finance.invoices']._refresh_financial_summary()
         return result
 
     def unlink(self):
@@ -212,6 +220,7 @@ class KojtoFinanceCashflowAllocation(models.Model):
 
         if invoice_ids:
             self._update_invoice_payment_status_after_deletion(invoice_ids)
+            self.env['kojto.finance.invoices']._refresh_financial_summary()
         return result
 
     def _update_invoice_payment_status(self):
@@ -48,6 +48,19 @@ ODOO_TO_DEEP_TRANSLATOR_LANG = {
     # Add more as needed
 }
 
+# Invoice fields the stored financial summary depends on, and the summary fields
+FINANCIAL_SUMMARY_INPUTS = {
+    "custom_vat", "exchange_rate_to_eur", "exchange_rate_to_bgn", "document_in_out_type", "invoice_type",
+    "parent_invoice_id", "force_paid_status", "active",
+    "content", "content_is_redistribution", "content_not_redistribution", "transaction_allocation_ids",
+}
+FINANCIAL_SUMMARY_FIELDS = [
+    "child_document_sum_all_totals", "payable_amount", "paid_amount", "open_amount",
+    "payable_amount_in_eur", "payable_amount_in_bgn", "paid_amount_in_eur", "paid_amount_in_bgn",
+    "open_amount_in_eur", "open_amount_in_bgn", "allocated_amount_in_eur_incoming", "allocated_amount_in_eur_outgoing",
+    "paid",
+]
+
 class KojtoFinanceInvoice(models.Model):
     _name = "kojto.finance.invoices"
     _description = "Kojto Finance Invoice"
@@ -148,7 +161,7 @@ class KojtoFinanceInvoice(models.Model):
     # Additional Invoice Details
     insured = fields.Boolean(string="Insured")
     force_paid_status = fields.Boolean(string="Force Paid Status", default=False)
-    paid = fields.Boolean(string="Paid", compute="_compute_paid", store=True)
+    paid = fields.Boolean(string="Paid", readonly=True, index=True)
     locked = fields.Boolean(string="Locked", default=False)
 
     # Attachments
@@ -177,44 +190,24 @@ class KojtoFinanceInvoice(models.Model):
     invoice_is_in_company_language = fields.Boolean(string="Is Company Language", compute="_compute_invoice_is_in_company_language")
 
     child_document_ids = fields.One2many(comodel_name="kojto.finance.invoices", inverse_name="parent_invoice_id", string="Credit/Debit Notes", compute="_compute_child_document_ids", help="Credit and debit notes linked to this invoice.")
-    child_document_sum_all_totals = fields.Float(string="Child Doc. Totals", compute="_compute_child_document_sum_all_totals", digits=(9, 2))
-    payable_amount = fields.Float(string="Payable Amount", compute="_compute_payable_amount", digits=(9, 2))
-    paid_amount = fields.Float(string="Paid Amount", compute="_compute_paid_amount", digits=(9, 2))
-    open_amount = fields.Float(string="Open Amount", compute="_compute_open_amount", digits=(9, 2))
+
+    # Financial summary, stored and kept current in SQL by the triggers of the
+    # open amount dashboard (kojto_finance_refresh_invoice_summaries)
+    child_document_sum_all_totals = fields.Float(string="Child Doc. Totals", digits=(9, 2), readonly=True)
+    payable_amount = fields.Float(string="Payable Amount", digits=(9, 2), readonly=True)
+    paid_amount = fields.Float(string="Paid Amount", digits=(9, 2), readonly=True)
+    open_amount = fields.Float(string="Open Amount", digits=(9, 2), readonly=True, index=True)
+    payable_amount_in_eur = fields.Float(string="Payable Amount (EUR)", digits=(16, 2), readonly=True)
+    payable_amount_in_bgn = fields.Float(string="Payable Amount (BGN)", digits=(16, 2), readonly=True)
+    paid_amount_in_eur = fields.Float(string="Paid Amount (EUR)", digits=(16, 2), readonly=True)
+    paid_amount_in_bgn = fields.Float(string="Paid Amount (BGN)", digits=(16, 2), readonly=True)
+    open_amount_in_eur = fields.Float(string="Open Amount (EUR)", digits=(16, 2), readonly=True, index=True)
+    open_amount_in_bgn = fields.Float(string="Open Amount (BGN)", digits=(16, 2), readonly=True, index=True)
+    allocated_amount_in_eur_incoming = fields.Float(string="Allocated In (EUR)", digits=(16, 2), readonly=True)
+    allocated_amount_in_eur_outgoing = fields.Float(string="Allocated Out (EUR)", digits=(16, 2), readonly=True)
     base_currency_id = fields.Many2one("res.currency", string="Converted Currency", compute="_compute_base_currency_id")
     total_price_base_currency = fields.Float(string="Total Price Base Currency", compute="_compute_total_price_base_currency", digits=(9, 2))
 
-    @api.depends("force_paid_status", "open_amount")
-    def _compute_paid(self):
-        for invoice in self:
-            invoice.paid = invoice.force_paid_status or invoice.open_amount == 0.0
-
-    @api.depends("transaction_allocation_ids.amount", "transaction_allocation_ids.transaction_direction", "transaction_allocation_ids.transaction_id.exchange_rate_to_bgn", "transaction_allocation_ids.transaction_id.exchange_rate_to_eur", "document_in_out_type", "base_currency_id")
-    def _compute_paid_amount(self):
-        for invoice in self:
-            if invoice.base_currency_id and invoice.base_currency_id.name == 'BGN':
-                sum_incoming = sum(
-                    a.amount * (a.transaction_id.exchange_rate_to_bgn or 1.0)
-                    for a in invoice.transaction_allocation_ids if a.transaction_direction == "incoming"
-                )
-                sum_outgoing = sum(
-                    a.amount * (a.transaction_id.exchange_rate_to_bgn or 1.0)
-                    for a in invoice.transaction_allocation_ids if a.transaction_direction == "outgoing"
-                )
-            else:
-                sum_incoming = sum(
-                    a.amount * (a.transaction_id.exchange_rate_to_eur or 1.0)
-                    for a in invoice.transaction_allocation_ids if a.transaction_direction == "incoming"
-                )
-                sum_outgoing = sum(
-                    a.amount * (a.transaction_id.exchange_rate_to_eur or 1.0)
-                    for a in invoice.transaction_allocation_ids if a.transaction_direction == "outgoing"
-                )
-            if invoice.document_in_out_type == "outgoing":
-                invoice.paid_amount = sum_incoming - sum_outgoing
-            else:  # incoming
-                invoice.paid_amount = sum_outgoing - sum_incoming
-
     @api.depends("parent_invoice_id", "invoice_type")
     def _compute_child_document_ids(self):
         for record in self:
@@ -231,14 +224,11 @@ class KojtoFinanceInvoice(models.Model):
         else:
             return 'EUR', lambda rec: rec.exchange_rate_to_eur or 1.0
 
-    @api.depends("child_document_ids", "child_document_ids.total_price", "base_currency_id")
-    def _compute_child_document_sum_all_totals(self):
-        for record in self:
-            if record.base_currency_id and record.base_currency_id.name == 'BGN':
-                total = sum(child.total_price * (child.exchange_rate_to_bgn or 1.0) for child in record.child_document_ids)
-            else:
-                total = sum(child.total_price * (child.exchange_rate_to_eur or 1.0) for child in record.child_document_ids)
-            record.child_document_sum_all_totals = total
+    @api.model_create_multi
+    def create(self, vals_list):
+        invoices = super().create(vals_list)
+        invoices._refresh_financial_summary()
+        return invoices
 
     def write(self, vals):
         for record in self:
@@ -249,7 +239,7 @@ class KojtoFinanceInvoice(models.Model):
                 raise ValidationError("This document is locked and cannot be updated. Contact accounting department for more information.")
 
             if "content_not_redistribution" not in updated_fields and "subcode_id" not in updated_fields:
-                return super(KojtoFinanceInvoice, self).write(vals)
+                return self._write_and_refresh_financial_summary(vals)
 
             content_subcodes = {}
             main_subcode = vals.get("subcode_id", record.subcode_id.id)
@@ -264,13 +254,34 @@ class KojtoFinanceInvoice(models.Model):
             if main_subcode not in content_subcodes.values():
                 raise ValidationError(f"The subcode of the invoice must match at least one subcode in the content.")
 
-        return super(KojtoFinanceInvoice, self).write(vals)
+        return self._write_and_refresh_financial_summary(vals)
+
+    def _write_and_refresh_financial_summary(self, vals):
+        result = super(KojtoFinanceInvoice, self).write(vals)
+        if FINANCIAL_SUMMARY_INPUTS.intersection(vals):
+            self._refresh_financial_summary()
+        return result
 
     def unlink(self):
         for record in self:
             if record.locked:
                 raise ValidationError("This document is locked and cannot be deleted. Contact accounting department for more information.")
-        return super(KojtoFinanceInvoice, self).unlink()
+        result = super(KojtoFinanceInvoice, self).unlink()
+        self._refresh_financial_summary()
+        return result
+
+    def _refresh_financial_summary(self):
+        """Reload the stored financial summary of all invoices.
+
+        The SQL triggers update it when invoices, contents, allocations or
+        transactions are written, so pending writes are flushed and the cached
+        values dropped. A write can change the summary of other invoices too
+        (the parent of a credit note), hence the whole model is invalidated.
+        """
+        for model_name in ("kojto.finance.invoice.contents", "kojto.finance.cashflow.allocation", "kojto.finance.cashflow"):
+            self.env[model_name].flush_model()
+        self.flush_model()
+        self.invalidate_model(FINANCIAL_SUMMARY_FIELDS)
 
     @api.constrains("consecutive_number")
     def _check_consecutive_number(self):
@@ -679,48 +690,16 @@ class KojtoFinanceInvoice(models.Model):
         if not date or not from_currency or not to_currency:
             return 0.0
 
-        # Convert date to datetime if it's a date object or string
         if isinstance(date, str):
             date = fields.Date.from_string(date)
-
-        # Convert date to datetime for comparison
-        if isinstance(date, date_type) and not isinstance(date, datetime):
-            date_start = datetime.combine(date, time_type.min)
-            date_end = datetime.combine(date, time_type.max)
-        elif isinstance(date, datetime):
-            date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-            date_end = date.replace(hour=23, minute=59, second=59, microsecond=999999)
-        else:
+        if not isinstance(date, date_type):
             return 0.0
 
-        exchange_rate = self.env["kojto.base.currency.exchange"].search(
-            [
-                ("base_currency_id", "=", from_currency.id),
-                ("target_currency_id", "=", to_currency.id),
-                ("datetime", ">=", date_start),
-                ("datetime", "<=", date_end),
-            ],
-            order="datetime DESC",
-            limit=1,
+        exchange_rate = self.env["kojto.base.currency.exchange"].get_rate(
+            from_currency.id, to_currency.id, date, inverse=False, latest=False, same_day=True
         )
 
-        if exchange_rate:
-            return exchange_rate.exchange_rate
-
-        return 0.0
-
-    @api.depends("transaction_allocation_ids", "total_price", "custom_vat", "vat_total", "payable_amount", "paid_amount", "base_currency_id", "child_document_ids", "child_document_ids.total_price", "force_paid_status")
-    def _compute_open_amount(self):
-        for invoice in self:
-            if invoice.invoice_type in ["credit_note", "debit_note"]:
-                invoice.open_amount = 0.0
-                continue
-            # If marked as force paid, open_amount is 0
-            if invoice.force_paid_status:
-                invoice.open_amount = 0.0
-            else:
-                invoice.open_amount = invoice.payable_amount - invoice.paid_amount
-        return {}
+        return exchange_rate or 0.0
 
     @api.onchange("date_issue")
     def _compute_accounting_op_date(self):
@@ -895,7 +874,7 @@ class KojtoFinanceInvoice(models.Model):
             content.refresh_compute_totals()
 
         self._compute_all_totals()
-        self._compute_open_amount()
+        self._refresh_financial_summary()
         return {}
 
     def dropdown_empty(self):
@@ -1515,16 +1494,6 @@ class KojtoFinanceInvoice(models.Model):
             }
         }
 
-    @api.depends("total_price", "child_document_sum_all_totals", "base_currency_id")
-    def _compute_payable_amount(self):
-        for record in self:
-            if record.base_currency_id and record.base_currency_id.name == 'BGN':
-                total_price = record.total_price * (record.exchange_rate_to_bgn or 1.0)
-            else:
-                total_price = record.total_price * (record.exchange_rate_to_eur or 1.0)
-            child_total = record.child_document_sum_all_totals  # Already in base currency
-            record.payable_amount = total_price + child_total
-
     @api.depends("total_price", "base_currency_id", "exchange_rate_to_bgn", "exchange_rate_to_eur")
     def _compute_total_price_base_currency(self):
         for record in self:
@@ -1645,8 +1614,6 @@ class KojtoFinanceInvoice(models.Model):
 
                 self.env['kojto.finance.cashflow.allocation'].create(allocation_vals)
 
-            invoice._compute_paid()
-
         return {
             'type': 'ir.actions.client',
             'tag': 'reload',
@@ -1654,11 +1621,9 @@ class KojtoFinanceInvoice(models.Model):
 
     def recompute_paid(self):
         """Recompute the paid field for selected invoices"""
-        # Recompute dependencies in order: payable_amount -> paid_amount -> open_amount -> paid
-        self._compute_payable_amount()
-        self._compute_paid_amount()
-        self._compute_open_amount()
-        self._compute_paid()
+        self._refresh_financial_summary()
+        self.env.cr.execute("SELECT kojto_finance_refresh_invoice_summaries(%s)", (self.ids,))
+        self.invalidate_model(FINANCIAL_SUMMARY_FIELDS)
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
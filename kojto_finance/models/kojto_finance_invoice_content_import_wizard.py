@@ -299,9 +299,8 @@ class KojtoFinanceInvoiceContentImportWizard(models.TransientModel):
                 self.invoice_id.invalidate_recordset(['content'])
                 self.invoice_id._compute_all_totals()
                 self.invoice_id._compute_invoice_has_invalid_redistribution()
-                self.invoice_id._compute_payable_amount()
                 self.invoice_id._compute_total_price_base_currency()
-                self.invoice_id._compute_open_amount()
+                self.invoice_id._refresh_financial_summary()
 
             return {"type": "ir.actions.act_window_close"}
 
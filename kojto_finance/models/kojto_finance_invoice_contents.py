@@ -82,7 +82,9 @@ class KojtoFinanceInvoiceContents(models.Model):
             if not vals.get('accounting_template_id'):
                 vals['subtype_id'] = False
                 vals['identifier_id'] = False
-        return super().create(vals_list)
+        contents = super().create(vals_list)
+        self.env['kojto.finance.invoices']._refresh_financial_summary()
+        return contents
 
     def write(self, vals):
         """Override write to ensure dependent fields are cleared when template is removed"""
@@ -103,7 +105,15 @@ class KojtoFinanceInvoiceContents(models.Model):
             if not new_template.requires_subtype_id:
                 vals['subtype_id'] = False
 
-        return super().write(vals)
+        result = super().write(vals)
+        if {'invoice_id', 'quantity', 'unit_price', 'pre_vat_total', 'vat_rate', 'is_redistribution'}.intersection(vals):
+            self.env['kojto.finance.invoices']._refresh_financial_summary()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env['kojto.finance.invoices']._refresh_financial_summary()
+        return result
 
     @api.depends("invoice_id.document_in_out_type")
     def _compute_accounting_template_domain(self):
@@ -302,4 +312,9 @@ class KojtoFinanceInvoiceContents(models.Model):
         # Return True to refresh the current view without navigation
         return True
 
+    def action_ai_batch_auto_accounting(self):
+        """Queue AI auto-accounting of the selected content lines in the background."""
+        runs = self.env['kojto.finance.ai.batch.runs']
+        return runs._enqueue_notification(runs._enqueue('content_accounting', self))
+
 
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Shared AI plumbing for the auto-allocation and auto-accounting helpers.
+
+- One OpenAI client per API URL and key for the whole process, over a single
+  pooled HTTP connection, safe to use from several threads.
+- A decision cache keyed by a normalized fingerprint of the record (counterparty,
+  description tokens, amount bucket). It is only consulted when the context has
+  ``ai_decision_cache``, as set by the batch runs, so the buttons on single
+  records keep asking the AI every time.
+"""
+
+import hashlib
+import math
+import re
+import threading
+
+import httpx
+from openai import OpenAI
+
+AI_MAX_CONNECTIONS = 8
+AMOUNT_BUCKETS_PER_DECADE = 10
+WORD_PATTERN = re.compile(r"[^\W\d_]{3,}")
+
+_clients = {}
+_clients_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_ai_client(ai_config):
+    """The process-wide OpenAI client for the given AI configuration."""
+    key = (ai_config['api_url'], ai_config['api_key'])
+    with _clients_lock:
+        if key not in _clients:
+            http_client = httpx.Client(
+                verify=False,
+                limits=httpx.Limits(max_connections=AI_MAX_CONNECTIONS, max_keepalive_connections=AI_MAX_CONNECTIONS),
+            )
+            _clients[key] = OpenAI(base_url=key[0], api_key=key[1], http_client=http_client)
+        return _clients[key]
+
+
+def amount_bucket(amount):
+    """Logarithmic bucket of an amount, about 26% wide, signed."""
+    if not amount:
+        return 0
+    bucket = int(math.floor(math.log10(abs(amount)) * AMOUNT_BUCKETS_PER_DECADE)) + 1000
+    return bucket if amount > 0 else -bucket
+
+
+def description_tokens(*texts):
+    """Sorted distinct words of the texts, upper case, without numbers, dates or references."""
+    tokens = set()
+    for text in texts:
+        tokens.update(token.upper() for token in WORD_PATTERN.findall(text or ""))
+    return sorted(tokens)
+
+
+def decision_fingerprint(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def reset_decision_stats():
+    _local.stats = {'hits': 0, 'misses': 0}
+
+
+def get_decision_stats():
+    return dict(getattr(_local, 'stats', None) or {'hits': 0, 'misses': 0})
+
+
+def cached_decision(env, kind, fingerprint, compute, is_valid=None):
+    """Return the cached decision for the fingerprint, or compute() and cache it.
+
+    A cached value failing is_valid (e.g. a record deleted since) is computed again.
+    Without ``ai_decision_cache`` in the context this is just compute().
+    """
+    if not env.context.get('ai_decision_cache'):
+        return compute()
+    if getattr(_local, 'stats', None) is None:
+        reset_decision_stats()
+    cache = env['kojto.finance.ai.decision.cache']
+    value = cache._get_decision(kind, fingerprint)
+    if value is not None and (is_valid is None or is_valid(value)):
+        _local.stats['hits'] += 1
+        return value
+    _local.stats['misses'] += 1
+    value = compute()
+    if value:
+        cache._set_decision(kind, fingerprint, value)
+    return value
@@ -8,10 +8,9 @@ for cashflow allocations based on historical allocation patterns.
 
 import logging
 import json
-import httpx
-from openai import OpenAI
 from odoo.exceptions import UserError
 from odoo import _
+from .ai_client import get_ai_client, cached_decision, decision_fingerprint, description_tokens, amount_bucket
 
 _logger = logging.getLogger(__name__)
 
@@ -72,7 +71,7 @@ def _get_most_similar_allocation(current_allocation_data, historical_allocations
     # Get AI config from first contact
     ai_config = _get_ai_config(env)
     # Initialize client
-    client = OpenAI(base_url=ai_config['api_url'], api_key=ai_config['api_key'], http_client=httpx.Client(verify=False))
+    client = get_ai_client(ai_config)
 
     valid_ids = [a['id'] for a in historical_allocations_data]
     _logger.info("Sending %d historical allocations to AI for similarity", len(historical_allocations_data))
@@ -225,10 +224,12 @@ def auto_accounting_for_allocation(allocation):
 
         # Step 4: Send to AI to find most similar allocation
         _logger.info("Sending to AI for similarity analysis...")
-        similar_allocation_id = _get_most_similar_allocation(
-            current_allocation,
-            historical_allocations,
-            allocation.env
+        valid_ids = [a['id'] for a in historical_allocations]
+        similar_allocation_id = cached_decision(
+            allocation.env, 'similar_allocation',
+            decision_fingerprint(direction, counterparty_id, allocation.subcode_id.id, description_tokens(allocation.description), amount_bucket(allocation.amount)),
+            lambda: _get_most_similar_allocation(current_allocation, historical_allocations, allocation.env),
+            lambda value: value in valid_ids,
         )
 
         if not similar_allocation_id:
@@ -1,9 +1,9 @@
 import json
 import logging
-import httpx
-from openai import OpenAI
 from odoo.exceptions import UserError
 from odoo import _
+from .ai_client import get_ai_client, cached_decision, decision_fingerprint, description_tokens, amount_bucket
+from .cashflow_candidate_scoring import score_transactions, score_invoices, rank_candidates, sort_by_score, compact_json, transaction_text
 
 _logger = logging.getLogger(__name__)
 
@@ -113,7 +113,7 @@ def _generate_allocation_descriptions(similar_transaction_data, current_transact
     """
     # Get AI config from first contact
     ai_config = _get_ai_config(env)
-    client = OpenAI(base_url=ai_config['api_url'], api_key=ai_config['api_key'], http_client=httpx.Client(verify=False))
+    client = get_ai_client(ai_config)
 
     _logger.info("Requesting AI to generate %d allocation descriptions", num_new_allocations)
     _logger.info("Similar transaction data: %s", json.dumps(similar_transaction_data, ensure_ascii=False, indent=2))
@@ -168,6 +168,16 @@ Consider:
     _logger.error("Failed to generate descriptions after %d attempts", AI_API_RETRIES)
     return None
 
+def _transaction_fingerprint(record):
+    """Normalized fingerprint of a transaction for the decision cache."""
+    return decision_fingerprint(
+        record.bank_account_id.id,
+        record.transaction_direction,
+        record.counterparty_id.id,
+        description_tokens(transaction_text(record)),
+        amount_bucket(record.amount),
+    )
+
 def auto_allocate_for_transaction(self):
     """
     Automatically allocate transactions using AI-driven similarity analysis with DeepSeek-R1:14b via Ollama's OpenAI-compatible API.
@@ -182,7 +192,12 @@ def auto_allocate_for_transaction(self):
         if record.unallocated_amount <= 0:
             return "No auto allocation possible"
 
-        similar_id = find_most_similar_transaction(record)
+        fingerprint = _transaction_fingerprint(record)
+        similar_id = cached_decision(
+            record.env, 'similar_transaction', fingerprint,
+            lambda: find_most_similar_transaction(record),
+            lambda value: _is_similar_candidate(record, self.browse(value)),
+        )
         if not similar_id:
             return "No auto allocation possible"
 
@@ -234,7 +249,7 @@ def auto_allocate_for_transaction(self):
             current_transaction_data = _build_transaction_data(record, include_descriptions=False)
             current_transaction_data['allocations'] = [new_alloc_data]  # Add the new allocation
 
-            # Generate description using AI
+            # Generate description using AI; not cached, it is written from this transaction's own reference
             ai_descriptions = _generate_allocation_descriptions(similar_transaction_data, current_transaction_data, 1, record.env)
             # Fallback to transaction description if AI fails
             transaction_description = getattr(record, 'transaction_data_raw', None) or getattr(record, 'description', '') or ''
@@ -282,17 +297,8 @@ def auto_allocate_for_transaction(self):
                 domain.append(('date_issue', '>=', str(four_months_ago)))
             invoices = self.env['kojto.finance.invoices'].search(domain, order='id desc', limit=100)
 
-            # Prepare lists for ordering
-            description = (getattr(record, 'description', None) or getattr(record, 'transaction_description', '') or '').lower()
-            invoices_with_match = []
-            invoices_without_match = []
-            for inv in invoices:
-                consecutive_number = str(inv.consecutive_number)
-                if consecutive_number and consecutive_number in description:
-                    invoices_with_match.append(inv)
-                else:
-                    invoices_without_match.append(inv)
-            ordered_invoices = invoices_with_match + invoices_without_match
+            # Best matching invoices first (invoice number in the payment text, amount, date)
+            ordered_invoices = sort_by_score(invoices, score_invoices(record, invoices))
 
             # First pass: prepare new allocations data for AI
             remaining_amount = record.unallocated_amount
@@ -375,13 +381,26 @@ def auto_allocate_for_transaction(self):
 
     return "No auto allocation possible"
 
+def _is_fully_allocated(transaction):
+    """Whether the allocations of the transaction sum up to its amount."""
+    return abs(sum(alloc.amount for alloc in transaction.transaction_allocation_ids) - transaction.amount) <= 0.01
+
+def _is_similar_candidate(record, candidate):
+    """Whether candidate may serve as the similar transaction of record, as find_most_similar_transaction picks them."""
+    candidate = candidate.exists()
+    return bool(
+        candidate
+        and candidate.id != record.id
+        and candidate.bank_account_id == record.bank_account_id
+        and candidate.transaction_direction == record.transaction_direction
+        and _is_fully_allocated(candidate)
+    )
+
 def find_most_similar_transaction(record):
     """
     Find the historical transaction most similar to the current transaction using DeepSeek-R1:14b via Ollama's OpenAI-compatible API.
     Returns only the ID of the most similar transaction.
     """
-    # Get AI config from first contact
-    ai_config = _get_ai_config(record.env)
     # Fetch historical transactions with same counterparty (no amount restrictions)
     transactions = record.search([
         ('bank_account_id', '=', record.bank_account_id.id),
@@ -409,41 +428,25 @@ def find_most_similar_transaction(record):
     expected_ptype = "cashflow_in" if record.transaction_direction == "incoming" else "cashflow_out"
 
     # Filter transactions where sum of allocations equals transaction amount
-    transactions_data = []
-    transactions_data_no_accounting = []
+    candidates = record.browse()
+    candidates_no_accounting = record.browse()
     for t in transactions:
-        alloc_sum = sum(alloc.amount for alloc in t.transaction_allocation_ids)
-        if abs(alloc_sum - t.amount) <= 0.01:
-            transaction_data = _build_transaction_data(t)
+        if _is_fully_allocated(t):
             # Check if at least one allocation has accounting template with correct primary_type
-            has_correct_accounting = any(
-                alloc.get('accounting_template_id') and
-                record.env['kojto.finance.accounting.templates'].browse(alloc.get('accounting_template_id')).primary_type == expected_ptype
-                for alloc in transaction_data['allocations']
-            )
-            # Check if has any accounting fields (for fallback)
-            has_accounting_fields = any(
-                alloc.get('accounting_template_id') or
-                alloc.get('accounting_ref_number') or
-                alloc.get('subtype_id')
-                for alloc in transaction_data['allocations']
-            )
-            if has_correct_accounting:
-                transactions_data.append(transaction_data)
-            elif has_accounting_fields:
-                transactions_data_no_accounting.append(transaction_data)
+            if any(alloc.accounting_template_id.primary_type == expected_ptype for alloc in t.transaction_allocation_ids):
+                candidates |= t
             else:
-                transactions_data_no_accounting.append(transaction_data)
+                candidates_no_accounting |= t
 
     # If we have transactions with correct accounting templates, use only those
     # Otherwise, fall back to transactions with any accounting fields (or none)
-    if not transactions_data:
-        transactions_data = transactions_data_no_accounting
-        _logger.info("No historical transactions with correct primary_type (%s) found, using %d transactions as fallback", expected_ptype, len(transactions_data))
+    if not candidates:
+        candidates = candidates_no_accounting
+        _logger.info("No historical transactions with correct primary_type (%s) found, using %d transactions as fallback", expected_ptype, len(candidates))
     else:
-        _logger.info("Found %d historical transactions with correct primary_type (%s) (excluding %d without)", len(transactions_data), expected_ptype, len(transactions_data_no_accounting))
+        _logger.info("Found %d historical transactions with correct primary_type (%s) (excluding %d without)", len(candidates), expected_ptype, len(candidates_no_accounting))
 
-    if not transactions_data:
+    if not candidates:
         _logger.info("No valid historical transactions for transaction %s", record.id)
         # Try one more time with even more relaxed criteria - look for any transactions with similar amounts
         _logger.info("Trying relaxed search for transaction %s with similar amounts", record.id)
@@ -452,7 +455,7 @@ def find_most_similar_transaction(record):
         amount_min = record.amount * 0.33  # -67% (allowing for ±200% range)
         amount_max = record.amount * 3.0   # +200%
 
-        relaxed_transactions = record.search([
+        candidates = record.search([
             ('bank_account_id', '=', record.bank_account_id.id),
             ('transaction_direction', '=', record.transaction_direction),
             ('amount', '>=', amount_min),
@@ -460,26 +463,28 @@ def find_most_similar_transaction(record):
             ('id', '!=', record.id)
         ], order='id desc', limit=10)
 
-        for t in relaxed_transactions:
-            transaction_data = _build_transaction_data(t)
-            transactions_data.append(transaction_data)
-
-        if transactions_data:
-            _logger.info("Found %d transactions with relaxed criteria (amount range %.2f - %.2f)", len(transactions_data), amount_min, amount_max)
+        if candidates:
+            _logger.info("Found %d transactions with relaxed criteria (amount range %.2f - %.2f)", len(candidates), amount_min, amount_max)
         else:
             _logger.info("No transactions found even with relaxed criteria")
             return None
 
+    # Rank locally; a clear match does not need the AI
+    confident_id, top_ids = rank_candidates(candidates.ids, score_transactions(record, candidates))
+    if confident_id:
+        _logger.info("Most similar transaction for %s by local score: %s", record.id, confident_id)
+        return confident_id
+
+    transactions_data = [_build_transaction_data(t) for t in record.browse(top_ids)]
     current_transaction = _build_transaction_data(record)
 
-    # Print the number of transactions and the JSON sent
-    valid_ids = [t['id'] for t in transactions_data]
-    _logger.info("Sending %d historical transactions to AI for similarity:", len(transactions_data))
-    _logger.info("Historical transactions JSON: %s", json.dumps(transactions_data, ensure_ascii=False, indent=2))
-    _logger.info("Current transaction JSON: %s", json.dumps(current_transaction, ensure_ascii=False, indent=2))
+    valid_ids = top_ids
+    _logger.info("Sending %d best ranked historical transactions to AI for similarity: %s", len(transactions_data), valid_ids)
 
+    # Get AI config from first contact
+    ai_config = _get_ai_config(record.env)
     # Initialize client
-    client = OpenAI(base_url=ai_config['api_url'], api_key=ai_config['api_key'], http_client=httpx.Client(verify=False))
+    client = get_ai_client(ai_config)
 
     for attempt in range(AI_API_RETRIES):
         try:
@@ -489,8 +494,8 @@ def find_most_similar_transaction(record):
                     "Valid transaction IDs: " + str(valid_ids) + ". "
                     "If you output anything else, it will be ignored. Do NOT explain, do NOT describe, do NOT output markdown, do NOT output any text before or after the JSON."
                 )},
-                {"role": "user", "content": f"Current transaction:\n{json.dumps(current_transaction, ensure_ascii=False, indent=2)}"},
-                {"role": "user", "content": f"Historical transactions:\n{json.dumps(transactions_data, ensure_ascii=False, indent=2)}"},
+                {"role": "user", "content": f"Current transaction:\n{compact_json(current_transaction)}"},
+                {"role": "user", "content": f"Historical transactions:\n{compact_json(transactions_data)}"},
                 {"role": "user", "content": (
                     "Find the most similar transaction based on:\n"
                     "1. Amount similarity (prefer transactions with similar amounts, especially for small amounts like bank charges)\n"
@@ -515,7 +520,7 @@ def find_most_similar_transaction(record):
             response_text = response.choices[0].message.content or ""
             try:
                 most_similar_id = json.loads(response_text)['most_similar_transaction_id']
-                if isinstance(most_similar_id, int) and most_similar_id in {t['id'] for t in transactions_data}:
+                if isinstance(most_similar_id, int) and most_similar_id in valid_ids:
                     _logger.info("Most similar transaction for %s: %s", record.id, most_similar_id)
                     return most_similar_id
                 _logger.error("Invalid transaction ID: %s", most_similar_id)
@@ -543,33 +548,40 @@ def find_most_suitable_invoice(self):
             ('counterparty_id', '=', record.counterparty_id.id)
         ], order='id desc', limit=100)
 
+        if not invoices:
+            _logger.info("No open invoices for transaction %s", record.id)
+            return None
+
+        # Rank locally; a clear match (invoice number in the payment text, same amount) does not need the AI
+        confident_id, top_ids = rank_candidates(invoices.ids, score_invoices(record, invoices))
+        if confident_id and invoices.browse(confident_id).open_amount >= record.unallocated_amount - 0.01:
+            _logger.info("Most suitable invoice for %s by local score: %s", record.id, confident_id)
+            return confident_id
+        invoices = invoices.browse(top_ids)
+
         invoices_data = [{
-                    'id': inv.id,
-                    'number': inv.consecutive_number,
-                    'date': str(inv.date_issue) if inv.date_issue else "",
-                    'open_amount': inv.open_amount,
-                    'total_price': inv.total_price,
+            'id': inv.id,
+            'number': inv.consecutive_number,
+            'date': str(inv.date_issue) if inv.date_issue else "",
+            'open_amount': inv.open_amount,
+            'total_price': inv.total_price,
             'counterparty': inv.counterparty_id.display_name if inv.counterparty_id else None,
             'direction': inv.document_in_out_type
         } for inv in invoices]
 
-        if not invoices_data:
-            _logger.info("No open invoices for transaction %s", record.id)
-            return None
-
         current_transaction = _build_transaction_data(record)
 
         # Get AI config from first contact
         ai_config = _get_ai_config(self.env)
         # Initialize client
-        client = OpenAI(base_url=ai_config['api_url'], api_key=ai_config['api_key'], http_client=httpx.Client(verify=False))
+        client = get_ai_client(ai_config)
 
         for attempt in range(AI_API_RETRIES):
             try:
                 messages = [
                     {"role": "system", "content": "Output ONLY a valid JSON object with a single field 'most_suitable_invoice_id' containing the ID (integer) of the most suitable invoice. No other text or fields."},
-                    {"role": "user", "content": f"Current transaction:\n{json.dumps(current_transaction, ensure_ascii=False, indent=2)}"},
-                    {"role": "user", "content": f"Open invoices:\n{json.dumps(invoices_data, ensure_ascii=False, indent=2)}"},
+                    {"role": "user", "content": f"Current transaction:\n{compact_json(current_transaction)}"},
+                    {"role": "user", "content": f"Open invoices:\n{compact_json(invoices_data)}"},
                     {"role": "user", "content": "Identify the open invoice most suitable for allocation to the current transaction based on matching amount to unallocated_amount, description keywords, partner, date proximity, etc. Prefer invoices where open_amount >= unallocated_amount. Output only the JSON object with 'most_suitable_invoice_id'."}
                 ]
 
@@ -0,0 +1,141 @@
+"""
+Local ranking of auto-allocation candidates.
+
+Historical transactions and open invoices are scored against a bank transaction
+with array arithmetic on amounts, counterparties, IBANs, text tokens and invoice
+numbers. Clear matches are taken directly; only ambiguous cases go to the AI,
+and then only with the best few candidates.
+"""
+import json
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w{3,}")
+IBAN_PATTERN = re.compile(r"[A-Z]{2}\d{2}[A-Z0-9]{11,30}")
+NUMBER_PATTERN = re.compile(r"\d{4,}")
+
+# Weights of the score parts, each part being between 0 and 1
+TRANSACTION_WEIGHTS = {"amount": 0.35, "counterparty": 0.3, "iban": 0.15, "tokens": 0.2}
+INVOICE_WEIGHTS = {"number": 0.45, "amount": 0.35, "counterparty": 0.1, "date": 0.1}
+INVOICE_DATE_RANGE_DAYS = 120
+
+# The best candidate is taken without the AI when it scores at least CONFIDENT_SCORE
+# and CONFIDENT_MARGIN more than the runner-up; otherwise the AI gets the best AI_TOP_K
+CONFIDENT_SCORE = 0.75
+CONFIDENT_MARGIN = 0.15
+AI_TOP_K = 5
+
+
+def transaction_text(record):
+    """Free text of a bank transaction: the :86 block when present, plus description and references."""
+    raw = record.transaction_data_raw or ""
+    text_86 = raw[raw.find(":86:") + 4:] if ":86:" in raw else raw
+    return " ".join(filter(None, [text_86, record.description, record.information, record.related_reference]))
+
+
+def text_tokens(text):
+    return {token.upper() for token in TOKEN_PATTERN.findall(text or "")}
+
+
+def text_ibans(text):
+    return set(IBAN_PATTERN.findall((text or "").upper().replace(" ", "")))
+
+
+def amount_proximity(amounts, target):
+    """1 for equal amounts, falling linearly to 0 at a relative difference of 100%."""
+    amounts = np.asarray(amounts, dtype=float)
+    scale = np.maximum(np.maximum(np.abs(amounts), abs(target)), 0.01)
+    return np.clip(1.0 - np.abs(amounts - target) / scale, 0.0, 1.0)
+
+
+def token_overlap(candidate_token_sets, tokens):
+    """Jaccard similarity of each candidate's tokens with the given tokens."""
+    return np.array([
+        len(candidate_tokens & tokens) / len(candidate_tokens | tokens) if candidate_tokens or tokens else 0.0
+        for candidate_tokens in candidate_token_sets
+    ], dtype=float)
+
+
+def score_transactions(record, candidates):
+    """Similarity of each historical transaction in candidates to record, in candidates order."""
+    if not candidates:
+        return np.zeros(0)
+    text = transaction_text(record)
+    tokens = text_tokens(text)
+    ibans = text_ibans(text)
+    if record.counterparty_bank_account_id.IBAN:
+        ibans.add(record.counterparty_bank_account_id.IBAN)
+
+    counterparty = np.array([
+        bool(record.counterparty_id) and c.counterparty_id == record.counterparty_id for c in candidates
+    ], dtype=float)
+    iban = np.array([
+        bool(ibans) and (
+            c.counterparty_bank_account_id.IBAN in ibans
+            or bool(text_ibans(transaction_text(c)) & ibans)
+        )
+        for c in candidates
+    ], dtype=float)
+    return (
+        TRANSACTION_WEIGHTS["amount"] * amount_proximity(candidates.mapped("amount"), record.amount)
+        + TRANSACTION_WEIGHTS["counterparty"] * counterparty
+        + TRANSACTION_WEIGHTS["iban"] * iban
+        + TRANSACTION_WEIGHTS["tokens"] * token_overlap([text_tokens(transaction_text(c)) for c in candidates], tokens)
+    )
+
+
+def score_invoices(record, invoices):
+    """Suitability of each open invoice for the unallocated amount of record, in invoices order."""
+    if not invoices:
+        return np.zeros(0)
+    numbers = set(NUMBER_PATTERN.findall(transaction_text(record)))
+    numbers |= {number.lstrip("0") for number in numbers}
+
+    number = np.array([
+        bool(inv.consecutive_number) and (inv.consecutive_number in numbers or inv.consecutive_number.lstrip("0") in numbers)
+        for inv in invoices
+    ], dtype=float)
+    counterparty = np.array([
+        bool(record.counterparty_id) and inv.counterparty_id == record.counterparty_id for inv in invoices
+    ], dtype=float)
+    date = np.zeros(len(invoices))
+    if record.date_value:
+        days = np.array([
+            abs((record.date_value - inv.date_issue).days) if inv.date_issue else INVOICE_DATE_RANGE_DAYS
+            for inv in invoices
+        ], dtype=float)
+        date = np.clip(1.0 - days / INVOICE_DATE_RANGE_DAYS, 0.0, 1.0)
+    return (
+        INVOICE_WEIGHTS["number"] * number
+        + INVOICE_WEIGHTS["amount"] * amount_proximity(invoices.mapped("open_amount"), record.unallocated_amount)
+        + INVOICE_WEIGHTS["counterparty"] * counterparty
+        + INVOICE_WEIGHTS["date"] * date
+    )
+
+
+def rank_candidates(ids, scores):
+    """Return (confident id or None, ids of the best AI_TOP_K candidates, best first)."""
+    if not len(ids):
+        return None, []
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    best = scores[order[0]]
+    runner_up = scores[order[1]] if len(order) > 1 else 0.0
+    confident_id = ids[order[0]] if best >= CONFIDENT_SCORE and best - runner_up >= CONFIDENT_MARGIN else None
+    return confident_id, [ids[k] for k in order[:AI_TOP_K]]
+
+
+def sort_by_score(records, scores):
+    """The records ordered by descending score, ties kept in their original order."""
+    return records.browse([records.ids[k] for k in np.argsort(-np.asarray(scores), kind="stable")])
+
+
+def compact_json(data):
+    """JSON for AI prompts: no indentation, no spaces, empty values left out."""
+    def strip(value):
+        if isinstance(value, dict):
+            return {k: strip(v) for k, v in value.items() if v is not None and v != "" and v != []}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+    return json.dumps(strip(data), ensure_ascii=False, separators=(",", ":"))
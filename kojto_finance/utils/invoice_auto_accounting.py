@@ -1,9 +1,8 @@
 import json
 import logging
-import httpx
-from openai import OpenAI
 from odoo.exceptions import UserError
 from odoo import _
+from .ai_client import get_ai_client, cached_decision, decision_fingerprint, description_tokens, amount_bucket
 
 _logger = logging.getLogger(__name__)
 
@@ -123,10 +122,12 @@ def auto_accounting_for_content(content_line):
     current_content = _build_invoice_content_data(content_line)
 
     # Step 4: Send to AI to find most similar content
-    similar_content_id = _get_most_similar_content(
-        current_content,
-        historical_contents,
-        content_line.env
+    valid_ids = [c['id'] for c in historical_contents]
+    similar_content_id = cached_decision(
+        content_line.env, 'similar_content',
+        decision_fingerprint(direction, counterparty_id, description_tokens(content_line.name), amount_bucket(content_line.pre_vat_total)),
+        lambda: _get_most_similar_content(current_content, historical_contents, content_line.env),
+        lambda value: value in valid_ids,
     )
 
     if not similar_content_id:
@@ -165,7 +166,7 @@ def _get_most_similar_content(current_content, historical_contents, env):
     # Get AI config from first contact
     ai_config = _get_ai_config(env)
     # Initialize client
-    client = OpenAI(base_url=ai_config['api_url'], api_key=ai_config['api_key'], http_client=httpx.Client(verify=False))
+    client = get_ai_client(ai_config)
 
     valid_ids = [c['id'] for c in historical_contents]
     _logger.info("Sending %d historical contents to AI for similarity", len(historical_contents))
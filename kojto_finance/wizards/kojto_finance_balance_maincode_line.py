@@ -87,3 +87,8 @@ class KojtoFinanceBalanceMaincodeLine(models.TransientModel):
         self.ensure_one()
         from .utils.kojto_finance_balance_wizard_actions import action_export_breakdown_to_excel
         return action_export_breakdown_to_excel(self.sudo())
+
+    def _xlsx_export_breakdown(self, xlsx, date_from=None, date_to=None, **params):
+        """Write the breakdown sheets into the streaming export"""
+        from .utils.kojto_finance_balance_wizard_actions import write_breakdown_workbook
+        return write_breakdown_workbook(self.sudo(), xlsx, date_from, date_to)
@@ -13,7 +13,7 @@ from odoo import models, fields, api
 from odoo.exceptions import UserError
 from datetime import datetime
 from .utils.kojto_finance_balance_wizard_calculations import calculate_subcode_balance
-from .utils.kojto_finance_balance_wizard_actions import action_export_balance_to_excel
+from .utils.kojto_finance_balance_wizard_actions import action_export_balance_to_excel, write_balance_workbook
 
 
 class KojtoFinanceBalanceWizard(models.TransientModel):
@@ -147,6 +147,10 @@ class KojtoFinanceBalanceWizard(models.TransientModel):
         """Export all balance data to Excel with separate sheets for each consolidation level"""
         return action_export_balance_to_excel(self)
 
+    def _xlsx_export_balance(self, xlsx, **params):
+        """Write the balance sheets into the streaming export"""
+        return write_balance_workbook(self, xlsx)
+
     def action_save_balance(self):
         """Save the current balance calculation (same as export but without creating file)"""
         self.ensure_one()
@@ -5,11 +5,10 @@ Kojto Finance Balance Wizard - Actions
 Contains action methods for the wizard.
 """
 
+from odoo import fields
 from odoo.exceptions import UserError
+from odoo.addons.kojto_base.utils.kojto_base_xlsx_export import iter_records, xlsx_export_action
 from datetime import datetime
-import io
-import base64
-import xlsxwriter
 
 
 def action_search_activities(wizard):
@@ -212,6 +211,24 @@ def action_view_missing_subcodes(wizard):
     }
 
 
+BALANCE_COLUMNS = [
+    ('Pre-VAT Tot. (OUT)', 18, 'currency'), ('Pre-VAT Tot. (IN)', 18, 'currency'),
+    ('Invoiceless Revenue', 18, 'currency'), ('Invoiceless Expenses', 18, 'currency'),
+    ('TT Hours', 18, 'currency'), ('TT Total', 18, 'currency'),
+    ('Assets Total', 18, 'currency'), ('Result', 18, 'currency'),
+]
+BALANCE_FIELDS = [
+    'outgoing_pre_vat_total', 'incoming_pre_vat_total', 'invoiceless_revenue', 'invoiceless_expenses',
+    'time_tracking_hours', 'time_tracking_total', 'assets_total', 'result',
+]
+BREAKDOWN_FILENAME_PREFIXES = {
+    'kojto.finance.balance.company.line': 'Company',
+    'kojto.finance.balance.maincode.line': 'Maincode',
+    'kojto.finance.balance.code.line': 'Code',
+    'kojto.finance.balance.subcode.line': 'Subcode',
+}
+
+
 def action_export_balance_to_excel(wizard):
     """Export all balance data to Excel with separate sheets for each consolidation level"""
     wizard.ensure_one()
@@ -219,155 +236,44 @@ def action_export_balance_to_excel(wizard):
     if not wizard.subcode_balance_line_ids:
         raise UserError("No data to export. Please compute the balance first.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-
-    currency = wizard.currency_id or wizard.env.ref('base.EUR')
-
-    # Helper function to write balance lines to a worksheet
-    def write_balance_sheet(worksheet, lines, headers, name_cols):
-        """Write balance lines to worksheet"""
-        # Write headers
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data
-        for row, line in enumerate(lines, start=1):
-            col = 0
-            for name_col in name_cols:
-                worksheet.write(row, col, getattr(line, name_col, '') or '')
-                col += 1
-            worksheet.write(row, col, line.outgoing_pre_vat_total or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.incoming_pre_vat_total or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.invoiceless_revenue or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.invoiceless_expenses or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.time_tracking_hours or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.time_tracking_total or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.assets_total or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.result or 0.0, currency_format)
-
-        # Write totals row
-        if lines:
-            total_row = len(lines) + 1
-            # Write TOTAL label in first column
-            if name_cols:
-                worksheet.write(total_row, 0, 'TOTAL', bold_format)
-                start_col = len(name_cols)
-            else:
-                worksheet.write(total_row, 0, 'TOTAL', bold_format)
-                start_col = 0
-            worksheet.write(total_row, start_col, sum(lines.mapped('outgoing_pre_vat_total')), currency_format)
-            worksheet.write(total_row, start_col + 1, sum(lines.mapped('incoming_pre_vat_total')), currency_format)
-            worksheet.write(total_row, start_col + 2, sum(lines.mapped('invoiceless_revenue')), currency_format)
-            worksheet.write(total_row, start_col + 3, sum(lines.mapped('invoiceless_expenses')), currency_format)
-            worksheet.write(total_row, start_col + 4, sum(lines.mapped('time_tracking_hours')), currency_format)
-            worksheet.write(total_row, start_col + 5, sum(lines.mapped('time_tracking_total')), currency_format)
-            worksheet.write(total_row, start_col + 6, sum(lines.mapped('assets_total')), currency_format)
-            worksheet.write(total_row, start_col + 7, sum(lines.mapped('result')), currency_format)
-
-    # Sheet 1: Company Balance
+    return xlsx_export_action(wizard, 'balance')
+
+
+def write_balance_workbook(wizard, xlsx):
+    """Write the balance sheets of the wizard, returns the filename"""
+
+    def write_balance_sheet(sheet_name, lines, name_columns, name_fields):
+        """Write balance lines with a totals row"""
+        xlsx.add_sheet(sheet_name, name_columns + BALANCE_COLUMNS)
+        for line in lines:
+            xlsx.write_row([line[name] for name in name_fields] + [line[name] or 0.0 for name in BALANCE_FIELDS])
+        xlsx.write_row(
+            ['TOTAL'] + [''] * (len(name_fields) - 1) + [sum(lines.mapped(name)) for name in BALANCE_FIELDS],
+            bold=True,
+        )
+
+    # Sheet 1: Company Balance (only one row - no totals row needed)
     if wizard.company_balance_line_ids:
-        worksheet = workbook.add_worksheet('Company Balance')
-        headers = [
-            'Pre-VAT Tot. (OUT)', 'Pre-VAT Tot. (IN)',
-            'Invoiceless Revenue', 'Invoiceless Expenses',
-            'TT Hours', 'TT Total', 'Assets Total', 'Result'
-        ]
-        # Write headers
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data (only one row for company balance - no totals row needed)
+        xlsx.add_sheet('Company Balance', BALANCE_COLUMNS)
         line = wizard.company_balance_line_ids[0]
-        worksheet.write(1, 0, line.outgoing_pre_vat_total or 0.0, currency_format)
-        worksheet.write(1, 1, line.incoming_pre_vat_total or 0.0, currency_format)
-        worksheet.write(1, 2, line.invoiceless_revenue or 0.0, currency_format)
-        worksheet.write(1, 3, line.invoiceless_expenses or 0.0, currency_format)
-        worksheet.write(1, 4, line.time_tracking_hours or 0.0, currency_format)
-        worksheet.write(1, 5, line.time_tracking_total or 0.0, currency_format)
-        worksheet.write(1, 6, line.assets_total or 0.0, currency_format)
-        worksheet.write(1, 7, line.result or 0.0, currency_format)
-
-        worksheet.set_column(0, 7, 18)  # Financial columns
+        xlsx.write_row([line[name] or 0.0 for name in BALANCE_FIELDS])
 
     # Sheet 2: Main Code Balance
     if wizard.maincode_balance_line_ids:
-        worksheet = workbook.add_worksheet('Main Code Balance')
-        headers = [
-            'Main Code', 'Description',
-            'Pre-VAT Tot. (OUT)', 'Pre-VAT Tot. (IN)',
-            'Invoiceless Revenue', 'Invoiceless Expenses',
-            'TT Hours', 'TT Total', 'Assets Total', 'Result'
-        ]
-        write_balance_sheet(worksheet, wizard.maincode_balance_line_ids, headers, ['maincode', 'description'])
-        worksheet.set_column(0, 0, 15)  # Main Code
-        worksheet.set_column(1, 1, 30)  # Description
-        worksheet.set_column(2, 9, 18)  # Financial columns
+        write_balance_sheet('Main Code Balance', wizard.maincode_balance_line_ids,
+                            [('Main Code', 15, None), ('Description', 30, None)], ['maincode', 'description'])
 
     # Sheet 3: Code Balance
     if wizard.code_balance_line_ids:
-        worksheet = workbook.add_worksheet('Code Balance')
-        headers = [
-            'Code Name', 'Description',
-            'Pre-VAT Tot. (OUT)', 'Pre-VAT Tot. (IN)',
-            'Invoiceless Revenue', 'Invoiceless Expenses',
-            'TT Hours', 'TT Total', 'Assets Total', 'Result'
-        ]
-        write_balance_sheet(worksheet, wizard.code_balance_line_ids, headers, ['code_name', 'description'])
-        worksheet.set_column(0, 0, 30)  # Code Name
-        worksheet.set_column(1, 1, 30)  # Description
-        worksheet.set_column(2, 9, 18)  # Financial columns
+        write_balance_sheet('Code Balance', wizard.code_balance_line_ids,
+                            [('Code Name', 30, None), ('Description', 30, None)], ['code_name', 'description'])
 
     # Sheet 4: Subcode Balance
     if wizard.subcode_balance_line_ids:
-        worksheet = workbook.add_worksheet('Subcode Balance')
-        headers = [
-            'Subcode Name', 'Description',
-            'Pre-VAT Tot. (OUT)', 'Pre-VAT Tot. (IN)',
-            'Invoiceless Revenue', 'Invoiceless Expenses',
-            'TT Hours', 'TT Total', 'Assets Total', 'Result'
-        ]
-        write_balance_sheet(worksheet, wizard.subcode_balance_line_ids, headers, ['subcode_name', 'description'])
-        worksheet.set_column(0, 0, 30)  # Subcode Name
-        worksheet.set_column(1, 1, 30)  # Description
-        worksheet.set_column(2, 9, 18)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Create attachment
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    filename = f"Subcode_Balance_{wizard.date_from}_{wizard.date_to}.xlsx"
-
-    attachment = wizard.env['ir.attachment'].create({
-        'name': filename,
-        'type': 'binary',
-        'datas': file_data_base64,
-        'res_model': wizard._name,
-        'res_id': wizard.id,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
+        write_balance_sheet('Subcode Balance', wizard.subcode_balance_line_ids,
+                            [('Subcode Name', 30, None), ('Description', 30, None)], ['subcode_name', 'description'])
 
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+    return f"Subcode_Balance_{wizard.date_from}_{wizard.date_to}.xlsx"
 
 
 def action_export_breakdown_to_excel(balance_line):
@@ -381,18 +287,9 @@ def action_export_breakdown_to_excel(balance_line):
 
     # Determine model name and filename prefix based on the balance line type
     model_name = balance_line._name
-    filename_prefix_map = {
-        'kojto.finance.balance.company.line': 'Company',
-        'kojto.finance.balance.maincode.line': 'Maincode',
-        'kojto.finance.balance.code.line': 'Code',
-        'kojto.finance.balance.subcode.line': 'Subcode',
-    }
-
-    if model_name not in filename_prefix_map:
+    if model_name not in BREAKDOWN_FILENAME_PREFIXES:
         raise UserError(f"Cannot export: Unsupported model type {model_name}.")
 
-    filename_prefix = filename_prefix_map[model_name]
-
     # Use browse with sudo to read the record without triggering validation
     record = balance_line.env[model_name].sudo().browse(record_id)
     if not record.exists():
@@ -490,8 +387,6 @@ def action_export_breakdown_to_excel(balance_line):
     if not date_from or not date_to:
         raise UserError("Cannot export: Date range is required.")
 
-    # Import get_breakdown_records
-    from .kojto_finance_balance_wizard_calculations import get_breakdown_records
     from datetime import datetime, date
 
     # Normalize dates - convert strings to date objects if needed
@@ -519,6 +414,21 @@ def action_export_breakdown_to_excel(balance_line):
     elif not isinstance(date_to, date):
         raise UserError(f"Invalid date type for date_to: {type(date_to)}")
 
+    # The workbook is written in the download request, which has no wizard context
+    return xlsx_export_action(
+        record, 'breakdown',
+        date_from=date_from.strftime('%Y-%m-%d'), date_to=date_to.strftime('%Y-%m-%d'),
+    )
+
+
+def write_breakdown_workbook(record, xlsx, date_from, date_to):
+    """Write the breakdown sheets of a balance line for the given dates, returns the filename"""
+    from .kojto_finance_balance_wizard_calculations import get_breakdown_records
+
+    date_from = fields.Date.to_date(date_from)
+    date_to = fields.Date.to_date(date_to)
+    model_name = record._name
+
     # Convert dates to datetime for proper comparison
     datetime_from = datetime.combine(date_from, datetime.min.time())
     datetime_to = datetime.combine(date_to, datetime.max.time())
@@ -529,208 +439,67 @@ def action_export_breakdown_to_excel(balance_line):
     maincode_ids = None
 
     if model_name == 'kojto.finance.balance.subcode.line':
-        if record.sudo().subcode_id:
-            subcode_ids = [record.sudo().subcode_id.id]
+        if record.subcode_id:
+            subcode_ids = [record.subcode_id.id]
     elif model_name == 'kojto.finance.balance.code.line':
-        if record.sudo().code_id:
-            code_ids = [record.sudo().code_id.id]
+        if record.code_id:
+            code_ids = [record.code_id.id]
     elif model_name == 'kojto.finance.balance.maincode.line':
-        if record.sudo().maincode_id:
-            maincode_ids = [record.sudo().maincode_id.id]
+        if record.maincode_id:
+            maincode_ids = [record.maincode_id.id]
     # For company balance line, all filters remain None
 
-    # Get breakdown records using get_breakdown_records
     breakdown = get_breakdown_records(
         record.env, date_from, date_to, datetime_from, datetime_to,
         subcode_ids=subcode_ids, code_ids=code_ids, maincode_ids=maincode_ids
     )
 
-    # Extract record IDs from the recordsets
-    outgoing_ids = breakdown['outgoing_pre_vat_total'].ids if breakdown['outgoing_pre_vat_total'] else []
-    incoming_ids = breakdown['incoming_pre_vat_total'].ids if breakdown['incoming_pre_vat_total'] else []
-    revenue_ids = breakdown['invoiceless_revenue'].ids if breakdown['invoiceless_revenue'] else []
-    expenses_ids = breakdown['invoiceless_expenses'].ids if breakdown['invoiceless_expenses'] else []
-    tt_ids = breakdown['hr_time_tracking'].ids if breakdown['hr_time_tracking'] else []
-    assets_ids = breakdown['assets_works'].ids if breakdown['assets_works'] else []
-
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-
-    # Define formats
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    text_format = workbook.add_format({'text_wrap': True})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-
-    # Helper function to write records to worksheet
-    def write_invoice_contents_sheet(worksheet, record_ids, headers):
-        """Write invoice contents records to worksheet"""
-        if not record_ids:
-            worksheet.write(0, 0, 'No data available')
+    def write_sheet(sheet_name, records, columns, row_values):
+        """Write the records in chunks, or a note if there are none"""
+        if not records:
+            xlsx.add_sheet(sheet_name, [])
+            xlsx.write_message('No data available')
             return
+        xlsx.add_sheet(sheet_name, columns)
+        for rec in iter_records(records.sudo()):
+            xlsx.write_row(row_values(rec))
 
-        # Write header row
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Read records
-        records = record.env['kojto.finance.invoice.contents'].sudo().browse(record_ids)
-        for row_idx, rec in enumerate(records, start=1):
-            worksheet.write(row_idx, 0, rec.name or '', text_format)
-            worksheet.write(row_idx, 1, rec.pre_vat_total or 0.0, currency_format)
-            worksheet.write(row_idx, 2, rec.invoice_id.name if rec.invoice_id else '', text_format)
-            worksheet.write(row_idx, 3, rec.subcode_id.subcode if rec.subcode_id else '', text_format)
-
-        # Auto-adjust column widths
-        worksheet.set_column(0, 0, 40)  # Name
-        worksheet.set_column(1, 1, 18)  # Pre-VAT Total
-        worksheet.set_column(2, 2, 20)  # Invoice
-        worksheet.set_column(3, 3, 15)  # Subcode
-
-    def write_cash_allocation_sheet(worksheet, record_ids, headers):
-        """Write cash allocation records to worksheet"""
-        if not record_ids:
-            worksheet.write(0, 0, 'No data available')
-            return
+    def invoice_contents_values(rec):
+        return [rec.name, rec.pre_vat_total or 0.0, rec.invoice_id.name, rec.subcode_id.subcode]
 
-        # Write header row
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Read records
-        records = record.env['kojto.finance.cashflow.allocation'].sudo().browse(record_ids)
-        for row_idx, rec in enumerate(records, start=1):
-            worksheet.write(row_idx, 0, rec.description or '', text_format)
-            worksheet.write(row_idx, 1, rec.amount or 0.0, currency_format)
-            worksheet.write(row_idx, 2, rec.transaction_id.name if rec.transaction_id else '', text_format)
-            worksheet.write(row_idx, 3, rec.subcode_id.subcode if rec.subcode_id else '', text_format)
-
-        # Auto-adjust column widths
-        worksheet.set_column(0, 0, 40)  # Description
-        worksheet.set_column(1, 1, 18)  # Amount
-        worksheet.set_column(2, 2, 20)  # Transaction
-        worksheet.set_column(3, 3, 15)  # Subcode
-
-    def write_time_tracking_sheet(worksheet, record_ids, headers):
-        """Write time tracking records to worksheet"""
-        if not record_ids:
-            worksheet.write(0, 0, 'No data available')
-            return
+    def cash_allocation_values(rec):
+        return [rec.description, rec.amount or 0.0, rec.transaction_id.name, rec.subcode_id.subcode]
 
-        # Write header row
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Read records
-        records = record.env['kojto.hr.time.tracking'].sudo().browse(record_ids)
-        for row_idx, rec in enumerate(records, start=1):
-            date_start = rec.datetime_start.strftime("%Y-%m-%d %H:%M") if rec.datetime_start else ""
-            worksheet.write(row_idx, 0, date_start, text_format)
-            worksheet.write(row_idx, 1, rec.total_hours or 0.0, currency_format)
-            worksheet.write(row_idx, 2, rec.value_in_EUR or 0.0, currency_format)
-            worksheet.write(row_idx, 3, rec.subcode_id.subcode if rec.subcode_id else '', text_format)
-            worksheet.write(row_idx, 4, rec.credited_subcode_id.subcode if rec.credited_subcode_id else '', text_format)
-
-        # Auto-adjust column widths
-        worksheet.set_column(0, 0, 18)  # Date Start
-        worksheet.set_column(1, 1, 15)  # Total Hours
-        worksheet.set_column(2, 2, 18)  # Value (EUR)
-        worksheet.set_column(3, 3, 15)  # Subcode
-        worksheet.set_column(4, 4, 20)  # Credited Subcode
-
-    def write_asset_works_sheet(worksheet, record_ids, headers):
-        """Write asset works records to worksheet"""
-        if not record_ids:
-            worksheet.write(0, 0, 'No data available')
-            return
+    def time_tracking_values(rec):
+        date_start = rec.datetime_start.strftime("%Y-%m-%d %H:%M") if rec.datetime_start else ""
+        return [date_start, rec.total_hours or 0.0, rec.value_in_EUR or 0.0, rec.subcode_id.subcode, rec.credited_subcode_id.subcode]
 
-        # Write header row
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Read records
-        records = record.env['kojto.asset.works'].sudo().browse(record_ids)
-        for row_idx, rec in enumerate(records, start=1):
-            date_start = rec.datetime_start.strftime("%Y-%m-%d %H:%M") if rec.datetime_start else ""
-            worksheet.write(row_idx, 0, date_start, text_format)
-            worksheet.write(row_idx, 1, rec.quantity or 0.0, currency_format)
-            worksheet.write(row_idx, 2, rec.value_in_EUR or 0.0, currency_format)
-            worksheet.write(row_idx, 3, rec.subcode_id.subcode if rec.subcode_id else '', text_format)
-            worksheet.write(row_idx, 4, rec.credited_subcode_id.subcode if rec.credited_subcode_id else '', text_format)
-
-        # Auto-adjust column widths
-        worksheet.set_column(0, 0, 18)  # Date Start
-        worksheet.set_column(1, 1, 15)  # Quantity
-        worksheet.set_column(2, 2, 18)  # Value (EUR)
-        worksheet.set_column(3, 3, 15)  # Subcode
-        worksheet.set_column(4, 4, 20)  # Credited Subcode
-
-    # Sheet 1: Outgoing Pre-VAT Total
-    worksheet = workbook.add_worksheet('Outgoing Pre-VAT Total')
-    write_invoice_contents_sheet(worksheet, outgoing_ids, ['Name', 'Pre-VAT Total', 'Invoice', 'Subcode'])
-
-    # Sheet 2: Incoming Pre-VAT Total
-    worksheet = workbook.add_worksheet('Incoming Pre-VAT Total')
-    write_invoice_contents_sheet(worksheet, incoming_ids, ['Name', 'Pre-VAT Total', 'Invoice', 'Subcode'])
-
-    # Sheet 3: Invoiceless Revenue
-    worksheet = workbook.add_worksheet('Invoiceless Revenue')
-    write_cash_allocation_sheet(worksheet, revenue_ids, ['Description', 'Amount', 'Transaction', 'Subcode'])
-
-    # Sheet 4: Invoiceless Expenses
-    worksheet = workbook.add_worksheet('Invoiceless Expenses')
-    write_cash_allocation_sheet(worksheet, expenses_ids, ['Description', 'Amount', 'Transaction', 'Subcode'])
+    def asset_works_values(rec):
+        date_start = rec.datetime_start.strftime("%Y-%m-%d %H:%M") if rec.datetime_start else ""
+        return [date_start, rec.quantity or 0.0, rec.value_in_EUR or 0.0, rec.subcode_id.subcode, rec.credited_subcode_id.subcode]
 
-    # Sheet 5: Time Tracking Total
-    worksheet = workbook.add_worksheet('Time Tracking Total')
-    write_time_tracking_sheet(worksheet, tt_ids, ['Date Start', 'Total Hours', 'Value (EUR)', 'Subcode', 'Credited Subcode'])
+    invoice_contents_columns = [('Name', 40, 'text'), ('Pre-VAT Total', 18, 'currency'), ('Invoice', 20, 'text'), ('Subcode', 15, 'text')]
+    cash_allocation_columns = [('Description', 40, 'text'), ('Amount', 18, 'currency'), ('Transaction', 20, 'text'), ('Subcode', 15, 'text')]
 
-    # Sheet 6: Assets Total
-    worksheet = workbook.add_worksheet('Assets Total')
-    write_asset_works_sheet(worksheet, assets_ids, ['Date Start', 'Quantity', 'Value (EUR)', 'Subcode', 'Credited Subcode'])
-
-    workbook.close()
-    output.seek(0)
-
-    # Create attachment
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-
-    # Handle date formatting - read() returns date strings
-    if date_from:
-        if isinstance(date_from, str):
-            date_from_str = date_from
-        else:
-            date_from_str = date_from.strftime('%Y-%m-%d')
-    else:
-        date_from_str = ''
-
-    if date_to:
-        if isinstance(date_to, str):
-            date_to_str = date_to
-        else:
-            date_to_str = date_to.strftime('%Y-%m-%d')
-    else:
-        date_to_str = ''
-
-    filename = f"{filename_prefix}_Balance_Breakdown_{date_from_str}_{date_to_str}.xlsx"
-
-    # Create standalone attachment (not linked to any model) to avoid validation issues
-    # This allows the export to work even if wizard_id is not set
-    attachment_vals = {
-        'name': filename,
-        'type': 'binary',
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        # Don't set res_model or res_id - create as standalone attachment
-    }
+    # Sheets 1-2: Outgoing / Incoming Pre-VAT Total
+    write_sheet('Outgoing Pre-VAT Total', breakdown['outgoing_pre_vat_total'], invoice_contents_columns, invoice_contents_values)
+    write_sheet('Incoming Pre-VAT Total', breakdown['incoming_pre_vat_total'], invoice_contents_columns, invoice_contents_values)
 
-    attachment = record.env['ir.attachment'].sudo().create(attachment_vals)
+    # Sheets 3-4: Invoiceless Revenue / Expenses
+    write_sheet('Invoiceless Revenue', breakdown['invoiceless_revenue'], cash_allocation_columns, cash_allocation_values)
+    write_sheet('Invoiceless Expenses', breakdown['invoiceless_expenses'], cash_allocation_columns, cash_allocation_values)
 
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+    # Sheet 5: Time Tracking Total
+    write_sheet('Time Tracking Total', breakdown['hr_time_tracking'], [
+        ('Date Start', 18, 'text'), ('Total Hours', 15, 'currency'), ('Value (EUR)', 18, 'currency'),
+        ('Subcode', 15, 'text'), ('Credited Subcode', 20, 'text'),
+    ], time_tracking_values)
+
+    # Sheet 6: Assets Total
+    write_sheet('Assets Total', breakdown['assets_works'], [
+        ('Date Start', 18, 'text'), ('Quantity', 15, 'currency'), ('Value (EUR)', 18, 'currency'),
+        ('Subcode', 15, 'text'), ('Credited Subcode', 20, 'text'),
+    ], asset_works_values)
 
+    prefix = BREAKDOWN_FILENAME_PREFIXES[model_name]
+    return f"{prefix}_Balance_Breakdown_{date_from.strftime('%Y-%m-%d')}_{date_to.strftime('%Y-%m-%d')}.xlsx"
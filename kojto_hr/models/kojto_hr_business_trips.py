@@ -388,57 +388,10 @@ class KojtoHrBusinessTrips(models.Model):
         if from_currency == to_currency:
             return 1.0
 
-        # Convert date to datetime for proper comparison
-        if isinstance(date, str):
-            from datetime import datetime
-            date = datetime.strptime(date, '%Y-%m-%d').date()
-
-        # Convert date to datetime string for database comparison
-        date_datetime = fields.Datetime.to_string(fields.Datetime.from_string(f"{date} 00:00:00"))
-
-        # First try direct lookup
-        exchange_rate = self.env["kojto.base.currency.exchange"].search([
-            ("base_currency_id", "=", from_currency.id),
-            ("target_currency_id", "=", to_currency.id),
-            ("datetime", "<=", date_datetime),
-        ], order="datetime DESC", limit=1)
-
-        if exchange_rate:
-            return exchange_rate.exchange_rate
-
-        # Try reverse lookup
-        reverse_rate = self.env["kojto.base.currency.exchange"].search([
-            ("base_currency_id", "=", to_currency.id),
-            ("target_currency_id", "=", from_currency.id),
-            ("datetime", "<=", date_datetime),
-        ], order="datetime DESC", limit=1)
-
-        if reverse_rate and reverse_rate.exchange_rate != 0:
-            calculated_rate = 1 / reverse_rate.exchange_rate
-            return calculated_rate
-
-        # If no rate found for the specific date, try to find the most recent rate available
-        # Try most recent direct rate
-        recent_rate = self.env["kojto.base.currency.exchange"].search([
-            ("base_currency_id", "=", from_currency.id),
-            ("target_currency_id", "=", to_currency.id),
-        ], order="datetime DESC", limit=1)
-
-        if recent_rate:
-            return recent_rate.exchange_rate
-
-        # Try most recent reverse rate
-        recent_reverse = self.env["kojto.base.currency.exchange"].search([
-            ("base_currency_id", "=", to_currency.id),
-            ("target_currency_id", "=", from_currency.id),
-        ], order="datetime DESC", limit=1)
-
-        if recent_reverse and recent_reverse.exchange_rate != 0:
-            calculated_rate = 1 / recent_reverse.exchange_rate
-            return calculated_rate
+        rate = self.env["kojto.base.currency.exchange"].get_rate(from_currency.id, to_currency.id, date)
 
         # If no exchange rate found, return 1.0 as fallback
-        return 1.0
+        return rate if rate is not None else 1.0
 
     def get_employee_name_for_printing(self):
         """Get employee name based on the trip's language"""
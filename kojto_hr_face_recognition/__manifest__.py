@@ -9,6 +9,7 @@
     "depends": ["base", "web", "kojto_hr"],
     "data": [
         "security/ir.model.access.csv",
+        "data/kojto_hr_face_recognition_cron.xml",
         "views/kojto_hr_face_recognition_buttons.xml",
         "views/kojto_hr_face_recognition_views.xml",
         "views/kojto_hr_terminal.xml",
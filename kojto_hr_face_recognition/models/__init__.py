@@ -1,2 +1,4 @@
 from . import kojto_hr_face_recognition
 from . import kojto_hr_face_recognition_landingpage
+from . import kojto_hr_face_recognition_base_images
+from . import kojto_hr_face_recognition_employees
@@ -1,4 +1,4 @@
-from odoo import api, fields, models
+from odoo import api, fields, models, tools
 from datetime import datetime, timedelta
 from odoo.exceptions import UserError, ValidationError, AccessDenied
 from io import BytesIO
@@ -10,6 +10,46 @@ import face_recognition
 from odoo.tools import config
 import json
 import os
+import time
+
+
+# Images are downsized to this many pixels on their longer side before face detection
+FACE_ENCODING_MAX_SIZE = 800
+
+FACE_ENCODING_CRON = "kojto_hr_face_recognition.ir_cron_kojto_hr_face_encoding"
+
+
+def pack_face_encoding(encoding):
+    """Pack a 128-d face encoding as base64 float32 bytes for a Binary field."""
+    return base64.b64encode(np.asarray(encoding, dtype=np.float32).tobytes())
+
+
+def unpack_face_encoding(data):
+    """Unpack a face encoding stored by pack_face_encoding."""
+    return np.frombuffer(base64.b64decode(bytes(data)), dtype=np.float32).astype(np.float64)
+
+
+def _encode_face_image(args):
+    """Detect the single face of one image and return (res_id, packed encoding, error).
+
+    source is a filestore path or the raw image bytes. Images are encoded in the cron
+    worker itself: Odoo workers are not forked into process pools.
+    """
+    res_id, source, max_size = args
+    try:
+        img = Image.open(source if isinstance(source, str) else BytesIO(source)).convert("RGB")
+        if max_size and max(img.size) > max_size:
+            img.thumbnail((max_size, max_size))
+        pixels = np.array(img)
+        face_locations = face_recognition.face_locations(pixels, model="hog", number_of_times_to_upsample=1)
+        encodings = face_recognition.face_encodings(pixels, face_locations)
+    except Exception as e:
+        return res_id, None, str(e)
+    if not encodings:
+        return res_id, None, "No face found"
+    if len(encodings) > 1:
+        return res_id, None, f"Multiple faces detected - {len(encodings)} faces found. Only one face per image is allowed."
+    return res_id, pack_face_encoding(encodings[0]), None
 
 
 class KojtoHrTimeTrackingImage(models.Model):
@@ -21,6 +61,8 @@ class KojtoHrTimeTrackingImage(models.Model):
     name = fields.Char(string="Name", compute="_compute_name", store=True)
     image = fields.Binary(string="Image")
     face_encoding = fields.Text(string="Face Encoding", help="JSON representation of face encoding")
+    face_encoding_data = fields.Binary(string="Face Encoding Data", attachment=False, help="128 float32 values of the face encoding")
+    face_encoding_version = fields.Integer(string="Face Encoding Version", default=0, help="Encoding version this image was last processed with")
     datetime_taken = fields.Datetime(string="Date/Time Taken")
     employee_id = fields.Many2one("kojto.hr.employees", string="Employee")
     user_id = fields.Many2one(related="employee_id.user_id", string="Associated User")
@@ -50,213 +92,235 @@ class KojtoHrTimeTrackingImage(models.Model):
         for record in self:
             record.name = f"Time Tracking for {record.employee_id.name if record.employee_id else 'Unknown Employee'}"
 
+    def init(self):
+        # Version of the employee encoding index, raised in the transaction that changes it
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS kojto_hr_face_encoding_index (
+                id integer PRIMARY KEY,
+                version bigint NOT NULL
+            );
+            INSERT INTO kojto_hr_face_encoding_index (id, version) VALUES (1, 0)
+            ON CONFLICT (id) DO NOTHING;
+        """)
+
+    @api.model
+    def _invalidate_employee_encoding_matrix(self):
+        """Raise the index version so every worker reloads the encoding matrix once this commits."""
+        self.env.cr.execute("UPDATE kojto_hr_face_encoding_index SET version = version + 1 WHERE id = 1")
+
+    @api.model
+    def _get_employee_encoding_matrix(self):
+        """Return (employee_ids, matrix) of all encoded images of active employees.
+
+        Row k of the read-only matrix is an encoding of employee_ids[k]. The result is
+        cached per index version, which is raised whenever encoded employee images or
+        their employees change.
+        """
+        self.env.cr.execute("SELECT version FROM kojto_hr_face_encoding_index WHERE id = 1")
+        row = self.env.cr.fetchone()
+        return self._load_employee_encoding_matrix(row[0] if row else 0)
+
+    @api.model
+    @tools.ormcache("version")
+    def _load_employee_encoding_matrix(self, version):
+        self.env["kojto.base.images"].flush_model(["employee_id", "face_encoding", "face_encoding_data"])
+        self.env["kojto.hr.employees"].flush_model(["active"])
+        self.env.cr.execute("""
+            SELECT i.employee_id, i.face_encoding_data, i.face_encoding
+            FROM kojto_base_images i
+            JOIN kojto_hr_employees e ON e.id = i.employee_id
+            WHERE e.active
+              AND (i.face_encoding_data IS NOT NULL OR i.face_encoding IS NOT NULL)
+            ORDER BY i.id
+        """)
+        employee_ids = []
+        rows = []
+        for employee_id, data, encoding_json in self.env.cr.fetchall():
+            try:
+                encoding = unpack_face_encoding(data) if data else np.array(json.loads(encoding_json))
+            except Exception:
+                continue
+            if encoding.shape != (128,):
+                continue
+            employee_ids.append(employee_id)
+            rows.append(encoding)
+        employee_ids = np.array(employee_ids, dtype=np.int64)
+        matrix = np.array(rows, dtype=np.float64).reshape(len(rows), 128)
+        employee_ids.flags.writeable = False
+        matrix.flags.writeable = False
+        return employee_ids, matrix
+
+    def _encode_missing_base_images(self):
+        """Encode employee images of active employees that have no encoding yet.
+
+        Images that cannot be encoded (missing file, no face or several faces) are marked
+        with the current encoding version and skipped until the next version, as in the
+        background encoding cron.
+        """
+        version = self._get_face_encoding_version()
+        base_images = self.env["kojto.base.images"].sudo().search([
+            ("employee_id", "!=", False),
+            ("employee_id.active", "=", True),
+            ("face_encoding_data", "=", False),
+            ("face_encoding", "=", False),
+            ("face_encoding_version", "<", version),
+        ])
+        if not base_images:
+            return
+        max_size = int(self.env["ir.config_parameter"].sudo().get_param(
+            "kojto_hr_face_recognition.encoding_max_size", FACE_ENCODING_MAX_SIZE))
+        sources = self._get_face_image_sources("kojto.base.images", base_images.ids)
+        for base_image in base_images:
+            if base_image.id in sources:
+                _, encoding, error = _encode_face_image((base_image.id, sources[base_image.id], max_size))
+            else:
+                encoding, error = None, "Image file not found"
+            if encoding is not None:
+                base_image.write({"face_encoding_data": encoding, "face_encoding_version": version})
+                continue
+            base_image.face_encoding_version = version
+            self.env["ir.logging"].create({
+                "name": "Face Encoding Warning",
+                "type": "server",
+                "message": f"Could not encode kojto.base.images {base_image.id}: {error}",
+                "path": __name__,
+                "func": "_encode_missing_base_images",
+                "line": 0,
+            })
+
     def action_assign_employee_by_face_recognition(self):
-        for record in self:
-            if not record.image:
-                return
+        records = self.filtered("image")
+        if not records:
+            return
+        records.datetime_taken = fields.Datetime.now()
 
-            record.datetime_taken = fields.Datetime.now()
+        self._encode_missing_base_images()
+        employee_ids, employee_matrix = self._get_employee_encoding_matrix()
 
-            base_images = self.env["kojto.base.images"].search([
-                ("employee_id", "!=", False),
-                ("employee_id.active", "=", True)
-            ])
-            employee_encodings = {}
-            db_name = self.env.cr.dbname
-            filestore_path = config.filestore(db_name)
-            for base_image in base_images:
-                encoding = None
-                if base_image.face_encoding:
-                    try:
-                        encoding = np.array(json.loads(base_image.face_encoding))
-                    except Exception:
-                        encoding = None
-                if encoding is None:
-                    # Try to retrieve the image from the filestore (same as working version)
-                    try:
-                        attachment = self.env['ir.attachment'].search([
-                            ("res_model", "=", "kojto.base.images"),
-                            ("res_id", "=", base_image.id),
-                            ("res_field", "=", "image")
-                        ], limit=1)
-                        if not attachment or not attachment.store_fname:
-                            raise Exception("No attachment or store_fname")
-                        file_path = os.path.join(filestore_path, attachment.store_fname)
-                        if not os.path.exists(file_path):
-                            raise Exception("File does not exist in filestore")
-                        # Read the file and encode
-                        with open(file_path, "rb") as f:
-                            file_data = f.read()
-                        img = Image.open(BytesIO(file_data)).convert("RGB")
-
-                        # Use face detection with better sensitivity for more lenient matching
-                        face_locations = face_recognition.face_locations(np.array(img), model="hog", number_of_times_to_upsample=1)
-                        encodings = face_recognition.face_encodings(np.array(img), face_locations)
-
-                        if encodings:
-                            # Validate that only one face is present
-                            if len(encodings) > 1:
-                                raise Exception(f"Multiple faces detected in employee image - {len(encodings)} faces found. Only one face per image is allowed.")
-
-                            # Use the single face encoding
-                            encoding = encodings[0]
-                            base_image.face_encoding = json.dumps(encoding.tolist())
-                        else:
-                            raise Exception("No face found in image")
-                    except Exception as e:
-                        # Log and delete orphaned image
-                        self.env["ir.logging"].create({
-                            "name": "Face Recognition Error",
-                            "type": "server",
-                            "message": f"Orphaned base image {base_image.id} deleted: {e}",
-                            "path": __name__,
-                            "func": "action_assign_employee_by_face_recognition",
-                            "line": 0,
-                        })
-                        base_image.unlink()
-                        continue
-                if encoding is not None:
-                    employee_encodings.setdefault(base_image.employee_id.id, []).append(encoding)
+        match_found = False
+        for record in records:
+            if record.employee_id:
+                continue
+            try:
+                # Process tracking image directly like working version
+                img = Image.open(BytesIO(base64.b64decode(record.image))).convert("RGB")
+
+                # Use face detection with better sensitivity for tracking images (same as working version)
+                face_locations = face_recognition.face_locations(np.array(img), model="hog", number_of_times_to_upsample=1)
+                tracking_encodings = face_recognition.face_encodings(np.array(img), face_locations)
 
-            match_found = False
-            for record in self:
-                if record.employee_id or not record.image:
+                if not tracking_encodings:
+                    self.env["ir.logging"].create({
+                        "name": "Face Recognition Warning",
+                        "type": "server",
+                        "message": f"No face found in tracking image {record.id}",
+                        "path": __name__,
+                        "func": "action_assign_employee_by_face_recognition",
+                        "line": 0,
+                    })
                     continue
-                try:
-                    # Process tracking image directly like working version
-                    img = Image.open(BytesIO(base64.b64decode(record.image))).convert("RGB")
-
-                    # Use face detection with better sensitivity for tracking images (same as working version)
-                    face_locations = face_recognition.face_locations(np.array(img), model="hog", number_of_times_to_upsample=1)
-                    tracking_encodings = face_recognition.face_encodings(np.array(img), face_locations)
-
-                    if not tracking_encodings:
-                        self.env["ir.logging"].create({
-                            "name": "Face Recognition Warning",
-                            "type": "server",
-                            "message": f"No face found in tracking image {record.id}",
-                            "path": __name__,
-                            "func": "action_assign_employee_by_face_recognition",
-                            "line": 0,
-                        })
-                        continue
 
-                    # Validate that only one face is present in tracking image (same as working version)
-                    if len(tracking_encodings) > 1:
-                        self.env["ir.logging"].create({
-                            "name": "Face Recognition Warning",
-                            "type": "server",
-                            "message": f"Multiple faces detected in tracking image {record.id} - {len(tracking_encodings)} faces found. Only one face per image is allowed.",
-                            "path": __name__,
-                            "func": "action_assign_employee_by_face_recognition",
-                            "line": 0,
-                        })
-                        continue
+                # Validate that only one face is present in tracking image (same as working version)
+                if len(tracking_encodings) > 1:
+                    self.env["ir.logging"].create({
+                        "name": "Face Recognition Warning",
+                        "type": "server",
+                        "message": f"Multiple faces detected in tracking image {record.id} - {len(tracking_encodings)} faces found. Only one face per image is allowed.",
+                        "path": __name__,
+                        "func": "action_assign_employee_by_face_recognition",
+                        "line": 0,
+                    })
+                    continue
+
+                # Use the single face encoding (same as working version)
+                tracking_encoding = tracking_encodings[0]
+
+                # Store the face encoding for future reference
+                record.write({
+                    "face_encoding_data": pack_face_encoding(tracking_encoding),
+                    "face_encoding_version": self._get_face_encoding_version(),
+                })
+                best_match_employee = None
+                best_match_distance = float('inf')
+                best_match_confidence = 0.0
+
+                # Compare with ALL employee encodings at once to find the BEST match
+                if len(employee_ids):
+                    face_distances = face_recognition.face_distance(employee_matrix, tracking_encoding)
+                    best_index = int(np.argmin(face_distances))
+                    # Lower distance = better match
+                    best_match_distance = float(face_distances[best_index])
+                    best_match_employee = int(employee_ids[best_index])
+                    # Convert distance to confidence percentage (lower distance = higher confidence)
+                    best_match_confidence = max(0, (1 - best_match_distance) * 100)
+
+                # Use simplified validation logic similar to working version
+                minimum_confidence_threshold = 40.0  # Back to working version threshold
+
+                # Log debug information
+                self.env["ir.logging"].create({
+                    "name": "Face Recognition Debug Info",
+                    "type": "server",
+                    "message": f"Processing tracking image {record.id} - Best match: Employee {best_match_employee} (Distance: {best_match_distance:.3f}, Confidence: {best_match_confidence:.1f}%)",
+                    "path": __name__,
+                    "func": "action_assign_employee_by_face_recognition",
+                    "line": 0,
+                })
+
+                # Simple validation: just check minimum confidence threshold
+                if best_match_employee and best_match_confidence >= minimum_confidence_threshold:
+                    record.employee_id = best_match_employee
+                    match_found = True
 
-                    # Use the single face encoding (same as working version)
-                    tracking_encoding = tracking_encodings[0]
-
-                    # Store the face encoding for future reference
-                    record.face_encoding = json.dumps(tracking_encoding.tolist())
-                    best_match_employee = None
-                    best_match_distance = float('inf')
-                    best_match_confidence = 0.0
-
-                    # Compare with ALL employee encodings to find the BEST match (same as working version)
-                    for employee_id, encodings_list in employee_encodings.items():
-                        # Calculate face distance for each employee encoding
-                        for employee_encoding in encodings_list:
-                            # Use face_distance for more precise comparison
-                            face_distance = face_recognition.face_distance([employee_encoding], tracking_encoding)[0]
-
-                            # Lower distance = better match
-                            if face_distance < best_match_distance:
-                                best_match_distance = face_distance
-                                best_match_employee = employee_id
-                                # Convert distance to confidence percentage (lower distance = higher confidence)
-                                best_match_confidence = max(0, (1 - face_distance) * 100)
-
-                    # Use simplified validation logic similar to working version
-                    minimum_confidence_threshold = 40.0  # Back to working version threshold
-
-                    # Log debug information
+                    # Log successful match with confidence
                     self.env["ir.logging"].create({
-                        "name": "Face Recognition Debug Info",
+                        "name": "Face Recognition Success",
                         "type": "server",
-                        "message": f"Processing tracking image {record.id} - Best match: Employee {best_match_employee} (Distance: {best_match_distance:.3f}, Confidence: {best_match_confidence:.1f}%)",
+                        "message": f"Best match found for tracking image {record.id} -> Employee {best_match_employee} (Confidence: {best_match_confidence:.1f}%)",
                         "path": __name__,
                         "func": "action_assign_employee_by_face_recognition",
                         "line": 0,
                     })
 
-                    # Simple validation: just check minimum confidence threshold
-                    if best_match_employee and best_match_confidence >= minimum_confidence_threshold:
-                        record.employee_id = best_match_employee
-                        match_found = True
-
-                        # Log successful match with confidence
-                        self.env["ir.logging"].create({
-                            "name": "Face Recognition Success",
-                            "type": "server",
-                            "message": f"Best match found for tracking image {record.id} -> Employee {best_match_employee} (Confidence: {best_match_confidence:.1f}%)",
-                            "path": __name__,
-                            "func": "action_assign_employee_by_face_recognition",
-                            "line": 0,
-                        })
-
-                    if not match_found:
-                        # Try fallback method with more lenient tolerance for false negatives (same as working version)
-                        # Use the same "best match" approach for fallback
-                        fallback_best_match = None
-                        fallback_best_distance = float('inf')
-
-                        for employee_id, encodings_list in employee_encodings.items():
-                            for employee_encoding in encodings_list:
-                                face_distance = face_recognition.face_distance([employee_encoding], tracking_encoding)[0]
-                                if face_distance < fallback_best_distance:
-                                    fallback_best_distance = face_distance
-                                    fallback_best_match = employee_id
-
-                        # Use a more lenient threshold for fallback (same as working version)
-                        if fallback_best_match and fallback_best_distance < 0.7:
-                            record.employee_id = fallback_best_match
-                            match_found = True
-                            fallback_confidence = max(0, (1 - fallback_best_distance) * 100)
-
-                            # Log fallback match
-                            self.env["ir.logging"].create({
-                                "name": "Face Recognition Fallback Match",
-                                "type": "server",
-                                "message": f"Fallback match found for tracking image {record.id} -> Employee {fallback_best_match} (Distance: {fallback_best_distance:.3f}, Confidence: {fallback_confidence:.1f}%)",
-                                "path": __name__,
-                                "func": "action_assign_employee_by_face_recognition",
-                                "line": 0,
-                            })
-
-                    if not match_found:
-                        # Log that no match was found but keep the record
-                        self.env["ir.logging"].create({
-                            "name": "Face Recognition Warning",
-                            "type": "server",
-                            "message": f"No face match found for tracking image {record.id}. Record kept for manual review.",
-                            "path": __name__,
-                            "func": "action_assign_employee_by_face_recognition",
-                            "line": 0,
-                        })
-                        # Don't delete the record, let it remain for manual assignment
-
-                except Exception as e:
+                # Use a more lenient threshold for fallback (same as working version)
+                elif best_match_employee and best_match_distance < 0.7:
+                    record.employee_id = best_match_employee
+                    match_found = True
+
+                    # Log fallback match
+                    self.env["ir.logging"].create({
+                        "name": "Face Recognition Fallback Match",
+                        "type": "server",
+                        "message": f"Fallback match found for tracking image {record.id} -> Employee {best_match_employee} (Distance: {best_match_distance:.3f}, Confidence: {best_match_confidence:.1f}%)",
+                        "path": __name__,
+                        "func": "action_assign_employee_by_face_recognition",
+                        "line": 0,
+                    })
+
+                else:
+                    # Log that no match was found but keep the record
                     self.env["ir.logging"].create({
-                        "name": "Face Recognition Error",
+                        "name": "Face Recognition Warning",
                         "type": "server",
-                        "message": f"Error processing tracking image {record.id}: {e}",
+                        "message": f"No face match found for tracking image {record.id}. Record kept for manual review.",
                         "path": __name__,
                         "func": "action_assign_employee_by_face_recognition",
                         "line": 0,
                     })
+                    # Don't delete the record, let it remain for manual assignment
+
+            except Exception as e:
+                self.env["ir.logging"].create({
+                    "name": "Face Recognition Error",
+                    "type": "server",
+                    "message": f"Error processing tracking image {record.id}: {e}",
+                    "path": __name__,
+                    "func": "action_assign_employee_by_face_recognition",
+                    "line": 0,
+                })
 
-            if match_found:
-                self.check_employee_id()
+        if match_found:
+            records.check_employee_id()
 
     def check_employee_id(self):
         for record in self:
@@ -363,293 +427,158 @@ class KojtoHrTimeTrackingImage(models.Model):
         # Just return True - the JavaScript onclick will handle opening the camera
         return True
 
-    def action_recalculate_all_face_encodings(self):
-        """Recalculate face encodings for all employee images"""
-        # Get all base images that have an employee_id and an image (including inactive employees)
-        base_images = self.env["kojto.base.images"].search([
-            ("employee_id", "!=", False),
-            ("image", "!=", False)
-        ])
-
-        if not base_images:
-            return {
-                'type': 'ir.actions.client',
-                'tag': 'display_notification',
-                'params': {
-                    'title': 'No Images Found',
-                    'message': 'No employee images found to process.',
-                    'type': 'warning',
-                    'sticky': False,
-                }
-            }
-
-        processed_count = 0
-        error_count = 0
-        db_name = self.env.cr.dbname
-        filestore_path = config.filestore(db_name)
+    @api.model
+    def _get_face_encoding_version(self):
+        return int(self.env["ir.config_parameter"].sudo().get_param("kojto_hr_face_recognition.encoding_version", 1))
 
-        for base_image in base_images:
-            try:
-                # Try to retrieve the image from the filestore
-                attachment = self.env['ir.attachment'].search([
-                    ("res_model", "=", "kojto.base.images"),
-                    ("res_id", "=", base_image.id),
-                    ("res_field", "=", "image")
-                ], limit=1)
-
-                if not attachment or not attachment.store_fname:
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Recalculation Error",
-                        "type": "server",
-                        "message": f"No attachment or store_fname for base image {base_image.id}",
-                        "path": __name__,
-                        "func": "action_recalculate_all_face_encodings",
-                        "line": 0,
-                    })
-                    error_count += 1
-                    continue
+    @api.model
+    def _get_face_encoding_domains(self, version):
+        """Domains of the images the encoding pipeline still has to process, by model."""
+        return {
+            "kojto.base.images": [
+                ("employee_id", "!=", False),
+                ("image", "!=", False),
+                ("face_encoding_version", "<", version),
+            ],
+            "kojto.hr.face.recognition": [
+                ("image", "!=", False),
+                ("face_encoding", "=", False),
+                ("face_encoding_data", "=", False),
+                ("face_encoding_version", "<", version),
+            ],
+        }
 
+    @api.model
+    def _get_face_image_sources(self, model_name, ids):
+        """Return {res_id: filestore path or raw bytes} of the image field of these records."""
+        attachments = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", model_name),
+            ("res_id", "in", ids),
+            ("res_field", "=", "image"),
+        ])
+        filestore_path = config.filestore(self.env.cr.dbname)
+        sources = {}
+        for attachment in attachments:
+            if attachment.store_fname:
                 file_path = os.path.join(filestore_path, attachment.store_fname)
-                if not os.path.exists(file_path):
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Recalculation Error",
-                        "type": "server",
-                        "message": f"File does not exist in filestore for base image {base_image.id}: {file_path}",
-                        "path": __name__,
-                        "func": "action_recalculate_all_face_encodings",
-                        "line": 0,
-                    })
-                    error_count += 1
+                if os.path.exists(file_path):
+                    sources[attachment.res_id] = file_path
                     continue
+            if attachment.db_datas:
+                sources[attachment.res_id] = attachment.db_datas
+        return sources
 
-                # Read the file and encode
-                with open(file_path, "rb") as f:
-                    file_data = f.read()
-
-                img = Image.open(BytesIO(file_data)).convert("RGB")
-
-                # Use face detection with better sensitivity for recalculation
-                face_locations = face_recognition.face_locations(np.array(img), model="hog", number_of_times_to_upsample=1)
-                encodings = face_recognition.face_encodings(np.array(img), face_locations)
-
-                if encodings:
-                    # Validate that only one face is present
-                    if len(encodings) > 1:
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Validation Error",
-                            "type": "server",
-                            "message": f"Multiple faces detected in base image {base_image.id} (Employee: {base_image.employee_id.name}) - {len(encodings)} faces found. Only one face per image is allowed.",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-                        error_count += 1
+    @api.model
+    def _cron_encode_face_images(self, chunk_size=None, time_limit=None):
+        """Encode pending employee and tracking images in chunks.
+
+        Every chunk is committed, so an interrupted run resumes where it stopped: images
+        still below the current encoding version are picked up by the next run, which is
+        triggered right away when the time limit leaves work behind.
+        """
+        params = self.env["ir.config_parameter"].sudo()
+        if chunk_size is None:
+            chunk_size = int(params.get_param("kojto_hr_face_recognition.encoding_chunk_size", 50))
+        if time_limit is None:
+            time_limit = int(params.get_param("kojto_hr_face_recognition.encoding_time_limit", 240))
+        max_size = int(params.get_param("kojto_hr_face_recognition.encoding_max_size", FACE_ENCODING_MAX_SIZE))
+        version = self._get_face_encoding_version()
+
+        started = time.monotonic()
+        processed_count = 0
+        error_count = 0
+        pending = False
+        for model_name, domain in self._get_face_encoding_domains(version).items():
+            model = self.env[model_name].sudo()
+            while not pending:
+                records = model.search(domain, order="id", limit=chunk_size)
+                if not records:
+                    break
+                if time.monotonic() - started >= time_limit:
+                    pending = True
+                    break
+                sources = self._get_face_image_sources(model_name, records.ids)
+                errors = {record.id: "Image file not found" for record in records if record.id not in sources}
+                for res_id, encoding, error in (_encode_face_image((res_id, source, max_size)) for res_id, source in sources.items()):
+                    if encoding is None:
+                        errors[res_id] = error
                         continue
-
-                    # Use the single face encoding
-                    encoding = encodings[0]
-                    base_image.face_encoding = json.dumps(encoding.tolist())
+                    model.browse(res_id).write({
+                        "face_encoding": False,
+                        "face_encoding_data": encoding,
+                        "face_encoding_version": version,
+                    })
                     processed_count += 1
 
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Success",
-                        "type": "server",
-                        "message": f"Successfully processed base image {base_image.id} (Employee: {base_image.employee_id.name}) - single face detected",
-                        "path": __name__,
-                        "func": "action_recalculate_all_face_encodings",
-                        "line": 0,
-                    })
-                else:
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Recalculation Warning",
-                        "type": "server",
-                        "message": f"No face found in image for base image {base_image.id} (Employee: {base_image.employee_id.name})",
-                        "path": __name__,
-                        "func": "action_recalculate_all_face_encodings",
-                        "line": 0,
-                    })
+                for res_id, error in errors.items():
+                    # Keep the previous encoding, if any, and do not retry until the next version
+                    model.browse(res_id).face_encoding_version = version
                     error_count += 1
-
-            except Exception as e:
-                # Handle specific error types
-                error_msg = str(e)
-                if "Multiple faces detected" in error_msg:
-                    # Try to delete invalid image, but handle permission errors gracefully
-                    try:
-                        base_image.unlink()
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Cleanup",
-                            "type": "server",
-                            "message": f"Successfully removed invalid base image {base_image.id} (Employee: {base_image.employee_id.name}) - multiple faces",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-                    except AccessDenied:
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Permission Warning",
-                            "type": "server",
-                            "message": f"Skipped deletion of invalid base image {base_image.id} (Employee: {base_image.employee_id.name}) - user lacks delete permissions. Manual cleanup may be required.",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-                    except Exception as delete_error:
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Delete Error",
-                            "type": "server",
-                            "message": f"Failed to delete invalid base image {base_image.id} (Employee: {base_image.employee_id.name}): {delete_error}",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-
-                elif "No face found" in error_msg:
-                    # Try to delete image with no face, but handle permission errors gracefully
-                    try:
-                        base_image.unlink()
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Cleanup",
-                            "type": "server",
-                            "message": f"Successfully removed invalid base image {base_image.id} (Employee: {base_image.employee_id.name}) - no face detected",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-                    except AccessDenied:
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Permission Warning",
-                            "type": "server",
-                            "message": f"Skipped deletion of invalid base image {base_image.id} (Employee: {base_image.employee_id.name}) - user lacks delete permissions. Manual cleanup may be required.",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-                    except Exception as delete_error:
-                        self.env["ir.logging"].create({
-                            "name": "Face Encoding Delete Error",
-                            "type": "server",
-                            "message": f"Failed to delete invalid base image {base_image.id} (Employee: {base_image.employee_id.name}): {delete_error}",
-                            "path": __name__,
-                            "func": "action_recalculate_all_face_encodings",
-                            "line": 0,
-                        })
-
-                else:
-                    # Log generic error
                     self.env["ir.logging"].create({
-                        "name": "Face Encoding Recalculation Error",
+                        "name": "Face Encoding Warning",
                         "type": "server",
-                        "message": f"Error processing base image {base_image.id} (Employee: {base_image.employee_id.name}): {e}",
+                        "message": f"Could not encode {model_name} {res_id}: {error}",
                         "path": __name__,
-                        "func": "action_recalculate_all_face_encodings",
+                        "func": "_cron_encode_face_images",
                         "line": 0,
                     })
-
-                error_count += 1
-
-        # Return notification with results
-        message = f"Face encoding recalculation completed. Processed: {processed_count}, Errors: {error_count}"
-        notification_type = 'success' if error_count == 0 else 'warning'
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': 'Face Encoding Recalculation',
-                'message': message,
-                'type': notification_type,
-                'sticky': False,
-            }
-        }
-
-    def action_encode_tracking_images(self):
-        """Generate face encodings for tracking images that don't have them yet"""
-        # Get all tracking images without face encodings
-        tracking_images = self.search([
-            ("image", "!=", False),
-            ("face_encoding", "=", False)
-        ])
-
-        if not tracking_images:
+                self.env.cr.commit()
+
+        elapsed = time.monotonic() - started
+        total_count = processed_count + error_count
+        if total_count:
+            self.env["ir.logging"].create({
+                "name": "Face Encoding Throughput",
+                "type": "server",
+                "message": f"Encoded {processed_count} image(s) with {error_count} error(s) in {elapsed:.1f}s "
+                           f"({total_count / elapsed if elapsed > 0 else 0.0:.2f} images/sec)"
+                           + (", continuing in the next run" if pending else ""),
+                "path": __name__,
+                "func": "_cron_encode_face_images",
+                "line": 0,
+            })
+        if pending:
+            self.env.ref(FACE_ENCODING_CRON).sudo()._trigger()
+
+    def _queue_face_encoding(self, title, model_name):
+        """Trigger the encoding cron and notify how many images of model_name it will process."""
+        version = self._get_face_encoding_version()
+        count = self.env[model_name].sudo().search_count(self._get_face_encoding_domains(version)[model_name])
+        if not count:
             return {
                 'type': 'ir.actions.client',
                 'tag': 'display_notification',
                 'params': {
                     'title': 'No Images Found',
-                    'message': 'No tracking images without face encodings found.',
+                    'message': 'No images to encode found.',
                     'type': 'info',
                     'sticky': False,
                 }
             }
 
-        processed_count = 0
-        error_count = 0
-
-        for record in tracking_images:
-            try:
-                # Process tracking image directly
-                img = Image.open(BytesIO(base64.b64decode(record.image))).convert("RGB")
-
-                # Use face detection with better sensitivity for tracking images
-                face_locations = face_recognition.face_locations(np.array(img), model="hog", number_of_times_to_upsample=1)
-                tracking_encodings = face_recognition.face_encodings(np.array(img), face_locations)
-
-                if tracking_encodings and len(tracking_encodings) == 1:
-                    # Store the face encoding
-                    record.face_encoding = json.dumps(tracking_encodings[0].tolist())
-                    processed_count += 1
-
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Success",
-                        "type": "server",
-                        "message": f"Successfully processed tracking image {record.id} - face encoding generated",
-                        "path": __name__,
-                        "func": "action_encode_tracking_images",
-                        "line": 0,
-                    })
-                else:
-                    error_count += 1
-                    if not tracking_encodings:
-                        error_msg = f"No face found in tracking image {record.id}"
-                    else:
-                        error_msg = f"Multiple faces detected in tracking image {record.id} - {len(tracking_encodings)} faces found"
-
-                    self.env["ir.logging"].create({
-                        "name": "Face Encoding Warning",
-                        "type": "server",
-                        "message": error_msg,
-                        "path": __name__,
-                        "func": "action_encode_tracking_images",
-                        "line": 0,
-                    })
-
-            except Exception as e:
-                error_count += 1
-                self.env["ir.logging"].create({
-                    "name": "Face Encoding Error",
-                    "type": "server",
-                    "message": f"Error processing tracking image {record.id}: {e}",
-                    "path": __name__,
-                    "func": "action_encode_tracking_images",
-                    "line": 0,
-                })
-
-        # Return notification with results
-        message = f"Tracking image face encoding completed. Processed: {processed_count}, Errors: {error_count}"
-        notification_type = 'success' if error_count == 0 else 'warning'
-
+        self.env.ref(FACE_ENCODING_CRON).sudo()._trigger()
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': 'Tracking Image Face Encoding',
-                'message': message,
-                'type': notification_type,
+                'title': title,
+                'message': f"{count} image(s) queued for face encoding in the background. Progress and throughput are logged as Face Encoding Throughput.",
+                'type': 'success',
                 'sticky': False,
             }
         }
 
+    def action_recalculate_all_face_encodings(self):
+        """Queue all employee images for re-encoding by the background pipeline"""
+        # Raising the version marks every image, including already encoded ones, as pending
+        version = self._get_face_encoding_version() + 1
+        self.env["ir.config_parameter"].sudo().set_param("kojto_hr_face_recognition.encoding_version", version)
+        return self._queue_face_encoding('Face Encoding Recalculation', "kojto.base.images")
+
+    def action_encode_tracking_images(self):
+        """Queue tracking images that don't have face encodings yet for the background pipeline"""
+        return self._queue_face_encoding('Tracking Image Face Encoding', "kojto.hr.face.recognition")
+
     def action_debug_face_recognition_settings(self):
         """Display current face recognition settings for debugging"""
         settings_info = {
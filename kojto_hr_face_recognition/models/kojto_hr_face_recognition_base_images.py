@@ -0,0 +1,48 @@
+"""
+Kojto HR Face Recognition Base Images
+
+Purpose:
+--------
+Stores the face encoding of every employee image in compact binary form and
+invalidates the cached employee encoding matrix used for face matching
+whenever encoded employee images are added, changed or removed.
+"""
+
+from odoo import api, fields, models
+
+INDEXED_FIELDS = {"image", "employee_id", "face_encoding", "face_encoding_data"}
+
+
+class KojtoHrFaceRecognitionBaseImages(models.Model):
+    _inherit = "kojto.base.images"
+
+    face_encoding_data = fields.Binary(string="Face Encoding Data", attachment=False, help="128 float32 values of the face encoding")
+    face_encoding_version = fields.Integer(string="Face Encoding Version", default=0, help="Encoding version this image was last processed with")
+
+    def _in_encoding_index(self):
+        """Tell whether any of these images is, or may be, a row of the employee encoding matrix."""
+        return any(record.employee_id and (record.face_encoding or record.face_encoding_data) for record in self)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records._in_encoding_index():
+            self.env["kojto.hr.face.recognition"]._invalidate_employee_encoding_matrix()
+        return records
+
+    def write(self, vals):
+        if "image" in vals and "face_encoding_data" not in vals:
+            # The encoding belongs to the old image
+            vals = dict(vals, face_encoding=False, face_encoding_data=False, face_encoding_version=0)
+        indexed = INDEXED_FIELDS & set(vals) and self._in_encoding_index()
+        result = super().write(vals)
+        if indexed or (INDEXED_FIELDS & set(vals) and self._in_encoding_index()):
+            self.env["kojto.hr.face.recognition"]._invalidate_employee_encoding_matrix()
+        return result
+
+    def unlink(self):
+        indexed = self._in_encoding_index()
+        result = super().unlink()
+        if indexed:
+            self.env["kojto.hr.face.recognition"]._invalidate_employee_encoding_matrix()
+        return result
@@ -0,0 +1,27 @@
+"""
+Kojto HR Face Recognition Employees
+
+Purpose:
+--------
+Invalidates the cached employee encoding matrix when employees with encoded
+images are activated, archived or deleted.
+"""
+
+from odoo import models
+
+
+class KojtoHrFaceRecognitionEmployees(models.Model):
+    _inherit = "kojto.hr.employees"
+
+    def write(self, vals):
+        result = super().write(vals)
+        if "active" in vals and self.employee_images._in_encoding_index():
+            self.env["kojto.hr.face.recognition"]._invalidate_employee_encoding_matrix()
+        return result
+
+    def unlink(self):
+        indexed = self.employee_images._in_encoding_index()
+        result = super().unlink()
+        if indexed:
+            self.env["kojto.hr.face.recognition"]._invalidate_employee_encoding_matrix()
+        return result
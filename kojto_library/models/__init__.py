@@ -1 +1,2 @@
+from . import ir_attachment
 from . import kojto_library_printable
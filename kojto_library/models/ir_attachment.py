@@ -0,0 +1,12 @@
+from odoo import fields, models
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    pdf_cache_key = fields.Char(string="PDF Cache Key", readonly=True, copy=False, index="btree_not_null",
+                                help="Key of the rendering this PDF was made from, see kojto.library.printable")
+
+    def init(self):
+        # Cache keys used to be kept in the description, which users see
+        self.env.cr.execute("UPDATE ir_attachment SET description = NULL WHERE description LIKE 'pdf-cache:%'")
@@ -1,30 +1,75 @@
 from odoo import tools, models, fields, api, _
 from odoo.exceptions import ValidationError, UserError
 import base64
+from datetime import timedelta
 
 from weasyprint import HTML
 
+PDF_CACHE_DAYS = 90
+
 
 class KojtoLibraryPrintable(models.AbstractModel):
     _name = "kojto.library.printable"
     _description = "Kojto Library Printable"
 
+    # Reuse the printed PDF while the record, report and language are unchanged
+    _pdf_cache = False
+
     def print_document_as_pdf(self):
+        attachment = self.get_pdf_attachment()
+        return {"type": "ir.actions.act_url", "url": f"/web/content/{attachment.id}?download=true", "target": "new"}
+
+    def get_pdf_attachment(self):
+        """Return the PDF attachment of the document, rendering it only when needed.
+
+        With _pdf_cache, the attachment keeps the key of its last rendering in
+        pdf_cache_key (report, language, CSS, the latest change of the QWeb
+        templates and of the company, and write_date of the record and of the
+        rows from _get_pdf_cache_dependencies) and is returned as it is while
+        that key still matches.
+        """
+        self.ensure_one()
+        if self._pdf_cache:
+            attachment = self.env["ir.attachment"].search([("res_model", "=", self._name), ("res_id", "=", self.id), ("name", "=", f"{self.name}.pdf")], limit=1)
+            if attachment and attachment.pdf_cache_key == self._get_pdf_cache_key():
+                return attachment
         html = self.generate_report_html()
         html = self.inject_report_css(html)
         attachment = self.create_pdf_attachment(html)
-        return {"type": "ir.actions.act_url", "url": f"/web/content/{attachment.id}?download=true", "target": "new"}
+        if self._pdf_cache:
+            # Taken after create_pdf_attachment, which updates the record itself
+            attachment.sudo().pdf_cache_key = self._get_pdf_cache_key()
+        return attachment
 
-    def generate_report_html(self):
-        self = self.with_context(lang=self.language_id.code if self.language_id else "en_US")
+    def _get_pdf_cache_key(self):
+        lang = self.language_id.code if self.language_id else "en_US"
+        report_css_ref = getattr(self, "_report_css_ref", "kojto_pdf_main_document_header.css")
+        # Templates are compared as a whole: a module update rewrites them all anyway
+        template = self.env["ir.ui.view"].sudo().search([("type", "=", "qweb")], order="write_date desc", limit=1)
+        dependencies = [f"{len(records)}:{fields.Datetime.to_string(max(records.mapped('write_date'), default=False))}"
+                        for records in [self.env.company] + self._get_pdf_cache_dependencies()]
+        return "|".join([self._get_report_ref(), lang, report_css_ref, fields.Datetime.to_string(template.write_date),
+                         fields.Datetime.to_string(self.write_date)] + dependencies)
+
+    def _get_pdf_cache_dependencies(self):
+        """Recordsets printed with the document; adding, changing or removing their rows renders the PDF again.
+
+        Contacts printed on the document (company, counterparty, issuer) belong here too.
+        """
+        return []
 
+    def _get_report_ref(self):
         # If force_report_ref is in context, only use the context report_ref
         if self._context.get('force_report_ref'):
             report_ref = self._context.get('report_ref')
             if not report_ref:
                 raise ValueError("force_report_ref is set but no report_ref provided in context")
-        else:
-            report_ref = self._context.get('report_ref') or getattr(self, "_report_ref", f"{self._name}.report_{self._name}")
+            return report_ref
+        return self._context.get('report_ref') or getattr(self, "_report_ref", f"{self._name}.report_{self._name}")
+
+    def generate_report_html(self):
+        self = self.with_context(lang=self.language_id.code if self.language_id else "en_US")
+        report_ref = self._get_report_ref()
 
         report = self.env["ir.actions.report"]._get_report_from_name(report_ref)
         if not report:
@@ -55,3 +100,21 @@ class KojtoLibraryPrintable(models.AbstractModel):
         if attachment:
             self.write({"pdf_attachment_id": attachment.id})
         return attachment
+
+    @api.autovacuum
+    def _gc_pdf_cache(self):
+        """Drop cached PDFs of deleted records, and superseded ones not rendered for PDF_CACHE_DAYS days.
+
+        The PDF a record still references as its pdf_attachment_id is kept.
+        """
+        if self._abstract or not self._pdf_cache:
+            return
+        attachments = self.env["ir.attachment"].sudo().search([
+            ("res_model", "=", self._name),
+            ("pdf_cache_key", "!=", False),
+        ])
+        records = self.sudo().with_context(active_test=False).browse(set(attachments.mapped("res_id"))).exists()
+        existing_ids = set(records.ids)
+        referenced_ids = set(records.mapped("pdf_attachment_id").ids) if "pdf_attachment_id" in self._fields else set()
+        expiry = fields.Datetime.now() - timedelta(days=PDF_CACHE_DAYS)
+        attachments.filtered(lambda a: a.res_id not in existing_ids or (a.id not in referenced_ids and a.write_date < expiry)).unlink()
@@ -10,6 +10,7 @@
     "external_dependencies": {"python": ["binpacking", "pulp", "openpyxl", "ezdxf", "weasyprint", "rectpack", "svgwrite", "shapely"]},
     "data": [
         "security/ir.model.access.csv",
+        "data/kojto_optimizer_cron.xml",
         "views/kojto_optimizer_1d_views.xml",
         "views/kojto_optimizer_2d_views.xml",
         "views/kojto_optimizer_2dr_views.xml",
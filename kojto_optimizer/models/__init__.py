@@ -2,6 +2,10 @@
 # Landing page
 from . import kojto_optimizer_landingpage
 
+# Background cutting plan jobs
+from . import kojto_optimizer_jobs
+from . import kojto_optimizer_plan_cache
+
 # 1D Optimization Models
 from . import optimizer_1d
 
@@ -0,0 +1,344 @@
+"""
+Kojto Optimizer Jobs
+
+Purpose:
+--------
+Runs cutting-plan computations outside the HTTP request. Packages inheriting
+kojto.optimizer.job.mixin with background computation enabled enqueue one job
+per distinct set of inputs when they or their rows are written, instead of
+nesting inline; the cron runners claim queued jobs and write the result back
+to the package. The cutting plan compute itself only reads the jobs.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import timedelta
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+JOB_RUNNER_CRONS = [
+    "kojto_optimizer.ir_cron_kojto_optimizer_job_runner_1",
+    "kojto_optimizer.ir_cron_kojto_optimizer_job_runner_2",
+]
+
+# A failed or interrupted job is queued again after RETRY_BACKOFF_SECONDS,
+# doubling on every attempt, until it has run MAX_ATTEMPTS times
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 60
+# Jobs running for longer were left behind by a killed worker
+STALE_RUNNING_MINUTES = 60
+
+
+class KojtoOptimizerJobs(models.Model):
+    _name = "kojto.optimizer.jobs"
+    _description = "Kojto Optimizer Cutting Plan Jobs"
+    _order = "id desc"
+
+    res_model = fields.Char(string="Package Model", required=True, index=True)
+    res_id = fields.Integer(string="Package ID", required=True, index=True)
+    fingerprint = fields.Char(string="Input Fingerprint", required=True, index=True)
+    state = fields.Selection([
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+        ("cancelled", "Cancelled"),
+    ], string="State", required=True, default="queued", index=True)
+    progress = fields.Integer(string="Progress (%)", default=0)
+    cutting_plan = fields.Text(string="Cutting Plan")
+    cutting_plan_json = fields.Text(string="Cutting Plan JSON")
+    error_message = fields.Text(string="Error")
+    date_started = fields.Datetime(string="Started")
+    date_finished = fields.Datetime(string="Finished")
+    duration = fields.Float(string="Duration (s)", digits=(9, 2))
+    attempts = fields.Integer(string="Attempts", default=0)
+    next_attempt_at = fields.Datetime(string="Next Attempt", index=True)
+
+    @api.model
+    def _find_job(self, package, fingerprint, states=("queued", "running", "done", "failed")):
+        return self.search([
+            ("res_model", "=", package._name),
+            ("res_id", "=", package.id),
+            ("fingerprint", "=", fingerprint),
+            ("state", "in", list(states)),
+        ], limit=1)
+
+    @api.model
+    def _enqueue(self, package, fingerprint, force=False):
+        """Return the job for these inputs, queueing one if none exists yet.
+
+        Requests for inputs that already have a queued, running, finished or failed
+        job are coalesced onto it; queued jobs for older inputs of the same package
+        are cancelled. force queues a new job even if a finished or failed one exists.
+        """
+        job = self._find_job(package, fingerprint, ("queued", "running") if force else ("queued", "running", "done", "failed"))
+        if job:
+            return job
+        self.search([
+            ("res_model", "=", package._name),
+            ("res_id", "=", package.id),
+            ("state", "=", "queued"),
+        ]).write({"state": "cancelled"})
+        job = self.create({"res_model": package._name, "res_id": package.id, "fingerprint": fingerprint})
+        self._trigger_runners()
+        return job
+
+    @api.model
+    def _trigger_runners(self, at=None):
+        for xmlid in JOB_RUNNER_CRONS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron and cron.active:
+                cron.sudo()._trigger(at)
+
+    @api.model
+    def _claim_next_job(self):
+        """Lock the oldest due queued job, mark it running and commit so other runners skip it."""
+        self.env.cr.execute("""
+            SELECT id FROM kojto_optimizer_jobs
+            WHERE state = 'queued'
+              AND (next_attempt_at IS NULL OR next_attempt_at <= NOW() AT TIME ZONE 'UTC')
+            ORDER BY id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        job = self.browse(row[0])
+        job.write({
+            "state": "running",
+            "progress": 10,
+            "attempts": job.attempts + 1,
+            "date_started": fields.Datetime.now(),
+        })
+        self.env.cr.commit()
+        return job
+
+    def _retry_or_fail(self, error_message):
+        """Queue the jobs again with backoff, or fail them once out of attempts."""
+        now = fields.Datetime.now()
+        retry_at = False
+        for job in self:
+            if job.attempts < MAX_ATTEMPTS:
+                next_attempt_at = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** max(job.attempts - 1, 0))
+                job.write({"state": "queued", "progress": 0, "error_message": error_message, "next_attempt_at": next_attempt_at})
+                retry_at = min(retry_at, next_attempt_at) if retry_at else next_attempt_at
+            else:
+                job.write({"state": "failed", "progress": 0, "error_message": error_message, "date_finished": now})
+        if retry_at:
+            self._trigger_runners(retry_at)
+
+    @api.model
+    def _reap_stale_jobs(self):
+        """Retry or fail jobs left running by a worker that was killed or timed out."""
+        self.env.cr.execute("""
+            SELECT id FROM kojto_optimizer_jobs
+            WHERE state = 'running'
+              AND date_started < NOW() AT TIME ZONE 'UTC' - %s * INTERVAL '1 minute'
+            FOR UPDATE SKIP LOCKED
+        """, (STALE_RUNNING_MINUTES,))
+        stale = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if stale:
+            _logger.warning("Cutting plan jobs %s were left running, retrying them", stale.ids)
+            stale._retry_or_fail(f"Interrupted after running for more than {STALE_RUNNING_MINUTES} minutes")
+            self.env.cr.commit()
+
+    @api.model
+    def _cron_run_jobs(self, limit=None):
+        """Run queued jobs until the queue is empty or the batch size is reached.
+
+        Every runner cron claims jobs with SKIP LOCKED, so several runners (and
+        several cron workers) drain the queue in parallel without running a job twice.
+        """
+        if limit is None:
+            limit = int(self.env["ir.config_parameter"].sudo().get_param("kojto_optimizer.job_batch_size", 10))
+        self._reap_stale_jobs()
+        for _ in range(limit):
+            job = self._claim_next_job()
+            if not job:
+                break
+            job._run()
+            self.env.cr.commit()
+
+    def _run(self):
+        self.ensure_one()
+        package = self.env[self.res_model].browse(self.res_id).exists()
+        if not package or package._get_cutting_plan_fingerprint() != self.fingerprint:
+            # The package was deleted or its inputs changed after the job was queued
+            self.write({"state": "cancelled", "date_finished": fields.Datetime.now()})
+            return
+        started = time.monotonic()
+        try:
+            with self.env.cr.savepoint():
+                values = package._compute_cutting_plan_inline()
+        except Exception as e:
+            _logger.error(f"Cutting plan job {self.id} for {self.res_model}({self.res_id}) failed: {str(e)}", exc_info=True)
+            self.write({"duration": time.monotonic() - started})
+            self._retry_or_fail(str(e))
+            return
+        self.write(dict(
+            values,
+            state="done",
+            progress=100,
+            error_message=False,
+            date_finished=fields.Datetime.now(),
+            duration=time.monotonic() - started,
+        ))
+        package.sudo().with_context(kojto_optimizer_job_result=True).write(values)
+
+    @api.autovacuum
+    def _gc_finished_jobs(self):
+        """Drop finished jobs older than 30 days, keeping the latest plan of every package."""
+        self.env.cr.execute("""
+            DELETE FROM kojto_optimizer_jobs
+            WHERE state IN ('done', 'failed', 'cancelled')
+              AND create_date < NOW() AT TIME ZONE 'UTC' - INTERVAL '30 days'
+              AND id NOT IN (
+                  SELECT MAX(id) FROM kojto_optimizer_jobs
+                  WHERE state = 'done'
+                  GROUP BY res_model, res_id
+              )
+        """)
+
+
+class KojtoOptimizerJobMixin(models.AbstractModel):
+    _name = "kojto.optimizer.job.mixin"
+    _description = "Kojto Optimizer Background Cutting Plan Mixin"
+
+    compute_in_background = fields.Boolean(string="Compute in Background", default=False, help="When enabled, the cutting plan is computed by a background job instead of during the request; the last plan stays visible until the new one is ready")
+    plan_state = fields.Selection([
+        ("ready", "Ready"),
+        ("computing", "Computing"),
+        ("stale", "Stale"),
+    ], string="Plan State", compute="_compute_plan_state")
+    plan_progress = fields.Integer(string="Plan Progress (%)", compute="_compute_plan_state")
+
+    # Packages define _get_cutting_plan_inputs(), returning a JSON-serialisable
+    # description of everything their plan depends on
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._queue_cutting_plans()
+        return records
+
+    def write(self, vals):
+        result = super().write(vals)
+        if not self.env.context.get("kojto_optimizer_job_result"):
+            self._queue_cutting_plans()
+        return result
+
+    def _queue_cutting_plans(self):
+        """Queue a job for the current inputs of every background package that has none yet."""
+        jobs = self.env["kojto.optimizer.jobs"].sudo()
+        for record in self.exists().filtered("compute_in_background"):
+            jobs._enqueue(record, record._get_cutting_plan_fingerprint())
+
+    def _get_cutting_plan_fingerprint(self):
+        self.ensure_one()
+        payload = json.dumps(self._get_cutting_plan_inputs(), sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _compute_cutting_plan_inline(self):
+        """Run the package's own cutting plan compute in this process and return its values."""
+        self.ensure_one()
+        record = self.with_context(kojto_optimizer_inline=True)
+        fields.determine(record._fields["cutting_plan_json"].compute, record)
+        return {"cutting_plan": record.cutting_plan, "cutting_plan_json": record.cutting_plan_json}
+
+    def _filter_cutting_plan_inline(self):
+        """Assign plans of background records from their jobs and return the rest.
+
+        A background record gets the result of the job matching its current inputs.
+        While that job is queued or running, or not queued yet, it keeps the last
+        finished plan. Jobs are queued on write (_queue_cutting_plans), never here.
+        """
+        if self.env.context.get("kojto_optimizer_inline"):
+            return self
+        background = self.filtered("compute_in_background")
+        jobs = self.env["kojto.optimizer.jobs"].sudo()
+        for record in background:
+            if not isinstance(record.id, int):
+                # Unsaved edits in the form do not queue jobs
+                record.cutting_plan = record._origin.cutting_plan if record._origin else False
+                record.cutting_plan_json = record._origin.cutting_plan_json if record._origin else False
+                continue
+            job = jobs._find_job(record, record._get_cutting_plan_fingerprint())
+            if job.state == "failed":
+                record.cutting_plan = f"Error computing cutting plan: {job.error_message}"
+                record.cutting_plan_json = json.dumps({
+                    "cutting_plans": [],
+                    "stock_used": [],
+                    "summary": {},
+                    "success": False,
+                    "message": f"Error: {job.error_message}",
+                    "error_details": job.error_message
+                })
+                continue
+            if job.state != "done":
+                job = jobs.search([
+                    ("res_model", "=", record._name),
+                    ("res_id", "=", record.id),
+                    ("state", "=", "done"),
+                ], limit=1)
+            record.cutting_plan = job.cutting_plan or False
+            record.cutting_plan_json = job.cutting_plan_json or False
+        return self - background
+
+    def _compute_plan_state(self):
+        background = self.filtered(lambda r: r.compute_in_background and isinstance(r.id, int))
+        # Latest job of every package and input fingerprint, in one search
+        latest = {}
+        for job in self.env["kojto.optimizer.jobs"].sudo().search([
+            ("res_model", "=", self._name),
+            ("res_id", "in", background.ids),
+            ("state", "in", ["queued", "running", "done", "failed"]),
+        ]):
+            latest.setdefault((job.res_id, job.fingerprint), job)
+        for record in self:
+            if record not in background:
+                record.plan_state = "ready"
+                record.plan_progress = 100
+                continue
+            job = latest.get((record.id, record._get_cutting_plan_fingerprint()), self.env["kojto.optimizer.jobs"])
+            if job.state == "done":
+                record.plan_state = "ready"
+            elif job.state in ("queued", "running"):
+                record.plan_state = "computing"
+            else:
+                record.plan_state = "stale"
+            record.plan_progress = job.progress or 0
+
+    def action_requeue_cutting_plan(self):
+        jobs = self.env["kojto.optimizer.jobs"].sudo()
+        for record in self.filtered("compute_in_background"):
+            jobs._enqueue(record, record._get_cutting_plan_fingerprint(), force=True)
+        return True
+
+
+class KojtoOptimizerJobLineMixin(models.AbstractModel):
+    _name = "kojto.optimizer.job.line.mixin"
+    _description = "Kojto Optimizer Background Cutting Plan Line Mixin"
+
+    # Rows of a package (stock, bars, shapes) queue its plan when they change
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records.package_id._queue_cutting_plans()
+        return records
+
+    def write(self, vals):
+        packages = self.package_id
+        result = super().write(vals)
+        (packages | self.package_id)._queue_cutting_plans()
+        return result
+
+    def unlink(self):
+        packages = self.package_id
+        result = super().unlink()
+        packages._queue_cutting_plans()
+        return result
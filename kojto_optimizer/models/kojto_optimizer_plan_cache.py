@@ -0,0 +1,121 @@
+"""
+Kojto Optimizer Plan Cache
+
+Purpose:
+--------
+Persistent, content-addressed cache of generated cutting plans. Entries are keyed
+by a hash of the optimizer inputs only (no package or record ids), so identical
+or copied packages reuse a plan instead of running the optimizer again. A cached
+plan is relabelled for the package asking for it. Least recently used entries
+are evicted once the cache exceeds kojto_optimizer.plan_cache_size entries.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Bump whenever a generator changes its output for the same inputs
+CACHE_VERSION = 2
+
+
+class KojtoOptimizerPlanCache(models.Model):
+    _name = "kojto.optimizer.plan.cache"
+    _description = "Kojto Optimizer Cutting Plan Cache"
+    _order = "last_used desc"
+
+    key = fields.Char(string="Input Hash", required=True, index=True)
+    kind = fields.Selection([("1d", "1D"), ("2d", "2D"), ("2dr", "2DR")], string="Kind", required=True)
+    result_json = fields.Text(string="Cutting Plan JSON", required=True)
+    hit_count = fields.Integer(string="Hits", default=0)
+    last_used = fields.Datetime(string="Last Used", default=fields.Datetime.now, index=True)
+
+    _sql_constraints = [
+        ("unique_key", "UNIQUE(key)", "Cache key must be unique."),
+    ]
+
+    @api.model
+    def _make_key(self, kind, inputs):
+        payload = json.dumps([CACHE_VERSION, kind, inputs], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @api.model
+    def _get_or_generate(self, kind, inputs, package, generate):
+        """Return the cutting plan JSON for these inputs, calling generate() on a miss.
+
+        Only successful plans are stored. Hits and misses are counted on the entries:
+        hit_count per entry, one entry per miss.
+        """
+        key = self._make_key(kind, inputs)
+        self.env.cr.execute("""
+            UPDATE kojto_optimizer_plan_cache
+            SET hit_count = hit_count + 1, last_used = NOW() AT TIME ZONE 'UTC'
+            WHERE key = %s
+            RETURNING result_json
+        """, (key,))
+        row = self.env.cr.fetchone()
+        if row:
+            _logger.debug(f"Cutting plan cache hit for {kind} package {package.id}")
+            return self._relabel(kind, row[0], package)
+
+        result_json = generate()
+        try:
+            success = json.loads(result_json).get("success", False)
+        except (TypeError, ValueError):
+            success = False
+        if success:
+            self.env.cr.execute("""
+                INSERT INTO kojto_optimizer_plan_cache
+                    (key, kind, result_json, hit_count, last_used, create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, 0, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC', %s, NOW() AT TIME ZONE 'UTC')
+                ON CONFLICT (key) DO NOTHING
+            """, (key, kind, result_json, self.env.uid, self.env.uid))
+            self._evict()
+        return result_json
+
+    @api.model
+    def _evict(self):
+        size = int(self.env["ir.config_parameter"].sudo().get_param("kojto_optimizer.plan_cache_size", 500))
+        self.env.cr.execute("""
+            DELETE FROM kojto_optimizer_plan_cache
+            WHERE id IN (
+                SELECT id FROM kojto_optimizer_plan_cache
+                ORDER BY last_used DESC, id DESC
+                OFFSET %s
+            )
+        """, (size,))
+
+    @api.model
+    def _relabel(self, kind, result_json, package):
+        """Replace the package header, plan numbers and record ids of a cached plan."""
+        result = json.loads(result_json)
+        header = {
+            "id": str(package.id),
+            "name": package.name or "Unnamed Package",
+            "subcode_id": str(package.subcode_id.id) if package.subcode_id else None,
+            "description": package.description or "No description provided",
+            "date_issue": (
+                package.date_issue.strftime('%Y-%m-%d')
+                if package.date_issue
+                else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            ),
+        }
+        if kind == "1d":
+            result["package"] = header
+            result["timestamp"] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            stock_ids = {s.stock_position: str(s.id) for s in package.stock_ids}
+            bar_ids = {b.bar_position: str(b.id) for b in package.bar_ids}
+            for number, plan in enumerate(result.get("cutting_plans", []), start=1):
+                plan["cutting_plan_number"] = f"{header['name']}_CP{number:03d}"
+                plan["stock_id"] = stock_ids.get(plan["stock_position"], plan.get("stock_id"))
+                for cut in plan.get("cut_pattern", []):
+                    cut["bar_id"] = bar_ids.get(cut["bar_position"], cut.get("bar_id"))
+        else:
+            result.update(header)
+            if kind == "2dr":
+                for number, plan in enumerate(result.get("cutting_plans", []), start=1):
+                    plan["cutting_plan_number"] = f"{header['name']}_CP{number:03d}"
+        return json.dumps(result, indent=2)
@@ -5,6 +5,7 @@ from odoo.exceptions import ValidationError
 
 class KojtoOptimizer1DBars(models.Model):
     _name = "kojto.optimizer.1d.bars"
+    _inherit = ["kojto.optimizer.job.line.mixin"]
     _description = "Bars for Kojto Optimizer 1D"
 
     package_id = fields.Many2one("kojto.optimizer.1d.packages", string="Package", required=True, ondelete="cascade")
@@ -7,7 +7,7 @@ from ...utils.compute_1d_cutting_plan import compute_1d_cutting_plan
 class KojtoOptimizer1DPackages(models.Model):
     _name = "kojto.optimizer.1d.packages"
     _description = "Kojto Optimizer 1D Packages"
-    _inherit = ["kojto.library.printable"]
+    _inherit = ["kojto.library.printable", "kojto.optimizer.job.mixin"]
     _report_ref = "kojto_optimizer.print_kojto_optimizer_1d_packages"
 
 
@@ -24,7 +24,8 @@ class KojtoOptimizer1DPackages(models.Model):
     final_cut = fields.Float(string="Final Cut (mm)", required=True, default=0.0)
     cutting_plan = fields.Text(string="Cutting Plan", compute="compute_1d_cutting_plan", store=True)
     cutting_plan_json = fields.Text(string="Cutting Plan JSON", compute="compute_1d_cutting_plan", store=True)
-    optimization_method = fields.Selection(selection=[("greedy", "Greedy"), ("first-fit", "First Fit"), ("best-fit", "Best Fit")], string="Optimization Method", required=True, default="best-fit")
+    optimization_method = fields.Selection(selection=[("greedy", "Greedy"), ("first-fit", "First Fit"), ("best-fit", "Best Fit"), ("optimal", "Optimal")], string="Optimization Method", required=True, default="best-fit")
+    optimization_time_limit = fields.Integer(string="Time Limit (s)", default=10, help="Wall-clock budget for the optimal method; the best plan found within it is used and its optimality gap is reported")
     use_stock_priority = fields.Boolean(string="Use Stock Priority", default=False, help="When enabled, stock pieces will be used in order of their position field")
     language_id = fields.Many2one("res.lang", string="Language", default=lambda self: self.env.ref("base.lang_en").id)
     pdf_attachment_id = fields.Many2one("ir.attachment", string="Attachments")
@@ -35,6 +36,12 @@ class KojtoOptimizer1DPackages(models.Model):
             if any(val < 0 for val in [record.width_of_cut, record.initial_cut, record.final_cut]):
                 raise ValidationError("Cut values cannot be negative.")
 
+    @api.constrains("optimization_time_limit")
+    def _check_time_limit(self):
+        for record in self:
+            if record.optimization_time_limit < 1 or record.optimization_time_limit > 600:
+                raise ValidationError("Time limit must be between 1 and 600 seconds.")
+
     @api.constrains("stock_ids", "bar_ids")
     def _check_record_limits(self):
         for record in self:
@@ -75,16 +82,44 @@ class KojtoOptimizer1DPackages(models.Model):
                 )
             record.name = f"{base_name_prefix}.{str(next_number).zfill(3)}"
 
-    @api.depends("stock_ids", "bar_ids", "optimization_method", "width_of_cut", "initial_cut", "final_cut", "use_stock_priority")
+    @api.depends("stock_ids", "bar_ids", "optimization_method", "width_of_cut", "initial_cut", "final_cut", "use_stock_priority", "optimization_time_limit", "compute_in_background")
     def compute_1d_cutting_plan(self):
-        for record in self:
+        for record in self._filter_cutting_plan_inline():
             try:
                 compute_1d_cutting_plan(record)
             except Exception as e:
                 record.cutting_plan = ""
                 record.cutting_plan_json = ""
 
-    @api.onchange("stock_ids", "bar_ids", "optimization_method", "width_of_cut", "initial_cut", "final_cut", "use_stock_priority")
+    def _get_cutting_plan_inputs(self):
+        self.ensure_one()
+        return dict(
+            self._get_cutting_plan_cache_inputs(),
+            name=self.name,
+            stock_ids=self.stock_ids.ids,
+            bar_ids=self.bar_ids.ids,
+        )
+
+    def _get_cutting_plan_cache_inputs(self):
+        self.ensure_one()
+        return {
+            "method": self.optimization_method,
+            "time_limit": self.optimization_time_limit,
+            "width_of_cut": self.width_of_cut,
+            "initial_cut": self.initial_cut,
+            "final_cut": self.final_cut,
+            "use_stock_priority": self.use_stock_priority,
+            "stock": [
+                (s.stock_position, s.stock_description, s.stock_length, s.available_stock_pieces)
+                for s in self.stock_ids
+            ],
+            "bars": [
+                (b.bar_position, b.bar_description, b.bar_length, b.required_bar_pieces)
+                for b in self.bar_ids
+            ],
+        }
+
+    @api.onchange("stock_ids", "bar_ids", "optimization_method", "width_of_cut", "initial_cut", "final_cut", "use_stock_priority", "optimization_time_limit")
     def _onchange_recompute_cutting_plan(self):
         if self._origin:
             self.compute_1d_cutting_plan()
@@ -23,6 +23,7 @@ _logger = logging.getLogger(__name__)
 
 class KojtoOptimizer2dShapesToCut(models.Model):
     _name = "kojto.optimizer.2d.shapes.to.cut"
+    _inherit = ["kojto.optimizer.job.line.mixin"]
     _description = "Kojto Profile Optimizer 2D Shapes to Cut"
 
     package_id = fields.Many2one("kojto.optimizer.2d.packages", string="Package", required=True, ondelete="cascade")
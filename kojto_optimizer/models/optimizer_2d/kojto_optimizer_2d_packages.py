@@ -18,7 +18,7 @@ _logger = logging.getLogger(__name__)
 class KojtoOptimizer2dPackages(models.Model):
     _name = "kojto.optimizer.2d.packages"
     _description = "Kojto Profile Optimizer 2D Packages"
-    _inherit = ["kojto.library.printable"]
+    _inherit = ["kojto.library.printable", "kojto.optimizer.job.mixin"]
     _report_ref = "kojto_optimizer.print_kojto_optimizer_2d_packages"
 
     name = fields.Char(compute="generate_2d_package_name", store=True, string="Name")
@@ -50,6 +50,17 @@ class KojtoOptimizer2dPackages(models.Model):
         ("skyline_bl", "Skyline - Bottom Left"),
     ], required=True, default="maxrects_bssf", string="Optimization Method")
 
+    nesting_mode = fields.Selection([
+        ("single", "Single Run"),
+        ("portfolio", "Portfolio"),
+    ], required=True, default="single", string="Nesting Mode",
+        help="Portfolio nests several configurations one after another and keeps the plan with the least waste")
+    nesting_time_limit = fields.Integer(
+        string="Time Limit (s)",
+        default=30,
+        help="Wall-clock budget for portfolio nesting; configurations not started when it expires are skipped"
+    )
+
     use_stock_priority = fields.Boolean(
         string="Use Stock Priority",
         default=False,
@@ -80,6 +91,12 @@ class KojtoOptimizer2dPackages(models.Model):
             ]):
                 raise ValidationError("Cut width and margins cannot be negative.")
 
+    @api.constrains("nesting_time_limit")
+    def _check_nesting_time_limit(self):
+        for record in self:
+            if record.nesting_time_limit < 1 or record.nesting_time_limit > 600:
+                raise ValidationError("Time limit must be between 1 and 600 seconds.")
+
     @api.constrains("stock_rectangles_ids", "shapes_to_cut_ids")
     def _check_record_limits(self):
         for record in self:
@@ -126,13 +143,13 @@ class KojtoOptimizer2dPackages(models.Model):
 
     @api.depends("stock_rectangles_ids", "shapes_to_cut_ids", "optimization_method",
                  "width_of_cut", "margin_left", "margin_right", "margin_top", "margin_bottom",
-                 "use_stock_priority", "thickness", "material_id",
+                 "use_stock_priority", "thickness", "material_id", "nesting_mode", "nesting_time_limit",
                  "shapes_to_cut_ids.bbox_width", "shapes_to_cut_ids.bbox_height",
                  "shapes_to_cut_ids.required_cut_shape_pieces",
-                 "shapes_to_cut_ids.outer_polygon_json")
+                 "shapes_to_cut_ids.outer_polygon_json", "compute_in_background")
     def _compute_cutting_plan(self):
         """Compute cutting plan for 2D shapes using actual polygon shapes."""
-        for record in self:
+        for record in self._filter_cutting_plan_inline():
             try:
                 if not record.stock_rectangles_ids or not record.shapes_to_cut_ids:
                     record.cutting_plan = ""
@@ -143,17 +160,22 @@ class KojtoOptimizer2dPackages(models.Model):
                 from ...utils.generate_2d_cutting_plan import generate_2d_cutting_plan
 
                 # Generate cutting plan using actual polygon shapes
-                result_json = generate_2d_cutting_plan(
-                    stock_rectangles_ids=record.stock_rectangles_ids,
-                    shapes_to_cut_ids=record.shapes_to_cut_ids,
-                    method=record.optimization_method,
-                    width_of_cut=record.width_of_cut,
-                    use_stock_priority=record.use_stock_priority,
-                    package=record,
-                    margin_left=record.margin_left or 0.0,
-                    margin_right=record.margin_right or 0.0,
-                    margin_top=record.margin_top or 0.0,
-                    margin_bottom=record.margin_bottom or 0.0
+                result_json = self.env["kojto.optimizer.plan.cache"].sudo()._get_or_generate(
+                    "2d", record._get_cutting_plan_cache_inputs(), record,
+                    lambda: generate_2d_cutting_plan(
+                        stock_rectangles_ids=record.stock_rectangles_ids,
+                        shapes_to_cut_ids=record.shapes_to_cut_ids,
+                        method=record.optimization_method,
+                        width_of_cut=record.width_of_cut,
+                        use_stock_priority=record.use_stock_priority,
+                        package=record,
+                        margin_left=record.margin_left or 0.0,
+                        margin_right=record.margin_right or 0.0,
+                        margin_top=record.margin_top or 0.0,
+                        margin_bottom=record.margin_bottom or 0.0,
+                        portfolio=record.nesting_mode == "portfolio",
+                        time_limit=record.nesting_time_limit or 30
+                    )
                 )
 
                 try:
@@ -260,6 +282,36 @@ class KojtoOptimizer2dPackages(models.Model):
                     "error_details": str(e)
                 })
 
+    def _get_cutting_plan_inputs(self):
+        """Inputs of the polygon nest plus package identity, fingerprinted for background jobs."""
+        self.ensure_one()
+        return dict(
+            self._get_cutting_plan_cache_inputs(),
+            name=self.name,
+            stock_ids=self.stock_rectangles_ids.ids,
+            shape_ids=self.shapes_to_cut_ids.ids,
+        )
+
+    def _get_cutting_plan_cache_inputs(self):
+        """Inputs of the polygon nest without package identity, hashed for the plan cache."""
+        self.ensure_one()
+        return {
+            "method": self.optimization_method,
+            "nesting_mode": self.nesting_mode,
+            "time_limit": self.nesting_time_limit if self.nesting_mode == "portfolio" else None,
+            "width_of_cut": self.width_of_cut,
+            "margins": [self.margin_left, self.margin_right, self.margin_top, self.margin_bottom],
+            "use_stock_priority": self.use_stock_priority,
+            "stock": [
+                (s.stock_position, s.stock_description, s.stock_width, s.stock_length, s.available_stock_rectangle_pieces)
+                for s in self.stock_rectangles_ids
+            ],
+            "shapes": [
+                (c.cut_position, c.cut_description, c.required_cut_shape_pieces, c.outer_polygon_json)
+                for c in self.shapes_to_cut_ids
+            ],
+        }
+
     @api.depends("cutting_plan_json", "shapes_to_cut_ids", "margin_left", "margin_bottom")
     def _compute_cutting_plan_svgs(self):
         """Compute SVG representations of cutting plans."""
@@ -13,6 +13,7 @@ from odoo.exceptions import ValidationError
 
 class KojtoOptimizer2drCutRectangles(models.Model):
     _name = "kojto.optimizer.2dr.cut.rectangles"
+    _inherit = ["kojto.optimizer.job.line.mixin"]
     _description = "Kojto Profile Optimizer 2DR Cut Rectangles"
 
     package_id = fields.Many2one("kojto.optimizer.2dr.packages", string="Package", required=True, ondelete="cascade")
@@ -24,7 +24,7 @@ from ...utils.compute_cutting_plan_2dr_svg import compute_cutting_plan_2dr_svg
 class KojtoOptimizer2drPackages(models.Model):
     _name = "kojto.optimizer.2dr.packages"
     _description = "Kojto Profile Optimizer 2DR Packages"
-    _inherit = ["kojto.library.printable"]
+    _inherit = ["kojto.library.printable", "kojto.optimizer.job.mixin"]
     _report_ref = "kojto_optimizer.print_kojto_optimizer_2dr_packages"
 
 
@@ -147,10 +147,11 @@ class KojtoOptimizer2drPackages(models.Model):
         "margin_left",
         "margin_right",
         "margin_top",
-        "margin_bottom"
+        "margin_bottom",
+        "compute_in_background"
     )
     def _compute_cutting_plan(self):
-        for package in self:
+        for package in self._filter_cutting_plan_inline():
             try:
                 compute_2dr_cutting_plan(package)
             except Exception as e:
@@ -163,6 +164,33 @@ class KojtoOptimizer2drPackages(models.Model):
                 package.cutting_plan_json = False
                 _logger.warning(f"No cutting plan generated for package {package.id or 'new'}")
 
+    def _get_cutting_plan_inputs(self):
+        self.ensure_one()
+        return dict(
+            self._get_cutting_plan_cache_inputs(),
+            name=self.name,
+            stock_ids=self.stock_rectangles_ids.ids,
+            cut_ids=self.cutted_rectangles_ids.ids,
+        )
+
+    def _get_cutting_plan_cache_inputs(self):
+        self.ensure_one()
+        return {
+            "method": self.optimization_method,
+            "width_of_cut": self.width_of_cut,
+            "margins": [self.margin_left, self.margin_right, self.margin_top, self.margin_bottom],
+            "use_stock_priority": self.use_stock_priority,
+            "allow_cut_rotation": self.allow_cut_rotation,
+            "stock": [
+                (s.stock_position, s.stock_description, s.stock_width, s.stock_length, s.available_stock_rectangle_pieces)
+                for s in self.stock_rectangles_ids
+            ],
+            "cuts": [
+                (c.cut_position, c.cut_description, c.cut_width, c.cut_length, c.required_cut_rectangle_pieces)
+                for c in self.cutted_rectangles_ids
+            ],
+        }
+
     @api.depends("cutting_plan_json")
     def _compute_cutting_plan_svgs(self):
         for package in self:
@@ -13,6 +13,7 @@ from odoo.exceptions import ValidationError
 
 class KojtoOptimizer2drStockRectangles(models.Model):
     _name = "kojto.optimizer.2dr.stock.rectangles"
+    _inherit = ["kojto.optimizer.job.line.mixin"]
     _description = "Kojto Profile Optimizer 2DR Stock Rectangles"
     _order = "stock_position, id"
 
@@ -5,15 +5,19 @@ from ..utils.generate_1d_cutting_plan import generate_1d_cutting_plan
 def compute_1d_cutting_plan(self):
     for record in self:
         try:
-            result_json = generate_1d_cutting_plan(
-                stock_ids=record.stock_ids,
-                bar_ids=record.bar_ids,
-                method=record.optimization_method,
-                width_of_cut=record.width_of_cut,
-                initial_cut=record.initial_cut,
-                final_cut=record.final_cut,
-                use_stock_priority=record.use_stock_priority,
-                package=record
+            result_json = record.env["kojto.optimizer.plan.cache"].sudo()._get_or_generate(
+                "1d", record._get_cutting_plan_cache_inputs(), record,
+                lambda: generate_1d_cutting_plan(
+                    stock_ids=record.stock_ids,
+                    bar_ids=record.bar_ids,
+                    method=record.optimization_method,
+                    width_of_cut=record.width_of_cut,
+                    initial_cut=record.initial_cut,
+                    final_cut=record.final_cut,
+                    use_stock_priority=record.use_stock_priority,
+                    package=record,
+                    time_limit=record.optimization_time_limit or 10
+                )
             )
             try:
                 result = json.loads(result_json)
@@ -74,8 +78,13 @@ def compute_1d_cutting_plan(self):
                 f"\tMethod: {summary.get('method', 'N/A')}\n"
                 f"\tWidth of Cut: {summary.get('width_of_cut', 0.0)} mm\n"
                 f"\tInitial Cut: {summary.get('initial_cut', record.initial_cut)} mm\n"
-                f"\tFinal Cut: {summary.get('final_cut', record.final_cut)} mm\n\n"
+                f"\tFinal Cut: {summary.get('final_cut', record.final_cut)} mm\n"
             )
+            if summary.get("optimality_gap") is not None:
+                cutting_plan_text += f"\tOptimality Gap: {summary['optimality_gap']:.2f}% ({summary.get('solver_status', 'N/A')})\n"
+            if summary.get("lower_bound_stock_length") is not None:
+                cutting_plan_text += f"\tLower Bound Stock Length: {summary['lower_bound_stock_length'] / 1000:.2f} m\n"
+            cutting_plan_text += "\n"
             cutting_plan_text += "2. Used Stock:\n"
             for stock in result.get("stock_used", []):
                 cutting_plan_text += (
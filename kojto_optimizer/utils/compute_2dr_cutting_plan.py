@@ -5,18 +5,21 @@ from ..utils.generate_2dr_cutting_plan import generate_2dr_cutting_plan
 def compute_2dr_cutting_plan(self):
     for record in self:
         try:
-            result_json = generate_2dr_cutting_plan(
-                stock_rectangles_ids=record.stock_rectangles_ids,
-                cutted_rectangles_ids=record.cutted_rectangles_ids,
-                method=record.optimization_method,
-                width_of_cut=record.width_of_cut,
-                use_stock_priority=record.use_stock_priority,
-                allow_cut_rotation=record.allow_cut_rotation,
-                package=record,
-                margin_left=record.margin_left or 0.0,
-                margin_right=record.margin_right or 0.0,
-                margin_top=record.margin_top or 0.0,
-                margin_bottom=record.margin_bottom or 0.0
+            result_json = record.env["kojto.optimizer.plan.cache"].sudo()._get_or_generate(
+                "2dr", record._get_cutting_plan_cache_inputs(), record,
+                lambda: generate_2dr_cutting_plan(
+                    stock_rectangles_ids=record.stock_rectangles_ids,
+                    cutted_rectangles_ids=record.cutted_rectangles_ids,
+                    method=record.optimization_method,
+                    width_of_cut=record.width_of_cut,
+                    use_stock_priority=record.use_stock_priority,
+                    allow_cut_rotation=record.allow_cut_rotation,
+                    package=record,
+                    margin_left=record.margin_left or 0.0,
+                    margin_right=record.margin_right or 0.0,
+                    margin_top=record.margin_top or 0.0,
+                    margin_bottom=record.margin_bottom or 0.0
+                )
             )
             try:
                 result = json.loads(result_json)
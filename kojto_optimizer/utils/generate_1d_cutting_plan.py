@@ -1,8 +1,220 @@
 import json
+from bisect import bisect_left, insort
 from binpacking import to_constant_bin_number
 from datetime import datetime
+from .solve_1d_cutting_stock import solve_1d_cutting_stock
 
-def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut=0.0, initial_cut=0.0, final_cut=0.0, use_stock_priority=False, package=None):
+# Lengths are packed as integer micrometres so bin fills compare exactly
+LENGTH_SCALE = 1000
+
+
+def _to_units(length):
+    return int(round(length * LENGTH_SCALE))
+
+
+def _add_run(runs, bar_index, count):
+    if runs and runs[-1][0] == bar_index:
+        runs[-1][1] += count
+    else:
+        runs.append([bar_index, count])
+
+
+class _FreeTree:
+    """Max segment tree over bin free lengths, in the order the bins were opened."""
+
+    def __init__(self):
+        self.size = 64
+        self.tree = [-1] * (2 * self.size)
+        self.count = 0
+
+    def append(self, free):
+        if self.count == self.size:
+            leaves = self.tree[self.size:]
+            self.size *= 2
+            self.tree = [-1] * self.size + leaves + [-1] * (self.size - len(leaves))
+            for i in range(self.size - 1, 0, -1):
+                self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+        self.count += 1
+        self.update(self.count - 1, free)
+
+    def update(self, index, free):
+        i = index + self.size
+        self.tree[i] = free
+        i //= 2
+        while i:
+            self.tree[i] = max(self.tree[2 * i], self.tree[2 * i + 1])
+            i //= 2
+
+    def first_at_least(self, length):
+        """Index of the first bin with at least length free, or None."""
+        if self.tree[1] < length:
+            return None
+        i = 1
+        while i < self.size:
+            i = 2 * i if self.tree[2 * i] >= length else 2 * i + 1
+        return i - self.size
+
+
+def _pack_greedy(order, weights, left, stock_indices, capacities, unopened, bins):
+    """First fit in stock order, one bar size at a time.
+
+    Bins are [stock_index, free, runs, copies, rank]; runs are [bar_index, count]
+    pairs in cutting order. Unopened stock is not materialised: every stock index
+    only keeps a counter of pieces still available, and the opened bins of each
+    stock index sit in a max tree so the first fitting bin is found in log time.
+    """
+    trees = {s: _FreeTree() for s in stock_indices}
+    opened = {s: [] for s in stock_indices}
+    for bar_index in order:
+        w = weights[bar_index]
+        while left[bar_index]:
+            target = None
+            for rank, s in enumerate(stock_indices):
+                slot = trees[s].first_at_least(w)
+                if slot is not None:
+                    target = opened[s][slot]
+                    break
+                if unopened[s] and capacities[s] >= w:
+                    target = [s, capacities[s], [], 1, (rank, len(opened[s]))]
+                    unopened[s] -= 1
+                    trees[s].append(capacities[s])
+                    opened[s].append(target)
+                    bins.append(target)
+                    break
+            if target is None:
+                break
+            count = min(left[bar_index], target[1] // w)
+            target[1] -= count * w
+            left[bar_index] -= count
+            _add_run(target[2], bar_index, count)
+            trees[target[0]].update(target[4][1], target[1])
+
+
+def _pack_best_fit(order, weights, left, stock_indices, capacities, unopened, bins):
+    """Best fit: every piece goes to the bin it leaves the least free length in.
+
+    Open bins are kept sorted by (free, rank). Once a bin is the best fit for a bar
+    size it stays the best fit until full, so a whole run is placed at once.
+    """
+    rank_of = {s: k for k, s in enumerate(stock_indices)}
+    opened = {s: 0 for s in stock_indices}
+    # Stock with pieces left, smallest capacity first
+    fresh_order = sorted((s for s in stock_indices if unopened[s]), key=lambda s: (capacities[s], rank_of[s]))
+    fresh_capacities = [capacities[s] for s in fresh_order]
+    fits = []
+    smallest = min(weights[b] for b in order)
+    for bar_index in order:
+        w = weights[bar_index]
+        while left[bar_index]:
+            i = bisect_left(fits, (w,))
+            candidate = fits[i] if i < len(fits) else None
+            j = bisect_left(fresh_capacities, w)
+            fresh = fresh_order[j] if j < len(fresh_order) else None
+            if candidate is not None and (
+                fresh is None or candidate[:2] < (capacities[fresh], (rank_of[fresh], opened[fresh]))
+            ):
+                fits.pop(i)
+                target = candidate[2]
+            elif fresh is not None:
+                target = [fresh, capacities[fresh], [], 1, (rank_of[fresh], opened[fresh])]
+                unopened[fresh] -= 1
+                opened[fresh] += 1
+                bins.append(target)
+                if not unopened[fresh]:
+                    del fresh_order[j]
+                    del fresh_capacities[j]
+            else:
+                # A piece that fits nowhere ends packing into this stock
+                return
+            count = min(left[bar_index], target[1] // w)
+            target[1] -= count * w
+            left[bar_index] -= count
+            _add_run(target[2], bar_index, count)
+            if target[1] >= smallest:
+                insort(fits, (target[1], target[4], target))
+
+
+def _pack_constant_bins(order, weights, left, stock_indices, capacities, unopened, bins):
+    """Spread the pieces evenly over every available stock piece (binpacking)."""
+    slots = [s for s in stock_indices for _ in range(unopened[s])]
+    pieces = {(bar_index, k): weights[bar_index] for bar_index in order for k in range(left[bar_index])}
+    if not slots or not pieces:
+        return
+    for slot, contents in enumerate(to_constant_bin_number(pieces, len(slots))):
+        if not contents:
+            continue
+        stock_index = slots[slot]
+        runs = []
+        for bar_index, _ in sorted(contents, key=lambda key: (-weights[key[0]], key[0])):
+            _add_run(runs, bar_index, 1)
+        unopened[stock_index] -= 1
+        bins.append([stock_index, capacities[stock_index] - sum(contents.values()), runs, 1, (slot,)])
+    for bar_index in order:
+        left[bar_index] = 0
+
+
+def _pack_optimal(order, weights, left, stock_indices, capacities, unopened, costs, time_limit, use_stock_priority, bins):
+    """Pack by column generation over distinct adjusted lengths.
+
+    Bar positions sharing an adjusted length share a demand row; after solving they
+    are handed out to pattern copies in position order. Returns the solver info.
+    """
+    lengths = sorted({weights[b] for b in order if left[b]}, reverse=True)
+    row_of = {w: i for i, w in enumerate(lengths)}
+    queues = [[] for _ in lengths]
+    for bar_index in order:
+        if left[bar_index]:
+            queues[row_of[weights[bar_index]]].append(bar_index)
+    demand = [sum(left[b] for b in queue) for queue in queues]
+
+    solution = solve_1d_cutting_stock(
+        [capacities[s] for s in stock_indices],
+        [unopened[s] for s in stock_indices],
+        [costs[s] for s in stock_indices],
+        lengths,
+        demand,
+        time_limit=time_limit,
+    )
+    solver_info = {
+        "solver_status": solution["status"],
+        "solver_iterations": solution["iterations"],
+        "optimality_gap": round(solution["gap"] * 100, 2) if solution["gap"] is not None else None,
+        "lower_bound_stock_length": (
+            round(solution["lower_bound"], 2)
+            if solution["lower_bound"] is not None and not use_stock_priority
+            else None
+        ),
+    }
+    if solution["patterns"] is None:
+        return solver_info
+
+    heads = [0] * len(lengths)
+    for slot, counts, copies in sorted(solution["patterns"], key=lambda p: p[0]):
+        stock_index = stock_indices[slot]
+        rows = [(i, c) for i, c in enumerate(counts) if c]
+        while copies:
+            # Copies served entirely by the current head position of every row
+            batch = min(left[queues[i][heads[i]]] // c for i, c in rows)
+            batch = min(copies, batch) or 1
+            runs = []
+            for i, c in rows:
+                need = c * batch
+                while need:
+                    bar_index = queues[i][heads[i]]
+                    take = min(need, left[bar_index])
+                    _add_run(runs, bar_index, take // batch if batch > 1 else take)
+                    left[bar_index] -= take
+                    need -= take
+                    if not left[bar_index]:
+                        heads[i] += 1
+            used = sum(weights[b] * n for b, n in runs)
+            unopened[stock_index] -= batch
+            bins.append([stock_index, capacities[stock_index] - used, runs, batch, (slot, len(bins))])
+            copies -= batch
+    return solver_info
+
+
+def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut=0.0, initial_cut=0.0, final_cut=0.0, use_stock_priority=False, package=None, time_limit=10):
     result = {
         "cutting_plans": [],
         "stock_used": [],
@@ -59,7 +271,7 @@ def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut
         )
 
     # Validate optimization method
-    valid_methods = ["greedy", "first-fit", "best-fit"]
+    valid_methods = ["greedy", "first-fit", "best-fit", "optimal"]
     if method not in valid_methods:
         return error_result(
             "Cannot create cutting plan - invalid optimization method",
@@ -128,273 +340,94 @@ def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut
                 f"Bar position {pos} ({desc}) has invalid pieces {pieces}. Pieces must be positive."
             )
 
-    # Prepare items for packing
-    items = []
-    for bar_pos, bar_len, pieces, bar_id, bar_desc in bar_data:
-        adjusted_length = bar_len + width_of_cut
-        items.extend([{
-            "bar_position": bar_pos,
-            "length": bar_len,
-            "adjusted_length": adjusted_length,
-            "bar_id": str(bar_id),
-            "bar_description": bar_desc
-        } for _ in range(pieces)])
-    items.sort(key=lambda x: x["adjusted_length"], reverse=True)
-
-    # Group stock by position for priority-based optimization
-    if use_stock_priority:
-        # Sort stock data by position
-        stock_data = sorted(stock_data, key=lambda x: x[0])  # Sort by stock_position (index 0)
-
-        # Group stock by position
-        stock_by_position = {}
-        for stock_pos, stock_len, stock_pieces, stock_id, stock_desc in stock_data:
-            if stock_pos not in stock_by_position:
-                stock_by_position[stock_pos] = []
-            usable_length = stock_len - initial_cut - final_cut
-            if usable_length <= 0:
-                continue
-            stock_by_position[stock_pos].extend([
-                (stock_pos, stock_len, usable_length, stock_id, stock_desc)
-                for _ in range(stock_pieces)
-            ])
-
-        # Process each position sequentially
-        remaining_items = items.copy()
-        all_bins = []
-        all_stock_map = {}
-        bin_index = 0
-
-        for stock_pos in sorted(stock_by_position.keys()):
-            if not remaining_items:
-                break
+    # Compact model: one entry per bar position and per stock position, lengths in integer units
+    kerf = _to_units(width_of_cut)
+    trim = _to_units(initial_cut) + _to_units(final_cut)
+    weights = [_to_units(length) + kerf for _, length, _, _, _ in bar_data]
+    left = [pieces for _, _, pieces, _, _ in bar_data]
+    order = sorted(range(len(bar_data)), key=lambda b: -weights[b])
+    capacities = [_to_units(length) - trim for _, length, _, _, _ in stock_data]
+    unopened = [pieces if capacities[s] > 0 else 0 for s, (_, _, pieces, _, _) in enumerate(stock_data)]
 
-            # Create bins for current position only
-            bins = []
-            stock_map = {}
-            for stock_pos_current, stock_len, usable_length, stock_id, stock_desc in stock_by_position[stock_pos]:
-                bins.append({
-                    "capacity": usable_length,
-                    "original_length": stock_len,
-                    "remaining": usable_length,
-                    "items": [],
-                    "stock_id": str(stock_id),
-                    "stock_description": stock_desc
-                })
-                stock_map[bin_index] = stock_pos_current
-                bin_index += 1
-
-            if not bins:
-                continue
-
-            # Packing logic for current position
-            if method == "greedy":
-                for item in remaining_items[:]:  # Copy list to avoid modification during iteration
-                    placed = False
-                    for bin in bins:
-                        if bin["remaining"] >= item["adjusted_length"]:
-                            bin["items"].append({
-                                "bar_position": item["bar_position"],
-                                "length": item["length"],
-                                "bar_id": item["bar_id"],
-                                "bar_description": item["bar_description"]
-                            })
-                            bin["remaining"] -= item["adjusted_length"]
-                            placed = True
-                            remaining_items.remove(item)  # Remove placed item
-                            break
-            elif method == "first-fit":
-                item_dict = {f"{item['bar_position']}_{i}": item["adjusted_length"] for i, item in enumerate(remaining_items)}
-                try:
-                    packed_bins = to_constant_bin_number(item_dict, len(bins))
-                    placed_items = set()
-                    for bin_idx, bin_contents in enumerate(packed_bins):
-                        for item_key, adj_len in bin_contents.items():
-                            bar_pos = item_key.split("_")[0]
-                            bar_len = adj_len - width_of_cut
-                            matching_item = next(i for i in remaining_items if i["bar_position"] == bar_pos and i["length"] == bar_len and i not in placed_items)
-                            bins[bin_idx]["items"].append({
-                                "bar_position": bar_pos,
-                                "length": bar_len,
-                                "bar_id": matching_item["bar_id"],
-                                "bar_description": matching_item["bar_description"]
-                            })
-                            bins[bin_idx]["remaining"] -= adj_len
-                            placed_items.add(matching_item)
-                    # Remove placed items from remaining_items
-                    remaining_items = [item for item in remaining_items if item not in placed_items]
-                except (ValueError, StopIteration):
-                    # Skip this position if packing fails
-                    continue
-            elif method == "best-fit":
-                for item in remaining_items[:]:  # Copy list to avoid modification during iteration
-                    best_bin_idx = None
-                    min_remaining = float("inf")
-                    for i, bin in enumerate(bins):
-                        if bin["remaining"] >= item["adjusted_length"] and bin["remaining"] - item["adjusted_length"] < min_remaining:
-                            best_bin_idx = i
-                            min_remaining = bin["remaining"] - item["adjusted_length"]
-                    if best_bin_idx is not None:
-                        bins[best_bin_idx]["items"].append({
-                            "bar_position": item["bar_position"],
-                            "length": item["length"],
-                            "bar_id": item["bar_id"],
-                            "bar_description": item["bar_description"]
-                        })
-                        bins[best_bin_idx]["remaining"] -= item["adjusted_length"]
-                        remaining_items.remove(item)  # Remove placed item
-                    else:
-                        # Skip this position if no fit found
-                        break
-
-            # Add bins from current position to global list
-            all_bins.extend(bins)
-            all_stock_map.update(stock_map)
-
-        # Check if all items were placed
-        if remaining_items:
-            unplaced_count = len(remaining_items)
-            return error_result(
-                "Cannot create cutting plan - insufficient stock to place all bars",
-                f"Unable to place {unplaced_count} bars. Increase stock quantity or adjust bar requirements."
-            )
-
-        bins = all_bins
-        stock_map = all_stock_map
+    if not any(unopened):
+        return error_result(
+            "Cannot create cutting plan - no usable stock pieces available",
+            "No stock pieces remain after applying initial and final cuts. Ensure stock length exceeds initial_cut + final_cut."
+        )
 
+    bins = []
+    solver_info = None
+    if method == "optimal":
+        stock_indices = [s for s in range(len(stock_data)) if unopened[s]]
+        if use_stock_priority:
+            stock_indices.sort(key=lambda s: stock_data[s][0])
+        # With stock priority every later position is made more expensive than all earlier ones
+        costs = [0.0] * len(stock_data)
+        for rank, s in enumerate(stock_indices):
+            costs[s] = stock_data[s][1] * (rank + 1 if use_stock_priority else 1)
+        solver_info = _pack_optimal(
+            order, weights, left, stock_indices, capacities, unopened, costs, time_limit, use_stock_priority, bins
+        )
     else:
-        # Original non-priority logic
-        bins = []
-        stock_map = {}
-        bin_index = 0
-        for stock_pos, stock_len, stock_pieces, stock_id, stock_desc in stock_data:
-            usable_length = stock_len - initial_cut - final_cut
-            if usable_length <= 0:
-                continue
-            for _ in range(stock_pieces):
-                bins.append({
-                    "capacity": usable_length,
-                    "original_length": stock_len,
-                    "remaining": usable_length,
-                    "items": [],
-                    "stock_id": str(stock_id),
-                    "stock_description": stock_desc
-                })
-                stock_map[bin_index] = stock_pos
-                bin_index += 1
-
-        if not bins:
-            return error_result(
-                "Cannot create cutting plan - no usable stock pieces available",
-                "No stock pieces remain after applying initial and final cuts. Ensure stock length exceeds initial_cut + final_cut."
-            )
-
-        # Packing logic
-        if method == "greedy":
-            for item in items:
-                placed = False
-                for bin in bins:
-                    if bin["remaining"] >= item["adjusted_length"]:
-                        bin["items"].append({
-                            "bar_position": item["bar_position"],
-                            "length": item["length"],
-                            "bar_id": item["bar_id"],
-                            "bar_description": item["bar_description"]
-                        })
-                        bin["remaining"] -= item["adjusted_length"]
-                        placed = True
-                        break
-                if not placed:
-                    return error_result(
-                        "Cannot create cutting plan - insufficient stock to place all bars",
-                        f"Unable to place bar {item['bar_position']} ({item['bar_description']}) with adjusted length {item['adjusted_length']}. Increase stock quantity."
-                    )
-        elif method == "first-fit":
-            item_dict = {f"{item['bar_position']}_{i}": item["adjusted_length"] for i, item in enumerate(items)}
-            try:
-                packed_bins = to_constant_bin_number(item_dict, len(bins))
-                for bin_idx, bin_contents in enumerate(packed_bins):
-                    for item_key, adj_len in bin_contents.items():
-                        bar_pos = item_key.split("_")[0]
-                        bar_len = adj_len - width_of_cut
-                        matching_item = next(i for i in items if i["bar_position"] == bar_pos and i["length"] == bar_len)
-                        bins[bin_idx]["items"].append({
-                            "bar_position": bar_pos,
-                            "length": bar_len,
-                            "bar_id": matching_item["bar_id"],
-                            "bar_description": matching_item["bar_description"]
-                        })
-                        bins[bin_idx]["remaining"] -= adj_len
-            except ValueError as e:
-                return error_result(
-                    "Cannot create cutting plan - insufficient stock to place all bars",
-                    f"First-fit packing failed: {str(e)}. Increase stock quantity or adjust bar requirements."
-                )
-        elif method == "best-fit":
-            for item in items:
-                best_bin_idx = None
-                min_remaining = float("inf")
-                for i, bin in enumerate(bins):
-                    if bin["remaining"] >= item["adjusted_length"] and bin["remaining"] - item["adjusted_length"] < min_remaining:
-                        best_bin_idx = i
-                        min_remaining = bin["remaining"] - item["adjusted_length"]
-                if best_bin_idx is not None:
-                    bins[best_bin_idx]["items"].append({
-                        "bar_position": item["bar_position"],
-                        "length": item["length"],
-                        "bar_id": item["bar_id"],
-                        "bar_description": item["bar_description"]
-                    })
-                    bins[best_bin_idx]["remaining"] -= item["adjusted_length"]
-                else:
-                    return error_result(
-                        "Cannot create cutting plan - insufficient stock to place all bars",
-                        f"Unable to place bar {item['bar_position']} ({item['bar_description']}) with adjusted length {item['adjusted_length']}. Increase stock quantity."
-                    )
+        pack = {"greedy": _pack_greedy, "first-fit": _pack_constant_bins, "best-fit": _pack_best_fit}[method]
+        if use_stock_priority:
+            # Exhaust each stock position before moving on to the next one
+            for s in sorted(range(len(stock_data)), key=lambda s: stock_data[s][0]):
+                if not any(left):
+                    break
+                if unopened[s]:
+                    pack(order, weights, left, [s], capacities, unopened, bins)
+        else:
+            pack(order, weights, left, list(range(len(stock_data))), capacities, unopened, bins)
 
     # Verify all items were placed
-    packed_items = sum(len(bin["items"]) for bin in bins)
-    total_items = len(items)
-    if packed_items < total_items:
+    unplaced = sum(left)
+    if unplaced:
+        if method == "optimal" or use_stock_priority:
+            return error_result(
+                "Cannot create cutting plan - insufficient stock to place all bars",
+                f"Unable to place {unplaced} bars. Increase stock quantity or adjust bar requirements."
+            )
+        bar_pos, _, _, _, bar_desc = bar_data[next(b for b in order if left[b])]
+        adjusted_length = next(b[1] for b in bar_data if b[0] == bar_pos) + width_of_cut
         return error_result(
-            "Cannot create cutting plan - insufficient stock to meet bar requirements",
-            f"Unmet pieces: {total_items - packed_items}. Increase stock quantity or reduce bar pieces."
+            "Cannot create cutting plan - insufficient stock to place all bars",
+            f"Unable to place bar {bar_pos} ({bar_desc}) with adjusted length {adjusted_length}. Increase stock quantity."
         )
 
-    # Calculate cutting plans
+    # Identical bins collapse into one cutting plan, keyed by their run tuple
     total_stock_length = sum(s[1] * s[2] for s in stock_data)
     total_bar_length = sum(b[1] * b[2] for b in bar_data)
-    patterns_by_stock = {}
-    for bin_idx, bin in enumerate(bins):
-        if not bin["items"]:
+    stock_order = sorted(range(len(stock_data)), key=lambda s: stock_data[s][0]) if use_stock_priority else range(len(stock_data))
+    patterns_by_stock = {s: {} for s in stock_order}
+    for stock_index, _, runs, copies, _ in sorted(bins, key=lambda b: (b[0], b[4])):
+        if not runs:
             continue
-        stock_pos = stock_map[bin_idx]
-        stock_len = bin["original_length"]
-        pattern_key = "|".join(
-            f"{item['bar_position']}_{item['length']}_{item['bar_id']}_{item['bar_description']}"
-            for item in bin["items"]
-        )
-        if stock_pos not in patterns_by_stock:
-            patterns_by_stock[stock_pos] = {}
-        patterns_by_stock[stock_pos][pattern_key] = patterns_by_stock[stock_pos].get(pattern_key, 0) + 1
+        patterns = patterns_by_stock[stock_index]
+        key = tuple((bar_index, count) for bar_index, count in runs)
+        patterns[key] = patterns.get(key, 0) + copies
 
     # Generate cutting plans
     package_name_base = result.get("package", {}).get("name", "Unnamed Package")
     plan_counter = 1
-    for stock_pos, patterns in patterns_by_stock.items():
-        stock_info = next(s for s in stock_data if s[0] == stock_pos)
-        stock_len, stock_id, stock_desc = stock_info[1], stock_info[3], stock_info[4]
-        for pattern_key, count in patterns.items():
+    used_bins = 0
+    total_used_stock_length = 0.0
+    stock_used_dict = {}
+    for stock_index in patterns_by_stock:
+        stock_pos, stock_len, _, stock_id, stock_desc = stock_data[stock_index]
+        for runs, count in patterns_by_stock[stock_index].items():
             cut_pattern = []
-            for p in pattern_key.split("|"):
-                parts = p.split("_")
-                cut_pattern.append({
-                    "bar_position": parts[0],
-                    "length": float(parts[1]),
-                    "bar_id": parts[2],
-                    "bar_description": parts[3]
-                })
-            used_length = sum(p["length"] + width_of_cut for p in cut_pattern) + initial_cut + final_cut
+            used_length = initial_cut + final_cut
+            for bar_index, pieces in runs:
+                bar_pos, bar_len, _, bar_id, bar_desc = bar_data[bar_index]
+                cut = {
+                    "bar_position": bar_pos,
+                    "length": bar_len,
+                    "bar_id": str(bar_id),
+                    "bar_description": bar_desc
+                }
+                cut_pattern.extend(dict(cut) for _ in range(pieces))
+                used_length += (bar_len + width_of_cut) * pieces
             total_waste = stock_len - used_length
             waste_percentage = (total_waste / stock_len * 100) if stock_len > 0 else 0
             cutting_plan_number = f"{package_name_base}_CP{plan_counter:03d}"
@@ -412,29 +445,25 @@ def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut
                 "width_of_cut": width_of_cut
             })
             plan_counter += 1
+            used_bins += count
+            total_used_stock_length += stock_len * count
 
-    # Generate stock used summary
-    stock_used_dict = {}
-    for plan in result["cutting_plans"]:
-        key = (plan["stock_position"], plan["stock_description"], plan["stock_length"])
-        if key in stock_used_dict:
-            stock_used_dict[key]["pcs"] += plan["pieces"]
-        else:
-            stock_used_dict[key] = {
-                "stock_position": plan["stock_position"],
-                "stock_description": plan["stock_description"],
-                "stock_length": plan["stock_length"],
-                "pcs": plan["pieces"]
-            }
+            # Generate stock used summary
+            key = (stock_pos, stock_desc, stock_len)
+            if key in stock_used_dict:
+                stock_used_dict[key]["pcs"] += count
+            else:
+                stock_used_dict[key] = {
+                    "stock_position": stock_pos,
+                    "stock_description": stock_desc,
+                    "stock_length": stock_len,
+                    "pcs": count
+                }
 
     result["stock_used"] = list(stock_used_dict.values())
 
     # Calculate final summary
-    total_used_stock_length = sum(
-        next(s[1] for s in stock_data if s[0] == plan["stock_position"]) * plan["pieces"]
-        for plan in result["cutting_plans"]
-    )
-    total_waste = total_used_stock_length - total_bar_length + (initial_cut + final_cut) * len([b for b in bins if b["items"]])
+    total_waste = total_used_stock_length - total_bar_length + (initial_cut + final_cut) * used_bins
     total_waste_percentage = (total_waste / total_stock_length * 100) if total_stock_length > 0 else 0
 
     result["summary"] = {
@@ -447,6 +476,8 @@ def generate_1d_cutting_plan(stock_ids, bar_ids, method="best-fit", width_of_cut
         "initial_cut": initial_cut,
         "final_cut": final_cut
     }
+    if solver_info:
+        result["summary"].update(solver_info)
 
     result["success"] = True
     result["message"] = "Cutting plan generated successfully"
@@ -1,7 +1,11 @@
 # kojto_optimizer/utils/generate_2d_cutting_plan.py
 
+import itertools
 import json
 import logging
+import math
+import random
+import time
 from datetime import datetime
 from shapely.geometry import Polygon
 from shapely.affinity import translate as shapely_translate
@@ -15,6 +19,228 @@ except ImportError:
 
 _logger = logging.getLogger(__name__)
 
+# pynest2d works on integer coordinates: 1 mm = SCALE units
+SCALE = 10.0
+
+# Portfolio search space; None keeps the pynest2d default
+PORTFOLIO_ROTATIONS = [None, (0, 90, 180, 270), (0, 180)]
+PORTFOLIO_ALIGNMENTS = [None, "BOTTOM_LEFT", "TOP_RIGHT"]
+PORTFOLIO_ORDERS = ["bbox_area", "shuffle"]
+PORTFOLIO_MAX_CONFIGS = 24
+
+
+def _make_config(rotations=None, alignment=None):
+    """Build a pynest2d NestConfig for the given rotations (degrees) and alignment, or None."""
+    if rotations is None and alignment is None:
+        return None
+    from pynest2d import NfpConfig, NestConfig
+    placer = NfpConfig()
+    if rotations is not None:
+        placer.rotations = [math.radians(r) for r in rotations]
+    if alignment is not None:
+        placer.alignment = getattr(NfpConfig.Alignment, alignment)
+    return NestConfig(placer)
+
+
+def _nest_once(polygons, order, bin_width_int, bin_height_int, spacing_scaled, rotations=None, alignment=None):
+    """Run one pynest2d nest and return its placements as plain data.
+
+    polygons are integer point lists; order is the sequence of their indexes handed
+    to the nester. Returns (num_bins, placements) where placements[i] is
+    (bin_id, min_x, min_y, rotation) of polygons[i] in pynest2d's centred bin
+    coordinates, or None when it was not placed. Only plain data goes in and out,
+    so portfolio runs never share pynest2d objects.
+    """
+    items = [Item([Point(x, y) for x, y in polygons[i]]) for i in order]
+    config = _make_config(rotations, alignment)
+    box = Box(bin_width_int, bin_height_int)
+    if config is None:
+        num_bins = nest(items, box, spacing_scaled)
+    else:
+        num_bins = nest(items, box, spacing_scaled, config)
+
+    placements = [None] * len(polygons)
+    for i, item in zip(order, items):
+        bin_id = item.binId()
+        if bin_id < 0:
+            continue
+        transformed = item.transformedShape()
+        vertices = [transformed.vertex(k) for k in range(transformed.vertexCount())]
+        if not vertices:
+            continue
+        placements[i] = (
+            bin_id,
+            float(min(v.x() for v in vertices)),
+            float(min(v.y() for v in vertices)),
+            float(item.rotation()),
+        )
+    return num_bins, placements
+
+
+def _sheet_types(stock_data, use_stock_priority):
+    """Group stock into the sheet types the nester fills.
+
+    With stock priority every position is its own type, in position order.
+    Otherwise positions sharing an effective size are merged and their pieces add up.
+    """
+    types = {}
+    for k, stock in enumerate(stock_data):
+        key = k if use_stock_priority else (stock['effective_width'], stock['effective_length'])
+        if key not in types:
+            types[key] = {
+                'effective_width': stock['effective_width'],
+                'effective_length': stock['effective_length'],
+                'bin_width_int': int(round(stock['effective_width'] * SCALE)),
+                'bin_height_int': int(round(stock['effective_length'] * SCALE)),
+                'original_area': stock['original_width'] * stock['original_length'],
+                'pieces': 0,
+                'stocks': [],
+            }
+        types[key]['pieces'] += stock['pieces']
+        types[key]['stocks'].append(stock)
+    return list(types.values())
+
+
+def _fits(points, sheet_type, rotations=None):
+    """Tell whether the bounding box of an integer polygon fits a sheet type, turned by 90° if allowed."""
+    width = max(x for x, _ in points) - min(x for x, _ in points)
+    height = max(y for _, y in points) - min(y for _, y in points)
+    bin_width, bin_height = sheet_type['bin_width_int'], sheet_type['bin_height_int']
+    if width <= bin_width and height <= bin_height:
+        return True
+    # pynest2d's default rotations include quarter turns
+    turns = rotations is None or any(r % 180 == 90 for r in rotations)
+    return turns and height <= bin_width and width <= bin_height
+
+
+def _nest_sheets(polygons, areas, types, spacing_scaled, order, rotations=None, alignment=None, use_stock_priority=False):
+    """Nest the polygons onto sheets of the given types within their available pieces.
+
+    With stock priority (or a single type) the types are filled in order, each with one
+    nest run over what is left. Otherwise sheets are chosen greedily: every step nests
+    the remaining items on each type with pieces left and either finishes with the type
+    that takes everything at the best utilisation, or keeps all full sheets (every sheet
+    but the last, partly filled one) of the type that fills them best.
+
+    Returns (bins, placements, short): bins[b] is the type index of sheet b,
+    placements[i] is (b, min_x, min_y, rotation) in that sheet's centred coordinates or
+    None, and short tells whether a leftover item would fit a type whose stock ran out.
+    """
+    left = [t['pieces'] for t in types]
+    remaining = list(order)
+    bins = []
+    placements = [None] * len(polygons)
+
+    def take(k, run, bin_ids):
+        for bin_id in bin_ids:
+            bins.append(k)
+            for i in remaining:
+                if run[i] is not None and run[i][0] == bin_id:
+                    placements[i] = (len(bins) - 1,) + run[i][1:]
+        left[k] -= len(bin_ids)
+        remaining[:] = [i for i in remaining if placements[i] is None]
+
+    def nest_on(k):
+        t = types[k]
+        _, run = _nest_once(polygons, remaining, t['bin_width_int'], t['bin_height_int'], spacing_scaled, rotations, alignment)
+        filled = {}
+        for i in remaining:
+            if run[i] is not None:
+                filled[run[i][0]] = filled.get(run[i][0], 0.0) + areas[i]
+        return run, filled
+
+    if use_stock_priority or len(types) == 1:
+        for k in range(len(types)):
+            if not remaining:
+                break
+            run, filled = nest_on(k)
+            take(k, run, sorted(filled)[:left[k]])
+    else:
+        while remaining:
+            remaining_area = sum(areas[i] for i in remaining)
+            best = None
+            for k, t in enumerate(types):
+                if not left[k]:
+                    continue
+                run, filled = nest_on(k)
+                if not filled:
+                    continue
+                if len(filled) <= left[k] and all(run[i] is not None for i in remaining):
+                    option = (remaining_area / (len(filled) * t['original_area']), -t['original_area'], True, k, run, sorted(filled))
+                else:
+                    bin_ids = sorted(filled)
+                    bin_ids = (bin_ids[:-1] if len(bin_ids) > 1 else bin_ids)[:left[k]]
+                    utilisation = sum(filled[b] for b in bin_ids) / (len(bin_ids) * t['original_area'])
+                    option = (utilisation, -t['original_area'], False, k, run, bin_ids)
+                if best is None or option[:2] > best[:2]:
+                    best = option
+            if best is None:
+                break
+            _, _, finished, k, run, bin_ids = best
+            take(k, run, bin_ids)
+            if finished:
+                break
+    short = any(
+        not left[k] and _fits(polygons[i], t, rotations)
+        for i in remaining for k, t in enumerate(types)
+    )
+    return bins, placements, short
+
+
+def _nest_candidate(args):
+    try:
+        return _nest_sheets(*args)
+    except Exception as e:
+        _logger.warning(f"Portfolio nest configuration failed: {e}")
+        return None
+
+
+def _portfolio_candidates(types, item_count, allow_rotation, use_stock_priority):
+    """Nest configurations to try: (type indexes, order, rotations, alignment), baseline first.
+
+    Besides nesting on all sheet types, every type is also tried on its own unless
+    stock priority fixes the order in which they are used. Configurations that change
+    a single setting from the baseline come first, so every item order, rotation set,
+    alignment and sheet type gets a slot before the list is cut to PORTFOLIO_MAX_CONFIGS.
+    """
+    type_sets = [list(range(len(types)))]
+    if not use_stock_priority and len(types) > 1:
+        type_sets += [[k] for k in range(len(types))]
+    identity = list(range(item_count))
+    shuffled = list(identity)
+    random.Random(item_count).shuffle(shuffled)
+    orders = [shuffled if order_name == "shuffle" else identity for order_name in PORTFOLIO_ORDERS]
+    rotation_sets = PORTFOLIO_ROTATIONS if allow_rotation else [None]
+    indexes = itertools.product(
+        range(len(orders)), range(len(rotation_sets)), range(len(PORTFOLIO_ALIGNMENTS)), range(len(type_sets)),
+    )
+    # Stable sort: the baseline, then single-setting variations, then the rest by how far they stray
+    indexes = sorted(indexes, key=lambda idx: (sum(1 for i in idx if i) > 1, max(idx)))
+    candidates = [
+        (type_sets[t], orders[o], rotation_sets[r], PORTFOLIO_ALIGNMENTS[a])
+        for o, r, a, t in indexes
+    ]
+    return candidates[:PORTFOLIO_MAX_CONFIGS]
+
+
+def _run_portfolio(jobs, time_limit):
+    """Run _nest_sheets over jobs one after another within time_limit seconds.
+
+    Returns one result per job, None for jobs that failed or were not started in time.
+    Jobs run in-process: forking an Odoo worker copies its database connections and
+    locks, and spawned interpreters cannot import addon modules. The first (baseline)
+    job always runs so there is a plan to fall back on; later jobs only start while
+    time is left, so the budget is exceeded by at most one configuration.
+    """
+    results = [None] * len(jobs)
+    deadline = time.monotonic() + time_limit
+    for k, args in enumerate(jobs):
+        if k and time.monotonic() >= deadline:
+            _logger.info(f"Portfolio time limit reached, skipping {len(jobs) - k} configuration(s)")
+            break
+        results[k] = _nest_candidate(args)
+    return results
+
 
 def generate_2d_cutting_plan(
     stock_rectangles_ids,
@@ -27,7 +253,9 @@ def generate_2d_cutting_plan(
     margin_right=0.0,
     margin_top=0.0,
     margin_bottom=0.0,
-    allow_rotation=True  # New parameter to control rotation
+    allow_rotation=True,  # New parameter to control rotation
+    portfolio=False,
+    time_limit=30
 ):
     """
     Updated version:
@@ -36,6 +264,11 @@ def generate_2d_cutting_plan(
     - Keeps continuous rotation if True (default for better packing)
     - Normalized polygons + bbox sorting for bottom-left packing
     - SCALE=10.0, kerf as int
+    - portfolio=True nests several configurations (item order, rotation set, alignment,
+      sheet size) within time_limit seconds and keeps the plan with
+      the least used stock area
+    - Stock positions of different sizes are nested as separate sheet types, each
+      limited to its available pieces (see _nest_sheets)
     """
 
     def error_result(message, error_details=None):
@@ -92,12 +325,9 @@ def generate_2d_cutting_plan(
     if not stock_data:
         return error_result("No valid stock after applying margins")
 
-    effective_width = stock_data[0]['effective_width']
-    effective_length = stock_data[0]['effective_length']
-    total_available_pieces = sum(s['pieces'] for s in stock_data)
-
     if use_stock_priority:
         stock_data.sort(key=lambda x: x['position'])
+    types = _sheet_types(stock_data, use_stock_priority)
 
     # Prepare shapes - normalize to (0,0)
     shapes_data = []
@@ -162,101 +392,88 @@ def generate_2d_cutting_plan(
     if not all_items_data:
         return error_result("No items after expanding pieces")
 
-    # Scale
-    SCALE = 10.0
-
-    # Create Items
-    pynest_items = []
+    # Integer polygons handed to the nester, one per expanded item
+    polygons = []
     item_mapping = []
     for data in all_items_data:
-        try:
-            if not allow_rotation and data.get('is_90'):
-                points_float = data['outer_points_float_90']
-            else:
-                points_float = data['outer_points_float']
-            points_int = [Point(int(round(x * SCALE)), int(round(y * SCALE)))
-                          for x, y in points_float]
-            if len(points_int) < 3:
-                continue
-            item = Item(points_int)
-            pynest_items.append(item)
-            item_mapping.append(data)
-        except Exception as e:
-            _logger.warning(f"Failed to create Item for {data['position']}: {e}")
+        if not allow_rotation and data.get('is_90'):
+            points_float = data['outer_points_float_90']
+        else:
+            points_float = data['outer_points_float']
+        points_int = [(int(round(x * SCALE)), int(round(y * SCALE))) for x, y in points_float]
+        if len(points_int) < 3:
             continue
+        polygons.append(points_int)
+        item_mapping.append(data)
 
-    if not pynest_items:
+    if not polygons:
         return error_result("No valid pynest2d Items created")
 
-    # Bin and kerf
-    bin_width_int = int(round(effective_width * SCALE))
-    bin_height_int = int(round(effective_length * SCALE))
-    bin_box = Box(bin_width_int, bin_height_int)
     spacing_scaled = int(round(width_of_cut * SCALE))
 
-    _logger.info(f"Nesting parameters: bin={bin_width_int}x{bin_height_int} (scaled), "
-                 f"spacing={spacing_scaled} (scaled, {width_of_cut}mm), "
-                 f"items={len(pynest_items)}")
-
-    # Nest
-    try:
-        num_bins_used = nest(pynest_items, bin_box, spacing_scaled)
-        _logger.info(f"pynest2d nesting completed: {num_bins_used} sheets required")
+    areas = [data['area'] for data in item_mapping]
+    if portfolio:
+        candidates = _portfolio_candidates(types, len(polygons), allow_rotation, use_stock_priority)
+        runs = _run_portfolio([
+            (polygons, areas, [types[k] for k in type_set], spacing_scaled, order, rotations, alignment, use_stock_priority)
+            for type_set, order, rotations, alignment in candidates
+        ], time_limit)
+        best = None
+        for (type_set, order, rotations, alignment), run in zip(candidates, runs):
+            if run is None:
+                continue
+            run_bins, run_placements, run_short = run
+            run_bins = [type_set[k] for k in run_bins]
+            score = (
+                run_short,
+                sum(1 for p in run_placements if p is None),
+                sum(types[k]['original_area'] for k in run_bins),
+            )
+            if best is None or score < best[0]:
+                best = (score, run_bins, run_placements, run_short)
+        if best is None:
+            return error_result("Nesting failed", {"exception": "No portfolio configuration produced a result"})
+        _, bins, placements, short = best
+        _logger.info(f"Portfolio nesting kept a plan on {len(bins)} sheets "
+                     f"out of {sum(1 for r in runs if r is not None)}/{len(candidates)} finished configurations")
+    else:
+        _logger.info(f"Nesting parameters: {len(types)} sheet type(s), "
+                     f"spacing={spacing_scaled} (scaled, {width_of_cut}mm), "
+                     f"items={len(polygons)}")
+        try:
+            bins, placements, short = _nest_sheets(
+                polygons, areas, types, spacing_scaled, list(range(len(polygons))), None, None, use_stock_priority
+            )
+            _logger.info(f"pynest2d nesting completed: {len(bins)} sheets required")
+            placed_count = sum(1 for p in placements if p is not None)
+            _logger.info(f"Placed {placed_count} out of {len(polygons)} items")
+        except Exception as e:
+            _logger.error(f"Nesting failed: {e}", exc_info=True)
+            return error_result("Nesting failed", {"exception": str(e)})
 
-        # Log placement statistics
-        placed_count = sum(1 for item in pynest_items if item.binId() >= 0)
-        _logger.info(f"Placed {placed_count} out of {len(pynest_items)} items")
-    except Exception as e:
-        _logger.error(f"Nesting failed: {e}", exc_info=True)
-        return error_result("Nesting failed", {"exception": str(e)})
+    if short:
+        available = ", ".join(f"{t['pieces']} x {t['effective_width']} x {t['effective_length']} mm" for t in types)
+        return error_result(f"Insufficient stock: items left over after using all sheets ({available})")
 
-    if num_bins_used > total_available_pieces:
-        return error_result(
-            f"Insufficient stock: {num_bins_used} sheets needed, only {total_available_pieces} available"
-        )
+    # Label every sheet with the stock position it is cut from, consuming the
+    # pieces of each sheet type's positions in order
+    type_stocks = [iter([stock for stock in t['stocks'] for _ in range(stock['pieces'])]) for t in types]
+    sheet_stocks = [next(type_stocks[k]) for k in bins]
 
-    # Extract positions from nested items
-    # pynest2d places items in a coordinate system where the bin is centered at (0,0)
-    # So items are placed around (-bin_width/2, -bin_height/2) to (bin_width/2, bin_height/2)
-    # We need to shift to bottom-left origin (0,0) by adding half the bin dimensions
+    # pynest2d places items in a coordinate system where the bin is centered at (0,0),
+    # so the bottom-left origin is reached by adding half the bin dimensions
     plans_by_bin = {}
     unplaced_count = 0
-    for item_obj, data in zip(pynest_items, item_mapping):
-        bin_id = item_obj.binId()
-        if bin_id < 0:
+    for placement, data in zip(placements, item_mapping):
+        if placement is None:
             unplaced_count += 1
             continue
-
-        transformed = item_obj.transformedShape()
-        if transformed.vertexCount() == 0:
-            continue
-
-        # Get all vertex coordinates from the transformed shape
-        vertices = [(float(transformed.vertex(i).x()), float(transformed.vertex(i).y()))
-                    for i in range(transformed.vertexCount())]
-
-        if not vertices:
-            continue
-
-        # Find bounding box of the transformed shape
-        min_x = min(v[0] for v in vertices)
-        min_y = min(v[1] for v in vertices)
-        max_x = max(v[0] for v in vertices)
-        max_y = max(v[1] for v in vertices)
-
-        # pynest2d uses a coordinate system where the bin is centered at (0,0)
-        # The bin extends from approximately (-bin_width/2, -bin_height/2) to (bin_width/2, bin_height/2)
-        # We need to shift coordinates to bottom-left origin (0,0)
-        # The shift is: add half the bin dimensions to move from center-origin to bottom-left origin
+        bin_id, min_x, min_y, rotation = placement
+        bin_width_int = types[bins[bin_id]]['bin_width_int']
+        bin_height_int = types[bins[bin_id]]['bin_height_int']
         pos_x = (min_x + bin_width_int / 2.0) / SCALE
         pos_y = (min_y + bin_height_int / 2.0) / SCALE
 
-        # Debug: log first few placements to verify coordinate system
-        if len(plans_by_bin.get(bin_id, [])) < 3:
-            _logger.debug(f"Item {data.get('position', 'unknown')}: "
-                         f"transformed bbox=({min_x:.1f},{min_y:.1f}) to ({max_x:.1f},{max_y:.1f}), "
-                         f"final pos=({pos_x:.2f},{pos_y:.2f})")
-
         # Ensure positions are non-negative (should be after the shift)
         if pos_x < -0.01 or pos_y < -0.01:  # Allow small negative due to rounding
             _logger.warning(f"Negative position detected for {data.get('position', 'unknown')}: "
@@ -265,7 +482,7 @@ def generate_2d_cutting_plan(
             pos_x = max(0, pos_x)
             pos_y = max(0, pos_y)
 
-        rotation_deg = float(item_obj.rotation())
+        rotation_deg = float(rotation)
         # If no rotation, force 0 or 90
         if not allow_rotation:
             rotation_deg = 90.0 if data.get('is_90') else 0.0
@@ -286,15 +503,14 @@ def generate_2d_cutting_plan(
     cutting_plans = []
     stock_usage = {}
     plan_number = 1
-    stock_idx = 0
 
     for bin_id in sorted(plans_by_bin):
         placed = plans_by_bin[bin_id]
-        stock = stock_data[stock_idx % len(stock_data)]
-        stock_idx += 1
+        stock = sheet_stocks[bin_id]
+        sheet = types[bins[bin_id]]
 
         used_area = sum(p['data']['area'] for p in placed)
-        stock_area = effective_width * effective_length
+        stock_area = sheet['effective_width'] * sheet['effective_length']
         waste_pct = round(100 * (1 - used_area / stock_area), 2) if stock_area > 0 else 0
 
         cutting_plan = {
@@ -336,12 +552,12 @@ def generate_2d_cutting_plan(
         plan_number += 1
 
     total_cut_area = sum(sum(item['area'] for item in plan['cut_pattern']) for plan in cutting_plans)
-    total_used_stock_area = len(cutting_plans) * stock_data[0]['original_width'] * stock_data[0]['original_length']
+    total_used_stock_area = sum(plan['stock_width'] * plan['stock_length'] for plan in cutting_plans)
     total_waste_pct = round(100 * (1 - total_cut_area / total_used_stock_area), 2) if total_used_stock_area > 0 else 0
 
     result = {
         "success": True,
-        "message": f"Generated {len(cutting_plans)} cutting plan(s) using {num_bins_used} sheet(s)."
+        "message": f"Generated {len(cutting_plans)} cutting plan(s) using {len(bins)} sheet(s)."
                    + (f" {unplaced_count} item(s) unplaced." if unplaced_count else " All items placed."),
         "cutting_plans": cutting_plans,
         "stock_used": list(stock_usage.values()),
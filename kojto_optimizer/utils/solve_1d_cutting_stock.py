@@ -0,0 +1,347 @@
+import math
+import time
+import pulp
+
+EPS = 1e-6
+
+
+def _price_pattern(values, weights, limits, capacity, node_limit=20000):
+    """Bounded knapsack by depth-first branch and bound.
+
+    Returns (best_value, counts, upper_bound) where counts is aligned with the input
+    lists and upper_bound is the Dantzig bound at the root. The bound stays valid
+    even if the node limit stops the search early.
+    """
+    order = [
+        i for i in range(len(values))
+        if values[i] > EPS and weights[i] <= capacity + EPS and limits[i] > 0
+    ]
+    order.sort(key=lambda i: values[i] / weights[i], reverse=True)
+    v = [values[i] for i in order]
+    w = [weights[i] for i in order]
+    u = [min(limits[i], int((capacity + EPS) // weights[i])) for i in order]
+    n = len(order)
+
+    def upper_bound(k, cap):
+        total = 0.0
+        for j in range(k, n):
+            fit = min(u[j], int((cap + EPS) // w[j]))
+            total += fit * v[j]
+            cap -= fit * w[j]
+            if fit < u[j]:
+                return total + v[j] * max(cap, 0.0) / w[j]
+        return total
+
+    root_bound = upper_bound(0, capacity)
+    best_value = 0.0
+    best_counts = [0] * n
+    counts = [0] * n
+    frames = []
+    nodes = 0
+
+    def push(k, cap, value):
+        nonlocal best_value, best_counts
+        if value > best_value + EPS:
+            best_value = value
+            best_counts = counts[:k] + [0] * (n - k)
+        if k == n or value + upper_bound(k, cap) <= best_value + EPS:
+            return
+        frames.append([k, cap, value, min(u[k], int((cap + EPS) // w[k]))])
+
+    push(0, capacity, 0.0)
+    while frames and nodes < node_limit:
+        frame = frames[-1]
+        k, cap, value, c = frame
+        if c < 0:
+            counts[k] = 0
+            frames.pop()
+            continue
+        frame[3] = c - 1
+        counts[k] = c
+        nodes += 1
+        push(k + 1, cap - c * w[k], value + c * v[k])
+
+    result = [0] * len(values)
+    for pos, i in enumerate(order):
+        result[i] = best_counts[pos]
+    return best_value, result, root_bound
+
+
+def _solve_master(columns, costs, demand, availability, relaxed, time_limit=None, initial=None):
+    """Solve the restricted master problem over the given pattern columns.
+
+    columns: list of (stock_index, counts). Artificial variables with a prohibitive
+    cost keep the model feasible so that duals are always available. initial maps
+    column index to copies and warm-starts the integer solve.
+    """
+    prob = pulp.LpProblem("cutting_stock", pulp.LpMinimize)
+    category = pulp.LpContinuous if relaxed else pulp.LpInteger
+    x = [pulp.LpVariable(f"x{j}", lowBound=0, cat=category) for j in range(len(columns))]
+    penalty = 10.0 * max(costs) * max(1, len(demand))
+    art = [pulp.LpVariable(f"a{i}", lowBound=0, cat=category) for i in range(len(demand))]
+
+    prob += (
+        pulp.lpSum(costs[s] * x[j] for j, (s, _) in enumerate(columns))
+        + pulp.lpSum(penalty * a for a in art)
+    )
+    for i, d in enumerate(demand):
+        prob += (
+            pulp.lpSum(counts[i] * x[j] for j, (_, counts) in enumerate(columns) if counts[i])
+            + art[i] >= d,
+            f"d{i}",
+        )
+    for s, avail in enumerate(availability):
+        members = [x[j] for j, (stock_index, _) in enumerate(columns) if stock_index == s]
+        if members:
+            prob += pulp.lpSum(members) <= avail, f"s{s}"
+
+    solver_kwargs = {"msg": False}
+    if initial:
+        for j, var in enumerate(x):
+            var.setInitialValue(initial.get(j, 0))
+        for a in art:
+            a.setInitialValue(0)
+        solver_kwargs["warmStart"] = True
+    if time_limit is not None:
+        solver_kwargs["timeLimit"] = max(1, int(math.ceil(time_limit)))
+    prob.solve(pulp.PULP_CBC_CMD(**solver_kwargs))
+
+    values = [v.varValue or 0.0 for v in x]
+    artificial = sum(a.varValue or 0.0 for a in art)
+    duals = pi = None
+    if relaxed:
+        pi = [prob.constraints[f"d{i}"].pi or 0.0 for i in range(len(demand))]
+        duals = [
+            (prob.constraints[f"s{s}"].pi or 0.0) if f"s{s}" in prob.constraints else 0.0
+            for s in range(len(availability))
+        ]
+    objective = pulp.value(prob.objective) or 0.0
+    return {
+        "status": pulp.LpStatus[prob.status],
+        "values": values,
+        "artificial": artificial,
+        "objective": objective,
+        "pi": pi,
+        "sigma": duals,
+    }
+
+
+def _first_fit_decreasing(demand, weights, capacities, availability, costs):
+    """Pack demand first-fit decreasing, one bar size at a time.
+
+    New bars are opened from the stock with the lowest cost per usable length.
+    Returns (stock_index, counts, 1) patterns or None when the stock runs out.
+    """
+    remaining_availability = list(availability)
+    open_bins = []
+    for i in sorted(range(len(demand)), key=lambda i: weights[i], reverse=True):
+        left = demand[i]
+        for b in open_bins:
+            if not left:
+                break
+            fit = min(left, int((b["free"] + EPS) // weights[i]))
+            if fit:
+                b["free"] -= fit * weights[i]
+                b["counts"][i] += fit
+                left -= fit
+        while left:
+            candidates = [
+                s for s in range(len(capacities))
+                if remaining_availability[s] > 0 and capacities[s] + EPS >= weights[i]
+            ]
+            if not candidates:
+                return None
+            s = min(candidates, key=lambda s: (costs[s] / capacities[s], -capacities[s]))
+            remaining_availability[s] -= 1
+            fit = min(left, int((capacities[s] + EPS) // weights[i]))
+            counts = [0] * len(demand)
+            counts[i] = fit
+            left -= fit
+            open_bins.append({"stock_index": s, "free": capacities[s] - fit * weights[i], "counts": counts})
+    return [(b["stock_index"], tuple(b["counts"]), 1) for b in open_bins]
+
+
+def _trim_surplus(patterns, demand):
+    """Remove over-produced pieces so every length is cut exactly as often as required."""
+    produced = [0] * len(demand)
+    for _, counts, copies in patterns:
+        for i, c in enumerate(counts):
+            produced[i] += c * copies
+    surplus = [p - d for p, d in zip(produced, demand)]
+    if not any(s > 0 for s in surplus):
+        return patterns
+
+    trimmed = []
+    queue = list(patterns)
+    while queue:
+        stock_index, counts, copies = queue.pop()
+        reducible = [i for i, c in enumerate(counts) if c and surplus[i] > 0]
+        if not reducible:
+            trimmed.append((stock_index, counts, copies))
+            continue
+        i = reducible[0]
+        whole = min(copies, surplus[i] // counts[i])
+        if whole:
+            reduced = list(counts)
+            reduced[i] = 0
+            surplus[i] -= whole * counts[i]
+            queue.append((stock_index, tuple(reduced), whole))
+            if copies - whole:
+                queue.append((stock_index, counts, copies - whole))
+            continue
+        reduced = list(counts)
+        reduced[i] -= surplus[i]
+        surplus[i] = 0
+        queue.append((stock_index, tuple(reduced), 1))
+        if copies - 1:
+            queue.append((stock_index, counts, copies - 1))
+    return [p for p in trimmed if any(p[1])]
+
+
+def solve_1d_cutting_stock(capacities, availability, costs, weights, demand, time_limit=10.0, max_iterations=500):
+    """Solve a 1D cutting-stock problem by column generation.
+
+    capacities/availability/costs describe stock types (usable length, pieces, objective
+    weight); weights/demand describe distinct bar sizes (length incl. kerf, pieces).
+
+    Returns a dict with "patterns" as (stock_index, counts, copies) tuples, the integer
+    "objective", a valid "lower_bound" on it and the relative "gap". "patterns" is None
+    when the stock cannot cover the demand.
+    """
+    started = time.monotonic()
+    deadline = started + max(time_limit, 1.0)
+    # Leave part of the budget for the integer phase over the generated columns
+    pricing_deadline = started + 0.6 * max(time_limit, 1.0)
+    n_items = len(demand)
+    total_pieces = sum(demand)
+
+    # Homogeneous starting patterns: one column per (stock type, bar size) pair
+    columns = []
+    seen = set()
+    for s, cap in enumerate(capacities):
+        for i, w in enumerate(weights):
+            fit = min(demand[i], int((cap + EPS) // w))
+            if fit <= 0:
+                continue
+            counts = [0] * n_items
+            counts[i] = fit
+            key = (s, tuple(counts))
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+
+    if any(
+        not any(cap + EPS >= weights[i] for s, cap in enumerate(capacities) if availability[s] > 0)
+        for i in range(n_items)
+    ):
+        return {"patterns": None, "objective": None, "lower_bound": None, "gap": None, "status": "Infeasible", "iterations": 0}
+
+    # First-fit decreasing gives an incumbent and seeds the column pool with its patterns
+    incumbent = _first_fit_decreasing(demand, weights, capacities, availability, costs)
+    for stock_index, counts, _ in incumbent or []:
+        if (stock_index, counts) not in seen:
+            seen.add((stock_index, counts))
+            columns.append((stock_index, counts))
+
+    # Material bound: every piece at the cheapest cost per usable length
+    lower_bound = sum(w * d for w, d in zip(weights, demand)) * min(
+        costs[s] / capacities[s] for s in range(len(capacities)) if availability[s] > 0
+    )
+    converged = False
+    iterations = 0
+    master = None
+    while iterations < max_iterations and time.monotonic() < pricing_deadline:
+        iterations += 1
+        master = _solve_master(columns, costs, demand, availability, relaxed=True)
+        pi, sigma = master["pi"], master["sigma"]
+        added = 0
+        lagrangian = master["objective"]
+        for s, cap in enumerate(capacities):
+            if availability[s] <= 0:
+                continue
+            value, counts, bound = _price_pattern(pi, weights, demand, cap)
+            reduced_cost = costs[s] - sigma[s] - value
+            bound_reduced_cost = costs[s] - sigma[s] - bound
+            lagrangian += min(availability[s], total_pieces) * min(0.0, bound_reduced_cost)
+            key = (s, tuple(counts))
+            if reduced_cost < -EPS * max(1.0, costs[s]) and any(counts) and key not in seen:
+                seen.add(key)
+                columns.append(key)
+                added += 1
+        lower_bound = max(lower_bound, lagrangian)
+        if not added:
+            converged = True
+            lower_bound = max(lower_bound, master["objective"])
+            break
+
+    if master is None:
+        master = _solve_master(columns, costs, demand, availability, relaxed=True)
+    if converged and master["artificial"] > EPS:
+        return {"patterns": None, "objective": None, "lower_bound": None, "gap": None, "status": "Infeasible", "iterations": iterations}
+
+    # A single stock type costs a whole bar at a time, so the bound rounds up
+    if len(capacities) == 1 and costs[0] > 0:
+        lower_bound = math.ceil(lower_bound / costs[0] - EPS) * costs[0]
+
+    # Round the relaxation down and pack what is left first-fit decreasing
+    rounded = [
+        (columns[j][0], columns[j][1], int(math.floor(v + EPS)))
+        for j, v in enumerate(master["values"]) if math.floor(v + EPS) > 0
+    ]
+    used = [0] * len(capacities)
+    residual = list(demand)
+    for stock_index, counts, copies in rounded:
+        used[stock_index] += copies
+        for i, c in enumerate(counts):
+            residual[i] -= c * copies
+    residual = [max(0, r) for r in residual]
+    remaining_availability = [a - u for a, u in zip(availability, used)]
+    extra = _first_fit_decreasing(residual, weights, capacities, remaining_availability, costs)
+    heuristics = [h for h in (incumbent, rounded + extra if extra is not None else None) if h is not None]
+    patterns = min(heuristics, key=lambda h: sum(costs[st] * c for st, _, c in h)) if heuristics else None
+
+    initial = None
+    if patterns is not None:
+        index = {}
+        for stock_index, counts, copies in patterns:
+            key = (stock_index, counts)
+            if key not in seen:
+                seen.add(key)
+                columns.append(key)
+            index[key] = index.get(key, 0) + copies
+        initial = {j: index[key] for j, key in enumerate(columns) if key in index}
+
+    proven = patterns is not None and sum(costs[st] * c for st, _, c in patterns) <= lower_bound + EPS
+    remaining = max(1.0, deadline - time.monotonic())
+    integer = None
+    if not proven:
+        integer = _solve_master(columns, costs, demand, availability, relaxed=False, time_limit=remaining, initial=initial)
+    if integer and integer["artificial"] < 0.5 and integer["status"] in ("Optimal", "Not Solved"):
+        candidate = [
+            (columns[j][0], columns[j][1], int(round(v)))
+            for j, v in enumerate(integer["values"]) if int(round(v)) > 0
+        ]
+        produced = [0] * n_items
+        for _, counts, copies in candidate:
+            for i, c in enumerate(counts):
+                produced[i] += c * copies
+        if all(p >= d for p, d in zip(produced, demand)) and (
+            patterns is None
+            or sum(costs[st] * c for st, _, c in candidate) < sum(costs[st] * c for st, _, c in patterns)
+        ):
+            patterns = candidate
+    if patterns is None:
+        return {"patterns": None, "objective": None, "lower_bound": lower_bound, "gap": None, "status": "Infeasible", "iterations": iterations}
+
+    patterns = _trim_surplus(patterns, demand)
+    objective = sum(costs[s] * copies for s, _, copies in patterns)
+    gap = max(0.0, (objective - lower_bound) / objective) if objective > 0 else 0.0
+    status = "Optimal" if gap <= EPS else ("Converged" if converged else "Time limit")
+    return {
+        "patterns": patterns,
+        "objective": objective,
+        "lower_bound": lower_bound,
+        "gap": gap,
+        "status": status,
+        "iterations": iterations,
+    }
@@ -10,6 +10,7 @@
     'depends': ['kojto_contacts'],
     'data': [
         'security/ir.model.access.csv',
+        'data/kojto_products_cron.xml',
         'views/wizards/kojto_product_import_wizard_views.xml',
         'views/kojto_product_components_views.xml',
         'views/kojto_product_component_revisions_views.xml',
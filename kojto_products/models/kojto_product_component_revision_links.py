@@ -1,7 +1,7 @@
 # kojto_products/models/kojto_product_component_revision_links.py
 from odoo import models, fields, api
 from odoo.exceptions import UserError, ValidationError
-from ..utils.kojto_products_graph_utils import resolve_graph
+from ..utils.kojto_products_graph_utils import ProductGraph
 
 class KojtoProductComponentRevisionLink(models.Model):
     _name = 'kojto.product.component.revision.link'
@@ -72,15 +72,12 @@ class KojtoProductComponentRevisionLink(models.Model):
 
         # Create all records at once
         records = super().create(vals_list)
+        records._invalidate_rollups()
 
-        # Perform post-creation validation if needed (batch cycles for small batches)
+        # Perform post-creation validation. The cycle check already ran as a
+        # constraint of the create, once for the whole batch.
         if not self.env.context.get('skip_cycle_check'):
-            # Only run cycle checks on smaller batches to avoid timeout
-            if len(records) <= 50:
-                for record in records:
-                    record._validate_links()
-                    record._check_self_referential()
-                    record._check_no_cycle()
+            records._validate_links()
 
         return records
 
@@ -109,7 +106,11 @@ class KojtoProductComponentRevisionLink(models.Model):
         # Set datetime_locked when is_locked is set to True
         if vals.get('is_locked') is True and not vals.get('datetime_locked'):
             vals['datetime_locked'] = fields.Datetime.now()
+        if {'source_revision_id', 'target_component_id', 'quantity'}.intersection(vals):
+            self._invalidate_rollups()
         super().write(vals)
+        if 'source_revision_id' in vals:
+            self._invalidate_rollups()
         if not self.env.context.get('skip_cycle_check'):
             self._validate_links()
             self._check_self_referential()
@@ -127,8 +128,13 @@ class KojtoProductComponentRevisionLink(models.Model):
                 )
             if not self.env.context.get('skip_cycle_check'):
                 record._validate_links()
+        self._invalidate_rollups()
         return super().unlink()
 
+    def _invalidate_rollups(self):
+        """Drop the stored roll-ups of every revision whose tree includes the source of these links."""
+        return self.env['kojto.product.component.revision']._invalidate_rollups(self.source_revision_id.component_id.ids)
+
     def _validate_links(self):
         """Validate link integrity before creating, editing, or deleting."""
         for record in self:
@@ -189,48 +195,36 @@ class KojtoProductComponentRevisionLink(models.Model):
 
     @api.constrains('source_revision_id', 'target_component_id')
     def _check_no_cycle(self):
+        """Check all links of the batch for cycles in a single walk over the graph below their sources."""
         if self.env.context.get('skip_cycle_check'):
             return
-        for record in self:
-            if record.source_revision_id:
-                has_cycle, cycle_path = resolve_graph(start_revision=record.source_revision_id, env=self.env, mode='cycle')
-                if has_cycle:
-                    cycle_revision_names = cycle_path.split(' -> ')
-                    links = self.env['kojto.product.component.revision.link'].search([
-                        ('source_revision_id', 'in', [
-                            r.id for r in self.env['kojto.product.component.revision'].search([
-                                ('name', 'in', cycle_revision_names)
-                            ])
-                        ]),
-                        ('target_component_id', 'in', [
-                            c.id for c in self.env['kojto.product.component'].search([])
-                        ])
-                    ])
-                    cycle_links = []
-                    for link in links:
-                        target_latest = link.target_component_id.get_latest_revision()
-                        if target_latest and target_latest.name in cycle_revision_names:
-                            cycle_links.append(
-                                f"Link ID {link.id}: {link.source_revision_id.name} -> "
-                                f"{link.target_component_id.name} (resolves to {target_latest.name})"
-                            )
-                    cycle_message = (
-                        f"Link ID {record.id}: {cycle_path}\n"
-                        f"Source: {record.source_revision_id.name}, Target: {record.target_component_id.name}\n"
-                        f"Cycle links found: {'; '.join(cycle_links) if cycle_links else 'None'}"
-                    )
-                    record._update_cycle_check(cycle_message)
-                    delete_suggestion = (
-                        f"DELETE FROM kojto_product_component_revision_link WHERE id = {record.id};"
-                        if self.env['kojto.product.component.revision.link'].search([('id', '=', record.id)])
-                        else "Link not found; check other links in cycle path."
-                    )
-                    raise UserError(
-                        f"Cycle detected in component links: {cycle_path}\n"
-                        f"Link ID: {record.id}, Source: {record.source_revision_id.name}, "
-                        f"Target: {record.target_component_id.name}\n"
-                        f"Cycle links: {'; '.join(cycle_links) if cycle_links else 'None'}\n"
-                    )
+        source_revisions = self.source_revision_id
+        if not source_revisions:
+            return
+        graph = ProductGraph(self.env, source_revisions.ids)
+        cycle = graph.find_cycle(source_revisions.ids)
+        if not cycle:
+            return
+
+        cycle_path = graph.cycle_path(cycle)
+        cycle_link_records = self.browse(graph.cycle_link_ids(cycle))
+        cycle_links = [
+            f"Link ID {link.id}: {link.source_revision_id.name} -> "
+            f"{link.target_component_id.name} (resolves to {graph.names[dst]})"
+            for link, dst in zip(cycle_link_records, cycle[1:])
+        ]
+        record = (self & cycle_link_records)[:1] or self[:1]
+        record._update_cycle_check(
+            f"Link ID {record.id}: {cycle_path}\n"
+            f"Source: {record.source_revision_id.name}, Target: {record.target_component_id.name}\n"
+            f"Cycle links found: {'; '.join(cycle_links) if cycle_links else 'None'}"
+        )
+        raise UserError(
+            f"Cycle detected in component links: {cycle_path}\n"
+            f"Link ID: {record.id}, Source: {record.source_revision_id.name}, "
+            f"Target: {record.target_component_id.name}\n"
+            f"Cycle links: {'; '.join(cycle_links) if cycle_links else 'None'}\n"
+        )
 
     @api.constrains('target_component_id')
     def _check_target_component_id(self):
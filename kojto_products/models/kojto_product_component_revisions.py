@@ -1,13 +1,23 @@
 # -*- coding: utf-8 -*-
 # kojto_products/models/kojto_product_component_revisions.py
-from odoo import models, fields, api
+from odoo import models, fields, api, Command
 from odoo.exceptions import UserError, ValidationError
+import time
 from datetime import timedelta
-from ..utils.kojto_products_graph_utils import resolve_graph
+from ..utils.kojto_products_graph_utils import ATTRIBUTES, ProductGraph, resolve_graph
 from ..utils.kojto_products_collect_revision_paths import collect_revision_paths
 from ..utils.kojto_products_export_html import format_top_down, format_bottom_up
 from ..utils.kojto_products_export_excel import export_revision_tree_to_excel
 
+# Depth of the analysis shown on the forms, and of the stored roll-ups
+ROLLUP_DEPTH = 30
+# Writes to these fields change the tree or totals of every revision above
+ROLLUP_DEPENDENCIES = {f'{attribute}_attribute' for attribute in ATTRIBUTES} | {
+    'component_id', 'datetime_issue', 'is_locked', 'datetime_locked',
+}
+# Stores the roll-ups dropped by writes, triggered by _invalidate_rollups
+ROLLUP_CRON = 'kojto_products.ir_cron_kojto_products_refresh_rollups'
+
 class KojtoProductComponentRevision(models.Model):
     _name = 'kojto.product.component.revision'
     _description = 'Kojto Product Component Revision'
@@ -34,6 +44,13 @@ class KojtoProductComponentRevision(models.Model):
     analysis_top_down = fields.Html(string='Analysis Top Down', compute='_compute_analysis_results', store=False, sanitize_attributes=False)
     analysis_bottom_up = fields.Html(string='Analysis Bottom Up', compute='_compute_analysis_results', store=False, sanitize_attributes=False)
     export_file = fields.Binary(string='Export File', readonly=True, attachment=True)
+
+    # Rendered analysis of the tree, dropped (rollup_valid unset) when anything in
+    # rollup_component_ids changes and stored again by the roll-up cron
+    rollup_valid = fields.Boolean(string='Roll-up Valid', readonly=True, copy=False, index=True)
+    rollup_component_ids = fields.Many2many('kojto.product.component', string='Roll-up Components', relation='kojto_product_revision_rollup_component_rel', column1='revision_id', column2='component_id', readonly=True, copy=False)
+    analysis_top_down_cache = fields.Html(string='Cached Analysis Top Down', readonly=True, copy=False, sanitize_attributes=False)
+    analysis_bottom_up_cache = fields.Html(string='Cached Analysis Bottom Up', readonly=True, copy=False, sanitize_attributes=False)
     export_file_name = fields.Char(string='Export File Name', readonly=True)
 
     @api.depends('component_id', 'datetime_issue')
@@ -86,48 +103,123 @@ class KojtoProductComponentRevision(models.Model):
 
     @api.depends('datetime_issue', 'link_ids')
     def _compute_analysis_results(self):
+        # ✓ Use resolve_depth from context (defaults to 30 if not specified)
+        max_depth = self.env.context.get('resolve_depth', ROLLUP_DEPTH)
         for revision in self:
             if not revision.id or not revision.exists():
                 revision.analysis_top_down = "<ul><li>No revision data available</li></ul>"
                 revision.analysis_bottom_up = "<ul><li>No revision data available</li></ul>"
                 continue
 
-            # ✓ Use resolve_depth from context (defaults to 30 if not specified)
-            max_depth = self.env.context.get('resolve_depth', 30)
+            # ✓ Serve the stored analysis while nothing in the tree has changed
+            if max_depth == ROLLUP_DEPTH and revision.rollup_valid:
+                revision.analysis_top_down = revision.analysis_top_down_cache
+                revision.analysis_bottom_up = revision.analysis_bottom_up_cache
+                continue
 
-            # ✓ Include ALL children in traversal for correct aggregates
-            # Only limit depth to prevent stack overflow
-            visited, edges, aggregated_attributes, lock_status = resolve_graph(
-                start_revision=revision,
-                env=self.env,
-                mode='tree',
-                max_depth=max_depth  # ← Limit depth only
-            )
-            revision_map = {
-                rev.id: rev for rev in self.env['kojto.product.component.revision'].browse(visited) if rev.exists()
-            }
-            # Get paths and quantities for bottom-up analysis
-            paths, quantities, link_quantities = collect_revision_paths(
-                revision.id, edges, revision_map, self.env
-            )
+            _graph, _aggregated_attributes, analysis_top_down, analysis_bottom_up = revision._build_analysis(max_depth)
+            revision.analysis_top_down = analysis_top_down
+            revision.analysis_bottom_up = analysis_bottom_up
 
-            revision.analysis_top_down = format_top_down(
-                edges=edges,
-                visited=visited,
-                aggregated_attributes=aggregated_attributes,
-                revision_map=revision_map,
-                env=self.env,
-                start_revision_id=revision.id,
-                lock_status=lock_status
-            )
-            revision.analysis_bottom_up = format_bottom_up(
-                start_revision=revision,
-                paths=paths,
-                quantities=quantities,
-                link_quantities=link_quantities,
-                revision_map=revision_map,
-                lock_status=lock_status
-            )
+    def _build_analysis(self, max_depth):
+        """Resolve the tree of the revision and render its analysis.
+
+        Returns (graph, aggregated_attributes, analysis_top_down, analysis_bottom_up).
+        """
+        self.ensure_one()
+        # ✓ Include ALL children in traversal for correct aggregates
+        # Only limit depth to prevent stack overflow
+        graph = ProductGraph(self.env, [self.id])
+        visited, edges, aggregated_attributes, lock_status = graph.tree(self.id, max_depth=max_depth)
+        revision_map = {
+            rev.id: rev for rev in self.env['kojto.product.component.revision'].browse(visited) if rev.exists()
+        }
+        # Get paths and quantities for bottom-up analysis
+        paths, quantities, link_quantities = collect_revision_paths(
+            self.id, edges, revision_map, self.env
+        )
+
+        analysis_top_down = format_top_down(
+            edges=edges,
+            visited=visited,
+            aggregated_attributes=aggregated_attributes,
+            revision_map=revision_map,
+            env=self.env,
+            start_revision_id=self.id,
+            lock_status=lock_status
+        )
+        analysis_bottom_up = format_bottom_up(
+            start_revision=self,
+            paths=paths,
+            quantities=quantities,
+            link_quantities=link_quantities,
+            revision_map=revision_map,
+            lock_status=lock_status,
+            aggregated_attributes=aggregated_attributes
+        )
+        return graph, aggregated_attributes, analysis_top_down, analysis_bottom_up
+
+    def _refresh_rollups(self):
+        """Store the analysis of the revisions, depending on every component loaded in their graph."""
+        for revision in self.exists():
+            graph, _aggregated_attributes, analysis_top_down, analysis_bottom_up = revision._build_analysis(ROLLUP_DEPTH)
+            revision.sudo().with_context(rollup_cache=True).write({
+                'rollup_valid': True,
+                'rollup_component_ids': [Command.set(list(graph.component_revisions))],
+                'analysis_top_down_cache': analysis_top_down,
+                'analysis_bottom_up_cache': analysis_bottom_up,
+            })
+
+    @api.model
+    def _invalidate_rollups(self, component_ids):
+        """Drop the stored roll-ups of every revision whose tree includes one of the components.
+
+        The forms build the analysis on the fly until the roll-up cron, triggered
+        here, stores it again. Returns the revisions whose roll-ups were dropped.
+        """
+        component_ids = [component_id for component_id in component_ids if component_id]
+        if not component_ids:
+            return self.browse()
+        stale = self.sudo().search([
+            ('rollup_valid', '=', True),
+            ('rollup_component_ids', 'in', component_ids),
+        ])
+        if stale:
+            stale.with_context(rollup_cache=True).write({'rollup_valid': False})
+            self._trigger_rollup_cron()
+        return stale
+
+    @api.model
+    def _trigger_rollup_cron(self):
+        cron = self.env.ref(ROLLUP_CRON, raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger()
+
+    @api.model
+    def _cron_refresh_rollups(self, batch_size=50, time_limit=240):
+        """Store the roll-ups of revisions without a valid one, latest first, committing every batch.
+
+        Revisions are claimed with SKIP LOCKED: one locked by a write that is
+        dropping its roll-up is left to the run that write triggers. When the
+        time limit leaves work behind, the next run is triggered right away.
+        """
+        started = time.monotonic()
+        while True:
+            if time.monotonic() - started >= time_limit:
+                self._trigger_rollup_cron()
+                return
+            self.env.cr.execute("""
+                SELECT id FROM kojto_product_component_revision
+                WHERE rollup_valid IS NOT TRUE
+                ORDER BY id DESC
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            """, [batch_size])
+            revisions = self.browse([row[0] for row in self.env.cr.fetchall()])
+            if not revisions:
+                return
+            revisions._refresh_rollups()
+            self.env.cr.commit()
 
     @api.model
     def create(self, vals_list):
@@ -142,13 +234,24 @@ class KojtoProductComponentRevision(models.Model):
         for revision in revisions:
             if revision.name.startswith('temp_'):
                 raise ValidationError(f"Failed to compute name for revision ID {revision.id}.")
+        # A new revision may replace the one resolved in trees using its component.
+        # Its own roll-up is stored by the cron as well.
+        self._invalidate_rollups(revisions.component_id.ids)
+        self._trigger_rollup_cron()
         return revisions
 
     def write(self, vals):
-        # Skip validation during copying or locking operations
-        if self.env.context.get('copying_revision') or self.env.context.get('locking_tree'):
+        if self.env.context.get('rollup_cache'):
             return super().write(vals)
+        if ROLLUP_DEPENDENCIES.intersection(vals):
+            self._invalidate_rollups(self.component_id.ids + [vals.get('component_id')])
 
+        # Skip validation during copying or locking operations
+        if not (self.env.context.get('copying_revision') or self.env.context.get('locking_tree')):
+            self._check_revision_write(vals)
+        return super().write(vals)
+
+    def _check_revision_write(self, vals):
         # Prevent modifications to non-latest revisions
         for revision in self:
             if not revision.is_last_revision:
@@ -167,11 +270,10 @@ class KojtoProductComponentRevision(models.Model):
                     # Set datetime_locked for the revision being locked
                     vals['datetime_locked'] = fields.Datetime.now()
                     self._lock_revision_tree(revision)
-        return super().write(vals)
 
     def _lock_revision_tree(self, revision):
         # Get the revision tree using resolve_graph
-        visited, edges, aggregated_attributes = resolve_graph(
+        visited, edges, aggregated_attributes, lock_status = resolve_graph(
             start_revision=revision,
             env=self.env,
             mode='tree'
@@ -210,6 +312,7 @@ class KojtoProductComponentRevision(models.Model):
                     f"Cannot delete revision '{revision.name}' because it is referenced by {len(revision.link_ids)} link(s)."
                 )
         component_ids = self.mapped('component_id').ids
+        self._invalidate_rollups(component_ids)
         result = super().unlink()
         revisions = self.env['kojto.product.component.revision'].search([('component_id', 'in', component_ids)])
         if revisions:
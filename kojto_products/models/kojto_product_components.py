@@ -72,6 +72,9 @@ class KojtoProductComponents(models.Model):
             revisions = self.env['kojto.product.component.revision'].search([('component_id', 'in', self.ids)])
             if revisions:
                 revisions._compute_component_revision_name()
+        if 'name' in vals or 'unit_id' in vals:
+            # Names and units are part of the stored analysis of every tree using the component
+            self.env['kojto.product.component.revision']._invalidate_rollups(self.ids)
         return result
 
     @api.depends('revision_ids', 'revision_ids.datetime_issue')
@@ -213,8 +213,9 @@ class KojtoProductImportWizard(models.TransientModel):
                 })
             components[name] = {'component': component, 'revision': latest_revision}
 
-        # Process links
+        # Process links, created in one batch so that cycles are checked in a single pass
         target_components_cache = {}
+        link_vals_list = []
         for line in component_lines + link_lines:
             component_name = line['name'] if 'name' in line else line['component_name']
             component = components[component_name]['component']
@@ -259,7 +260,7 @@ class KojtoProductImportWizard(models.TransientModel):
                                 'datetime_issue': datetime.now()
                             })
                     target_components_cache[cache_key] = target_component
-                self.env['kojto.product.component.revision.link'].create({
+                link_vals_list.append({
                     'source_revision_id': revision.id,
                     'target_component_id': target_component.id,
                     'target_subcode_id': target_subcode_id,
@@ -267,6 +268,8 @@ class KojtoProductImportWizard(models.TransientModel):
                     'link_type': link_data['link_type'],
                     'link_description': link_data['link_description']
                 })
+        if link_vals_list:
+            self.env['kojto.product.component.revision.link'].create(link_vals_list)
 
         return {
             'type': 'ir.actions.act_window',
@@ -798,3 +798,146 @@ class TestGraphAnalysis(TransactionCase):
         print("✓ No errors during formatting")
         print("-"*80)
 
+
+    def test_09_locked_path_resolution(self):
+        """Test that links below a locked revision resolve to revisions issued before the lock"""
+        print("\n" + "-"*80)
+        print("TEST 09: Locked Path Resolution")
+        print("-"*80)
+
+        from datetime import timedelta
+        from odoo import fields
+        from ..utils.kojto_products_graph_utils import resolve_graph
+
+        now = fields.Datetime.now()
+        component_root = self.env['kojto.product.component'].create({
+            'name': 'LockedRoot',
+            'unit_id': self.unit_pcs.id,
+            'subcode_id': self.subcode_test.id,
+        })
+        component_child = self.env['kojto.product.component'].create({
+            'name': 'LockedChild',
+            'unit_id': self.unit_pcs.id,
+            'subcode_id': self.subcode_test.id,
+        })
+
+        rev_root = component_root.latest_revision_id
+        rev_child_old = component_child.latest_revision_id
+        rev_child_old.with_context(copying_revision=True).write({
+            'datetime_issue': now - timedelta(days=2),
+            'weight_attribute': 1.0,
+        })
+        self.env['kojto.product.component.revision.link'].create({
+            'source_revision_id': rev_root.id,
+            'target_subcode_id': self.subcode_test.id,
+            'target_component_id': component_child.id,
+            'quantity': 2.0,
+        })
+
+        # Root locked yesterday, child revised today
+        rev_root.with_context(locking_tree=True).write({
+            'is_locked': True,
+            'datetime_locked': now - timedelta(days=1),
+        })
+        rev_child_new = component_child.action_create_revision()
+        rev_child_new.write({'weight_attribute': 9.0})
+
+        visited, edges, aggregated_attributes, lock_status = resolve_graph(
+            start_revision=rev_root,
+            env=self.env,
+            mode='tree'
+        )
+
+        print(f"Visited: {sorted(visited)}, old child: {rev_child_old.id}, new child: {rev_child_new.id}")
+        self.assertIn(rev_child_old.id, visited, "Locked root should resolve to the child revision issued before the lock")
+        self.assertNotIn(rev_child_new.id, visited, "Revisions issued after the lock should not be used")
+        self.assertEqual(edges, [(rev_root.id, rev_child_old.id)])
+        self.assertAlmostEqual(aggregated_attributes[rev_root.id]['weight'], 2.0, places=2)
+        self.assertEqual(lock_status[rev_root.id], 'L')
+
+        print("✓ Locked path resolves to revisions issued before the lock")
+        print("-"*80)
+
+    def test_10_rollup_invalidation(self):
+        """Test that stored roll-ups are dropped for ancestors only when a leaf changes"""
+        print("\n" + "-"*80)
+        print("TEST 10: Roll-up Invalidation")
+        print("-"*80)
+
+        component_root = self.env['kojto.product.component'].create({
+            'name': 'RollupRoot',
+            'unit_id': self.unit_pcs.id,
+            'subcode_id': self.subcode_test.id,
+        })
+        component_leaf = self.env['kojto.product.component'].create({
+            'name': 'RollupLeaf',
+            'unit_id': self.unit_pcs.id,
+            'subcode_id': self.subcode_test.id,
+        })
+        rev_root = component_root.latest_revision_id
+        rev_leaf = component_leaf.latest_revision_id
+        rev_leaf.write({'weight_attribute': 4.0})
+        self.env['kojto.product.component.revision.link'].create({
+            'source_revision_id': rev_root.id,
+            'target_subcode_id': self.subcode_test.id,
+            'target_component_id': component_leaf.id,
+            'quantity': 3.0,
+        })
+
+        # Writes do not build roll-ups; the analysis is built on read until the cron stores it
+        self.assertFalse(rev_root.rollup_valid, "Roll-up should not be built by the write")
+        self.assertIn('RollupLeaf', str(rev_root.analysis_top_down))
+        self.assertFalse(rev_root.rollup_valid, "Roll-up should not be stored on display")
+
+        (rev_root | self.rev_assembly)._refresh_rollups()
+        self.assertTrue(rev_root.rollup_valid)
+        self.assertIn(component_leaf, rev_root.rollup_component_ids)
+        rev_root.invalidate_recordset(['analysis_top_down', 'analysis_bottom_up'])
+        self.assertEqual(rev_root.analysis_top_down, rev_root.analysis_top_down_cache, "Valid roll-up should be served as stored")
+        print(f"Stored roll-up depends on components: {rev_root.rollup_component_ids.mapped('name')}")
+
+        # Changing the leaf drops the roll-ups of its ancestors only
+        rev_leaf.write({'weight_attribute': 5.0})
+        self.assertFalse(rev_root.rollup_valid, "Ancestor roll-up should be dropped")
+        self.assertTrue(self.rev_assembly.rollup_valid)
+        self.assertNotIn(component_leaf, self.rev_assembly.rollup_component_ids, "Unrelated roll-ups should not depend on the leaf")
+
+        # The dropped roll-up is stored again with the new tree
+        rev_root._refresh_rollups()
+        self.assertTrue(rev_root.rollup_valid)
+
+        print("✓ Roll-ups are dropped through the dependency index when trees change")
+        print("-"*80)
+
+    def test_11_batch_cycle_detection(self):
+        """Test that a cycle spread over a batch of new links is detected in one create"""
+        print("\n" + "-"*80)
+        print("TEST 11: Batch Cycle Detection")
+        print("-"*80)
+
+        components = self.env['kojto.product.component'].create([{
+            'name': f'BatchCycle{index}',
+            'unit_id': self.unit_pcs.id,
+            'subcode_id': self.subcode_test.id,
+        } for index in range(3)])
+        revisions = [component.latest_revision_id for component in components]
+
+        # BatchCycle0 -> BatchCycle1 -> BatchCycle2 -> BatchCycle0, created together
+        link_vals_list = [{
+            'source_revision_id': revisions[index].id,
+            'target_subcode_id': self.subcode_test.id,
+            'target_component_id': components[(index + 1) % 3].id,
+            'quantity': 1.0,
+        } for index in range(3)]
+
+        with self.assertRaises(UserError) as error:
+            self.env['kojto.product.component.revision.link'].create(link_vals_list)
+        print(f"✓ Cycle detected: {str(error.exception)[:100]}...")
+        self.assertIn('cycle', str(error.exception).lower())
+
+        # Without the closing link the batch is valid
+        links = self.env['kojto.product.component.revision.link'].create(link_vals_list[:2])
+        self.assertEqual(len(links), 2)
+
+        print("✓ Batch of links checked for cycles in a single pass")
+        print("-"*80)
@@ -158,7 +158,8 @@ def export_revision_tree_to_excel(edges, visited, aggregated_attributes, revisio
     for col, header in enumerate(headers2):
         sheet2.write(0, col, header, bold_format)
 
-    # Write bottom-up analysis to sheet using the same calculation as format_bottom_up
+    # Write bottom-up analysis to sheet with the same rolled-up attributes as format_bottom_up
+    memo = {}
     row = 1
     sorted_rev_ids = [start_revision_id] + sorted([rid for rid in visited if rid != start_revision_id], key=lambda rid: revision_map[rid].name if rid in revision_map else '')
     for rev_id in sorted_rev_ids:
@@ -166,10 +167,13 @@ def export_revision_tree_to_excel(edges, visited, aggregated_attributes, revisio
         if not rev:
             continue
 
-        # Calculate attributes using the same function as format_bottom_up
-        weight, length, area, volume, price, time, other = calculate_revision_attributes(
-            rev_id, paths, quantities, link_quantities, revision_map
-        )
+        # Reuse the totals rolled up by resolve_graph, calculate only if missing
+        if rev_id in aggregated_attributes:
+            weight, length, area, volume, price, time, other = aggregated_attributes[rev_id].values()
+        else:
+            weight, length, area, volume, price, time, other = calculate_revision_attributes(
+                rev_id, paths, quantities, link_quantities, revision_map, memo
+            )
 
         # Format revision name with lock status
         revision_name = rev.name or ''
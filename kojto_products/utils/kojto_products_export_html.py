@@ -166,11 +166,12 @@ def format_top_down(edges, visited, aggregated_attributes, revision_map, env, st
     """
     return Markup(html)
 
-def format_bottom_up(start_revision, paths, quantities, link_quantities, revision_map, lock_status):
+def format_bottom_up(start_revision, paths, quantities, link_quantities, revision_map, lock_status, aggregated_attributes=None):
     """
     Format the bottom-up analysis as a collapsible HTML tree.
     Each revision's attributes are calculated from the bottom up, summing its own attributes
     and contributions from child revisions, weighted by the quantities in the paths.
+    When the rolled-up aggregated_attributes from resolve_graph are given, they are used as is.
     """
     css = (
         ".revision-tree{font-family:Arial,sans-serif;max-width:800px;margin:20px auto;background:#fff;padding:20px;"
@@ -194,10 +195,15 @@ def format_bottom_up(start_revision, paths, quantities, link_quantities, revisio
     html = ['<div class="revision-tree">']
     html.append(f'<style>{css}</style>')
 
+    memo = {}
+
     def format_attributes(rev_id, paths, quantities, link_quantities, revision_map):
-        weight, length, area, volume, price, time, other = calculate_revision_attributes(
-            rev_id, paths, quantities, link_quantities, revision_map
-        )
+        if aggregated_attributes and rev_id in aggregated_attributes:
+            weight, length, area, volume, price, time, other = aggregated_attributes[rev_id].values()
+        else:
+            weight, length, area, volume, price, time, other = calculate_revision_attributes(
+                rev_id, paths, quantities, link_quantities, revision_map, memo
+            )
         weight_val, weight_unit = UnitConverter.convert_weight(weight)
         length_val, length_unit = UnitConverter.convert_length(length)
         area_val, area_unit = UnitConverter.convert_area(area)
@@ -1,206 +1,228 @@
 # kojto_products/utils/kojto_products_graph_utils.py
-from odoo.exceptions import ValidationError
-from odoo import fields
-
-def fetch_components(env, initial_component_ids, max_components=100000, max_depth=50):
-    """
-    Fetch linked components with limits to prevent OOM.
-
-    Args:
-        env: Odoo environment
-        initial_component_ids: Starting component IDs
-        max_components: Maximum components to fetch (prevents memory explosion)
-        max_depth: Maximum recursion depth (prevents infinite loops)
-
-    Returns:
-        set: Component IDs (limited to prevent OOM)
-    """
-    component_ids = set(initial_component_ids)
-    depth = 0
-
-    def _fetch_components(component_ids_to_process):
-        nonlocal depth
-        if not component_ids_to_process or depth >= max_depth or len(component_ids) >= max_components:
-            return
-
-        # ✓ Limit query result
-        links = env['kojto.product.component.revision.link'].search([
-            ('source_revision_id.component_id', 'in', list(component_ids_to_process))
-        ], limit=min(10000, max_components * 10))
-
-        new_component_ids = {link.target_component_id.id for link in links if link.target_component_id} - component_ids
-
-        if new_component_ids:
-            # ✓ Respect component limit
-            can_add = max_components - len(component_ids)
-            if can_add > 0:
-                to_add = list(new_component_ids)[:can_add]
-                component_ids.update(to_add)
-                depth += 1
-                _fetch_components(set(to_add))
-
-    _fetch_components(initial_component_ids)
-    return component_ids
-
-def get_latest_revision(component, path_locking_dates, latest_revisions, revision_cache):
-    """
-    Get the latest valid revision for a component based on the locking dates in the current path.
-
-    Args:
-        component: The component to get revision for
-        path_locking_dates: List of (revision_id, datetime_locked) tuples from the current path
-        latest_revisions: Dict mapping component IDs to their sorted revisions
-        revision_cache: Dict for caching results
-
-    Returns:
-        The latest valid revision or None if no valid revision exists
-    """
-    cache_key = (component.id, tuple(sorted(path_locking_dates or [])))
-    if cache_key in revision_cache:
-        return revision_cache[cache_key]
-
-    revs = latest_revisions.get(component.id, [])
-    if not revs:
-        return None
-
-    # If no locking dates in path, return the latest revision
-    if not path_locking_dates:
-        latest = revs[-1]
-        revision_cache[cache_key] = latest
-        return latest
+from bisect import bisect_right
 
-    # Find the latest revision that's not after any locking date in the path
-    for rev in reversed(revs):
-        is_valid = True
-        for _, lock_date in path_locking_dates:
-            if lock_date and rev.datetime_issue and rev.datetime_issue > lock_date:
-                is_valid = False
-                break
-        if is_valid:
-            revision_cache[cache_key] = rev
-            return rev
-    return None
+from odoo.exceptions import ValidationError
 
-def get_links(env, source_revision, path_locking_dates, latest_revisions, revision_cache):
-    """
-    Get all valid links from a source revision based on the current path's locking dates.
+ATTRIBUTES = ('weight', 'length', 'area', 'volume', 'price', 'time', 'other')
 
-    Args:
-        env: Odoo environment for database access
-        source_revision: The source revision to get links from
-        path_locking_dates: List of (revision_id, datetime_locked) tuples from the current path
-        latest_revisions: Dict mapping component IDs to their sorted revisions
-        revision_cache: Dict for caching results
 
-    Returns:
-        List of tuples (target_revision, link_id, quantity)
+class ProductGraph:
     """
-    next_revisions = []
-    if not source_revision or not source_revision.exists():
-        return next_revisions
-    links = env['kojto.product.component.revision.link'].search([
-        ('source_revision_id', 'in', source_revision.id)
-    ])
-    target_component_ids = [link.target_component_id.id for link in links if link.target_component_id]
-    if target_component_ids:
-        revision_map_local = {}
-        for component_id in set(target_component_ids):
-            component = env['kojto.product.component'].browse(component_id)
-            target_revision = get_latest_revision(component, path_locking_dates, latest_revisions, revision_cache)
-            if target_revision:
-                revision_map_local[component_id] = target_revision
-        for link in links:
-            if link.target_component_id and link.target_component_id.id in revision_map_local:
-                target_revision = revision_map_local[link.target_component_id.id]
-                next_revisions.append((target_revision, link.id, link.quantity or 1.0))
-    return next_revisions
+    Link/revision subgraph reachable from a set of revisions, loaded in a few
+    set-based queries and held in integer-indexed arrays.
 
-def dfs_traverse(revision, path_locking_dates, visited, recursion_stack, path, edges, aggregated_attributes,
-                 mode, env, latest_revisions, revision_cache):
+    Revisions are numbered 0..n-1 (ids in ``revision_ids``, index in ``index``).
+    A link points to a component, so ``children[i]`` holds (component_id,
+    quantity, link_id) and the target revision is resolved per path with
+    ``resolve_revision``, according to the locking dates on that path.
     """
-    Perform a depth-first search traversal of the revision graph.
-
-    Args:
-        revision: Current revision to process
-        path_locking_dates: List of (revision_id, datetime_locked) tuples from the current path
-        visited: Set of visited revision IDs
-        recursion_stack: Set of revision IDs in the current recursion stack
-        path: List of (revision, link_id) tuples in the current path
-        edges: List of (src_id, dst_id) tuples for the tree
-        aggregated_attributes: Dict mapping revision IDs to their aggregated attributes
-        mode: 'cycle' for cycle detection, 'tree' for tree construction
-        env: Odoo environment for database access
-        latest_revisions: Dict mapping component IDs to their sorted revisions
-        revision_cache: Dict for caching results
-
-    Returns:
-        Tuple (has_cycle: bool, cycle_path: str)
-    """
-    if not revision or not revision.exists():
-        return False, None
-    if revision.id in recursion_stack:
-        cycle_start = next(i for i, (rev, _) in enumerate(path) if rev.id == revision.id)
-        cycle = path[cycle_start:] + [(revision, None)]
-        cycle_path_str = " -> ".join([rev.name for rev, _ in cycle])
-        return True, cycle_path_str
-    if revision.id in visited:
-        return False, None
-
-    # Update path locking dates if this revision is locked
-    current_path_locking_dates = list(path_locking_dates or [])
-    if revision.is_locked and revision.datetime_locked:
-        current_path_locking_dates.append((revision.id, revision.datetime_locked))
-
-    recursion_stack.add(revision.id)
-    path.append((revision, None))
-    visited.add(revision.id)
 
-    agg_attrs = {
-        'weight': revision.weight_attribute or 0.0,
-        'length': revision.length_attribute or 0.0,
-        'area': revision.area_attribute or 0.0,
-        'volume': revision.volume_attribute or 0.0,
-        'price': revision.price_attribute or 0.0,
-        'time': revision.time_attribute or 0.0,
-        'other': revision.other_attribute or 0.0
-    }
-
-    # ✓ Include ALL children - no skipping to ensure correct aggregates
-    for next_rev, link_id, quantity in get_links(env, revision, current_path_locking_dates, latest_revisions, revision_cache):
-        if not next_rev or not next_rev.exists():
-            continue
-        path[-1] = (revision, link_id)
-        has_cycle, cycle_path_str = dfs_traverse(
-            next_rev, current_path_locking_dates, visited, recursion_stack, path,
-            edges, aggregated_attributes, mode, env, latest_revisions, revision_cache
+    def __init__(self, env, start_revision_ids):
+        self.env = env
+        env['kojto.product.component.revision'].flush_model()
+        env['kojto.product.component.revision.link'].flush_model()
+        self._load_revisions(list(start_revision_ids))
+        self._load_links()
+
+    def _load_revisions(self, start_revision_ids):
+        """Load every revision of every component reachable from the start revisions."""
+        self.env.cr.execute("""
+            WITH RECURSIVE reachable(component_id) AS (
+                SELECT component_id
+                FROM kojto_product_component_revision
+                WHERE id = ANY(%s)
+                UNION
+                SELECT l.target_component_id
+                FROM reachable r
+                JOIN kojto_product_component_revision rev ON rev.component_id = r.component_id
+                JOIN kojto_product_component_revision_link l ON l.source_revision_id = rev.id
+            )
+            SELECT rev.id, rev.component_id, rev.name, rev.datetime_issue,
+                   CASE WHEN rev.is_locked THEN rev.datetime_locked END AS datetime_locked,
+                   COALESCE(rev.is_locked, FALSE) AS is_locked,
+                   COALESCE(rev.weight_attribute, 0), COALESCE(rev.length_attribute, 0),
+                   COALESCE(rev.area_attribute, 0), COALESCE(rev.volume_attribute, 0),
+                   COALESCE(rev.price_attribute, 0), COALESCE(rev.time_attribute, 0),
+                   COALESCE(rev.other_attribute, 0)
+            FROM kojto_product_component_revision rev
+            WHERE rev.component_id IN (SELECT component_id FROM reachable)
+            ORDER BY rev.component_id, rev.datetime_issue, rev.id
+        """, [start_revision_ids])
+        rows = self.env.cr.fetchall()
+
+        self.revision_ids = [row[0] for row in rows]
+        self.index = {revision_id: idx for idx, revision_id in enumerate(self.revision_ids)}
+        self.component_ids = [row[1] for row in rows]
+        self.names = [row[2] for row in rows]
+        self.lock_dates = [row[4] for row in rows]
+        self.is_locked = [row[5] for row in rows]
+        self.attributes = [row[6:13] for row in rows]
+
+        # Revisions of each component, oldest first, with their issue dates for bisecting
+        self.component_revisions = {}
+        self.component_dates = {}
+        for idx, row in enumerate(rows):
+            self.component_revisions.setdefault(row[1], []).append(idx)
+            self.component_dates.setdefault(row[1], []).append(row[3])
+        self.is_last_revision = [False] * len(rows)
+        for revisions in self.component_revisions.values():
+            self.is_last_revision[revisions[-1]] = True
+
+    def _load_links(self):
+        """Load the links of all loaded revisions as adjacency lists."""
+        self.children = [[] for _ in self.revision_ids]
+        self.env.cr.execute("""
+            SELECT source_revision_id, target_component_id, COALESCE(NULLIF(quantity, 0), 1.0), id
+            FROM kojto_product_component_revision_link
+            WHERE source_revision_id = ANY(%s)
+            ORDER BY id
+        """, [self.revision_ids])
+        for source_id, target_component_id, quantity, link_id in self.env.cr.fetchall():
+            self.children[self.index[source_id]].append((target_component_id, quantity, link_id))
+
+    def resolve_revision(self, component_id, lock_date=None):
+        """Index of the latest revision of a component issued on or before lock_date (any if None), or None."""
+        revisions = self.component_revisions.get(component_id)
+        if not revisions:
+            return None
+        if lock_date is None:
+            return revisions[-1]
+        position = bisect_right(self.component_dates[component_id], lock_date)
+        return revisions[position - 1] if position else None
+
+    def lock_status(self):
+        """Lock status per revision id: 'L' locked last revision, 'LS' locked superseded, None unlocked."""
+        return {
+            revision_id: ('L' if self.is_last_revision[idx] else 'LS') if self.is_locked[idx] else None
+            for idx, revision_id in enumerate(self.revision_ids)
+        }
+
+    def traverse(self, start_revision_id, max_depth=None):
+        """
+        Depth-first walk from a revision, without recursion.
+        See _traverse for the details and the returned tuple.
+        """
+        return self._traverse([self.index[start_revision_id]], max_depth=max_depth)
+
+    def find_cycle(self, start_revision_ids):
+        """
+        Check the graph below several revisions in one pass, e.g. the sources
+        of a batch of new links. Revisions reached from an earlier start are not
+        walked again, so the cost is linear in the size of the subgraph.
+
+        Returns:
+            Revision indexes forming a cycle (first one repeated at the end), or None
+        """
+        return self._traverse([self.index[revision_id] for revision_id in start_revision_ids])[0]
+
+    def _traverse(self, start_indexes, max_depth=None):
+        """
+        Depth-first walk from one or more revisions, without recursion.
+
+        Each link resolves to the target component's revision valid under the
+        earliest locking date on the path so far. Revisions below max_depth are
+        treated as leaves. Shared sub-assemblies are expanded once and their
+        totals reused, like the previous recursive traversal.
+
+        Returns:
+            Tuple (cycle, visited, edges, aggregated):
+                cycle: revision indexes forming a cycle (first one repeated at the end), or None
+                visited: set of revision indexes
+                edges: list of (src_idx, dst_idx) in post-order
+                aggregated: dict revision index -> list of attribute totals, in ATTRIBUTES order
+        """
+        visited = set()
+        on_stack = set()
+        edges = []
+        aggregated = {}
+        resolved = {}
+
+        def enter(idx, lock_date, depth):
+            own_lock_date = self.lock_dates[idx]
+            if own_lock_date and (lock_date is None or own_lock_date < lock_date):
+                lock_date = own_lock_date
+            visited.add(idx)
+            on_stack.add(idx)
+            aggregated[idx] = list(self.attributes[idx])
+            targets = []
+            if max_depth is None or depth < max_depth:
+                for component_id, quantity, _link_id in self.children[idx]:
+                    key = (component_id, lock_date)
+                    if key not in resolved:
+                        resolved[key] = self.resolve_revision(component_id, lock_date)
+                    if resolved[key] is not None:
+                        targets.append((resolved[key], quantity))
+            # Frame: [revision, depth, targets, position of the next target, lock date]
+            return [idx, depth, targets, 0, lock_date]
+
+        stack = []
+        pending = list(reversed(start_indexes))
+        while stack or pending:
+            if not stack:
+                start = pending.pop()
+                if start not in visited:
+                    stack.append(enter(start, None, 0))
+                continue
+            frame = stack[-1]
+            idx, depth, targets, position, lock_date = frame
+            if position == len(targets):
+                on_stack.discard(idx)
+                stack.pop()
+                continue
+            target, quantity = targets[position]
+            if target in on_stack:
+                cycle_start = next(i for i, f in enumerate(stack) if f[0] == target)
+                return [f[0] for f in stack[cycle_start:]] + [target], visited, edges, aggregated
+            if target not in visited:
+                stack.append(enter(target, lock_date, depth + 1))
+                continue
+            # Target is complete: add its totals and move on to the next link
+            edges.append((idx, target))
+            totals = aggregated[idx]
+            for i, value in enumerate(aggregated[target]):
+                totals[i] += quantity * value
+            frame[3] += 1
+        return None, visited, edges, aggregated
+
+    def cycle_path(self, cycle):
+        return " -> ".join(self.names[idx] or '' for idx in cycle)
+
+    def cycle_link_ids(self, cycle):
+        """Ids of the links along a cycle returned by find_cycle or traverse."""
+        link_ids = []
+        for src, dst in zip(cycle, cycle[1:]):
+            link_ids += [
+                link_id for component_id, _quantity, link_id in self.children[src]
+                if component_id == self.component_ids[dst]
+            ]
+        return link_ids
+
+    def tree(self, start_revision_id, max_depth=None):
+        """Tree resolution of a revision, keyed by revision ids (see resolve_graph 'tree' mode)."""
+        _cycle, visited, edges, aggregated = self.traverse(start_revision_id, max_depth=max_depth)
+        ids = self.revision_ids
+        aggregated_attributes = {
+            ids[idx]: dict(zip(ATTRIBUTES, totals)) for idx, totals in aggregated.items()
+        }
+        return (
+            {ids[idx] for idx in visited},
+            [(ids[src], ids[dst]) for src, dst in edges],
+            aggregated_attributes,
+            self.lock_status(),
         )
-        if has_cycle:
-            return True, cycle_path_str
-        if mode == 'tree':
-            edges.append((revision.id, next_rev.id))
-            child_attrs = aggregated_attributes.get(next_rev.id, {
-                'weight': 0.0, 'length': 0.0, 'area': 0.0, 'volume': 0.0,
-                'price': 0.0, 'time': 0.0, 'other': 0.0
-            })
-            for attr in ['weight', 'length', 'area', 'volume', 'price', 'time', 'other']:
-                agg_attrs[attr] += quantity * child_attrs[attr]
 
-    recursion_stack.remove(revision.id)
-    path.pop()
-    aggregated_attributes[revision.id] = agg_attrs
-    return False, None
 
 def resolve_graph(start_revision, env, mode='cycle', max_depth=None):
     """
     Resolve the revision graph starting from the given revision.
-    Uses locking dates to determine which revisions are locked,
-    but uses is_locked and is_last_revision fields to determine lock status display.
+    Uses locking dates to determine which revisions are linked,
+    and the component's latest revision to determine lock status display.
 
     Args:
         start_revision: The starting revision record.
         env: Odoo environment for database access.
         mode (str): 'cycle' for cycle detection, 'tree' for tree construction.
-        max_depth (int): Maximum depth for traversal (None for unlimited, 50-100 recommended)
+        max_depth (int): Maximum depth for traversal (None for unlimited)
 
     Returns:
         For 'cycle' mode: Tuple (has_cycle: bool, cycle_path: str)
@@ -211,67 +233,12 @@ def resolve_graph(start_revision, env, mode='cycle', max_depth=None):
     """
     if not start_revision or not start_revision.exists():
         raise ValidationError(f"Invalid start_revision: {start_revision.name if start_revision else 'None'}")
+    if mode not in ('cycle', 'tree'):
+        raise ValidationError(f"Invalid mode: {mode}")
 
-    # ✓ FIXED: Only fetch components that are linked to start_revision
-    component_ids = fetch_components(env, [start_revision.component_id.id], max_depth=max_depth or 50)
-
-    # Only fetch components we'll use
-    all_components = env['kojto.product.component'].browse(list(component_ids))
-    all_revisions = env['kojto.product.component.revision'].search([
-        ('component_id', 'in', all_components.ids)
-    ])
-    all_links = env['kojto.product.component.revision.link'].search([
-        ('source_revision_id', 'in', all_revisions.ids)
-    ])
-
-    visited = set()
-    recursion_stack = set()
-    path = []
-    edges = []
-    revision_cache = {}
-    aggregated_attributes = {}
-    lock_status = {}  # Track lock status for each revision
-
-    # Pre-compute latest revisions for each component (using SQL for efficiency)
-    latest_revisions = {}
-    for component in all_components:
-        revs = [r for r in all_revisions if r.component_id.id == component.id]
-        if revs:
-            # Sort revisions by datetime_issue
-            sorted_revs = sorted(revs, key=lambda r: r.datetime_issue or fields.Datetime.now())
-            latest_revisions[component.id] = sorted_revs
-
-    # Initialize lock status for all revisions
-    for rev in all_revisions:
-        if rev.is_locked:
-            lock_status[rev.id] = 'L' if rev.is_last_revision else 'LS'
-        else:
-            lock_status[rev.id] = None
-
-    # Track depth for bounded traversal
-    depth_counter = [0]
-
-    def dfs_traverse_with_depth_limit(revision, path_locking_dates, visited, recursion_stack, path, edges, aggregated_attributes,
-                                      mode, env, latest_revisions, revision_cache):
-        """DFS with depth limiting only - includes all children for correct aggregates."""
-        # ✓ CONSTRAINT: Check depth limit (prevents stack overflow, not data loss)
-        if max_depth and depth_counter[0] >= max_depth:
-            return False, None
-
-        depth_counter[0] += 1
-        result = dfs_traverse(revision, path_locking_dates, visited, recursion_stack, path, edges,
-                            aggregated_attributes, mode, env, latest_revisions, revision_cache)
-        depth_counter[0] -= 1
-        return result
-
-    has_cycle, cycle_path_str = dfs_traverse_with_depth_limit(
-        start_revision, None, visited, recursion_stack, path, edges,
-        aggregated_attributes, mode, env, latest_revisions, revision_cache
-    )
+    graph = ProductGraph(env, [start_revision.id])
+    if mode == 'tree':
+        return graph.tree(start_revision.id, max_depth=max_depth)
 
-    if mode == 'cycle':
-        return has_cycle, cycle_path_str or "No cycle detected"
-    elif mode == 'tree':
-        return visited, edges, aggregated_attributes, lock_status
-    else:
-        raise ValidationError(f"Invalid mode: {mode}")
+    cycle = graph.traverse(start_revision.id, max_depth=max_depth)[0]
+    return bool(cycle), graph.cycle_path(cycle) if cycle else "No cycle detected"
@@ -1,7 +1,10 @@
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from odoo.tools import split_every
 import base64
 import ezdxf
+import hashlib
+import math
 import tempfile
 import os
 from ..utils.compute_section_properties_polygons import compute_section_properties
@@ -25,27 +28,29 @@ class KojtoProfiles(models.Model):
     drawing = fields.Binary("Combined Drawing", compute="_compute_drawing")
     autocad_dxf = fields.Binary("AutoCAD DXF", readonly=True)
     process_ids = fields.One2many("kojto.profile.processes", "profile_id", string="Processes")
-    contact_lines_list = fields.Text(string="Contact Lines Text", compute="_compute_contact_lines_text")
+    contact_lines_list = fields.Text(string="Contact Lines Text", compute="_compute_section_properties", store=True)
     total_process_time_per_m = fields.Float(string="Total Process Time per Meter (min/m)", compute="_compute_total_process_time_per_m", help="Total time required per meter for all processes combined, in minutes.")
-    profile_cross_sectional_area = fields.Float(string="Total Area", compute="_compute_section_properties")
-    profile_weight = fields.Float(string="Weight per m", compute="_compute_section_properties")
-    jx = fields.Float(string="Jx", compute="_compute_section_properties")
-    jy = fields.Float(string="Jy", compute="_compute_section_properties")
-    wx = fields.Float(string="Wx", compute="_compute_section_properties")
-    wy = fields.Float(string="Wy", compute="_compute_section_properties")
-    center_of_mass_x = fields.Float(string="Center of Mass X", compute="_compute_section_properties")
-    center_of_mass_y = fields.Float(string="Center of Mass Y", compute="_compute_section_properties")
-    max_height = fields.Float(string="h", compute="_compute_section_properties")
-    max_width = fields.Float(string="w", compute="_compute_section_properties")
-    coating_perimeter = fields.Float(string="U(mm)", compute="_compute_coating_perimeter")
-    number_ext_corners = fields.Integer(string="Number of External Corners", compute="_compute_number_external_corners")
+    # Geometry properties are stored, and only recomputed when geometry_fingerprint changes
+    geometry_fingerprint = fields.Char(string="Geometry Fingerprint", compute="_compute_section_properties", store=True, copy=False)
+    profile_cross_sectional_area = fields.Float(string="Total Area", compute="_compute_section_properties", store=True)
+    profile_weight = fields.Float(string="Weight per m", compute="_compute_section_properties", store=True)
+    jx = fields.Float(string="Jx", compute="_compute_section_properties", store=True)
+    jy = fields.Float(string="Jy", compute="_compute_section_properties", store=True)
+    wx = fields.Float(string="Wx", compute="_compute_section_properties", store=True)
+    wy = fields.Float(string="Wy", compute="_compute_section_properties", store=True)
+    center_of_mass_x = fields.Float(string="Center of Mass X", compute="_compute_section_properties", store=True)
+    center_of_mass_y = fields.Float(string="Center of Mass Y", compute="_compute_section_properties", store=True)
+    max_height = fields.Float(string="h", compute="_compute_section_properties", store=True)
+    max_width = fields.Float(string="w", compute="_compute_section_properties", store=True)
+    coating_perimeter = fields.Float(string="U(mm)", compute="_compute_section_properties", store=True)
+    number_ext_corners = fields.Integer(string="Number of External Corners", compute="_compute_section_properties", store=True)
 
     #points with description in the SVG
     profile_description_point_ids = fields.One2many("kojto.profile.description.points", "profile_id", string="Profile Points")
 
 
     profile_description = fields.Text(string="Profile Description")
-    profile_perimeter_coordinates = fields.Json(string="Profile Perimeter Coordinates", compute="_compute_section_properties")
+    profile_perimeter_coordinates = fields.Json(string="Profile Perimeter Coordinates", compute="_compute_section_properties", store=True)
 
 
     # Python Constraints
@@ -81,14 +86,15 @@ class KojtoProfiles(models.Model):
                 offset_x = insert.x
                 offset_y = insert.y
                 rotation = insert.rotation if hasattr(insert, 'rotation') else 0.0
+                cos_rotation = math.cos(math.radians(rotation))
+                sin_rotation = math.sin(math.radians(rotation))
                 for polygon in insert.shape_id.polygon_ids:
                     if not polygon.point_ids:
                         continue
                     rotated_points = []
                     for point in polygon.point_ids:
-                        import math
-                        x_rotated = point.x * math.cos(math.radians(rotation)) - point.y * math.sin(math.radians(rotation))
-                        y_rotated = point.x * math.sin(math.radians(rotation)) + point.y * math.cos(math.radians(rotation))
+                        x_rotated = point.x * cos_rotation - point.y * sin_rotation
+                        y_rotated = point.x * sin_rotation + point.y * cos_rotation
                         x_translated = x_rotated + offset_x
                         y_translated = y_rotated + offset_y
                         rotated_points.append((x_translated, y_translated))
@@ -131,14 +137,40 @@ class KojtoProfiles(models.Model):
                 polygons.append(item)
         return polygons
 
+    def _get_density(self):
+        return self.material_id.density if self.material_id and hasattr(self.material_id, "density") else 1000
+
+    def _get_geometry_fingerprint(self):
+        """Hash of the raw geometry inputs (strips, shape inserts, density), without building any polygon."""
+        geometry = [self._get_density()]
+        for strip in self.strip_ids:
+            geometry.append((strip.point_1_x, strip.point_1_y, strip.point_2_x, strip.point_2_y,
+                             strip.thickness, strip.angle_1, strip.angle_2))
+        for insert in self.shape_insert_ids:
+            geometry.append((insert.shape_id.id, insert.x, insert.y, insert.rotation, [
+                (polygon.is_external, [(point.x, point.y) for point in polygon.point_ids])
+                for polygon in insert.shape_id.polygon_ids
+            ]))
+        return hashlib.sha1(repr(geometry).encode()).hexdigest()
+
     @api.depends("strip_ids", "strip_ids.point_1_x", "strip_ids.point_1_y", "strip_ids.point_2_x", "strip_ids.point_2_y",
                  "strip_ids.point_2o_x", "strip_ids.point_2o_y", "strip_ids.point_1o_x", "strip_ids.point_1o_y",
+                 "strip_ids.thickness", "strip_ids.angle_1", "strip_ids.angle_2",
                  "shape_insert_ids", "shape_insert_ids.x", "shape_insert_ids.y", "shape_insert_ids.rotation",
                  "shape_insert_ids.shape_id", "shape_insert_ids.shape_id.polygon_ids",
+                 "shape_insert_ids.shape_id.polygon_ids.is_external",
                  "shape_insert_ids.shape_id.polygon_ids.point_ids", "shape_insert_ids.shape_id.polygon_ids.point_ids.x",
                  "shape_insert_ids.shape_id.polygon_ids.point_ids.y", "material_id", "material_id.density")
     def _compute_section_properties(self):
+        force = self.env.context.get("force_section_properties")
         for record in self:
+            fingerprint = record._get_geometry_fingerprint()
+            if not force and record.id and fingerprint == record.geometry_fingerprint:
+                # Unchanged geometry (e.g. the same values written again): keep the stored properties
+                for field_name in record._get_section_property_fields():
+                    record[field_name] = record[field_name]
+                continue
+            record.geometry_fingerprint = fingerprint
             record.profile_cross_sectional_area = 0.0
             record.profile_weight = 0.0
             record.jx = 0.0
@@ -149,25 +181,76 @@ class KojtoProfiles(models.Model):
             record.center_of_mass_y = 0.0
             record.max_height = 0.0
             record.max_width = 0.0
+            record.coating_perimeter = 0.0
+            record.number_ext_corners = 0
+            record.contact_lines_list = ""
             record.profile_perimeter_coordinates = []
-            density = record.material_id.density if record.material_id and hasattr(record.material_id, "density") else 1000
             polygons_data = record._get_polygons_data()
             polygons_data = [p for p in polygons_data if (isinstance(p, dict) and p['points']) or (isinstance(p, list) and p)]
-            if polygons_data:
-                properties = compute_section_properties(polygons_data, density)
-                record.profile_cross_sectional_area = properties.get("profile_cross_sectional_area", 0.0)
-                record.profile_weight = properties.get("profile_weight", 0.0)
-                record.center_of_mass_x = properties.get("center_of_mass_x", 0.0)
-                record.center_of_mass_y = properties.get("center_of_mass_y", 0.0)
-                record.jx = properties.get("jx", 0.0)
-                record.jy = properties.get("jy", 0.0)
-                record.wx = properties.get("wx", 0.0)
-                record.wy = properties.get("wy", 0.0)
-                record.max_height = properties.get("max_height", 0.0)
-                record.max_width = properties.get("max_width", 0.0)
-                # Round perimeter coordinates to 2 decimal places
-                perimeter_coords = properties.get("perimeter_coordinates", [])
-                record.profile_perimeter_coordinates = [[round(x, 2), round(y, 2)] for x, y in perimeter_coords]
+            if not polygons_data:
+                continue
+
+            properties = compute_section_properties(polygons_data, record._get_density())
+            record.profile_cross_sectional_area = properties.get("profile_cross_sectional_area", 0.0)
+            record.profile_weight = properties.get("profile_weight", 0.0)
+            record.center_of_mass_x = properties.get("center_of_mass_x", 0.0)
+            record.center_of_mass_y = properties.get("center_of_mass_y", 0.0)
+            record.jx = properties.get("jx", 0.0)
+            record.jy = properties.get("jy", 0.0)
+            record.wx = properties.get("wx", 0.0)
+            record.wy = properties.get("wy", 0.0)
+            record.max_height = properties.get("max_height", 0.0)
+            record.max_width = properties.get("max_width", 0.0)
+            # Round perimeter coordinates to 2 decimal places
+            perimeter_coords = properties.get("perimeter_coordinates", [])
+            record.profile_perimeter_coordinates = [[round(x, 2), round(y, 2)] for x, y in perimeter_coords]
+
+            # Coating perimeter, contact lines and corners use the external polygons only
+            external_polygons = []
+            for item in polygons_data:
+                if isinstance(item, dict):
+                    if not item.get('is_subtract', False) and item['points']:
+                        external_polygons.append(item['points'])
+                elif isinstance(item, list) and item:
+                    external_polygons.append(item)
+            if not external_polygons:
+                continue
+            record.coating_perimeter = compute_coating_perimeter(external_polygons) or 0.0
+            record.number_ext_corners = compute_external_corners(external_polygons) or 0
+            contact_lines_result, _, _ = compute_contact_lines(external_polygons)
+            record.contact_lines_list = "\n".join(
+                f"({p1[0]:.2f}, {p1[1]:.2f}) - ({p2[0]:.2f}, {p2[1]:.2f})"
+                for p1, p2 in contact_lines_result
+            ) if contact_lines_result else ""
+
+    def _get_section_property_fields(self):
+        return [
+            name for name, field in self._fields.items()
+            if field.compute == "_compute_section_properties"
+        ]
+
+    def action_recompute_section_properties(self):
+        """Recompute the stored geometry properties of the selected profiles, or of all profiles."""
+        profiles = self or self.with_context(active_test=False).search([])
+        count = len(profiles)
+        property_fields = [self._fields[name] for name in self._get_section_property_fields()]
+        for ids in split_every(500, profiles.ids):
+            batch = self.browse(ids).with_context(force_section_properties=True)
+            # Computed like a regular recompute: values are cached, then written in one flush
+            with self.env.protecting(property_fields, batch):
+                batch._compute_section_properties()
+            batch.flush_recordset()
+            self.env.invalidate_all()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': 'Success',
+                'message': f'Section properties recomputed for {count} profile(s).',
+                'type': 'success',
+                'sticky': False,
+            }
+        }
 
     @api.depends("strip_ids", "strip_ids.point_1_x", "strip_ids.point_1_y", "strip_ids.point_2_x", "strip_ids.point_2_y",
                  "strip_ids.point_2o_x", "strip_ids.point_2o_y", "strip_ids.point_1o_x", "strip_ids.point_1o_y",
@@ -191,53 +274,6 @@ class KojtoProfiles(models.Model):
                 show_origin_points=False
             ) or False
 
-    @api.depends("strip_ids", "shape_insert_ids")
-    def _compute_coating_perimeter(self):
-        for record in self:
-            polygons_data = record._get_polygons_data()
-            polygons_data = [p for p in polygons_data if (isinstance(p, dict) and p['points']) or (isinstance(p, list) and p)]
-            external_polygons = []
-            for item in polygons_data:
-                if isinstance(item, dict):
-                    if not item.get('is_subtract', False) and item['points']:
-                        external_polygons.append(item['points'])
-                elif isinstance(item, list) and item:
-                    external_polygons.append(item)
-            record.coating_perimeter = compute_coating_perimeter(external_polygons) or 0.0
-
-    @api.depends("strip_ids", "shape_insert_ids")
-    def _compute_contact_lines_text(self):
-        for record in self:
-            polygons_data = record._get_polygons_data()
-            polygons_data = [p for p in polygons_data if (isinstance(p, dict) and p['points']) or (isinstance(p, list) and p)]
-            external_polygons = []
-            for item in polygons_data:
-                if isinstance(item, dict):
-                    if not item.get('is_subtract', False) and item['points']:
-                        external_polygons.append(item['points'])
-                elif isinstance(item, list) and item:
-                    external_polygons.append(item)
-            contact_lines_result, _, _ = compute_contact_lines(external_polygons) if external_polygons else ([], [], [])
-            contact_lines_str = "\n".join(
-                f"({p1[0]:.2f}, {p1[1]:.2f}) - ({p2[0]:.2f}, {p2[1]:.2f})"
-                for p1, p2 in contact_lines_result
-            ) if contact_lines_result else ""
-            record.contact_lines_list = contact_lines_str
-
-    @api.depends("strip_ids", "shape_insert_ids")
-    def _compute_number_external_corners(self):
-        for record in self:
-            polygons_data = record._get_polygons_data()
-            polygons_data = [p for p in polygons_data if (isinstance(p, dict) and p['points']) or (isinstance(p, list) and p)]
-            external_polygons = []
-            for item in polygons_data:
-                if isinstance(item, dict):
-                    if not item.get('is_subtract', False) and item['points']:
-                        external_polygons.append(item['points'])
-                elif isinstance(item, list) and item:
-                    external_polygons.append(item)
-            record.number_ext_corners = compute_external_corners(external_polygons) or 0
-
     def generate_autocad_dxf(self):
         polygons = self._get_polygons_for_dxf()
         contact_lines_result, _, _ = compute_contact_lines(polygons) if polygons else ([], [], [])
@@ -9,6 +9,7 @@
     "depends": ["kojto_finance"],
     "data": [
         "security/ir.model.access.csv",
+        "data/kojto_warehouses_cron.xml",
 
         "views/kojto_warehouses_batches_views.xml",
         "views/kojto_warehouses_buttons.xml",
@@ -5,6 +5,7 @@ from . import kojto_warehouses_transactions
 from . import kojto_warehouses_certificates
 from . import kojto_warehouses_profile_shapes
 from . import kojto_warehouses_inventory
+from . import kojto_warehouses_balance_snapshots
 from . import kojto_warehouses_landingpage
 from . import kojto_warehouses_receipts
 from . import kojto_warehouses_inspection_report
@@ -0,0 +1,161 @@
+from datetime import date, timedelta
+from odoo import api, models, fields, tools
+import logging
+_logger = logging.getLogger(__name__)
+
+
+class KojtoWarehousesBalanceSnapshots(models.Model):
+    _name = "kojto.warehouses.balance.snapshots"
+    _description = "Warehouse Balance Snapshots"
+    _rec_name = "snapshot_date"
+    _order = "snapshot_date desc, store_id"
+
+    # Cumulative transaction_value_pre_vat_eur of all transactions up to and
+    # including snapshot_date. Created at month ends by cron, and deleted from
+    # the date of any back-dated change on, so a balance at any date is
+    # "nearest snapshot + transactions since".
+    snapshot_date = fields.Date(string="Snapshot Date", required=True, readonly=True)
+    store_id = fields.Many2one("kojto.base.stores", string="Warehouse", readonly=True, ondelete="cascade")
+    accounting_identifier_id = fields.Many2one("kojto.finance.accounting.identifiers", string="Accounting Identifier", readonly=True, ondelete="cascade")
+    subcode_id = fields.Many2one("kojto.commission.subcodes", string="Subcode", readonly=True, ondelete="cascade")
+    value = fields.Float(string="Value (EUR)", digits=(16, 2), readonly=True)
+
+    def init(self):
+        tools.create_index(self.env.cr, "kojto_warehouses_balance_snapshots_date_store_idx", self._table, ["snapshot_date", "store_id"])
+
+        # Anything that moves value before the latest snapshot deletes the
+        # snapshots from that date on. Current-dated writes find nothing to delete.
+        self.env.cr.execute("""
+            CREATE OR REPLACE FUNCTION kojto_warehouses_balance_snapshots_invalidate()
+            RETURNS trigger AS $$
+            DECLARE
+                v_date DATE;
+            BEGIN
+                IF TG_TABLE_NAME = 'kojto_warehouses_transactions' THEN
+                    IF TG_OP = 'INSERT' THEN
+                        v_date := NEW.date_issue;
+                    ELSIF TG_OP = 'DELETE' THEN
+                        v_date := OLD.date_issue;
+                    ELSE
+                        v_date := LEAST(OLD.date_issue, NEW.date_issue);
+                    END IF;
+                ELSIF TG_TABLE_NAME = 'kojto_warehouses_items' THEN
+                    SELECT MIN(date_issue) INTO v_date FROM kojto_warehouses_transactions WHERE item_id = NEW.id;
+                ELSE
+                    SELECT MIN(t.date_issue) INTO v_date
+                    FROM kojto_warehouses_transactions t
+                    JOIN kojto_warehouses_items i ON i.id = t.item_id
+                    WHERE i.batch_id = NEW.id;
+                END IF;
+
+                IF v_date IS NOT NULL THEN
+                    DELETE FROM kojto_warehouses_balance_snapshots WHERE snapshot_date >= v_date;
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS kojto_warehouses_transactions_snapshot_trigger ON kojto_warehouses_transactions;
+            CREATE TRIGGER kojto_warehouses_transactions_snapshot_trigger
+            AFTER INSERT OR DELETE OR UPDATE OF date_issue, item_id, subcode_id, transaction_value_pre_vat_eur ON kojto_warehouses_transactions
+            FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_balance_snapshots_invalidate();
+
+            DROP TRIGGER IF EXISTS kojto_warehouses_items_snapshot_trigger ON kojto_warehouses_items;
+            CREATE TRIGGER kojto_warehouses_items_snapshot_trigger
+            AFTER UPDATE OF batch_id ON kojto_warehouses_items
+            FOR EACH ROW WHEN (OLD.batch_id IS DISTINCT FROM NEW.batch_id)
+            EXECUTE FUNCTION kojto_warehouses_balance_snapshots_invalidate();
+
+            DROP TRIGGER IF EXISTS kojto_warehouses_batches_snapshot_trigger ON kojto_warehouses_batches;
+            CREATE TRIGGER kojto_warehouses_batches_snapshot_trigger
+            AFTER UPDATE OF store_id, accounting_identifier_id ON kojto_warehouses_batches
+            FOR EACH ROW WHEN (OLD.store_id IS DISTINCT FROM NEW.store_id
+                OR OLD.accounting_identifier_id IS DISTINCT FROM NEW.accounting_identifier_id)
+            EXECUTE FUNCTION kojto_warehouses_balance_snapshots_invalidate();
+        """)
+
+    @api.model
+    def get_snapshot_date(self, on_or_before):
+        """Return the latest snapshot date on or before the given date, or None."""
+        self.flush_model()
+        self.env.cr.execute("""
+            SELECT MAX(snapshot_date) FROM kojto_warehouses_balance_snapshots WHERE snapshot_date <= %s
+        """, (on_or_before,))
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def create_snapshots(self, until=None):
+        """Create the missing month-end snapshots up to the last closed month.
+
+        Each month is built from the previous snapshot plus that month's transactions.
+        Returns the number of snapshot dates created.
+        """
+        until = until or date.today().replace(day=1) - timedelta(days=1)
+        cr = self.env.cr
+        self.env['kojto.warehouses.transactions'].flush_model()
+        if not self._get_missing_month_end(until):
+            return 0
+
+        # Writers wait until the snapshots are committed, so a back-dated
+        # transaction cannot slip in between reading and storing them
+        cr.execute("""
+            LOCK TABLE kojto_warehouses_transactions, kojto_warehouses_items, kojto_warehouses_batches IN SHARE MODE
+        """)
+        previous = self.get_snapshot_date(until)
+        month_end = self._get_missing_month_end(until)
+
+        created = 0
+        while month_end and month_end <= until:
+            cr.execute("""
+                INSERT INTO kojto_warehouses_balance_snapshots
+                    (snapshot_date, store_id, accounting_identifier_id, subcode_id, value, create_uid, create_date, write_uid, write_date)
+                SELECT %(date)s, store_id, accounting_identifier_id, subcode_id, SUM(value),
+                    %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                FROM (
+                    SELECT store_id, accounting_identifier_id, subcode_id, value
+                    FROM kojto_warehouses_balance_snapshots
+                    WHERE snapshot_date = %(previous)s
+                    UNION ALL
+                    SELECT b.store_id, b.accounting_identifier_id, t.subcode_id, t.transaction_value_pre_vat_eur
+                    FROM kojto_warehouses_transactions t
+                    INNER JOIN kojto_warehouses_items i ON t.item_id = i.id
+                    INNER JOIN kojto_warehouses_batches b ON i.batch_id = b.id
+                    WHERE t.date_issue <= %(date)s
+                        AND (%(previous)s IS NULL OR t.date_issue > %(previous)s)
+                        AND t.transaction_value_pre_vat_eur IS NOT NULL
+                ) v
+                GROUP BY store_id, accounting_identifier_id, subcode_id
+                HAVING SUM(value) != 0
+            """, {'date': month_end, 'previous': previous, 'uid': self.env.uid})
+            previous = month_end
+            month_end = self._month_end(month_end + timedelta(days=1))
+            created += 1
+
+        if created:
+            _logger.info("Created %s warehouse balance snapshot(s) up to %s", created, previous)
+        self.invalidate_model()
+        return created
+
+    @api.model
+    def _get_missing_month_end(self, until):
+        """Return the first month end after the latest snapshot that is still missing, or None."""
+        previous = self.get_snapshot_date(until)
+        if previous:
+            month_end = self._month_end(previous + timedelta(days=1))
+        else:
+            self.env.cr.execute("""
+                SELECT MIN(date_issue) FROM kojto_warehouses_transactions WHERE transaction_value_pre_vat_eur IS NOT NULL
+            """)
+            first_date = self.env.cr.fetchone()[0]
+            if not first_date:
+                return None
+            month_end = self._month_end(first_date)
+        return month_end if month_end <= until else None
+
+    @api.model
+    def _month_end(self, day):
+        return (day.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    @api.model
+    def _cron_create_snapshots(self):
+        self.create_snapshots()
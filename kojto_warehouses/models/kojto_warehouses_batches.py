@@ -39,8 +39,8 @@ class KojtoWarehousesBatches(models.Model):
     unit_id = fields.Many2one("kojto.base.units", string="Unit", related="accounting_identifier_id.unit_id")
     invoice_content_quantity = fields.Float(string="Invoice Content Quantity", related="invoice_content_id.quantity")
 
-    current_batch_quantity = fields.Float(string="Current Quantity", compute="_compute_current_batch_quantity")
-    current_batch_value = fields.Float(string="Current Value (BGN)", compute="_compute_current_batch_value", store=True)
+    current_batch_quantity = fields.Float(string="Current Quantity", readonly=True, copy=False, help="Maintained in SQL from the transactions, see kojto.warehouses.inventory")
+    current_batch_value = fields.Float(string="Current Value (BGN)", readonly=True, copy=False, help="Maintained in SQL from the quantity and unit price, see kojto.warehouses.inventory")
 
     items_ids = fields.One2many("kojto.warehouses.items", "batch_id", string="Items", context={'active_test': False})
     certificate_ids = fields.One2many("kojto.warehouses.certificates", "batch_id", string="Attachments")
@@ -106,12 +106,6 @@ class KojtoWarehousesBatches(models.Model):
             summary_parts = [f"{count} {cert_type}" for cert_type, count in cert_counts.items()]
             record.repr_attachments = ", ".join(summary_parts)
 
-    @api.depends('items_ids', 'items_ids.current_item_quantity')
-    def _compute_current_batch_quantity(self):
-        """Compute current quantity based on items' current quantities only."""
-        for batch in self:
-            batch.current_batch_quantity = sum(item.current_item_quantity for item in batch.items_ids)
-
     @api.depends('current_batch_quantity')
     def compute_active(self):
         """Compute active status for batches. Can be called directly from outside."""
@@ -119,11 +113,6 @@ class KojtoWarehousesBatches(models.Model):
             rec.active = (rec.current_batch_quantity > 0)
         return {}
 
-    @api.depends('current_batch_quantity', 'unit_price_converted')
-    def _compute_current_batch_value(self):
-        for batch in self:
-            batch.current_batch_value = batch.current_batch_quantity * batch.unit_price_converted
-
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
@@ -138,8 +127,12 @@ class KojtoWarehousesBatches(models.Model):
         return batches
 
     def write(self, vals):
-        """Write method for batches. Odoo automatically handles recomputation of computed fields."""
-        return super().write(vals)
+        """Write method for batches. A new unit price is revalued in SQL, so the cached value is dropped."""
+        result = super().write(vals)
+        if 'unit_price' in vals or 'unit_price_conversion_rate' in vals:
+            self.flush_recordset(['unit_price', 'unit_price_conversion_rate'])
+            self.invalidate_recordset(['current_batch_value'])
+        return result
 
     def _generate_items(self, count, length=0, width=0, weight=0):
         """Generate a specified number of items for this batch with given dimensions."""
@@ -1,4 +1,6 @@
 from odoo import api, models, fields, tools
+import logging
+_logger = logging.getLogger(__name__)
 
 class KojtoWarehousesInventory(models.Model):
     _name = "kojto.warehouses.inventory"
@@ -59,145 +61,358 @@ class KojtoWarehousesInventory(models.Model):
                 ON kojto_warehouses_transactions(to_from_store);
             """)
 
-            # Drop existing view if it exists
+            # Replace the materialized views of earlier versions, their refresh
+            # trigger rescanned all items and transactions on every write
             tools.drop_view_if_exists(self.env.cr, self._table)
+            self.env.cr.execute("""
+                DROP TRIGGER IF EXISTS refresh_warehouse_inventory_trigger ON kojto_warehouses_transactions;
+                DROP FUNCTION IF EXISTS refresh_warehouse_inventory_views();
+                DROP MATERIALIZED VIEW IF EXISTS kojto_warehouses_transaction_quantities;
+                DROP MATERIALIZED VIEW IF EXISTS kojto_warehouses_item_weights;
+            """)
 
-            # Create materialized view for item weights
+            # Balance tables, kept current by the triggers below
             self.env.cr.execute("""
-                CREATE MATERIALIZED VIEW IF NOT EXISTS kojto_warehouses_item_weights AS (
-                    SELECT
-                        i.id,
-                        CASE
-                            WHEN i.item_type = 'sheet' THEN
-                                CASE
-                                    WHEN i.length > 0 AND i.width > 0 AND b.thickness > 0 AND m.density > 0
-                                    THEN (i.length * i.width * b.thickness / 1000000000.0) * m.density
-                                    ELSE 0
-                                END
-                            WHEN i.item_type = 'bar' THEN
-                                CASE
-                                    WHEN i.length > 0 AND m.density > 0 AND p.cross_section > 0
-                                    THEN (i.length * p.cross_section / 1000000000.0) * m.density
-                                    ELSE 0
-                                END
-                            ELSE 0
-                        END as computed_weight
-                    FROM kojto_warehouses_items i
-                    JOIN kojto_warehouses_batches b ON b.id = i.batch_id
-                    LEFT JOIN kojto_base_material_grades m ON m.id = b.material_id
-                    LEFT JOIN kojto_warehouses_profile_shapes p ON p.id = b.profile_id
+                CREATE TABLE IF NOT EXISTS kojto_warehouses_item_balances (
+                    item_id INTEGER PRIMARY KEY,
+                    quantity DOUBLE PRECISION NOT NULL DEFAULT 0
                 );
 
-                CREATE UNIQUE INDEX IF NOT EXISTS kojto_warehouses_item_weights_id_idx
-                ON kojto_warehouses_item_weights(id);
+                CREATE TABLE IF NOT EXISTS kojto_warehouses_identifier_balances (
+                    accounting_identifier_id INTEGER PRIMARY KEY,
+                    quantity DOUBLE PRECISION NOT NULL DEFAULT 0,
+                    value DOUBLE PRECISION NOT NULL DEFAULT 0
+                );
+            """)
+
+            # Delta functions. Quantities are signed by to_from_store and
+            # valued at the current converted unit price of the item's batch.
+            # They also keep the stored item and batch quantities current.
+            self.env.cr.execute("""
+                CREATE OR REPLACE FUNCTION kojto_warehouses_apply_identifier_delta(
+                    p_identifier_id INTEGER, p_quantity DOUBLE PRECISION, p_value DOUBLE PRECISION)
+                RETURNS void AS $$
+                BEGIN
+                    IF p_identifier_id IS NULL THEN
+                        RETURN;
+                    END IF;
+                    INSERT INTO kojto_warehouses_identifier_balances AS ib (accounting_identifier_id, quantity, value)
+                    VALUES (p_identifier_id, p_quantity, p_value)
+                    ON CONFLICT (accounting_identifier_id) DO UPDATE
+                    SET quantity = ib.quantity + EXCLUDED.quantity,
+                        value = ib.value + EXCLUDED.value;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE OR REPLACE FUNCTION kojto_warehouses_apply_batch_delta(
+                    p_batch_id INTEGER, p_quantity DOUBLE PRECISION)
+                RETURNS void AS $$
+                DECLARE
+                    v_identifier_id INTEGER;
+                    v_price DOUBLE PRECISION;
+                BEGIN
+                    UPDATE kojto_warehouses_batches
+                    SET current_batch_quantity = COALESCE(current_batch_quantity, 0) + p_quantity,
+                        current_batch_value = (COALESCE(current_batch_quantity, 0) + p_quantity)
+                            * COALESCE(unit_price * COALESCE(NULLIF(unit_price_conversion_rate, 0), 1.0), 0),
+                        active = COALESCE(current_batch_quantity, 0) + p_quantity > 0
+                    WHERE id = p_batch_id
+                    RETURNING accounting_identifier_id, unit_price * COALESCE(NULLIF(unit_price_conversion_rate, 0), 1.0)
+                    INTO v_identifier_id, v_price;
+                    -- Batch already deleted, its delete trigger took the balance out
+                    IF NOT FOUND THEN
+                        RETURN;
+                    END IF;
+                    PERFORM kojto_warehouses_apply_identifier_delta(v_identifier_id, p_quantity, p_quantity * COALESCE(v_price, 0));
+                END;
+                $$ LANGUAGE plpgsql;
 
-                CREATE INDEX IF NOT EXISTS kojto_warehouses_item_weights_computed_weight_idx
-                ON kojto_warehouses_item_weights(computed_weight);
+                CREATE OR REPLACE FUNCTION kojto_warehouses_apply_stock_delta(
+                    p_item_id INTEGER, p_quantity DOUBLE PRECISION)
+                RETURNS void AS $$
+                DECLARE
+                    v_batch_id INTEGER;
+                BEGIN
+                    IF p_item_id IS NULL OR p_quantity = 0 THEN
+                        RETURN;
+                    END IF;
+                    UPDATE kojto_warehouses_items
+                    SET current_item_quantity = COALESCE(current_item_quantity, 0) + p_quantity,
+                        active = COALESCE(current_item_quantity, 0) + p_quantity > 0
+                    WHERE id = p_item_id
+                    RETURNING batch_id INTO v_batch_id;
+                    -- Item already deleted, its delete trigger took the balance out
+                    IF NOT FOUND THEN
+                        RETURN;
+                    END IF;
+                    INSERT INTO kojto_warehouses_item_balances AS ib (item_id, quantity)
+                    VALUES (p_item_id, p_quantity)
+                    ON CONFLICT (item_id) DO UPDATE SET quantity = ib.quantity + EXCLUDED.quantity;
+                    PERFORM kojto_warehouses_apply_batch_delta(v_batch_id, p_quantity);
+                END;
+                $$ LANGUAGE plpgsql;
             """)
 
-            # Create materialized view for transaction quantities
+            # Transactions: move the old row out and the new row in
             self.env.cr.execute("""
-                CREATE MATERIALIZED VIEW IF NOT EXISTS kojto_warehouses_transaction_quantities AS (
-                    SELECT
-                        t.id,
-                        CASE
-                            WHEN i.item_type IN ('sheet', 'bar') THEN iw.computed_weight
-                            WHEN i.item_type = 'part' THEN t.transaction_quantity_override
-                            ELSE 0
-                        END as computed_quantity
-                    FROM kojto_warehouses_transactions t
-                    JOIN kojto_warehouses_items i ON i.id = t.item_id
-                    LEFT JOIN kojto_warehouses_item_weights iw ON iw.id = i.id
-                );
+                CREATE OR REPLACE FUNCTION kojto_warehouses_transactions_balance_trigger()
+                RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        PERFORM kojto_warehouses_apply_stock_delta(
+                            OLD.item_id,
+                            -CASE WHEN OLD.to_from_store = 'from_store' THEN -1 ELSE 1 END * COALESCE(OLD.transaction_quantity, 0));
+                    END IF;
+                    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                        PERFORM kojto_warehouses_apply_stock_delta(
+                            NEW.item_id,
+                            CASE WHEN NEW.to_from_store = 'from_store' THEN -1 ELSE 1 END * COALESCE(NEW.transaction_quantity, 0));
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS kojto_warehouses_transactions_balance_trigger ON kojto_warehouses_transactions;
+                CREATE TRIGGER kojto_warehouses_transactions_balance_trigger
+                AFTER INSERT OR DELETE OR UPDATE OF item_id, transaction_quantity, to_from_store ON kojto_warehouses_transactions
+                FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_transactions_balance_trigger();
+            """)
+
+            # Items: moving an item to another batch moves its balance, deleting
+            # it takes the balance out before its transactions cascade
+            self.env.cr.execute("""
+                CREATE OR REPLACE FUNCTION kojto_warehouses_items_balance_trigger()
+                RETURNS trigger AS $$
+                DECLARE
+                    v_quantity DOUBLE PRECISION;
+                BEGIN
+                    SELECT quantity INTO v_quantity FROM kojto_warehouses_item_balances WHERE item_id = OLD.id;
+                    v_quantity := COALESCE(v_quantity, 0);
+
+                    IF v_quantity != 0 THEN
+                        PERFORM kojto_warehouses_apply_batch_delta(OLD.batch_id, -v_quantity);
+                    END IF;
+
+                    IF TG_OP = 'DELETE' THEN
+                        DELETE FROM kojto_warehouses_item_balances WHERE item_id = OLD.id;
+                        RETURN OLD;
+                    END IF;
+
+                    IF v_quantity != 0 THEN
+                        PERFORM kojto_warehouses_apply_batch_delta(NEW.batch_id, v_quantity);
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
 
-                CREATE UNIQUE INDEX IF NOT EXISTS kojto_warehouses_transaction_quantities_id_idx
-                ON kojto_warehouses_transaction_quantities(id);
+                DROP TRIGGER IF EXISTS kojto_warehouses_items_balance_trigger ON kojto_warehouses_items;
+                CREATE TRIGGER kojto_warehouses_items_balance_trigger
+                AFTER UPDATE OF batch_id ON kojto_warehouses_items
+                FOR EACH ROW WHEN (OLD.batch_id IS DISTINCT FROM NEW.batch_id)
+                EXECUTE FUNCTION kojto_warehouses_items_balance_trigger();
 
-                CREATE INDEX IF NOT EXISTS kojto_warehouses_transaction_quantities_computed_quantity_idx
-                ON kojto_warehouses_transaction_quantities(computed_quantity);
+                DROP TRIGGER IF EXISTS kojto_warehouses_items_balance_delete_trigger ON kojto_warehouses_items;
+                CREATE TRIGGER kojto_warehouses_items_balance_delete_trigger
+                BEFORE DELETE ON kojto_warehouses_items
+                FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_items_balance_trigger();
             """)
 
-            # Create the main inventory view
+            # Batches: a new identifier or unit price revalues the whole batch
+            self.env.cr.execute("""
+                CREATE OR REPLACE FUNCTION kojto_warehouses_batches_balance_trigger()
+                RETURNS trigger AS $$
+                DECLARE
+                    v_quantity DOUBLE PRECISION;
+                BEGIN
+                    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                        SELECT COALESCE(SUM(ib.quantity), 0) INTO v_quantity
+                        FROM kojto_warehouses_item_balances ib
+                        JOIN kojto_warehouses_items i ON i.id = ib.item_id
+                        WHERE i.batch_id = OLD.id;
+                        PERFORM kojto_warehouses_apply_identifier_delta(
+                            OLD.accounting_identifier_id, -v_quantity,
+                            -v_quantity * COALESCE(OLD.unit_price * COALESCE(NULLIF(OLD.unit_price_conversion_rate, 0), 1.0), 0));
+                    ELSE
+                        v_quantity := 0;
+                    END IF;
+
+                    IF TG_OP = 'DELETE' THEN
+                        RETURN OLD;
+                    END IF;
+
+                    -- Also creates the row of an identifier without stock yet
+                    PERFORM kojto_warehouses_apply_identifier_delta(
+                        NEW.accounting_identifier_id, v_quantity,
+                        v_quantity * COALESCE(NEW.unit_price * COALESCE(NULLIF(NEW.unit_price_conversion_rate, 0), 1.0), 0));
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS kojto_warehouses_batches_balance_trigger ON kojto_warehouses_batches;
+                CREATE TRIGGER kojto_warehouses_batches_balance_trigger
+                AFTER INSERT OR UPDATE OF accounting_identifier_id, unit_price, unit_price_conversion_rate ON kojto_warehouses_batches
+                FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_batches_balance_trigger();
+
+                DROP TRIGGER IF EXISTS kojto_warehouses_batches_balance_delete_trigger ON kojto_warehouses_batches;
+                CREATE TRIGGER kojto_warehouses_batches_balance_delete_trigger
+                BEFORE DELETE ON kojto_warehouses_batches
+                FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_batches_balance_trigger();
+
+                -- The stored batch value follows its quantity and unit price
+                CREATE OR REPLACE FUNCTION kojto_warehouses_batches_value_trigger()
+                RETURNS trigger AS $$
+                BEGIN
+                    NEW.current_batch_value := COALESCE(NEW.current_batch_quantity, 0)
+                        * COALESCE(NEW.unit_price * COALESCE(NULLIF(NEW.unit_price_conversion_rate, 0), 1.0), 0);
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                DROP TRIGGER IF EXISTS kojto_warehouses_batches_value_trigger ON kojto_warehouses_batches;
+                CREATE TRIGGER kojto_warehouses_batches_value_trigger
+                BEFORE INSERT OR UPDATE OF unit_price, unit_price_conversion_rate ON kojto_warehouses_batches
+                FOR EACH ROW EXECUTE FUNCTION kojto_warehouses_batches_value_trigger();
+            """)
+
+            # The inventory reads the per-identifier balances only
             self.env.cr.execute("""
                 CREATE OR REPLACE VIEW kojto_warehouses_inventory AS (
-                    WITH inventory_quantities AS (
-                        SELECT
-                            b.accounting_identifier_id,
-                            SUM(
-                                CASE
-                                    WHEN t.to_from_store = 'to_store' THEN tq.computed_quantity
-                                    WHEN t.to_from_store = 'from_store' THEN -tq.computed_quantity
-                                    ELSE 0
-                                END
-                            ) as total_quantity,
-                            SUM(
-                                CASE
-                                    WHEN t.to_from_store = 'to_store' THEN tq.computed_quantity * (b.unit_price * COALESCE(b.unit_price_conversion_rate, 1.0))
-                                    WHEN t.to_from_store = 'from_store' THEN -tq.computed_quantity * (b.unit_price * COALESCE(b.unit_price_conversion_rate, 1.0))
-                                    ELSE 0
-                                END
-                            ) as total_value
-                        FROM kojto_warehouses_batches b
-                        JOIN kojto_warehouses_items i ON i.batch_id = b.id
-                        JOIN kojto_warehouses_transactions t ON t.item_id = i.id
-                        JOIN kojto_warehouses_transaction_quantities tq ON tq.id = t.id
-                        WHERE b.accounting_identifier_id IS NOT NULL
-                        GROUP BY b.accounting_identifier_id
-                    )
                     SELECT
-                        MIN(b.id) as id,
-                        b.accounting_identifier_id,
+                        ib.accounting_identifier_id as id,
+                        ib.accounting_identifier_id,
                         ai.name as name,
                         ai.unit_id as unit_id,
                         ai.identifier as identifier,
                         ai.identifier_type as identifier_type,
                         ai.active as active,
-                        COALESCE(iq.total_quantity, 0) as current_quantity,
-                        COALESCE(iq.total_value, 0) as current_value,
+                        ib.quantity as current_quantity,
+                        ib.value as current_value,
                         CASE
-                            WHEN COALESCE(iq.total_quantity, 0) != 0
-                            THEN COALESCE(iq.total_value, 0) / NULLIF(iq.total_quantity, 0)
+                            WHEN ib.quantity != 0
+                            THEN ib.value / ib.quantity
                             ELSE NULL
                         END as weighted_unit_price
-                    FROM kojto_warehouses_batches b
-                    JOIN kojto_finance_accounting_identifiers ai ON b.accounting_identifier_id = ai.id
-                    LEFT JOIN inventory_quantities iq ON iq.accounting_identifier_id = b.accounting_identifier_id
-                    WHERE b.accounting_identifier_id IS NOT NULL
-                    GROUP BY
-                        b.accounting_identifier_id,
-                        ai.name,
-                        ai.unit_id,
-                        ai.identifier,
-                        ai.identifier_type,
-                        ai.active,
-                        iq.total_quantity,
-                        iq.total_value
+                    FROM kojto_warehouses_identifier_balances ib
+                    JOIN kojto_finance_accounting_identifiers ai ON ai.id = ib.accounting_identifier_id
                 );
             """)
 
-            # Create refresh function for materialized views
-            self.env.cr.execute("""
-                CREATE OR REPLACE FUNCTION refresh_warehouse_inventory_views()
-                RETURNS trigger AS $$
-                BEGIN
-                    REFRESH MATERIALIZED VIEW CONCURRENTLY kojto_warehouses_item_weights;
-                    REFRESH MATERIALIZED VIEW CONCURRENTLY kojto_warehouses_transaction_quantities;
-                    RETURN NULL;
-                END;
-                $$ LANGUAGE plpgsql;
-
-                DROP TRIGGER IF EXISTS refresh_warehouse_inventory_trigger ON kojto_warehouses_transactions;
-                CREATE TRIGGER refresh_warehouse_inventory_trigger
-                AFTER INSERT OR UPDATE OR DELETE ON kojto_warehouses_transactions
-                FOR EACH STATEMENT EXECUTE FUNCTION refresh_warehouse_inventory_views();
-            """)
+            self.reconcile_balances()
 
         except Exception as e:
             raise
 
-    def refresh_materialized_views(self):
-        """Manually refresh the materialized views."""
-        self.env.cr.execute("""
-            REFRESH MATERIALIZED VIEW CONCURRENTLY kojto_warehouses_item_weights;
-            REFRESH MATERIALIZED VIEW CONCURRENTLY kojto_warehouses_transaction_quantities;
+    @api.model
+    def reconcile_balances(self):
+        """Rebuild the balance tables and the stored item and batch quantities
+        from the transactions and fix any drift. Also backfills them after install.
+
+        Writers are blocked while the tables are locked, readers are not.
+        Only rows that differ are written.
+        """
+        cr = self.env.cr
+        self.env['kojto.warehouses.transactions'].flush_model()
+        self.env['kojto.warehouses.items'].flush_model()
+        self.env['kojto.warehouses.batches'].flush_model()
+        cr.execute("""
+            LOCK TABLE kojto_warehouses_items, kojto_warehouses_batches,
+                kojto_warehouses_item_balances, kojto_warehouses_identifier_balances
+            IN EXCLUSIVE MODE
         """)
+
+        cr.execute("""
+            WITH computed AS (
+                SELECT
+                    t.item_id,
+                    SUM(CASE WHEN t.to_from_store = 'from_store' THEN -1 ELSE 1 END * COALESCE(t.transaction_quantity, 0)) as quantity
+                FROM kojto_warehouses_transactions t
+                JOIN kojto_warehouses_items i ON i.id = t.item_id
+                GROUP BY t.item_id
+            ),
+            deleted AS (
+                DELETE FROM kojto_warehouses_item_balances ib
+                WHERE NOT EXISTS (SELECT 1 FROM computed c WHERE c.item_id = ib.item_id)
+                RETURNING 1
+            ),
+            upserted AS (
+                INSERT INTO kojto_warehouses_item_balances AS ib (item_id, quantity)
+                SELECT item_id, quantity FROM computed
+                ON CONFLICT (item_id) DO UPDATE SET quantity = EXCLUDED.quantity
+                WHERE ib.quantity IS DISTINCT FROM EXCLUDED.quantity
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM deleted) + (SELECT COUNT(*) FROM upserted)
+        """)
+        item_fixes = cr.fetchone()[0]
+
+        cr.execute("""
+            UPDATE kojto_warehouses_items i
+            SET current_item_quantity = c.quantity, active = c.quantity > 0
+            FROM (
+                SELECT i2.id, COALESCE(ib.quantity, 0) as quantity
+                FROM kojto_warehouses_items i2
+                LEFT JOIN kojto_warehouses_item_balances ib ON ib.item_id = i2.id
+            ) c
+            WHERE i.id = c.id
+              AND (i.current_item_quantity IS DISTINCT FROM c.quantity OR i.active IS DISTINCT FROM c.quantity > 0)
+        """)
+        item_fixes += cr.rowcount
+
+        cr.execute("""
+            UPDATE kojto_warehouses_batches b
+            SET current_batch_quantity = c.quantity,
+                current_batch_value = c.quantity * COALESCE(b.unit_price * COALESCE(NULLIF(b.unit_price_conversion_rate, 0), 1.0), 0),
+                active = c.quantity > 0
+            FROM (
+                SELECT b2.id, COALESCE(SUM(ib.quantity), 0) as quantity
+                FROM kojto_warehouses_batches b2
+                LEFT JOIN kojto_warehouses_items i ON i.batch_id = b2.id
+                LEFT JOIN kojto_warehouses_item_balances ib ON ib.item_id = i.id
+                GROUP BY b2.id
+            ) c
+            WHERE b.id = c.id
+              AND (b.current_batch_quantity IS DISTINCT FROM c.quantity OR b.active IS DISTINCT FROM c.quantity > 0
+                   OR b.current_batch_value IS DISTINCT FROM
+                      c.quantity * COALESCE(b.unit_price * COALESCE(NULLIF(b.unit_price_conversion_rate, 0), 1.0), 0))
+        """)
+        batch_fixes = cr.rowcount
+
+        cr.execute("""
+            WITH computed AS (
+                SELECT
+                    b.accounting_identifier_id,
+                    COALESCE(SUM(ib.quantity), 0) as quantity,
+                    COALESCE(SUM(ib.quantity * b.unit_price * COALESCE(NULLIF(b.unit_price_conversion_rate, 0), 1.0)), 0) as value
+                FROM kojto_warehouses_batches b
+                LEFT JOIN kojto_warehouses_items i ON i.batch_id = b.id
+                LEFT JOIN kojto_warehouses_item_balances ib ON ib.item_id = i.id
+                WHERE b.accounting_identifier_id IS NOT NULL
+                GROUP BY b.accounting_identifier_id
+            ),
+            deleted AS (
+                DELETE FROM kojto_warehouses_identifier_balances ib
+                WHERE NOT EXISTS (SELECT 1 FROM computed c WHERE c.accounting_identifier_id = ib.accounting_identifier_id)
+                RETURNING 1
+            ),
+            upserted AS (
+                INSERT INTO kojto_warehouses_identifier_balances AS ib (accounting_identifier_id, quantity, value)
+                SELECT accounting_identifier_id, quantity, value FROM computed
+                ON CONFLICT (accounting_identifier_id) DO UPDATE
+                SET quantity = EXCLUDED.quantity, value = EXCLUDED.value
+                WHERE ib.quantity IS DISTINCT FROM EXCLUDED.quantity OR ib.value IS DISTINCT FROM EXCLUDED.value
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM deleted) + (SELECT COUNT(*) FROM upserted)
+        """)
+        identifier_fixes = cr.fetchone()[0]
+
+        if item_fixes or batch_fixes or identifier_fixes:
+            _logger.info("Warehouse balances reconciled: %s item rows, %s batch rows, %s identifier rows corrected", item_fixes, batch_fixes, identifier_fixes)
+        self.env['kojto.warehouses.items'].invalidate_model(['current_item_quantity', 'active'])
+        self.env['kojto.warehouses.batches'].invalidate_model(['current_batch_quantity', 'current_batch_value', 'active'])
+        self.invalidate_model()
+        return True
+
+    @api.model
+    def _cron_reconcile_balances(self):
+        self.reconcile_balances()
@@ -33,7 +33,7 @@ class KojtoWarehousesItems(models.Model):
     length = fields.Float(string="Length (mm)", default=1000.0)
     width = fields.Float(string="Width (mm)", default=1000.0)
     weight = fields.Float(string="Weight (kg)", compute="compute_weight", store=True, default=1.0)
-    current_item_quantity = fields.Float(string="Current Qty", compute="_compute_current_item_quantity")
+    current_item_quantity = fields.Float(string="Current Qty", readonly=True, copy=False, help="Maintained in SQL from the transactions, see kojto.warehouses.inventory")
     transaction_ids = fields.One2many("kojto.warehouses.transactions", "item_id", string="Transactions")
 
     part_type = fields.Selection([('common', 'Common'), ('fastener', 'Fastener'), ('package', 'Package'), ('other', 'Other')], string="Part Type", default='common')
@@ -162,9 +162,8 @@ class KojtoWarehousesItems(models.Model):
                     subtype_xmlid='mail.mt_note'
                 )
 
-            # Force recompute of available quantity and active status
-            item._compute_current_item_quantity()
-            item.compute_active()
+        # Pick up the quantities and active status the initial transactions set
+        items._refresh_stock_quantities()
         return items
 
     def write(self, vals):
@@ -194,24 +193,26 @@ class KojtoWarehousesItems(models.Model):
                         raise ValidationError(_("Weight calculation failed for sheet item %s.") % item.name)
 
                     if item.weight != old_weights.get(item.id, 0.0):
-                        # Force recompute of available quantity since weight changed
-                        item._compute_current_item_quantity()
-                        item.compute_active()
+                        # Weight changed the transaction quantities
+                        item._refresh_stock_quantities()
                 except Exception as e:
                     raise
 
         return result
 
-    @api.depends('transaction_ids.transaction_quantity', 'transaction_ids.to_from_store')
-    def _compute_current_item_quantity(self):
-        """Compute current quantity by summing transaction quantities."""
-        for item in self:
-            quantity = sum(
-                transaction.transaction_quantity if transaction.to_from_store == 'to_store'
-                else -transaction.transaction_quantity
-                for transaction in item.transaction_ids
-            )
-            item.current_item_quantity = quantity
+    def _refresh_stock_quantities(self):
+        """Reload the quantities and active status of the items and their batches.
+
+        The SQL triggers update them when transactions are written, so pending
+        transaction writes are flushed and the cached values dropped. Quantities
+        go first, so pending recomputes of active read the new ones.
+        """
+        self.env['kojto.warehouses.transactions'].flush_model()
+        batches = self.batch_id
+        self.invalidate_recordset(['current_item_quantity'])
+        batches.invalidate_recordset(['current_batch_quantity'])
+        self.invalidate_recordset(['active'])
+        batches.invalidate_recordset(['current_batch_value', 'active'])
 
     @api.depends('current_item_quantity')
     def compute_active(self):
@@ -134,25 +134,18 @@ class KojtoWarehousesTransactions(models.Model):
 
         transactions = super().create(vals_list)
         for transaction in transactions:
-            transaction.item_id._compute_current_item_quantity()
-            transaction.item_id.compute_active()
             transaction.write({'name': get_final_name(transaction.id, transaction.to_from_store, TRANSACTION_PREFIXES, DEFAULT_PREFIX)})
-            # Update batch computations
-            transaction.batch_id._compute_current_batch_quantity()
-            transaction.batch_id.compute_active()
+        # Item and batch quantities are updated in SQL
+        transactions.item_id._refresh_stock_quantities()
 
         return transactions
 
     def write(self, vals):
-        """Update batch computations on transaction changes."""
+        """Reload item and batch quantities on transaction changes."""
+        affected_items = self.item_id
         result = super().write(vals)
-        if 'transaction_quantity_override' in vals:
-            for transaction in self:
-                transaction.item_id._compute_current_item_quantity()
-        affected_batches = self.mapped('batch_id')
-        for batch in affected_batches:
-            batch._compute_current_batch_quantity()
-            batch.compute_active()
+        if {'item_id', 'transaction_quantity', 'transaction_quantity_override', 'to_from_store'}.intersection(vals):
+            (affected_items | self.item_id)._refresh_stock_quantities()
         return result
 
     @api.constrains('to_from_store', 'job_id', 'item_id')
@@ -205,11 +198,9 @@ class KojtoWarehousesTransactions(models.Model):
             if record.receipt_id:
                 raise ValidationError(_("Cannot delete transaction %s as it is linked to receipt %s.") % (record.name, record.receipt_id.name))
 
-        affected_batches = self.mapped('batch_id')
+        affected_items = self.item_id
         result = super().unlink()
-        for batch in affected_batches:
-            batch._compute_current_batch_quantity()
-            batch.compute_active()
+        affected_items.exists()._refresh_stock_quantities()
         return result
 
     def action_create_receipt(self):
@@ -344,14 +335,12 @@ class KojtoWarehousesTransactions(models.Model):
             return 0.51129  # Fallback: 1 BGN = 0.51129 EUR
 
         # Try to get exchange rate from exchange model
-        exchange_rate = self.env['kojto.base.currency.exchange'].search([
-            ('base_currency_id', '=', bgn_currency.id),
-            ('target_currency_id', '=', eur_currency.id),
-            ('datetime', '<=', date),
-        ], order='datetime desc', limit=1)
+        exchange_rate = self.env['kojto.base.currency.exchange'].get_rate(
+            bgn_currency.id, eur_currency.id, date, inverse=False, latest=False
+        )
 
         if exchange_rate:
-            return exchange_rate.exchange_rate
+            return exchange_rate
 
         # Fallback to hardcoded rate: 1 BGN = 0.51129 EUR
         return 0.51129
@@ -168,3 +168,8 @@ class KojtoWarehousesBalanceIdentifierLine(models.TransientModel):
         from .utils.kojto_warehouses_balance_wizard_actions import action_export_identifier_transactions_to_excel
         return action_export_identifier_transactions_to_excel(self.sudo())
 
+    def _xlsx_export_transactions(self, xlsx, **params):
+        """Write the transactions of this identifier into the streaming export"""
+        from .utils.kojto_warehouses_balance_wizard_actions import write_identifier_transactions
+        return write_identifier_transactions(self.sudo(), xlsx)
+
@@ -85,3 +85,8 @@ class KojtoWarehousesBalanceInfoLine(models.TransientModel):
         from .utils.kojto_warehouses_balance_wizard_actions import action_export_warehouse_transactions_to_excel
         return action_export_warehouse_transactions_to_excel(self.sudo())
 
+    def _xlsx_export_transactions(self, xlsx, **params):
+        """Write the transactions of this warehouse into the streaming export"""
+        from .utils.kojto_warehouses_balance_wizard_actions import write_warehouse_transactions
+        return write_warehouse_transactions(self.sudo(), xlsx)
+
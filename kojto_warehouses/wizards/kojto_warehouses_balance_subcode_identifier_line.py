@@ -170,3 +170,8 @@ class KojtoWarehousesBalanceSubcodeIdentifierLine(models.TransientModel):
         from .utils.kojto_warehouses_balance_wizard_actions import action_export_subcode_identifier_transactions_to_excel
         return action_export_subcode_identifier_transactions_to_excel(self.sudo())
 
+    def _xlsx_export_transactions(self, xlsx, **params):
+        """Write the transactions of this subcode-identifier combination into the streaming export"""
+        from .utils.kojto_warehouses_balance_wizard_actions import write_subcode_identifier_transactions
+        return write_subcode_identifier_transactions(self.sudo(), xlsx)
+
@@ -131,3 +131,8 @@ class KojtoWarehousesBalanceSubcodeLine(models.TransientModel):
         from .utils.kojto_warehouses_balance_wizard_actions import action_export_subcode_transactions_to_excel
         return action_export_subcode_transactions_to_excel(self.sudo())
 
+    def _xlsx_export_transactions(self, xlsx, **params):
+        """Write the transactions of this subcode into the streaming export"""
+        from .utils.kojto_warehouses_balance_wizard_actions import write_subcode_transactions
+        return write_subcode_transactions(self.sudo(), xlsx)
+
@@ -373,6 +373,11 @@ class KojtoWarehousesBalanceWizard(models.TransientModel):
         from .utils.kojto_warehouses_balance_wizard_actions import action_export_balance_to_excel
         return action_export_balance_to_excel(self)
 
+    def _xlsx_export_balance(self, xlsx, **params):
+        """Write the balance sheets into the streaming export"""
+        from .utils.kojto_warehouses_balance_wizard_actions import write_balance_workbook
+        return write_balance_workbook(self, xlsx)
+
     def action_save_balance(self):
         """Save/recompute the current balance calculation"""
         self.ensure_one()
@@ -3,12 +3,76 @@
 Kojto Warehouses Balance Wizard - Actions
 
 Contains action methods for the wizard (export functionality).
+
+The export actions only validate and prepare the data, then return a download
+of the streaming export in kojto_base. The write_* functions fill the workbook
+in the download request, reading the transactions with a server-side cursor.
 """
 
 from odoo.exceptions import UserError
-import io
-import base64
-import xlsxwriter
+from odoo.addons.kojto_base.utils.kojto_base_xlsx_export import iter_query, xlsx_export_action
+
+
+TRANSACTIONS_SQL = """
+    SELECT
+        t.date_issue,
+        t.name AS transaction_name,
+        t.to_from_store,
+        COALESCE(t.transaction_quantity, 0) AS quantity,
+        COALESCE(t.transaction_value_pre_vat_eur, 0) AS value_eur,
+        item.name AS item_name,
+        b.name AS batch_name,
+        s.name AS warehouse_name,
+        sc.name AS subcode_name,
+        sc.description AS subcode_description
+    FROM kojto_warehouses_transactions t
+    LEFT JOIN kojto_warehouses_items item ON t.item_id = item.id
+    LEFT JOIN kojto_warehouses_batches b ON t.batch_id = b.id
+    LEFT JOIN kojto_base_stores s ON b.store_id = s.id
+    LEFT JOIN kojto_commission_subcodes sc ON t.subcode_id = sc.id
+    WHERE {where}
+    ORDER BY t.date_issue DESC, t.id DESC
+"""
+
+# Transaction columns shared by the transaction sheets: (header, width, format)
+DATE_COLUMN = ('Date', 12, 'date')
+TRANSACTION_COLUMN = ('Transaction', 20, None)
+STOCK_COLUMNS = [
+    ('Warehouse', 20, None), ('Item', 20, None), ('Batch', 20, None), ('Type', 20, None),
+]
+VALUE_COLUMNS = [
+    ('Quantity', 18, 'currency'), ('Unit Price (EUR)', 18, 'currency'), ('Transaction Value (EUR)', 18, 'currency'),
+]
+SUBCODE_COLUMNS = [('Subcode', 20, None), ('Subcode Description', 20, None)]
+IDENTIFIER_COLUMNS = [('Identifier ID', 15, None), ('Identifier Name', 30, None), ('Identifier Type', 15, None)]
+
+
+def _iter_transactions(env, where, params):
+    """Yield the transaction rows matching the WHERE clause, with type label and unit price."""
+    for row in iter_query(env.cr, TRANSACTIONS_SQL.format(where=where), params):
+        row['type_label'] = 'To Store' if row['to_from_store'] == 'to_store' else 'From Store'
+        row['unit_price_eur'] = abs(row['value_eur'] / row['quantity']) if row['quantity'] > 0 else 0.0
+        yield row
+
+
+def _write_transactions(xlsx, sheet_name, leading_columns, transactions, leading_values):
+    """Write a transaction sheet: date, transaction, the leading columns, stock and value columns, then a total."""
+    xlsx.add_sheet(sheet_name, [DATE_COLUMN, TRANSACTION_COLUMN] + leading_columns + STOCK_COLUMNS + VALUE_COLUMNS)
+    total_value_eur = 0.0
+    for row in transactions:
+        xlsx.write_row(
+            [row['date_issue'], row['transaction_name']]
+            + leading_values(row)
+            + [row['warehouse_name'], row['item_name'], row['batch_name'], row['type_label'],
+               row['quantity'], row['unit_price_eur'], row['value_eur']]
+        )
+        total_value_eur += row['value_eur']
+    total_col = 2 + len(leading_columns) + len(STOCK_COLUMNS) + 1
+    xlsx.write_row([''] * total_col + ['TOTAL', total_value_eur], bold=True)
+
+
+def _identifier_type_label(line):
+    return dict(line._fields['identifier_type'].selection).get(line.identifier_type, '') if line.identifier_type else ''
 
 
 def action_export_balance_to_excel(wizard):
@@ -27,308 +91,111 @@ def action_export_balance_to_excel(wizard):
     if not wizard.warehouse_balance_line_ids:
         raise UserError("No data to export. Please compute the balance first.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    return xlsx_export_action(wizard, 'balance')
 
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
-
-    currency = wizard.currency_id or wizard.env.ref('base.EUR')
 
+def write_balance_workbook(wizard, xlsx):
+    """Write the balance sheets of the wizard, returns the filename"""
     # Sheet 1: Warehouse Balance Summary
-    worksheet = workbook.add_worksheet('Warehouse Balance')
-
-    # Write headers
-    headers = ['Warehouse', 'Beginning Value (EUR)', 'Ending Value (EUR)', 'Change (EUR)']
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-
-    # Write data
-    for row, line in enumerate(wizard.warehouse_balance_line_ids, start=1):
-        worksheet.write(row, 0, line.warehouse_name or '')
-        worksheet.write(row, 1, line.beginning_value or 0.0, currency_format)
-        worksheet.write(row, 2, line.ending_value or 0.0, currency_format)
+    xlsx.add_sheet('Warehouse Balance', [
+        ('Warehouse', 30, None), ('Beginning Value (EUR)', 18, 'currency'),
+        ('Ending Value (EUR)', 18, 'currency'), ('Change (EUR)', 18, 'currency'),
+    ])
+    for line in wizard.warehouse_balance_line_ids:
         change = (line.ending_value or 0.0) - (line.beginning_value or 0.0)
-        worksheet.write(row, 3, change, currency_format)
-
-    # Write totals row
-    if wizard.warehouse_balance_line_ids:
-        total_row = len(wizard.warehouse_balance_line_ids) + 1
-        worksheet.write(total_row, 0, 'TOTAL', bold_format)
-        worksheet.write(total_row, 1, wizard.beginning_value or 0.0, currency_format)
-        worksheet.write(total_row, 2, wizard.ending_value or 0.0, currency_format)
-        total_change = (wizard.ending_value or 0.0) - (wizard.beginning_value or 0.0)
-        worksheet.write(total_row, 3, total_change, currency_format)
-
-    # Set column widths
-    worksheet.set_column(0, 0, 30)  # Warehouse
-    worksheet.set_column(1, 3, 18)  # Financial columns
-
-    # Sheet 2: Transactions
-    # Use cached transaction data (no need to create thousands of records)
-    import json
-    transaction_lines_data = []
-    if wizard.transaction_lines_cache:
-        try:
-            transaction_lines_data = json.loads(wizard.transaction_lines_cache)
-        except:
-            pass
-
-    if transaction_lines_data:
-        worksheet = workbook.add_worksheet('Transactions')
-
-        # Write headers
-        headers = [
-            'Date', 'Warehouse', 'Transaction', 'Item', 'Batch',
-            'Type', 'Quantity', 'Unit Price (EUR)', 'Transaction Value (EUR)'
-        ]
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data directly from cached dictionary data
-        for row, line_data in enumerate(transaction_lines_data, start=1):
-            col = 0
-            worksheet.write(row, col, line_data.get('date_issue') or '', date_format)
-            col += 1
-            worksheet.write(row, col, line_data.get('warehouse_name') or '')
-            col += 1
-            worksheet.write(row, col, line_data.get('transaction_name') or '')
-            col += 1
-            worksheet.write(row, col, line_data.get('item_name') or '')
-            col += 1
-            worksheet.write(row, col, line_data.get('batch_name') or '')
-            col += 1
-
-            # Transaction type
-            type_label = 'To Store' if line_data.get('transaction_type') == 'to_store' else 'From Store'
-            worksheet.write(row, col, type_label)
-            col += 1
-
-            worksheet.write(row, col, line_data.get('quantity') or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line_data.get('unit_price_eur') or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line_data.get('transaction_value_eur') or 0.0, currency_format)
-
-        # Write totals row
-        if transaction_lines_data:
-            total_row = len(transaction_lines_data) + 1
-            worksheet.write(total_row, 7, 'TOTAL', bold_format)
-            worksheet.write(total_row, 8, wizard.total_transactions_value or 0.0, currency_format)
-
-        # Set column widths
-        worksheet.set_column(0, 0, 12)  # Date
-        worksheet.set_column(1, 1, 25)  # Warehouse
-        worksheet.set_column(2, 4, 20)  # Transaction, Item, Batch
-        worksheet.set_column(5, 5, 12)  # Type
-        worksheet.set_column(6, 8, 18)  # Financial columns
+        xlsx.write_row([line.warehouse_name, line.beginning_value or 0.0, line.ending_value or 0.0, change])
+    total_change = (wizard.ending_value or 0.0) - (wizard.beginning_value or 0.0)
+    xlsx.write_row(['TOTAL', wizard.beginning_value or 0.0, wizard.ending_value or 0.0, total_change], bold=True)
+
+    # Sheet 2: Transactions, read from the wizard's relation table
+    wizard.env.cr.execute("SELECT 1 FROM wh_bal_tx_rel WHERE wizard_id = %s LIMIT 1", [wizard.id])
+    if wizard.env.cr.fetchone():
+        xlsx.add_sheet('Transactions', [
+            DATE_COLUMN, ('Warehouse', 25, None), TRANSACTION_COLUMN, ('Item', 20, None), ('Batch', 20, None),
+            ('Type', 12, None)] + VALUE_COLUMNS)
+        total_value_eur = 0.0
+        transactions = _iter_transactions(
+            wizard.env, "t.id IN (SELECT transaction_id FROM wh_bal_tx_rel WHERE wizard_id = %s)", [wizard.id])
+        for row in transactions:
+            xlsx.write_row([
+                row['date_issue'], row['warehouse_name'], row['transaction_name'], row['item_name'], row['batch_name'],
+                row['type_label'], row['quantity'], row['unit_price_eur'], row['value_eur'],
+            ])
+            total_value_eur += row['value_eur']
+        xlsx.write_row([''] * 7 + ['TOTAL', total_value_eur], bold=True)
 
     # Sheet 3: Identifiers (grouped by identifier_id)
     if wizard.identifier_line_ids:
-        worksheet = workbook.add_worksheet('Identifiers')
-
-        # Write headers
-        headers = [
-            'Identifier ID', 'Identifier Name', 'Identifier Type', 'Transaction Count', 'Total Quantity', 'Unit',
-            'To Store Quantity', 'From Store Quantity',
-            'Total Value (EUR)', 'To Store Value (EUR)', 'From Store Value (EUR)'
-        ]
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data
-        total_value_eur = 0.0
-        total_to_store_value_eur = 0.0
-        total_from_store_value_eur = 0.0
-        for row, line in enumerate(wizard.identifier_line_ids, start=1):
-            col = 0
-            worksheet.write(row, col, line.identifier_id or '')
-            col += 1
-            worksheet.write(row, col, line.identifier_name or '')
-            col += 1
-            worksheet.write(row, col, dict(line._fields['identifier_type'].selection).get(line.identifier_type, '') if line.identifier_type else '')
-            col += 1
-            worksheet.write(row, col, line.transaction_count or 0)
-            col += 1
-            worksheet.write(row, col, line.total_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.unit_id.name if line.unit_id else '')
-            col += 1
-            worksheet.write(row, col, line.total_to_store_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_from_store_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_to_store_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_from_store_value_eur or 0.0, currency_format)
-
-            total_value_eur += line.total_value_eur or 0.0
-            total_to_store_value_eur += line.total_to_store_value_eur or 0.0
-            total_from_store_value_eur += line.total_from_store_value_eur or 0.0
-
-        # Write totals row
-        if wizard.identifier_line_ids:
-            total_row = len(wizard.identifier_line_ids) + 1
-            worksheet.write(total_row, 0, 'TOTAL', bold_format)
-            worksheet.write(total_row, 8, total_value_eur, currency_format)
-            worksheet.write(total_row, 9, total_to_store_value_eur, currency_format)
-            worksheet.write(total_row, 10, total_from_store_value_eur, currency_format)
-
-        # Set column widths
-        worksheet.set_column(0, 0, 15)  # Identifier ID
-        worksheet.set_column(1, 1, 30)  # Identifier Name
-        worksheet.set_column(2, 2, 15)  # Identifier Type
-        worksheet.set_column(3, 3, 15)  # Transaction Count
-        worksheet.set_column(4, 4, 18)  # Total Quantity
-        worksheet.set_column(5, 5, 12)  # Unit
-        worksheet.set_column(6, 7, 18)  # To/From Store Quantities
-        worksheet.set_column(8, 10, 20)  # Financial columns
+        xlsx.add_sheet('Identifiers', IDENTIFIER_COLUMNS + [
+            ('Transaction Count', 15, None), ('Total Quantity', 18, 'currency'), ('Unit', 12, None),
+            ('To Store Quantity', 18, 'currency'), ('From Store Quantity', 18, 'currency'),
+            ('Total Value (EUR)', 20, 'currency'), ('To Store Value (EUR)', 20, 'currency'),
+            ('From Store Value (EUR)', 20, 'currency'),
+        ])
+        lines = wizard.identifier_line_ids
+        for line in lines:
+            xlsx.write_row([
+                line.identifier_id, line.identifier_name, _identifier_type_label(line),
+                line.transaction_count or 0, line.total_quantity or 0.0, line.unit_id.name,
+                line.total_to_store_quantity or 0.0, line.total_from_store_quantity or 0.0,
+                line.total_value_eur or 0.0, line.total_to_store_value_eur or 0.0, line.total_from_store_value_eur or 0.0,
+            ])
+        xlsx.write_row(['TOTAL'] + [''] * 7 + [
+            sum(lines.mapped('total_value_eur')), sum(lines.mapped('total_to_store_value_eur')),
+            sum(lines.mapped('total_from_store_value_eur')),
+        ], bold=True)
 
     # Sheet 4: Subcodes (grouped by subcode_id)
     if wizard.subcode_line_ids:
-        worksheet = workbook.add_worksheet('Subcodes')
-
-        # Write headers
-        headers = [
-            'Subcode', 'Subcode Description', 'Transaction Count',
-            'Total Value (EUR)', 'To Store Value (EUR)', 'From Store Value (EUR)'
-        ]
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data
-        total_value_eur = 0.0
-        total_to_store_value_eur = 0.0
-        total_from_store_value_eur = 0.0
-        for row, line in enumerate(wizard.subcode_line_ids, start=1):
-            col = 0
-            worksheet.write(row, col, line.subcode_id.name if line.subcode_id else '')
-            col += 1
-            worksheet.write(row, col, line.subcode_description or '')
-            col += 1
-            worksheet.write(row, col, line.transaction_count or 0)
-            col += 1
-            worksheet.write(row, col, line.total_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_to_store_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_from_store_value_eur or 0.0, currency_format)
-
-            total_value_eur += line.total_value_eur or 0.0
-            total_to_store_value_eur += line.total_to_store_value_eur or 0.0
-            total_from_store_value_eur += line.total_from_store_value_eur or 0.0
-
-        # Write totals row
-        if wizard.subcode_line_ids:
-            total_row = len(wizard.subcode_line_ids) + 1
-            worksheet.write(total_row, 0, 'TOTAL', bold_format)
-            worksheet.write(total_row, 3, total_value_eur, currency_format)
-            worksheet.write(total_row, 4, total_to_store_value_eur, currency_format)
-            worksheet.write(total_row, 5, total_from_store_value_eur, currency_format)
-
-        # Set column widths
-        worksheet.set_column(0, 0, 20)  # Subcode
-        worksheet.set_column(1, 1, 30)  # Subcode Description
-        worksheet.set_column(2, 2, 15)  # Transaction Count
-        worksheet.set_column(3, 5, 20)  # Financial columns
+        xlsx.add_sheet('Subcodes', [
+            ('Subcode', 20, None), ('Subcode Description', 30, None), ('Transaction Count', 15, None),
+            ('Total Value (EUR)', 20, 'currency'), ('To Store Value (EUR)', 20, 'currency'),
+            ('From Store Value (EUR)', 20, 'currency'),
+        ])
+        lines = wizard.subcode_line_ids
+        for line in lines:
+            xlsx.write_row([
+                line.subcode_id.name, line.subcode_description, line.transaction_count or 0,
+                line.total_value_eur or 0.0, line.total_to_store_value_eur or 0.0, line.total_from_store_value_eur or 0.0,
+            ])
+        xlsx.write_row(['TOTAL', '', '',
+            sum(lines.mapped('total_value_eur')), sum(lines.mapped('total_to_store_value_eur')),
+            sum(lines.mapped('total_from_store_value_eur')),
+        ], bold=True)
 
     # Sheet 5: Subcodes @ Identifiers (grouped by subcode_id and identifier_id)
     if wizard.subcode_identifier_line_ids:
-        worksheet = workbook.add_worksheet('Subcodes @ Identifiers')
-
-        # Write headers
-        headers = [
-            'Subcode', 'Subcode Description', 'Identifier ID', 'Identifier Name', 'Identifier Type', 'Transaction Count', 'Total Quantity', 'Unit',
-            'To Store Quantity', 'From Store Quantity',
-            'Total Value (EUR)', 'To Store Value (EUR)', 'From Store Value (EUR)'
-        ]
-        for col, header in enumerate(headers):
-            worksheet.write(0, col, header, header_format)
-
-        # Write data
-        total_value_eur = 0.0
-        total_to_store_value_eur = 0.0
-        total_from_store_value_eur = 0.0
-        for row, line in enumerate(wizard.subcode_identifier_line_ids, start=1):
-            col = 0
-            worksheet.write(row, col, line.subcode_id.name if line.subcode_id else '')
-            col += 1
-            worksheet.write(row, col, line.subcode_description or '')
-            col += 1
-            worksheet.write(row, col, line.identifier_id or '')
-            col += 1
-            worksheet.write(row, col, line.identifier_name or '')
-            col += 1
-            worksheet.write(row, col, dict(line._fields['identifier_type'].selection).get(line.identifier_type, '') if line.identifier_type else '')
-            col += 1
-            worksheet.write(row, col, line.transaction_count or 0)
-            col += 1
-            worksheet.write(row, col, line.total_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.unit_id.name if line.unit_id else '')
-            col += 1
-            worksheet.write(row, col, line.total_to_store_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_from_store_quantity or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_to_store_value_eur or 0.0, currency_format)
-            col += 1
-            worksheet.write(row, col, line.total_from_store_value_eur or 0.0, currency_format)
-
-            total_value_eur += line.total_value_eur or 0.0
-            total_to_store_value_eur += line.total_to_store_value_eur or 0.0
-            total_from_store_value_eur += line.total_from_store_value_eur or 0.0
-
-        # Write totals row
-        if wizard.subcode_identifier_line_ids:
-            total_row = len(wizard.subcode_identifier_line_ids) + 1
-            worksheet.write(total_row, 0, 'TOTAL', bold_format)
-            worksheet.write(total_row, 10, total_value_eur, currency_format)
-            worksheet.write(total_row, 11, total_to_store_value_eur, currency_format)
-            worksheet.write(total_row, 12, total_from_store_value_eur, currency_format)
-
-        # Set column widths
-        worksheet.set_column(0, 0, 20)  # Subcode
-        worksheet.set_column(1, 1, 30)  # Subcode Description
-        worksheet.set_column(2, 2, 15)  # Identifier ID
-        worksheet.set_column(3, 3, 30)  # Identifier Name
-        worksheet.set_column(4, 4, 15)  # Identifier Type
-        worksheet.set_column(5, 5, 15)  # Transaction Count
-        worksheet.set_column(6, 6, 18)  # Total Quantity
-        worksheet.set_column(7, 7, 12)  # Unit
-        worksheet.set_column(8, 9, 18)  # To/From Store Quantities
-        worksheet.set_column(10, 12, 20)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Get file data
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    filename = f"Warehouse_Balance_{wizard.date_from}_{wizard.date_to}.xlsx"
-
-    # Create attachment as standalone (not linked to transient wizard model)
-    # Using sudo() and not setting res_model/res_id to avoid domain filter issues
-    attachment = wizard.env['ir.attachment'].sudo().create({
-        'name': filename,
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
-
-    # Return download action - use ir.actions.act_url with attachment ID
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+        xlsx.add_sheet('Subcodes @ Identifiers', [('Subcode', 20, None), ('Subcode Description', 30, None)] + IDENTIFIER_COLUMNS + [
+            ('Transaction Count', 15, None), ('Total Quantity', 18, 'currency'), ('Unit', 12, None),
+            ('To Store Quantity', 18, 'currency'), ('From Store Quantity', 18, 'currency'),
+            ('Total Value (EUR)', 20, 'currency'), ('To Store Value (EUR)', 20, 'currency'),
+            ('From Store Value (EUR)', 20, 'currency'),
+        ])
+        lines = wizard.subcode_identifier_line_ids
+        for line in lines:
+            xlsx.write_row([
+                line.subcode_id.name, line.subcode_description,
+                line.identifier_id, line.identifier_name, _identifier_type_label(line),
+                line.transaction_count or 0, line.total_quantity or 0.0, line.unit_id.name,
+                line.total_to_store_quantity or 0.0, line.total_from_store_quantity or 0.0,
+                line.total_value_eur or 0.0, line.total_to_store_value_eur or 0.0, line.total_from_store_value_eur or 0.0,
+            ])
+        xlsx.write_row(['TOTAL'] + [''] * 9 + [
+            sum(lines.mapped('total_value_eur')), sum(lines.mapped('total_to_store_value_eur')),
+            sum(lines.mapped('total_from_store_value_eur')),
+        ], bold=True)
+
+    return f"Warehouse_Balance_{wizard.date_from}_{wizard.date_to}.xlsx"
+
+
+def _warehouse_transactions_where(balance_line):
+    """WHERE clause and params for the transactions of a warehouse line (all warehouses if none)"""
+    where = "t.date_issue >= %s AND t.date_issue <= %s"
+    params = [balance_line.wizard_id.date_from, balance_line.wizard_id.date_to]
+    if balance_line.warehouse_id:
+        where += " AND b.store_id = %s"
+        params.append(balance_line.warehouse_id.id)
+    return where, params
 
 
 def action_export_warehouse_transactions_to_excel(balance_line):
@@ -338,126 +205,36 @@ def action_export_warehouse_transactions_to_excel(balance_line):
     if not balance_line.wizard_id.date_from or not balance_line.wizard_id.date_to:
         raise UserError("Date range is not set.")
 
-    # Build search domain - if warehouse_id is False, show all warehouses
-    if balance_line.warehouse_id:
-        # Filter by specific warehouse
-        domain = [
-            ('batch_id.store_id', '=', balance_line.warehouse_id.id),
-            ('date_issue', '>=', balance_line.wizard_id.date_from),
-            ('date_issue', '<=', balance_line.wizard_id.date_to),
-        ]
-    else:
-        # Show all warehouses (All Warehouses line)
-        domain = [
-            ('date_issue', '>=', balance_line.wizard_id.date_from),
-            ('date_issue', '<=', balance_line.wizard_id.date_to),
-        ]
-
-    # Get transactions in the date range
-    transactions = balance_line.env['kojto.warehouses.transactions'].search(domain, order='date_issue desc')
-
-    if not transactions:
+    where, params = _warehouse_transactions_where(balance_line)
+    balance_line.env.cr.execute(f"""
+        SELECT 1
+        FROM kojto_warehouses_transactions t
+        LEFT JOIN kojto_warehouses_batches b ON t.batch_id = b.id
+        WHERE {where}
+        LIMIT 1
+    """, params)
+    if not balance_line.env.cr.fetchone():
         warehouse_name = balance_line.warehouse_name or 'All Warehouses'
         raise UserError(f"No transactions found for {warehouse_name} in the selected date range.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
-
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    return xlsx_export_action(balance_line, 'transactions')
 
-    worksheet = workbook.add_worksheet(f'Transactions - {balance_line.warehouse_name}')
 
-    # Write headers
-    headers = [
-        'Date', 'Transaction', 'Item', 'Batch', 'Type',
-        'Quantity', 'Unit Price (EUR)', 'Transaction Value (EUR)'
-    ]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-
-    # Write data
+def write_warehouse_transactions(balance_line, xlsx):
+    """Write the transactions of a warehouse line, returns the filename"""
+    where, params = _warehouse_transactions_where(balance_line)
+    xlsx.add_sheet(f'Transactions - {balance_line.warehouse_name}', [
+        DATE_COLUMN, TRANSACTION_COLUMN, ('Item', 20, None), ('Batch', 20, None), ('Type', 20, None)] + VALUE_COLUMNS)
     total_value = 0.0
-    for row, transaction in enumerate(transactions, start=1):
-        col = 0
-        worksheet.write(row, col, transaction.date_issue or '', date_format)
-        col += 1
-        worksheet.write(row, col, transaction.name or '')
-        col += 1
-        worksheet.write(row, col, transaction.item_id.name if transaction.item_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.name if transaction.batch_id else '')
-        col += 1
-
-        # Transaction type
-        type_label = 'To Store' if transaction.to_from_store == 'to_store' else 'From Store'
-        worksheet.write(row, col, type_label)
-        col += 1
-
-        worksheet.write(row, col, transaction.transaction_quantity or 0.0, currency_format)
-        col += 1
-
-        # Use pre-computed value if available, otherwise calculate
-        if transaction.transaction_value_pre_vat_eur and transaction.transaction_quantity > 0:
-            unit_price_eur = abs(transaction.transaction_value_pre_vat_eur / transaction.transaction_quantity)
-            transaction_value_eur = transaction.transaction_value_pre_vat_eur
-        else:
-            # Fallback calculation
-            if transaction.batch_id and transaction.batch_id.unit_price_converted:
-                # Get exchange rate for transaction date
-                from .kojto_warehouses_balance_wizard_calculations import get_exchange_rate_to_eur
-                exchange_rate = get_exchange_rate_to_eur(balance_line.env, transaction.date_issue)
-                unit_price_eur = transaction.batch_id.unit_price_converted * exchange_rate
-                # Calculate value in EUR directly
-                transaction_value_eur = transaction.transaction_quantity * transaction.batch_id.unit_price_converted * exchange_rate
-                if transaction.to_from_store == 'from_store':
-                    transaction_value_eur = -transaction_value_eur
-            else:
-                unit_price_eur = 0.0
-                transaction_value_eur = 0.0
-
-        worksheet.write(row, col, unit_price_eur, currency_format)
-        col += 1
-        worksheet.write(row, col, transaction_value_eur, currency_format)
-
-        total_value += transaction_value_eur
-
-    # Write totals row
-    if transactions:
-        total_row = len(transactions) + 1
-        worksheet.write(total_row, 6, 'TOTAL', bold_format)
-        worksheet.write(total_row, 7, total_value, currency_format)
-
-    # Set column widths
-    worksheet.set_column(0, 0, 12)  # Date
-    worksheet.set_column(1, 4, 20)  # Transaction, Item, Batch, Type
-    worksheet.set_column(5, 7, 18)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Get file data
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    filename = f"Transactions_{balance_line.warehouse_name}_{balance_line.wizard_id.date_from}_{balance_line.wizard_id.date_to}.xlsx"
-
-    # Create attachment
-    attachment = balance_line.env['ir.attachment'].sudo().create({
-        'name': filename,
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
-
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+    for row in _iter_transactions(balance_line.env, where, params):
+        xlsx.write_row([
+            row['date_issue'], row['transaction_name'], row['item_name'], row['batch_name'], row['type_label'],
+            row['quantity'], row['unit_price_eur'], row['value_eur'],
+        ])
+        total_value += row['value_eur']
+    xlsx.write_row([''] * 6 + ['TOTAL', total_value], bold=True)
+
+    return f"Transactions_{balance_line.warehouse_name}_{balance_line.wizard_id.date_from}_{balance_line.wizard_id.date_to}.xlsx"
 
 
 def action_export_identifier_transactions_to_excel(identifier_line):
@@ -470,110 +247,26 @@ def action_export_identifier_transactions_to_excel(identifier_line):
     if not identifier_line.wizard_id.date_from or not identifier_line.wizard_id.date_to:
         raise UserError("Date range is not set.")
 
-    # Get transactions for this identifier in the date range
-    transactions = identifier_line.transaction_ids.sorted('date_issue desc')
-
-    if not transactions:
+    if not identifier_line.transaction_ids:
         raise UserError(f"No transactions found for Identifier {identifier_line.identifier_id} in the selected date range.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    return xlsx_export_action(identifier_line, 'transactions')
 
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
 
-    worksheet = workbook.add_worksheet(f'Transactions - Identifier {identifier_line.identifier_id}')
+def write_identifier_transactions(identifier_line, xlsx):
+    """Write the transactions of an identifier line, returns the filename"""
+    identifier_values = [identifier_line.identifier_id, identifier_line.identifier_name, _identifier_type_label(identifier_line)]
+    transactions = _iter_transactions(
+        identifier_line.env,
+        "t.id IN (SELECT transaction_id FROM wh_bal_id_tx_rel WHERE identifier_line_id = %s)",
+        [identifier_line.id],
+    )
+    _write_transactions(
+        xlsx, f'Transactions - Identifier {identifier_line.identifier_id}',
+        IDENTIFIER_COLUMNS, transactions, lambda row: identifier_values,
+    )
 
-    # Write headers
-    headers = [
-        'Date', 'Transaction', 'Identifier ID', 'Identifier Name', 'Identifier Type', 'Warehouse', 'Item', 'Batch', 'Type',
-        'Quantity', 'Unit Price (EUR)', 'Transaction Value (EUR)'
-    ]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-
-    # Write data
-    total_value_eur = 0.0
-    for row, transaction in enumerate(transactions, start=1):
-        col = 0
-        worksheet.write(row, col, transaction.date_issue or '', date_format)
-        col += 1
-        worksheet.write(row, col, transaction.name or '')
-        col += 1
-        worksheet.write(row, col, identifier_line.identifier_id or '')
-        col += 1
-        worksheet.write(row, col, identifier_line.identifier_name or '')
-        col += 1
-        identifier_type_label = dict(identifier_line._fields['identifier_type'].selection).get(identifier_line.identifier_type, '') if identifier_line.identifier_type else ''
-        worksheet.write(row, col, identifier_type_label)
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.store_id.name if transaction.batch_id and transaction.batch_id.store_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.item_id.name if transaction.item_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.name if transaction.batch_id else '')
-        col += 1
-
-        # Transaction type
-        type_label = 'To Store' if transaction.to_from_store == 'to_store' else 'From Store'
-        worksheet.write(row, col, type_label)
-        col += 1
-
-        worksheet.write(row, col, transaction.transaction_quantity or 0.0, currency_format)
-        col += 1
-
-        # Calculate unit price and value
-        unit_price_eur = 0.0
-        transaction_value_eur = transaction.transaction_value_pre_vat_eur or 0.0
-        if transaction.transaction_quantity > 0:
-            unit_price_eur = abs(transaction_value_eur / transaction.transaction_quantity)
-
-        worksheet.write(row, col, unit_price_eur, currency_format)
-        col += 1
-        worksheet.write(row, col, transaction_value_eur, currency_format)
-
-        total_value_eur += transaction_value_eur
-
-    # Write totals row
-    if transactions:
-        total_row = len(transactions) + 1
-        worksheet.write(total_row, 10, 'TOTAL', bold_format)
-        worksheet.write(total_row, 11, total_value_eur, currency_format)
-
-    # Set column widths
-    worksheet.set_column(0, 0, 12)  # Date
-    worksheet.set_column(1, 1, 20)  # Transaction
-    worksheet.set_column(2, 2, 15)  # Identifier ID
-    worksheet.set_column(3, 3, 30)  # Identifier Name
-    worksheet.set_column(4, 4, 15)  # Identifier Type
-    worksheet.set_column(5, 8, 20)  # Warehouse, Item, Batch, Type
-    worksheet.set_column(9, 11, 18)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Get file data
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    filename = f"Transactions_Identifier_{identifier_line.identifier_id}_{identifier_line.wizard_id.date_from}_{identifier_line.wizard_id.date_to}.xlsx"
-
-    # Create attachment
-    attachment = identifier_line.env['ir.attachment'].sudo().create({
-        'name': filename,
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
-
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+    return f"Transactions_Identifier_{identifier_line.identifier_id}_{identifier_line.wizard_id.date_from}_{identifier_line.wizard_id.date_to}.xlsx"
 
 
 def action_export_subcode_transactions_to_excel(subcode_line):
@@ -586,108 +279,26 @@ def action_export_subcode_transactions_to_excel(subcode_line):
     if not subcode_line.wizard_id.date_from or not subcode_line.wizard_id.date_to:
         raise UserError("Date range is not set.")
 
-    # Get transactions for this subcode in the date range
-    transactions = subcode_line.transaction_ids.sorted('date_issue desc')
-
-    if not transactions:
-        subcode_name = subcode_line.subcode_id.name if subcode_line.subcode_id else 'N/A'
-        raise UserError(f"No transactions found for Subcode {subcode_name} in the selected date range.")
+    if not subcode_line.transaction_ids:
+        raise UserError(f"No transactions found for Subcode {subcode_line.subcode_id.name} in the selected date range.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    return xlsx_export_action(subcode_line, 'transactions')
 
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
 
-    subcode_name = subcode_line.subcode_id.name if subcode_line.subcode_id else 'N/A'
-    worksheet = workbook.add_worksheet(f'Transactions - Subcode {subcode_name}')
+def write_subcode_transactions(subcode_line, xlsx):
+    """Write the transactions of a subcode line, returns the filename"""
+    subcode_name = subcode_line.subcode_id.name or 'N/A'
+    transactions = _iter_transactions(
+        subcode_line.env,
+        "t.id IN (SELECT transaction_id FROM wh_bal_subcode_tx_rel WHERE subcode_line_id = %s)",
+        [subcode_line.id],
+    )
+    _write_transactions(
+        xlsx, f'Transactions - Subcode {subcode_name}', SUBCODE_COLUMNS, transactions,
+        lambda row: [row['subcode_name'], row['subcode_description']],
+    )
 
-    # Write headers
-    headers = [
-        'Date', 'Transaction', 'Subcode', 'Subcode Description', 'Warehouse', 'Item', 'Batch', 'Type',
-        'Quantity', 'Unit Price (EUR)', 'Transaction Value (EUR)'
-    ]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-
-    # Write data
-    total_value_eur = 0.0
-    for row, transaction in enumerate(transactions, start=1):
-        col = 0
-        worksheet.write(row, col, transaction.date_issue or '', date_format)
-        col += 1
-        worksheet.write(row, col, transaction.name or '')
-        col += 1
-        worksheet.write(row, col, transaction.subcode_id.name if transaction.subcode_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.subcode_id.description if transaction.subcode_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.store_id.name if transaction.batch_id and transaction.batch_id.store_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.item_id.name if transaction.item_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.name if transaction.batch_id else '')
-        col += 1
-
-        # Transaction type
-        type_label = 'To Store' if transaction.to_from_store == 'to_store' else 'From Store'
-        worksheet.write(row, col, type_label)
-        col += 1
-
-        worksheet.write(row, col, transaction.transaction_quantity or 0.0, currency_format)
-        col += 1
-
-        # Calculate unit price and value
-        unit_price_eur = 0.0
-        transaction_value_eur = transaction.transaction_value_pre_vat_eur or 0.0
-        if transaction.transaction_quantity > 0:
-            unit_price_eur = abs(transaction_value_eur / transaction.transaction_quantity)
-
-        worksheet.write(row, col, unit_price_eur, currency_format)
-        col += 1
-        worksheet.write(row, col, transaction_value_eur, currency_format)
-
-        total_value_eur += transaction_value_eur
-
-    # Write totals row
-    if transactions:
-        total_row = len(transactions) + 1
-        worksheet.write(total_row, 9, 'TOTAL', bold_format)
-        worksheet.write(total_row, 10, total_value_eur, currency_format)
-
-    # Set column widths
-    worksheet.set_column(0, 0, 12)  # Date
-    worksheet.set_column(1, 1, 20)  # Transaction
-    worksheet.set_column(2, 3, 20)  # Subcode, Description
-    worksheet.set_column(4, 7, 20)  # Warehouse, Item, Batch, Type
-    worksheet.set_column(8, 10, 18)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Get file data
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    subcode_name = subcode_line.subcode_id.name if subcode_line.subcode_id else 'N/A'
-    filename = f"Transactions_Subcode_{subcode_name}_{subcode_line.wizard_id.date_from}_{subcode_line.wizard_id.date_to}.xlsx"
-
-    # Create attachment
-    attachment = subcode_line.env['ir.attachment'].sudo().create({
-        'name': filename,
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
-
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
+    return f"Transactions_Subcode_{subcode_name}_{subcode_line.wizard_id.date_from}_{subcode_line.wizard_id.date_to}.xlsx"
 
 
 def action_export_subcode_identifier_transactions_to_excel(subcode_identifier_line):
@@ -700,116 +311,29 @@ def action_export_subcode_identifier_transactions_to_excel(subcode_identifier_li
     if not subcode_identifier_line.wizard_id.date_from or not subcode_identifier_line.wizard_id.date_to:
         raise UserError("Date range is not set.")
 
-    # Get transactions for this subcode-identifier combination in the date range
-    transactions = subcode_identifier_line.transaction_ids.sorted('date_issue desc')
-
-    if not transactions:
-        subcode_name = subcode_identifier_line.subcode_id.name if subcode_identifier_line.subcode_id else 'N/A'
+    if not subcode_identifier_line.transaction_ids:
+        subcode_name = subcode_identifier_line.subcode_id.name
         raise UserError(f"No transactions found for {subcode_name} @ {subcode_identifier_line.identifier_id} in the selected date range.")
 
-    # Create Excel file in memory
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    return xlsx_export_action(subcode_identifier_line, 'transactions')
 
-    # Define formats
-    bold_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3'})
-    currency_format = workbook.add_format({'num_format': '#,##0.00'})
-    header_format = workbook.add_format({'bold': True, 'bg_color': '#D3D3D3', 'align': 'center'})
-    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
 
-    subcode_name = subcode_identifier_line.subcode_id.name if subcode_identifier_line.subcode_id else 'N/A'
-    worksheet = workbook.add_worksheet(f'Transactions - {subcode_name} @ {subcode_identifier_line.identifier_id}')
-
-    # Write headers
-    headers = [
-        'Date', 'Transaction', 'Identifier ID', 'Identifier Name', 'Identifier Type', 'Subcode', 'Subcode Description', 'Warehouse', 'Item', 'Batch', 'Type',
-        'Quantity', 'Unit Price (EUR)', 'Transaction Value (EUR)'
+def write_subcode_identifier_transactions(subcode_identifier_line, xlsx):
+    """Write the transactions of a subcode-identifier line, returns the filename"""
+    subcode_name = subcode_identifier_line.subcode_id.name or 'N/A'
+    identifier_values = [
+        subcode_identifier_line.identifier_id, subcode_identifier_line.identifier_name,
+        _identifier_type_label(subcode_identifier_line),
     ]
-    for col, header in enumerate(headers):
-        worksheet.write(0, col, header, header_format)
-
-    # Write data
-    total_value_eur = 0.0
-    for row, transaction in enumerate(transactions, start=1):
-        col = 0
-        worksheet.write(row, col, transaction.date_issue or '', date_format)
-        col += 1
-        worksheet.write(row, col, transaction.name or '')
-        col += 1
-        worksheet.write(row, col, subcode_identifier_line.identifier_id or '')
-        col += 1
-        worksheet.write(row, col, subcode_identifier_line.identifier_name or '')
-        col += 1
-        identifier_type_label = dict(subcode_identifier_line._fields['identifier_type'].selection).get(subcode_identifier_line.identifier_type, '') if subcode_identifier_line.identifier_type else ''
-        worksheet.write(row, col, identifier_type_label)
-        col += 1
-        worksheet.write(row, col, transaction.subcode_id.name if transaction.subcode_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.subcode_id.description if transaction.subcode_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.store_id.name if transaction.batch_id and transaction.batch_id.store_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.item_id.name if transaction.item_id else '')
-        col += 1
-        worksheet.write(row, col, transaction.batch_id.name if transaction.batch_id else '')
-        col += 1
-
-        # Transaction type
-        type_label = 'To Store' if transaction.to_from_store == 'to_store' else 'From Store'
-        worksheet.write(row, col, type_label)
-        col += 1
-
-        worksheet.write(row, col, transaction.transaction_quantity or 0.0, currency_format)
-        col += 1
-
-        # Calculate unit price and value
-        unit_price_eur = 0.0
-        transaction_value_eur = transaction.transaction_value_pre_vat_eur or 0.0
-        if transaction.transaction_quantity > 0:
-            unit_price_eur = abs(transaction_value_eur / transaction.transaction_quantity)
-
-        worksheet.write(row, col, unit_price_eur, currency_format)
-        col += 1
-        worksheet.write(row, col, transaction_value_eur, currency_format)
-
-        total_value_eur += transaction_value_eur
-
-    # Write totals row
-    if transactions:
-        total_row = len(transactions) + 1
-        worksheet.write(total_row, 11, 'TOTAL', bold_format)
-        worksheet.write(total_row, 12, total_value_eur, currency_format)
-
-    # Set column widths
-    worksheet.set_column(0, 0, 12)  # Date
-    worksheet.set_column(1, 1, 20)  # Transaction
-    worksheet.set_column(2, 2, 15)  # Identifier ID
-    worksheet.set_column(3, 3, 30)  # Identifier Name
-    worksheet.set_column(4, 4, 15)  # Identifier Type
-    worksheet.set_column(5, 6, 20)  # Subcode, Description
-    worksheet.set_column(7, 10, 20)  # Warehouse, Item, Batch, Type
-    worksheet.set_column(11, 13, 18)  # Financial columns
-
-    workbook.close()
-    output.seek(0)
-
-    # Get file data
-    file_data = output.read()
-    file_data_base64 = base64.b64encode(file_data).decode('utf-8')
-    subcode_name = subcode_identifier_line.subcode_id.name if subcode_identifier_line.subcode_id else 'N/A'
-    filename = f"Transactions_{subcode_name}_{subcode_identifier_line.identifier_id}_{subcode_identifier_line.wizard_id.date_from}_{subcode_identifier_line.wizard_id.date_to}.xlsx"
-
-    # Create attachment
-    attachment = subcode_identifier_line.env['ir.attachment'].sudo().create({
-        'name': filename,
-        'datas': file_data_base64,
-        'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    })
-
-    # Return download action
-    return {
-        'type': 'ir.actions.act_url',
-        'url': f'/web/content/{attachment.id}?download=true',
-        'target': 'self',
-    }
-
+    transactions = _iter_transactions(
+        subcode_identifier_line.env,
+        "t.id IN (SELECT transaction_id FROM wh_bal_subcode_id_tx_rel WHERE subcode_identifier_line_id = %s)",
+        [subcode_identifier_line.id],
+    )
+    _write_transactions(
+        xlsx, f'Transactions - {subcode_name} @ {subcode_identifier_line.identifier_id}',
+        IDENTIFIER_COLUMNS + SUBCODE_COLUMNS, transactions,
+        lambda row: identifier_values + [row['subcode_name'], row['subcode_description']],
+    )
+
+    return f"Transactions_{subcode_name}_{subcode_identifier_line.identifier_id}_{subcode_identifier_line.wizard_id.date_from}_{subcode_identifier_line.wizard_id.date_to}.xlsx"
@@ -8,6 +8,59 @@ Contains calculation methods for warehouse balance aggregation using SQL for per
 from datetime import datetime, timedelta
 
 
+def _balance_values_sql(env, balance_date, value_column, warehouse_ids=None):
+    """
+    Build the SQL for the value of each warehouse at the end of balance_date.
+
+    Reads the latest balance snapshot on or before balance_date and adds the
+    transactions after it, instead of summing the whole transaction history.
+
+    Returns:
+        tuple: (sql, params) selecting warehouse_id and value_column
+    """
+    snapshot_date = env['kojto.warehouses.balance.snapshots'].get_snapshot_date(balance_date)
+
+    snapshot_filter = ""
+    warehouse_filter = ""
+    if warehouse_ids:
+        warehouse_ids_str = ','.join(map(str, warehouse_ids))
+        snapshot_filter = f"AND sn.store_id IN ({warehouse_ids_str})"
+        warehouse_filter = f"AND b.store_id IN ({warehouse_ids_str})"
+
+    if snapshot_date:
+        snapshot_sql = f"""
+                SELECT sn.store_id AS warehouse_id, sn.value
+                FROM kojto_warehouses_balance_snapshots sn
+                WHERE sn.snapshot_date = %s
+                    {snapshot_filter}
+                UNION ALL"""
+        snapshot_params = [snapshot_date]
+        transaction_filter = "AND t.date_issue > %s"
+        transaction_params = [balance_date, snapshot_date]
+    else:
+        snapshot_sql = ""
+        snapshot_params = []
+        transaction_filter = ""
+        transaction_params = [balance_date]
+
+    sql = f"""
+            SELECT
+                v.warehouse_id,
+                COALESCE(SUM(v.value), 0) AS {value_column}
+            FROM ({snapshot_sql}
+                SELECT b.store_id AS warehouse_id, t.transaction_value_pre_vat_eur AS value
+                FROM kojto_warehouses_transactions t
+                INNER JOIN kojto_warehouses_items i ON t.item_id = i.id
+                INNER JOIN kojto_warehouses_batches b ON i.batch_id = b.id
+                WHERE t.date_issue <= %s
+                    {transaction_filter}
+                    AND t.transaction_value_pre_vat_eur IS NOT NULL
+                    {warehouse_filter}
+            ) v
+            GROUP BY v.warehouse_id"""
+    return sql, snapshot_params + transaction_params
+
+
 def calculate_warehouse_balance_sql(env, date_from, date_to, warehouse_ids=None, wizard_id=None):
     """
     Calculate warehouse balance using SQL for performance.
@@ -68,30 +121,16 @@ def calculate_warehouse_balance_sql(env, date_from, date_to, warehouse_ids=None,
         # Two CTEs (period_to_store and period_from_store) each need date_from and date_to
         period_params = [date_from, date_to, date_from, date_to]
 
+    # Beginning and ending balances start from the nearest month-end snapshot
+    beginning_sql, beginning_params = _balance_values_sql(env, date_before_from, 'beginning_value', warehouse_ids)
+    ending_sql, ending_params = _balance_values_sql(env, date_to, 'ending_value', warehouse_ids)
+
     query = f"""
         WITH beginning_values AS (
-            SELECT
-                b.store_id AS warehouse_id,
-                COALESCE(SUM(t.transaction_value_pre_vat_eur), 0) AS beginning_value
-            FROM kojto_warehouses_transactions t
-            INNER JOIN kojto_warehouses_items i ON t.item_id = i.id
-            INNER JOIN kojto_warehouses_batches b ON i.batch_id = b.id
-            WHERE t.date_issue < %s
-                AND t.transaction_value_pre_vat_eur IS NOT NULL
-                {warehouse_filter}
-            GROUP BY b.store_id
+            {beginning_sql}
         ),
         ending_values AS (
-            SELECT
-                b.store_id AS warehouse_id,
-                COALESCE(SUM(t.transaction_value_pre_vat_eur), 0) AS ending_value
-            FROM kojto_warehouses_transactions t
-            INNER JOIN kojto_warehouses_items i ON t.item_id = i.id
-            INNER JOIN kojto_warehouses_batches b ON i.batch_id = b.id
-            WHERE t.date_issue <= %s
-                AND t.transaction_value_pre_vat_eur IS NOT NULL
-                {warehouse_filter}
-            GROUP BY b.store_id
+            {ending_sql}
         ),
         period_to_store AS (
             SELECT
@@ -138,7 +177,7 @@ def calculate_warehouse_balance_sql(env, date_from, date_to, warehouse_ids=None,
 
     # Execute query with appropriate parameters
     # Beginning and ending always use date filters, period uses relation table or date filters
-    query_params = [date_from, date_to] + period_params
+    query_params = beginning_params + ending_params + period_params
     cr.execute(query, query_params)
     warehouse_results = cr.dictfetchall()
 